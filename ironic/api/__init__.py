@@ -27,6 +27,34 @@ API_SERVICE_OPTS = [
                default=1000,
                help='The maximum number of items returned in a single '
                     'response from a collection resource.'),
+    cfg.IntOpt('export_batch_size',
+               default=100,
+               help='The number of rows fetched from the database at a '
+                    'time when streaming a collection export.'),
+    cfg.IntOpt('max_watch_timeout',
+               default=60,
+               help='The maximum number of seconds a request may wait for '
+                    'the states of nodes to change.'),
+    cfg.FloatOpt('watch_interval',
+                 default=0.5,
+                 help='The interval, in seconds, at which the states of '
+                      'watched nodes are checked for changes.'),
+    cfg.BoolOpt('enable_metrics',
+                default=True,
+                help='Record the latency and throughput of each route, '
+                     'and export them at /v1/metrics.'),
+    cfg.BoolOpt('compress_responses',
+                default=True,
+                help='Compress the bodies of responses with gzip or '
+                     'deflate, for clients which accept it.'),
+    cfg.IntOpt('compress_min_size',
+               default=1024,
+               help='The minimum size, in bytes, of the body of a response '
+                    'for it to be compressed.'),
+    cfg.IntOpt('compress_level',
+               default=6,
+               help='The level of compression, from 1 (fastest) to 9 '
+                    '(smallest).'),
     ]
 
 CONF = cfg.CONF
@@ -21,6 +21,7 @@ import pecan
 from ironic.api import acl
 from ironic.api import config
 from ironic.api import hooks
+from ironic.api import metrics
 from ironic.api import middleware
 from ironic.common import policy
 
@@ -46,8 +47,14 @@ def setup_app(pecan_config=None, extra_hooks=None):
     app_hooks = [hooks.ConfigHook(),
                  hooks.DBHook(),
                  hooks.ContextHook(pecan_config.app.acl_public_routes),
-                 hooks.RPCHook(),
-                 hooks.NoExceptionTracebackHook()]
+                 hooks.RPCHook()]
+    custom_renderers = {}
+    if CONF.api.enable_metrics:
+        # NOTE: its before hook wraps the rpcapi attached by the RPCHook
+        app_hooks.append(hooks.MetricsHook())
+        custom_renderers = metrics.timed_renderers()
+        metrics.listen_db()
+    app_hooks.append(hooks.NoExceptionTracebackHook())
     if extra_hooks:
         app_hooks.extend(extra_hooks)
 
@@ -65,9 +72,15 @@ def setup_app(pecan_config=None, extra_hooks=None):
         debug=CONF.debug,
         force_canonical=getattr(pecan_config.app, 'force_canonical', True),
         hooks=app_hooks,
+        custom_renderers=custom_renderers,
         wrap_app=middleware.ParsableErrorMiddleware,
     )
 
+    if CONF.api.compress_responses:
+        app = middleware.CompressMiddleware(
+            app, min_size=CONF.api.compress_min_size,
+            level=CONF.api.compress_level)
+
     if pecan_config.app.enable_acl:
         return acl.install(app, cfg.CONF, pecan_config.app.acl_public_routes)
 
@@ -33,6 +33,11 @@ class APIBase(wtypes.Base):
                     if hasattr(self, k) and
                     getattr(self, k) != wsme.Unset)
 
+    @classmethod
+    def field_names(cls):
+        """Return the names of the attributes exposed by this API type."""
+        return [attr.name for attr in wtypes.list_attributes(cls)]
+
     def unset_fields_except(self, except_list=None):
         """Unset fields so they don't appear in the message body.
 
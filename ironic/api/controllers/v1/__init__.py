@@ -32,7 +32,9 @@ from ironic.api.controllers import base
 from ironic.api.controllers import link
 from ironic.api.controllers.v1 import chassis
 from ironic.api.controllers.v1 import driver
+from ironic.api.controllers.v1 import metrics
 from ironic.api.controllers.v1 import node
+from ironic.api.controllers.v1 import operation
 from ironic.api.controllers.v1 import port
 
 
@@ -71,6 +73,9 @@ class V1(base.APIBase):
     drivers = [link.Link]
     "Links to the drivers resource"
 
+    operations = [link.Link]
+    "Links to the operations resource"
+
     @classmethod
     def convert(self):
         v1 = V1()
@@ -113,6 +118,13 @@ class V1(base.APIBase):
                                           'drivers', '',
                                           bookmark=True)
                      ]
+        v1.operations = [link.Link.make_link('self', pecan.request.host_url,
+                                             'operations', ''),
+                         link.Link.make_link('bookmark',
+                                             pecan.request.host_url,
+                                             'operations', '',
+                                             bookmark=True)
+                        ]
         return v1
 
 
@@ -123,6 +135,8 @@ class Controller(rest.RestController):
     ports = port.PortsController()
     chassis = chassis.ChassisController()
     drivers = driver.DriversController()
+    operations = operation.OperationsController()
+    metrics = metrics.MetricsController()
 
     @wsme_pecan.wsexpose(V1)
     def get(self):
@@ -152,6 +152,11 @@ class ChassisController(rest.RestController):
         if marker:
             marker_obj = objects.Chassis.get_by_uuid(pecan.request.context,
                                                      marker)
+
+        digest = pecan.request.dbapi.get_chassis_digest()
+        if api_utils.check_etag(digest):
+            return
+
         chassis = pecan.request.dbapi.get_chassis_list(limit, marker_obj,
                                                        sort_key=sort_key,
                                                        sort_dir=sort_dir)
@@ -199,6 +204,11 @@ class ChassisController(rest.RestController):
 
         :param chassis_uuid: UUID of a chassis.
         """
+        digest = pecan.request.dbapi.get_chassis_digest(
+                                                {'uuid': chassis_uuid})
+        if digest[0] and api_utils.check_etag(digest):
+            return
+
         rpc_chassis = objects.Chassis.get_by_uuid(pecan.request.context,
                                                   chassis_uuid)
         return Chassis.convert_with_links(rpc_chassis)
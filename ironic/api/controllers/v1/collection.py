@@ -13,11 +13,168 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import abc
+import datetime
+import itertools
+
 import pecan
+import six
+from six.moves.urllib import parse as urlparse
+import wsme.rest.json
 from wsme import types as wtypes
 
 from ironic.api.controllers import base
 from ironic.api.controllers import link
+from ironic.openstack.common import jsonutils
+
+
+def stream(name, items):
+    """Write a collection to the response as chunked JSON.
+
+    Items are encoded and written one at a time, so the memory used does
+    not grow with the size of the collection.
+
+    :param name: the name of the collection, e.g. 'nodes'.
+    :param items: an iterable of items in their JSON form, as returned
+                  by :meth:`Serializer.iter`.
+    :returns: the response, which the controller should return as is.
+    """
+    def body():
+        yield '{"%s": [' % name
+        separator = ''
+        for item in items:
+            yield separator + jsonutils.dumps(item)
+            separator = ', '
+        yield ']}'
+
+    pecan.response.content_type = 'application/json'
+    pecan.response.app_iter = body()
+    return pecan.response
+
+
+@six.add_metaclass(abc.ABCMeta)
+class Serializer(object):
+    """Convert RPC objects straight to the JSON form of an API type.
+
+    The output is the same as encoding what the API type's
+    convert_with_links() returns, but no WSME object is built and
+    validated per item, links are filled in from string templates, and
+    the uuids of the parent resources are looked up with one query per
+    page instead of one per item.
+
+    Serializers do not use the request once built, as exports are
+    serialized after the controller has returned.
+    """
+
+    #: The API type of the items.
+    datatype = None
+
+    #: The name of the resource in URLs, e.g. 'nodes'.
+    resource = None
+
+    #: The fields returned when the collection is not expanded.
+    brief_fields = ()
+
+    #: The API fields holding links, mapped to the path they point to
+    #: relative to the item.
+    link_fields = {'links': ''}
+
+    #: The API field holding the uuid of the parent resource and the
+    #: object field holding its id, e.g. ('chassis_uuid', 'chassis_id').
+    parent_fields = (None, None)
+
+    def __init__(self, url, dbapi, expand=True, fields=None):
+        """Build a serializer.
+
+        :param url: the base URL of the API, used to build the links.
+        :param dbapi: the DB API, used to look up the parent resources.
+        :param expand: whether all the fields are returned, if no fields
+                       are given.
+        :param fields: a list of the fields to return, or None.
+        """
+        self._dbapi = dbapi
+        if fields is None:
+            if expand:
+                fields = self.datatype.field_names()
+            else:
+                fields = list(self.brief_fields) + ['links']
+
+        parent_field = self.parent_fields[0]
+        self._fields = [f for f in fields
+                        if f not in self.link_fields and f != parent_field]
+        self._links = [(f, p) for f, p in self.link_fields.items()
+                       if f in fields]
+        self._with_parent = parent_field in fields
+        self._url = link.build_url(self.resource, '', base_url=url)
+        self._bookmark = link.build_url(self.resource, '', bookmark=True,
+                                        base_url=url)
+
+    @abc.abstractmethod
+    def get_parent_uuids(self, parent_ids):
+        """Return a dict mapping the given parent ids to their uuids."""
+
+    def _serialize(self, values, parent_uuids):
+        item = {}
+        for field in self._fields:
+            value = values.get(field)
+            if isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            item[field] = value
+
+        if self._with_parent:
+            parent_id = values.get(self.parent_fields[1])
+            item[self.parent_fields[0]] = parent_uuids.get(parent_id)
+
+        uuid = values['uuid']
+        for field, path in self._links:
+            item[field] = [{'href': self._url + uuid + path, 'rel': 'self'},
+                           {'href': self._bookmark + uuid + path,
+                            'rel': 'bookmark'}]
+        return item
+
+    def __call__(self, objs):
+        """Serialize a page of RPC objects.
+
+        :returns: a list of dicts, ready to be encoded as JSON.
+        """
+        values = [obj.as_dict() for obj in objs]
+        parent_uuids = {}
+        if self._with_parent:
+            parent_ids = set(v.get(self.parent_fields[1]) for v in values)
+            parent_ids.discard(None)
+            if parent_ids:
+                parent_uuids = self.get_parent_uuids(list(parent_ids))
+        return [self._serialize(v, parent_uuids) for v in values]
+
+    def iter(self, objs, batch_size):
+        """Lazily serialize an iterable of RPC objects, a batch at a time."""
+        objs = iter(objs)
+        while True:
+            batch = list(itertools.islice(objs, batch_size))
+            if not batch:
+                return
+            for item in self(batch):
+                yield item
+
+
+def _serialized_tojson(datatype, value):
+    if value is not None and value._serialized is not None:
+        result = {value._type: value._serialized}
+        if value.next is not wtypes.Unset:
+            result['next'] = value.next
+        return result
+    return wsme.rest.json.tojson.default(datatype, value)
+
+
+def serializable(cls):
+    """Class decorator for collections which may hold serialized items.
+
+    When the items of such a collection are set with
+    :meth:`Collection.set_serialized`, they are encoded as they are,
+    bypassing the WSME conversion of each item.
+    """
+    wsme.rest.json.tojson.when_object(cls)(_serialized_tojson)
+    return cls
 
 
 class Collection(base.APIBase):
@@ -25,24 +182,47 @@ class Collection(base.APIBase):
     next = wtypes.text
     "A link to retrieve the next subset of the collection"
 
+    _serialized = None
+
     @property
     def collection(self):
+        if self._serialized is not None:
+            return self._serialized
         return getattr(self, self._type)
 
+    @staticmethod
+    def can_serialize():
+        """Return whether items may be given in their JSON form.
+
+        This is only the case when the response is rendered as JSON.
+        """
+        return pecan.request.pecan.get('content_type') == 'application/json'
+
+    def set_serialized(self, items):
+        """Set the items of the collection, already in their JSON form."""
+        self._serialized = items
+
     def has_next(self, limit):
         """Return whether collection has more items."""
         return len(self.collection) and len(self.collection) == limit
 
+    def _last_uuid(self):
+        last = self.collection[-1]
+        return last['uuid'] if isinstance(last, dict) else last.uuid
+
     def get_next(self, limit, url=None, **kwargs):
         """Return a link to the next subset of the collection."""
         if not self.has_next(limit):
             return wtypes.Unset
 
         resource_url = url or self._type
-        q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
+        quote = lambda v: urlparse.quote(six.text_type(v).encode('utf-8'),
+                                         safe='/,:')
+        q_args = ''.join(['%s=%s&' % (key, quote(kwargs[key]))
+                          for key in kwargs])
         next_args = '?%(args)slimit=%(limit)d&marker=%(marker)s' % {
                                             'args': q_args, 'limit': limit,
-                                            'marker': self.collection[-1].uuid}
+                                            'marker': self._last_uuid()}
 
         return link.Link.make_link('next', pecan.request.host_url,
                                    resource_url, next_args).href
@@ -23,6 +23,7 @@ import wsmeext.pecan as wsme_pecan
 from ironic.api.controllers import base
 from ironic.api.controllers import link
 from ironic.common import exception
+from ironic.common import hash_ring
 
 
 class Driver(base.APIBase):
@@ -113,6 +114,20 @@ class DriversController(rest.RestController):
 
     vendor_passthru = DriverPassthruController()
 
+    def _get_drivers(self):
+        """Return a dict mapping the name of each active driver to its
+        API representation.
+
+        The drivers and their hosts come from the shared hash ring manager,
+        which reloads them every CONF.hash_ring_reset_interval seconds, and
+        builds them again only when they changed. Their links depend on the
+        URL they are requested at, so they are converted for each request.
+        """
+        ring_manager = hash_ring.get_shared_ring_manager()
+        _generation, driver_hosts = ring_manager.get_driver_hosts()
+        return dict((name, Driver.convert_with_links(name, hosts))
+                    for name, hosts in driver_hosts.items())
+
     @wsme_pecan.wsexpose(DriverList)
     def get_all(self):
         """Retrieve a list of drivers.
@@ -121,21 +136,20 @@ class DriversController(rest.RestController):
         #              will break from a single-line doc string.
         #              This is a result of a bug in sphinxcontrib-pecanwsme
         # https://github.com/dreamhost/sphinxcontrib-pecanwsme/issues/8
-        driver_list = pecan.request.dbapi.get_active_driver_dict()
-        return DriverList.convert_with_links(driver_list)
+        drivers = self._get_drivers()
+        return DriverList(drivers=[drivers[name] for name in sorted(drivers)])
 
     @wsme_pecan.wsexpose(Driver, wtypes.text)
     def get_one(self, driver_name):
         """Retrieve a single driver.
         """
-        # NOTE(russell_h): There is no way to make this more efficient than
-        # retrieving a list of drivers using the current sqlalchemy schema, but
-        # this path must be exposed for Pecan to route any paths we might
-        # choose to expose below it.
-
-        driver_dict = pecan.request.dbapi.get_active_driver_dict()
-        for name, hosts in driver_dict.iteritems():
-            if name == driver_name:
-                return Driver.convert_with_links(name, list(hosts))
-
-        raise exception.DriverNotFound(driver_name=driver_name)
+        drivers = self._get_drivers()
+        if driver_name not in drivers:
+            # NOTE: the driver may be supported by a conductor which
+            # registered after the drivers were loaded.
+            hash_ring.get_shared_ring_manager().reset()
+            drivers = self._get_drivers()
+        try:
+            return drivers[driver_name]
+        except KeyError:
+            raise exception.DriverNotFound(driver_name=driver_name)
@@ -0,0 +1,25 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import pecan
+from pecan import rest
+
+from ironic.api import metrics
+
+
+class MetricsController(rest.RestController):
+    """REST controller for the metrics of the API service."""
+
+    @pecan.expose(content_type='text/plain')
+    def get_all(self):
+        """Retrieve the metrics of the API service, in plain text."""
+        return metrics.get_registry().render()
@@ -13,9 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import datetime
+import time
 
 from oslo.config import cfg
+from oslo import messaging
 import pecan
 from pecan import rest
 import six
@@ -26,6 +29,7 @@ import wsmeext.pecan as wsme_pecan
 from ironic.api.controllers import base
 from ironic.api.controllers import link
 from ironic.api.controllers.v1 import collection
+from ironic.api.controllers.v1 import operation
 from ironic.api.controllers.v1 import port
 from ironic.api.controllers.v1 import types
 from ironic.api.controllers.v1 import utils as api_utils
@@ -33,6 +37,7 @@ from ironic.common import exception
 from ironic.common import states as ir_states
 from ironic.common import utils
 from ironic import objects
+from ironic.openstack.common import timeutils
 
 
 CONF = cfg.CONF
@@ -40,6 +45,28 @@ CONF.import_opt('heartbeat_timeout', 'ironic.conductor.manager',
                 group='conductor')
 
 
+# API fields which are not backed by a DB column of the same name
+_FIELD_COLUMNS = {'chassis_uuid': 'chassis_id',
+                  'links': 'uuid',
+                  'ports': 'uuid'}
+
+
+def _get_nodes_projection(fields, filters, limit=None, marker=None,
+                          sort_key=None, sort_dir=None):
+    """Load only the DB columns needed to render the requested fields.
+
+    :returns: a list of partially populated :class:`objects.Node`.
+    """
+    columns = sorted(set(_FIELD_COLUMNS.get(f, f) for f in fields))
+    rows = pecan.request.dbapi.get_nodeinfo_list(columns=columns,
+                                                 filters=filters,
+                                                 limit=limit, marker=marker,
+                                                 sort_key=sort_key,
+                                                 sort_dir=sort_dir)
+    return [objects.Node(pecan.request.context, **dict(zip(columns, row)))
+            for row in rows]
+
+
 class NodePatchType(types.JsonPatchType):
 
     @staticmethod
@@ -72,6 +99,18 @@ class ConsoleInfo(base.APIBase):
         return cls(console_enabled=True, console_info=console)
 
 
+def _accepted(rpc_node, rpc_operation):
+    """Point the client at the operation tracking an accepted request.
+
+    :returns: the API representation of the operation.
+    """
+    # Set the HTTP Location Header
+    pecan.response.location = link.build_url('operations',
+                                             rpc_operation.uuid)
+    return operation.Operation.convert_with_links(rpc_operation,
+                                                  node_uuid=rpc_node.uuid)
+
+
 class NodeConsoleController(rest.RestController):
 
     @wsme_pecan.wsexpose(ConsoleInfo, types.uuid)
@@ -93,21 +132,26 @@ class NodeConsoleController(rest.RestController):
 
         return ConsoleInfo(console_enabled=console_state, console_info=console)
 
-    @wsme_pecan.wsexpose(None, types.uuid, types.boolean, status_code=202)
+    @wsme_pecan.wsexpose(operation.Operation, types.uuid, types.boolean,
+                         status_code=202)
     def put(self, node_uuid, enabled):
         """Start and stop the node console.
 
+        The conductor checks the request and starts a background task
+        for it; the operation returned tracks the progress of that task.
+
         :param node_uuid: UUID of a node.
         :param enabled: Boolean value; whether to enable or disable the
                 console.
         """
         rpc_node = objects.Node.get_by_uuid(pecan.request.context, node_uuid)
         topic = pecan.request.rpcapi.get_topic_for(rpc_node)
+        rpc_operation = operation.create_operation(
+                rpc_node, 'console', 'enabled' if enabled else 'disabled')
         pecan.request.rpcapi.set_console_mode(pecan.request.context, node_uuid,
-                                              enabled, topic)
-        # Set the HTTP Location Header
-        url_args = '/'.join([node_uuid, 'states', 'console'])
-        pecan.response.location = link.build_url('nodes', url_args)
+                                              enabled, topic,
+                                              operation_id=rpc_operation.uuid)
+        return _accepted(rpc_node, rpc_operation)
 
 
 class NodeStates(base.APIBase):
@@ -127,13 +171,14 @@ class NodeStates(base.APIBase):
 
     last_error = wtypes.text
 
+    _attr_list = ['console_enabled', 'last_error', 'power_state',
+                  'provision_state', 'target_power_state',
+                  'target_provision_state', 'provision_updated_at']
+
     @classmethod
     def convert(cls, rpc_node):
-        attr_list = ['console_enabled', 'last_error', 'power_state',
-                     'provision_state', 'target_power_state',
-                     'target_provision_state', 'provision_updated_at']
         states = NodeStates()
-        for attr in attr_list:
+        for attr in cls._attr_list:
             setattr(states, attr, getattr(rpc_node, attr))
         return states
 
@@ -149,6 +194,232 @@ class NodeStates(base.APIBase):
         return sample
 
 
+class NodesStates(base.APIBase):
+    """API representation of the states of several nodes."""
+
+    nodes = {wtypes.text: NodeStates}
+    "The states of each of the nodes, keyed by node UUID"
+
+    @classmethod
+    def sample(cls):
+        sample = cls(nodes={'1be26c0b-03f2-4d2e-ae87-c02d7f33c123':
+                                NodeStates.sample()})
+        return sample
+
+
+class NodesStateChange(base.APIBase):
+    """API representation of a state change requested for several nodes."""
+
+    nodes = wsme.wsattr([types.uuid], mandatory=True)
+    "The UUIDs of the nodes"
+
+    target = wsme.wsattr(wtypes.text, mandatory=True)
+    "The desired state of the nodes"
+
+    @classmethod
+    def sample(cls):
+        sample = cls(nodes=['1be26c0b-03f2-4d2e-ae87-c02d7f33c123'],
+                     target=ir_states.POWER_ON)
+        return sample
+
+
+class NodeStateChangeResult(base.APIBase):
+    """API representation of the outcome of a state change for a node."""
+
+    uuid = types.uuid
+    "The UUID of the node"
+
+    accepted = types.boolean
+    "Whether the state change was accepted and started"
+
+    error = wtypes.text
+    "Why the state change was not accepted"
+
+    @classmethod
+    def sample(cls):
+        sample = cls(uuid='1be26c0b-03f2-4d2e-ae87-c02d7f33c123',
+                     accepted=True, error=None)
+        return sample
+
+
+class NodesStateChangeResult(base.APIBase):
+    """API representation of the outcome of a state change for nodes."""
+
+    nodes = [NodeStateChangeResult]
+    "The outcome for each of the nodes, in the order they were requested"
+
+    @classmethod
+    def sample(cls):
+        sample = cls(nodes=[NodeStateChangeResult.sample()])
+        return sample
+
+
+def _check_provision_target(rpc_node, target):
+    """Check that a node may be moved to the target provision state.
+
+    :raises: ClientSideError (HTTP 409) if the node is already being
+             provisioned.
+    :raises: ClientSideError (HTTP 400) if the node is already in
+             the requested state.
+    :raises: InvalidStateRequested (HTTP 400) if the requested target
+             state is not valid.
+    """
+    if target == rpc_node.provision_state:
+        msg = (_("Node %(node)s is already in the '%(state)s' state.") %
+               {'node': rpc_node['uuid'], 'state': target})
+        raise wsme.exc.ClientSideError(msg, status_code=400)
+
+    if target in (ir_states.ACTIVE, ir_states.REBUILD):
+        processing = rpc_node.target_provision_state is not None
+    elif target == ir_states.DELETED:
+        processing = (rpc_node.target_provision_state is not None and
+                    rpc_node.provision_state != ir_states.DEPLOYWAIT)
+    else:
+        raise exception.InvalidStateRequested(state=target,
+                                              node=rpc_node.uuid)
+
+    if processing:
+        msg = (_('Node %s is already being provisioned or decommissioned.')
+               % rpc_node.uuid)
+        raise wsme.exc.ClientSideError(msg, status_code=409)  # Conflict
+
+
+def _unique(items):
+    """Return the items of a list without duplicates, in their order."""
+    seen = set()
+    unique = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            unique.append(item)
+    return unique
+
+
+def _change_nodes_state(node_uuids, send, check=None):
+    """Fan a state change for several nodes out to the conductors.
+
+    The nodes are grouped by the conductor service they are mapped to,
+    and each conductor is sent a single RPC call for all of its nodes.
+
+    :param node_uuids: the UUIDs of the nodes.
+    :param send: a function which makes the RPC call, given a list of
+                 node UUIDs and the topic of their conductor. It returns
+                 a dict mapping each UUID to None or to an error message.
+    :param check: an optional function called with each node, raising an
+                  exception if the state change is not allowed for it.
+    :returns: a NodesStateChangeResult.
+    """
+    node_uuids = _unique(node_uuids)
+    nodes = dict((n.uuid, n) for n in
+                 pecan.request.dbapi.get_node_list({'uuids': node_uuids}))
+    errors = {}
+    topics = collections.defaultdict(list)
+    for node_uuid in node_uuids:
+        try:
+            rpc_node = nodes.get(node_uuid)
+            if rpc_node is None:
+                raise exception.NodeNotFound(node=node_uuid)
+            if check is not None:
+                check(rpc_node)
+            topic = pecan.request.rpcapi.get_topic_for(rpc_node)
+        except (exception.IronicException, wsme.exc.ClientSideError) as e:
+            errors[node_uuid] = six.text_type(e)
+        else:
+            topics[topic].append(node_uuid)
+
+    for topic, uuids in topics.items():
+        try:
+            errors.update(send(uuids, topic))
+        except messaging.MessagingException as e:
+            errors.update((node_uuid, six.text_type(e))
+                          for node_uuid in uuids)
+
+    return NodesStateChangeResult(nodes=[
+        NodeStateChangeResult(uuid=node_uuid,
+                              accepted=errors.get(node_uuid) is None,
+                              error=errors.get(node_uuid))
+        for node_uuid in node_uuids])
+
+
+# The states which may be waited for. DELETED, the target of a tear down,
+# is reached once the node has no provision state left.
+_WATCHABLE_STATES = (ir_states.POWER_ON, ir_states.POWER_OFF,
+                     ir_states.ACTIVE, ir_states.DEPLOYING,
+                     ir_states.DEPLOYWAIT, ir_states.DEPLOYFAIL,
+                     ir_states.DELETING, ir_states.DELETED, ir_states.ERROR)
+
+
+def _watch_nodes(node_uuids, wait_until=None, timeout=None):
+    """Wait for the states of nodes to change.
+
+    The nodes are read again from the database every
+    CONF.api.watch_interval seconds, until the timeout expires or:
+
+    * if wait_until is given, each node has its power or provision state
+      set to it, or has failed to be provisioned;
+    * otherwise, the states of any of the nodes have changed.
+
+    :param node_uuids: the UUIDs of the nodes.
+    :param wait_until: the state to wait for.
+    :param timeout: the maximum number of seconds to wait. Defaults to, and
+                    is capped at, CONF.api.max_watch_timeout.
+    :returns: a list of the nodes, in the order of node_uuids.
+    :raises: NodeNotFound if one of the nodes does not exist.
+    :raises: InvalidParameterValue if the timeout is negative, or if
+             wait_until is not a state which may be waited for.
+    """
+    if wait_until is not None and wait_until not in _WATCHABLE_STATES:
+        raise exception.InvalidParameterValue(
+                _("Cannot wait for unknown state %(state)s; it must be one "
+                  "of %(states)s.") %
+                {'state': wait_until, 'states': ', '.join(_WATCHABLE_STATES)})
+    if timeout is None:
+        timeout = CONF.api.max_watch_timeout
+    elif timeout < 0:
+        raise exception.InvalidParameterValue(
+                _("The timeout must not be negative."))
+    deadline = timeutils.utcnow() + datetime.timedelta(
+            seconds=min(timeout, CONF.api.max_watch_timeout))
+
+    node_uuids = _unique(node_uuids)
+    filters = {'uuids': node_uuids}
+
+    def _load():
+        nodes = dict((n.uuid, n) for n in
+                     pecan.request.dbapi.get_node_list(filters))
+        for node_uuid in node_uuids:
+            if node_uuid not in nodes:
+                raise exception.NodeNotFound(node=node_uuid)
+        return [nodes[node_uuid] for node_uuid in node_uuids]
+
+    def _states(nodes):
+        return [[getattr(n, attr) for attr in NodeStates._attr_list]
+                for n in nodes]
+
+    def _settled(rpc_node):
+        if wait_until == ir_states.DELETED:
+            reached = rpc_node.provision_state == ir_states.NOSTATE
+        else:
+            reached = wait_until in (rpc_node.power_state,
+                                     rpc_node.provision_state)
+        return (reached or
+                rpc_node.provision_state in (ir_states.DEPLOYFAIL,
+                                             ir_states.ERROR))
+
+    nodes = _load()
+    initial = _states(nodes)
+    while True:
+        if wait_until is not None:
+            done = all(_settled(n) for n in nodes)
+        else:
+            done = _states(nodes) != initial
+        remaining = timeutils.delta_seconds(timeutils.utcnow(), deadline)
+        if done or remaining <= 0:
+            return nodes
+        time.sleep(min(CONF.api.watch_interval, remaining))
+        nodes = _load()
+
+
 class NodeStatesController(rest.RestController):
 
     _custom_actions = {
@@ -159,22 +430,38 @@ class NodeStatesController(rest.RestController):
     console = NodeConsoleController()
     "Expose console as a sub-element of states"
 
-    @wsme_pecan.wsexpose(NodeStates, types.uuid)
-    def get(self, node_uuid):
+    @wsme_pecan.wsexpose(NodeStates, types.uuid, wtypes.text, int)
+    def get(self, node_uuid, wait_until=None, timeout=None):
         """List the states of the node.
 
+        If wait_until or timeout is given, the response is held until the
+        node reaches the wait_until state (or fails to be provisioned), or
+        until any of its states change when wait_until is not given. The
+        states are returned as they are once the timeout expires.
+
         :param node_uuid: UUID of a node.
+        :param wait_until: a power or provision state to wait for, or
+                           'deleted' to wait for the end of a tear down.
+        :param timeout: the maximum number of seconds to wait.
         """
         # NOTE(lucasagomes): All these state values come from the
         # DB. Ironic counts with a periodic task that verify the current
         # power states of the nodes and update the DB accordingly.
-        rpc_node = objects.Node.get_by_uuid(pecan.request.context, node_uuid)
+        if wait_until is None and timeout is None:
+            rpc_node = objects.Node.get_by_uuid(pecan.request.context,
+                                                node_uuid)
+        else:
+            rpc_node = _watch_nodes([node_uuid], wait_until, timeout)[0]
         return NodeStates.convert(rpc_node)
 
-    @wsme_pecan.wsexpose(None, types.uuid, wtypes.text, status_code=202)
+    @wsme_pecan.wsexpose(operation.Operation, types.uuid, wtypes.text,
+                         status_code=202)
     def power(self, node_uuid, target):
         """Set the power state of the node.
 
+        The conductor checks the request and starts a background task
+        for it; the operation returned tracks the progress of that task.
+
         :param node_uuid: UUID of a node.
         :param target: The desired power state of the node.
         :raises: ClientSideError (HTTP 409) if a power operation is
@@ -193,22 +480,23 @@ class NodeStatesController(rest.RestController):
                           ir_states.REBOOT]:
             raise exception.InvalidStateRequested(state=target, node=node_uuid)
 
-        pecan.request.rpcapi.change_node_power_state(pecan.request.context,
-                                                     node_uuid, target, topic)
-        # Set the HTTP Location Header
-        url_args = '/'.join([node_uuid, 'states'])
-        pecan.response.location = link.build_url('nodes', url_args)
+        rpc_operation = operation.create_operation(rpc_node, 'power', target)
+        pecan.request.rpcapi.change_node_power_state(
+                pecan.request.context, node_uuid, target, topic,
+                operation_id=rpc_operation.uuid)
+        return _accepted(rpc_node, rpc_operation)
 
-    @wsme_pecan.wsexpose(None, types.uuid, wtypes.text, status_code=202)
+    @wsme_pecan.wsexpose(operation.Operation, types.uuid, wtypes.text,
+                         status_code=202)
     def provision(self, node_uuid, target):
-        """Asynchronous trigger the provisioning of the node.
+        """Trigger the provisioning of the node.
 
-        This will set the target provision state of the node, and a
-        background task will begin which actually applies the state
-        change. This call will return a 202 (Accepted) indicating the
-        request was accepted and is in progress; the client should
-        continue to GET the status of this node to observe the status
-        of the requested action.
+        The conductor checks the request and starts a background task
+        which actually applies the state change; this call waits for it
+        to do so. It then returns a 202 (Accepted) indicating the request
+        was accepted and is in progress, along with the operation which
+        tracks it; the client should GET that operation to observe the
+        status of the requested action.
 
         :param node_uuid: UUID of a node.
         :param target: The desired provision state of the node.
@@ -222,38 +510,24 @@ class NodeStatesController(rest.RestController):
         rpc_node = objects.Node.get_by_uuid(pecan.request.context, node_uuid)
         topic = pecan.request.rpcapi.get_topic_for(rpc_node)
 
-        if target == rpc_node.provision_state:
-            msg = (_("Node %(node)s is already in the '%(state)s' state.") %
-                   {'node': rpc_node['uuid'], 'state': target})
-            raise wsme.exc.ClientSideError(msg, status_code=400)
-
-        if target in (ir_states.ACTIVE, ir_states.REBUILD):
-            processing = rpc_node.target_provision_state is not None
-        elif target == ir_states.DELETED:
-            processing = (rpc_node.target_provision_state is not None and
-                        rpc_node.provision_state != ir_states.DEPLOYWAIT)
-        else:
-            raise exception.InvalidStateRequested(state=target, node=node_uuid)
-
-        if processing:
-            msg = (_('Node %s is already being provisioned or decommissioned.')
-                   % rpc_node.uuid)
-            raise wsme.exc.ClientSideError(msg, status_code=409)  # Conflict
+        _check_provision_target(rpc_node, target)
 
         # Note that there is a race condition. The node state(s) could change
         # by the time the RPC call is made and the TaskManager manager gets a
         # lock.
 
+        rpc_operation = operation.create_operation(rpc_node, 'provision',
+                                                   target)
         if target in (ir_states.ACTIVE, ir_states.REBUILD):
             rebuild = (target == ir_states.REBUILD)
             pecan.request.rpcapi.do_node_deploy(
-                    pecan.request.context, node_uuid, rebuild, topic)
+                    pecan.request.context, node_uuid, rebuild, topic,
+                    operation_id=rpc_operation.uuid)
         elif target == ir_states.DELETED:
             pecan.request.rpcapi.do_node_tear_down(
-                    pecan.request.context, node_uuid, topic)
-        # Set the HTTP Location Header
-        url_args = '/'.join([node_uuid, 'states'])
-        pecan.response.location = link.build_url('nodes', url_args)
+                    pecan.request.context, node_uuid, topic,
+                    operation_id=rpc_operation.uuid)
+        return _accepted(rpc_node, rpc_operation)
 
 
 class Node(base.APIBase):
@@ -372,12 +646,15 @@ class Node(base.APIBase):
         setattr(self, 'chassis_uuid', kwargs.get('chassis_id'))
 
     @classmethod
-    def _convert_with_links(cls, node, url, expand=True):
-        if not expand:
+    def _convert_with_links(cls, node, url, expand=True, fields=None):
+        if fields is not None:
+            node.unset_fields_except(fields)
+        elif not expand:
             except_list = ['instance_uuid', 'maintenance', 'power_state',
                            'provision_state', 'uuid']
             node.unset_fields_except(except_list)
-        else:
+
+        if (expand and fields is None) or (fields and 'ports' in fields):
             node.ports = [link.Link.make_link('self', url, 'nodes',
                                               node.uuid + "/ports"),
                           link.Link.make_link('bookmark', url, 'nodes',
@@ -389,18 +666,19 @@ class Node(base.APIBase):
         #                    the user, it's internal only.
         node.chassis_id = wtypes.Unset
 
-        node.links = [link.Link.make_link('self', url, 'nodes',
-                                          node.uuid),
-                      link.Link.make_link('bookmark', url, 'nodes',
-                                          node.uuid, bookmark=True)
-                     ]
+        if fields is None or 'links' in fields:
+            node.links = [link.Link.make_link('self', url, 'nodes',
+                                              node.uuid),
+                          link.Link.make_link('bookmark', url, 'nodes',
+                                              node.uuid, bookmark=True)
+                         ]
         return node
 
     @classmethod
-    def convert_with_links(cls, rpc_node, expand=True):
+    def convert_with_links(cls, rpc_node, expand=True, fields=None):
         node = Node(**rpc_node.as_dict())
         return cls._convert_with_links(node, pecan.request.host_url,
-                                       expand)
+                                       expand, fields)
 
     @classmethod
     def sample(cls, expand=True):
@@ -422,6 +700,21 @@ class Node(base.APIBase):
         return cls._convert_with_links(sample, 'http://localhost:6385', expand)
 
 
+class NodeSerializer(collection.Serializer):
+    """Fast conversion of nodes to their JSON form."""
+
+    datatype = Node
+    resource = 'nodes'
+    brief_fields = ('instance_uuid', 'maintenance', 'power_state',
+                    'provision_state', 'uuid')
+    link_fields = {'links': '', 'ports': '/ports'}
+    parent_fields = ('chassis_uuid', 'chassis_id')
+
+    def get_parent_uuids(self, parent_ids):
+        return self._dbapi.get_chassis_uuids(parent_ids)
+
+
+@collection.serializable
 class NodeCollection(collection.Collection):
     """API representation of a collection of nodes."""
 
@@ -433,9 +726,17 @@ class NodeCollection(collection.Collection):
 
     @classmethod
     def convert_with_links(cls, nodes, limit, url=None,
-                           expand=False, **kwargs):
+                           expand=False, fields=None, **kwargs):
         collection = NodeCollection()
-        collection.nodes = [Node.convert_with_links(n, expand) for n in nodes]
+        if collection.can_serialize():
+            serializer = NodeSerializer(pecan.request.host_url,
+                                        pecan.request.dbapi, expand, fields)
+            collection.set_serialized(serializer(nodes))
+        else:
+            collection.nodes = [Node.convert_with_links(n, expand, fields)
+                                for n in nodes]
+        if fields is not None:
+            kwargs['fields'] = ','.join(fields)
         collection.next = collection.get_next(limit, url=url, **kwargs)
         return collection
 
@@ -477,6 +778,33 @@ class NodeVendorPassthruController(rest.RestController):
                 pecan.request.context, node_uuid, method, data, topic)
 
 
+def _get_node_filters(driver=None, power_state=None, provision_state=None,
+                      reserved=None, updated_since=None, min_cpus=None,
+                      min_memory_mb=None, min_local_gb=None, cpu_arch=None):
+    """Build the DB filters for the optional query parameters of a list.
+
+    :returns: a dict of the filters for which a value was given.
+    """
+    values = {'driver': driver,
+              'power_state': power_state,
+              'provision_state': provision_state,
+              'reserved': reserved,
+              'updated_since': updated_since,
+              'min_cpus': min_cpus,
+              'min_memory_mb': min_memory_mb,
+              'min_local_gb': min_local_gb,
+              'cpu_arch': cpu_arch}
+    filters = dict((k, v) for k, v in values.items() if v is not None)
+    for key in ('min_cpus', 'min_memory_mb', 'min_local_gb'):
+        if filters.get(key, 0) < 0:
+            raise exception.InvalidParameterValue(
+                    _("%s must not be negative.") % key)
+    if updated_since is not None:
+        # the DB stores naive UTC datetimes
+        filters['updated_since'] = timeutils.normalize_time(updated_since)
+    return filters
+
+
 class NodesController(rest.RestController):
     """REST controller for Nodes."""
 
@@ -499,34 +827,63 @@ class NodesController(rest.RestController):
 
     _custom_actions = {
         'detail': ['GET'],
+        'export': ['GET'],
         'validate': ['GET'],
     }
 
+    @pecan.expose()
+    def _route(self, args):
+        # GET /nodes/states and PUT /nodes/states/<kind> would otherwise
+        # be routed to the per-node "states" sub-controller, which expects
+        # a node UUID before it in the path.
+        method = pecan.request.method
+        if method == 'GET' and args == ['states']:
+            return self.get_states, []
+        if method == 'PUT' and len(args) == 2 and args[0] == 'states':
+            return self.put_states, args[1:]
+        return super(NodesController, self)._route(args)
+
     def _get_nodes_collection(self, chassis_uuid, instance_uuid, associated,
                               maintenance, marker, limit, sort_key, sort_dir,
-                              expand=False, resource_url=None):
+                              expand=False, resource_url=None, fields=None,
+                              node_filters=None):
         if self.from_chassis and not chassis_uuid:
             raise exception.InvalidParameterValue(_(
                   "Chassis id not specified."))
 
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
+        fields = api_utils.validate_fields(fields, Node.field_names())
 
         marker_obj = None
         if marker:
             marker_obj = objects.Node.get_by_uuid(pecan.request.context,
                                                   marker)
+
+        filters = {}
         if instance_uuid:
-            nodes = self._get_nodes_by_instance(instance_uuid)
+            filters['instance_uuid'] = instance_uuid
         else:
-            filters = {}
             if chassis_uuid:
                 filters['chassis_uuid'] = chassis_uuid
             if associated is not None:
                 filters['associated'] = associated
             if maintenance is not None:
                 filters['maintenance'] = maintenance
-
+            if node_filters:
+                filters.update(node_filters)
+
+        digest = pecan.request.dbapi.get_node_digest(filters)
+        if api_utils.check_etag(digest):
+            return
+
+        if fields is not None:
+            nodes = _get_nodes_projection(fields, filters, limit, marker_obj,
+                                          sort_key=sort_key,
+                                          sort_dir=sort_dir)
+        elif instance_uuid:
+            nodes = self._get_nodes_by_instance(instance_uuid)
+        else:
             nodes = pecan.request.dbapi.get_node_list(filters, limit,
                                                       marker_obj,
                                                       sort_key=sort_key,
@@ -537,9 +894,15 @@ class NodesController(rest.RestController):
             parameters['associated'] = associated
         if maintenance:
             parameters['maintenance'] = maintenance
+        if node_filters and not instance_uuid:
+            parameters.update(node_filters)
+            if 'updated_since' in parameters:
+                parameters['updated_since'] = timeutils.isotime(
+                        parameters['updated_since'])
         return NodeCollection.convert_with_links(nodes, limit,
                                                  url=resource_url,
                                                  expand=expand,
+                                                 fields=fields,
                                                  **parameters)
 
     def _get_nodes_by_instance(self, instance_uuid):
@@ -555,10 +918,15 @@ class NodesController(rest.RestController):
 
     @wsme_pecan.wsexpose(NodeCollection, types.uuid, types.uuid,
                types.boolean, types.boolean, types.uuid, int, wtypes.text,
+               wtypes.text, wtypes.text, wtypes.text, wtypes.text,
+               wtypes.text, types.boolean, datetime.datetime, int, int, int,
                wtypes.text)
     def get_all(self, chassis_uuid=None, instance_uuid=None, associated=None,
                 maintenance=None, marker=None, limit=None, sort_key='id',
-                sort_dir='asc'):
+                sort_dir='asc', fields=None, driver=None, power_state=None,
+                provision_state=None, reserved=None, updated_since=None,
+                min_cpus=None, min_memory_mb=None, min_local_gb=None,
+                cpu_arch=None):
         """Retrieve a list of nodes.
 
         :param chassis_uuid: Optional UUID of a chassis, to get only nodes for
@@ -575,17 +943,50 @@ class NodesController(rest.RestController):
         :param limit: maximum number of resources to return in a single result.
         :param sort_key: column to sort results by. Default: id.
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to a brief subset of the fields.
+        :param driver: Optional name of a driver, to get only the nodes
+                       using it.
+        :param power_state: Optional power state, to get only the nodes
+                            in it.
+        :param provision_state: Optional provision state, to get only the
+                                nodes in it.
+        :param reserved: Optional boolean value that indicates whether to
+                         get nodes locked by a conductor ("True"), or not
+                         ("False").
+        :param updated_since: Optional datetime, to get only the nodes
+                              created or updated since then.
+        :param min_cpus: Optional number, to get only the nodes with at
+                         least this many CPUs.
+        :param min_memory_mb: Optional number, to get only the nodes with
+                              at least this much RAM, in MiB.
+        :param min_local_gb: Optional number, to get only the nodes with
+                             at least this much local disk, in GiB.
+        :param cpu_arch: Optional CPU architecture, to get only the nodes
+                         which have it.
         """
+        node_filters = _get_node_filters(driver, power_state,
+                                         provision_state, reserved,
+                                         updated_since, min_cpus,
+                                         min_memory_mb, min_local_gb,
+                                         cpu_arch)
         return self._get_nodes_collection(chassis_uuid, instance_uuid,
                                           associated, maintenance, marker,
-                                          limit, sort_key, sort_dir)
+                                          limit, sort_key, sort_dir,
+                                          fields=fields,
+                                          node_filters=node_filters)
 
     @wsme_pecan.wsexpose(NodeCollection, types.uuid, types.uuid,
             types.boolean, types.boolean, types.uuid, int, wtypes.text,
+            wtypes.text, wtypes.text, wtypes.text, wtypes.text,
+            wtypes.text, types.boolean, datetime.datetime, int, int, int,
             wtypes.text)
     def detail(self, chassis_uuid=None, instance_uuid=None, associated=None,
                maintenance=None, marker=None, limit=None, sort_key='id',
-               sort_dir='asc'):
+               sort_dir='asc', fields=None, driver=None, power_state=None,
+               provision_state=None, reserved=None, updated_since=None,
+               min_cpus=None, min_memory_mb=None, min_local_gb=None,
+               cpu_arch=None):
         """Retrieve a list of nodes with detail.
 
         :param chassis_uuid: Optional UUID of a chassis, to get only nodes for
@@ -602,18 +1003,196 @@ class NodesController(rest.RestController):
         :param limit: maximum number of resources to return in a single result.
         :param sort_key: column to sort results by. Default: id.
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to all fields.
+        :param driver: Optional name of a driver, to get only the nodes
+                       using it.
+        :param power_state: Optional power state, to get only the nodes
+                            in it.
+        :param provision_state: Optional provision state, to get only the
+                                nodes in it.
+        :param reserved: Optional boolean value that indicates whether to
+                         get nodes locked by a conductor ("True"), or not
+                         ("False").
+        :param updated_since: Optional datetime, to get only the nodes
+                              created or updated since then.
+        :param min_cpus: Optional number, to get only the nodes with at
+                         least this many CPUs.
+        :param min_memory_mb: Optional number, to get only the nodes with
+                              at least this much RAM, in MiB.
+        :param min_local_gb: Optional number, to get only the nodes with
+                             at least this much local disk, in GiB.
+        :param cpu_arch: Optional CPU architecture, to get only the nodes
+                         which have it.
         """
         # /detail should only work agaist collections
         parent = pecan.request.path.split('/')[:-1][-1]
         if parent != "nodes":
             raise exception.HTTPNotFound
 
+        node_filters = _get_node_filters(driver, power_state,
+                                         provision_state, reserved,
+                                         updated_since, min_cpus,
+                                         min_memory_mb, min_local_gb,
+                                         cpu_arch)
         expand = True
         resource_url = '/'.join(['nodes', 'detail'])
         return self._get_nodes_collection(chassis_uuid, instance_uuid,
                                           associated, maintenance, marker,
                                           limit, sort_key, sort_dir, expand,
-                                          resource_url)
+                                          resource_url, fields, node_filters)
+
+    @wsme_pecan.wsexpose(NodesStates, wtypes.text, wtypes.text, int)
+    def get_states(self, nodes, wait_until=None, timeout=None):
+        """Watch the states of several nodes at once.
+
+        The response is held until every node reaches the wait_until state
+        (or fails to be provisioned), or until the states of any of the
+        nodes change when wait_until is not given. The states are returned
+        as they are once the timeout expires.
+
+        :param nodes: a comma-separated list of node UUIDs.
+        :param wait_until: a power or provision state to wait for, or
+                           'deleted' to wait for the end of a tear down.
+        :param timeout: the maximum number of seconds to wait.
+        """
+        if self.from_chassis:
+            raise exception.OperationNotPermitted
+
+        node_uuids = [n.strip() for n in nodes.split(',') if n.strip()]
+        if not node_uuids:
+            raise exception.InvalidParameterValue(
+                    _("No nodes were specified."))
+        for node_uuid in node_uuids:
+            if not utils.is_uuid_like(node_uuid):
+                raise exception.InvalidUUID(uuid=node_uuid)
+
+        rpc_nodes = _watch_nodes(node_uuids, wait_until, timeout)
+        return NodesStates(nodes=dict((n.uuid, NodeStates.convert(n))
+                                      for n in rpc_nodes))
+
+    @wsme_pecan.wsexpose(NodesStateChangeResult, wtypes.text,
+                         body=NodesStateChange, status_code=202)
+    def put_states(self, kind, change):
+        """Change the power or provision state of several nodes at once.
+
+        Each conductor service is sent a single request for all the nodes
+        it manages. The response tells whether the state change was
+        accepted for each node; the client should then GET the states of
+        the nodes to observe the progress of the requested action.
+
+        :param kind: the kind of state to change, "power" or "provision".
+        :param change: the UUIDs of the nodes and their target state.
+        :raises: InvalidStateRequested (HTTP 400) if the requested target
+                 state is not valid.
+        """
+        if self.from_chassis:
+            raise exception.OperationNotPermitted
+
+        context = pecan.request.context
+        rpcapi = pecan.request.rpcapi
+        target = change.target
+        check = None
+        if kind == 'power':
+            if target not in [ir_states.POWER_ON,
+                              ir_states.POWER_OFF,
+                              ir_states.REBOOT]:
+                raise exception.InvalidStateRequested(
+                        state=target, node=', '.join(change.nodes))
+
+            def send(uuids, topic):
+                return rpcapi.change_nodes_power_state(context, uuids,
+                                                       target, topic)
+        elif kind == 'provision':
+            if target not in (ir_states.ACTIVE, ir_states.REBUILD,
+                              ir_states.DELETED):
+                raise exception.InvalidStateRequested(
+                        state=target, node=', '.join(change.nodes))
+
+            def check(rpc_node):
+                _check_provision_target(rpc_node, target)
+
+            def send(uuids, topic):
+                if target == ir_states.DELETED:
+                    return rpcapi.do_nodes_tear_down(context, uuids, topic)
+                rebuild = (target == ir_states.REBUILD)
+                return rpcapi.do_nodes_deploy(context, uuids, rebuild, topic)
+        else:
+            raise exception.HTTPNotFound
+
+        return _change_nodes_state(change.nodes, send, check)
+
+    @api_utils.expose_stream
+    def export(self, chassis_uuid=None, associated=None, maintenance=None,
+               sort_key='id', sort_dir='asc', fields=None, driver=None,
+               power_state=None, provision_state=None, reserved=None,
+               updated_since=None, min_cpus=None, min_memory_mb=None,
+               min_local_gb=None, cpu_arch=None):
+        """Stream the list of all nodes with detail, without pagination.
+
+        The response is written in chunks while the nodes are read from
+        the database, so the memory used does not depend on the number of
+        nodes.
+
+        :param chassis_uuid: Optional UUID of a chassis, to get only nodes for
+                           that chassis.
+        :param associated: Optional boolean whether to return a list of
+                           associated or unassociated nodes.
+        :param maintenance: Optional boolean value that indicates whether
+                            to get nodes in maintenance mode ("True"), or not
+                            in maintenance mode ("False").
+        :param sort_key: column to sort results by. Default: id.
+        :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to all fields.
+        :param driver, power_state, provision_state, reserved,
+               updated_since, min_cpus, min_memory_mb, min_local_gb,
+               cpu_arch: Optional filters, as for :meth:`get_all`.
+        """
+        if self.from_chassis:
+            raise exception.OperationNotPermitted
+
+        # /export should only work against collections
+        parent = pecan.request.path.split('/')[:-1][-1]
+        if parent != "nodes":
+            raise exception.HTTPNotFound
+
+        sort_dir = api_utils.validate_sort_dir(sort_dir)
+        fields = api_utils.validate_fields(fields, Node.field_names())
+
+        filters = {}
+        if chassis_uuid:
+            filters['chassis_uuid'] = types.uuid.validate(chassis_uuid)
+        if associated is not None:
+            filters['associated'] = types.boolean.validate(associated)
+        if maintenance is not None:
+            filters['maintenance'] = types.boolean.validate(maintenance)
+        if reserved is not None:
+            reserved = types.boolean.validate(reserved)
+        if updated_since is not None:
+            try:
+                updated_since = timeutils.parse_isotime(updated_since)
+            except ValueError as e:
+                raise exception.InvalidParameterValue(six.text_type(e))
+        try:
+            min_cpus, min_memory_mb, min_local_gb = [
+                    int(v) if v is not None else None
+                    for v in (min_cpus, min_memory_mb, min_local_gb)]
+        except ValueError as e:
+            raise exception.InvalidParameterValue(six.text_type(e))
+        filters.update(_get_node_filters(driver, power_state,
+                                         provision_state, reserved,
+                                         updated_since, min_cpus,
+                                         min_memory_mb, min_local_gb,
+                                         cpu_arch))
+
+        nodes = pecan.request.dbapi.get_node_iter(
+                    filters, sort_key=sort_key, sort_dir=sort_dir,
+                    batch_size=CONF.api.export_batch_size)
+        serializer = NodeSerializer(pecan.request.host_url,
+                                    pecan.request.dbapi, fields=fields)
+        return collection.stream('nodes', serializer.iter(
+                                     nodes, CONF.api.export_batch_size))
 
     @wsme_pecan.wsexpose(wtypes.text, types.uuid)
     def validate(self, node_uuid):
@@ -624,17 +1203,32 @@ class NodesController(rest.RestController):
         return pecan.request.rpcapi.validate_driver_interfaces(
                 pecan.request.context, rpc_node.uuid, topic)
 
-    @wsme_pecan.wsexpose(Node, types.uuid)
-    def get_one(self, node_uuid):
+    @wsme_pecan.wsexpose(Node, types.uuid, wtypes.text)
+    def get_one(self, node_uuid, fields=None):
         """Retrieve information about the given node.
 
         :param node_uuid: UUID of a node.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to all fields.
         """
         if self.from_chassis:
             raise exception.OperationNotPermitted
 
-        rpc_node = objects.Node.get_by_uuid(pecan.request.context, node_uuid)
-        return Node.convert_with_links(rpc_node)
+        fields = api_utils.validate_fields(fields, Node.field_names())
+
+        digest = pecan.request.dbapi.get_node_digest({'uuid': node_uuid})
+        if digest[0] and api_utils.check_etag(digest):
+            return
+
+        if fields is None:
+            rpc_node = objects.Node.get_by_uuid(pecan.request.context,
+                                                node_uuid)
+        else:
+            nodes = _get_nodes_projection(fields, {'uuid': node_uuid})
+            if not nodes:
+                raise exception.NodeNotFound(node=node_uuid)
+            rpc_node = nodes[0]
+        return Node.convert_with_links(rpc_node, fields=fields)
 
     @wsme_pecan.wsexpose(Node, body=Node, status_code=201)
     def post(self, node):
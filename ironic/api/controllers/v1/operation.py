@@ -0,0 +1,192 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import pecan
+from pecan import rest
+import wsme
+from wsme import types as wtypes
+import wsmeext.pecan as wsme_pecan
+
+from ironic.api.controllers import base
+from ironic.api.controllers import link
+from ironic.api.controllers.v1 import collection
+from ironic.api.controllers.v1 import types
+from ironic.api.controllers.v1 import utils as api_utils
+from ironic.common import states as ir_states
+from ironic import objects
+
+
+def create_operation(rpc_node, action, target):
+    """Record a new, queued operation on a node.
+
+    :param rpc_node: the node acted upon.
+    :param action: the kind of action, 'power', 'provision' or 'console'.
+    :param target: the state requested by the action.
+    :returns: a :class:`objects.Operation`.
+    """
+    operation = objects.Operation(context=pecan.request.context,
+                                  node_id=rpc_node.id, action=action,
+                                  target=target, state=ir_states.QUEUED)
+    operation.create()
+    return operation
+
+
+class Operation(base.APIBase):
+    """API representation of an asynchronous operation on a node.
+
+    An operation is created when a state change of a node is requested, and
+    is updated by the conductor as the change progresses.
+    """
+
+    uuid = types.uuid
+    "Unique UUID for this operation"
+
+    node_uuid = types.uuid
+    "The UUID of the node acted upon"
+
+    action = wtypes.text
+    "The kind of action: power, provision or console"
+
+    target = wtypes.text
+    "The state requested by the action"
+
+    state = wtypes.text
+    "One of queued, running, done or failed"
+
+    error = wtypes.text
+    "Why the operation failed"
+
+    started_at = datetime.datetime
+    "When a conductor started the operation"
+
+    finished_at = datetime.datetime
+    "When the operation was done or failed"
+
+    links = wsme.wsattr([link.Link], readonly=True)
+    "A list containing a self link and associated operation links"
+
+    def __init__(self, **kwargs):
+        self.fields = list(objects.Operation.fields.keys())
+        for k in self.fields:
+            setattr(self, k, kwargs.get(k))
+        self.fields.append('node_uuid')
+        setattr(self, 'node_uuid', kwargs.get('node_uuid'))
+
+    @classmethod
+    def _convert_with_links(cls, operation, url):
+        # never expose the id attributes
+        operation.id = wtypes.Unset
+        operation.node_id = wtypes.Unset
+        operation.links = [link.Link.make_link('self', url,
+                                               'operations', operation.uuid),
+                           link.Link.make_link('bookmark', url,
+                                               'operations', operation.uuid,
+                                               bookmark=True)
+                          ]
+        return operation
+
+    @classmethod
+    def convert_with_links(cls, rpc_operation, node_uuid=None):
+        if node_uuid is None and rpc_operation.node_id is not None:
+            node_uuid = pecan.request.dbapi.get_node_uuids(
+                    [rpc_operation.node_id]).get(rpc_operation.node_id)
+        operation = Operation(node_uuid=node_uuid, **rpc_operation.as_dict())
+        return cls._convert_with_links(operation, pecan.request.host_url)
+
+    @classmethod
+    def sample(cls):
+        time = datetime.datetime(2000, 1, 1, 12, 0, 0)
+        sample = cls(uuid='0b2bf8b8-e6a3-4bd7-9c41-d1f1ab3d5e2f',
+                     node_uuid='1be26c0b-03f2-4d2e-ae87-c02d7f33c123',
+                     action='power', target=ir_states.POWER_ON,
+                     state=ir_states.DONE, error=None, started_at=time,
+                     finished_at=time, created_at=time)
+        return cls._convert_with_links(sample, 'http://localhost:6385')
+
+
+class OperationCollection(collection.Collection):
+    """API representation of a collection of operations."""
+
+    operations = [Operation]
+    "A list containing operation objects"
+
+    def __init__(self, **kwargs):
+        self._type = 'operations'
+
+    @classmethod
+    def convert_with_links(cls, operations, limit, url=None, **kwargs):
+        node_uuids = pecan.request.dbapi.get_node_uuids(
+                set(op.node_id for op in operations if op.node_id))
+        collection = OperationCollection()
+        collection.operations = [
+                Operation.convert_with_links(
+                    op, node_uuid=node_uuids.get(op.node_id))
+                for op in operations]
+        collection.next = collection.get_next(limit, url=url, **kwargs)
+        return collection
+
+    @classmethod
+    def sample(cls):
+        sample = cls()
+        sample.operations = [Operation.sample()]
+        return sample
+
+
+class OperationsController(rest.RestController):
+    """REST controller for Operations."""
+
+    @wsme_pecan.wsexpose(OperationCollection, types.uuid, wtypes.text,
+                         types.uuid, int, wtypes.text, wtypes.text)
+    def get_all(self, node_uuid=None, state=None, marker=None, limit=None,
+                sort_key='id', sort_dir='asc'):
+        """Retrieve a list of operations.
+
+        :param node_uuid: UUID of a node, to get only its operations.
+        :param state: only return the operations in this state.
+        :param marker: pagination marker for large data sets.
+        :param limit: maximum number of resources to return in a single result.
+        :param sort_key: column to sort results by. Default: id.
+        :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        """
+        limit = api_utils.validate_limit(limit)
+        sort_dir = api_utils.validate_sort_dir(sort_dir)
+        marker_obj = None
+        if marker:
+            marker_obj = objects.Operation.get_by_uuid(pecan.request.context,
+                                                       marker)
+        filters = {}
+        parameters = {'sort_key': sort_key, 'sort_dir': sort_dir}
+        if node_uuid:
+            node = objects.Node.get_by_uuid(pecan.request.context, node_uuid)
+            filters['node_id'] = node.id
+            parameters['node_uuid'] = node_uuid
+        if state:
+            filters['state'] = state
+            parameters['state'] = state
+
+        operations = pecan.request.dbapi.get_operation_list(
+                filters, limit, marker_obj, sort_key=sort_key,
+                sort_dir=sort_dir)
+        return OperationCollection.convert_with_links(operations, limit,
+                                                      **parameters)
+
+    @wsme_pecan.wsexpose(Operation, types.uuid)
+    def get_one(self, operation_uuid):
+        """Retrieve information about the given operation.
+
+        :param operation_uuid: UUID of an operation.
+        """
+        rpc_operation = objects.Operation.get_by_uuid(pecan.request.context,
+                                                      operation_uuid)
+        return Operation.convert_with_links(rpc_operation)
@@ -15,6 +15,7 @@
 
 import datetime
 
+from oslo.config import cfg
 import pecan
 from pecan import rest
 import six
@@ -30,6 +31,29 @@ from ironic.api.controllers.v1 import utils as api_utils
 from ironic.common import exception
 from ironic import objects
 
+CONF = cfg.CONF
+
+
+# API fields which are not backed by a DB column of the same name
+_FIELD_COLUMNS = {'node_uuid': 'node_id',
+                  'links': 'uuid'}
+
+
+def _get_ports_projection(fields, filters, limit=None, marker=None,
+                          sort_key=None, sort_dir=None):
+    """Load only the DB columns needed to render the requested fields.
+
+    :returns: a list of partially populated :class:`objects.Port`.
+    """
+    columns = sorted(set(_FIELD_COLUMNS.get(f, f) for f in fields))
+    rows = pecan.request.dbapi.get_portinfo_list(columns=columns,
+                                                 filters=filters,
+                                                 limit=limit, marker=marker,
+                                                 sort_key=sort_key,
+                                                 sort_dir=sort_dir)
+    return [objects.Port(pecan.request.context, **dict(zip(columns, row)))
+            for row in rows]
+
 
 class PortPatchType(types.JsonPatchType):
 
@@ -97,21 +121,24 @@ class Port(base.APIBase):
         setattr(self, 'node_uuid', kwargs.get('node_id'))
 
     @classmethod
-    def convert_with_links(cls, rpc_port, expand=True):
+    def convert_with_links(cls, rpc_port, expand=True, fields=None):
         port = Port(**rpc_port.as_dict())
-        if not expand:
+        if fields is not None:
+            port.unset_fields_except(fields)
+        elif not expand:
             port.unset_fields_except(['uuid', 'address'])
 
         # never expose the node_id attribute
         port.node_id = wtypes.Unset
 
-        port.links = [link.Link.make_link('self', pecan.request.host_url,
-                                          'ports', port.uuid),
-                      link.Link.make_link('bookmark',
-                                          pecan.request.host_url,
-                                          'ports', port.uuid,
-                                          bookmark=True)
-                     ]
+        if fields is None or 'links' in fields:
+            port.links = [link.Link.make_link('self', pecan.request.host_url,
+                                              'ports', port.uuid),
+                          link.Link.make_link('bookmark',
+                                              pecan.request.host_url,
+                                              'ports', port.uuid,
+                                              bookmark=True)
+                         ]
         return port
 
     @classmethod
@@ -127,6 +154,31 @@ class Port(base.APIBase):
         return sample
 
 
+class PortsPatchType(PortPatchType):
+    """A json-patch operation on one of several ports, given by its UUID."""
+
+    uuid = wsme.wsattr(types.uuid, mandatory=True)
+
+    @staticmethod
+    def validate(patch):
+        ret = PortPatchType.validate(patch)
+        ret['uuid'] = patch.uuid
+        return ret
+
+
+class PortSerializer(collection.Serializer):
+    """Fast conversion of ports to their JSON form."""
+
+    datatype = Port
+    resource = 'ports'
+    brief_fields = ('uuid', 'address')
+    parent_fields = ('node_uuid', 'node_id')
+
+    def get_parent_uuids(self, parent_ids):
+        return self._dbapi.get_node_uuids(parent_ids)
+
+
+@collection.serializable
 class PortCollection(collection.Collection):
     """API representation of a collection of ports."""
 
@@ -138,10 +190,17 @@ class PortCollection(collection.Collection):
 
     @classmethod
     def convert_with_links(cls, rpc_ports, limit, url=None,
-                           expand=False, **kwargs):
+                           expand=False, fields=None, **kwargs):
         collection = PortCollection()
-        collection.ports = [Port.convert_with_links(p, expand)
-                            for p in rpc_ports]
+        if collection.can_serialize():
+            serializer = PortSerializer(pecan.request.host_url,
+                                        pecan.request.dbapi, expand, fields)
+            collection.set_serialized(serializer(rpc_ports))
+        else:
+            collection.ports = [Port.convert_with_links(p, expand, fields)
+                                for p in rpc_ports]
+        if fields is not None:
+            kwargs['fields'] = ','.join(fields)
         collection.next = collection.get_next(limit, url=url, **kwargs)
         return collection
 
@@ -161,29 +220,53 @@ class PortsController(rest.RestController):
 
     _custom_actions = {
         'detail': ['GET'],
+        'export': ['GET'],
     }
 
+    @pecan.expose()
+    def _route(self, args):
+        # PATCH /ports, without a port UUID, updates several ports at once.
+        if (pecan.request.method == 'PATCH' and not any(args)
+                and not self.from_nodes):
+            return self.patch_many, []
+        return super(PortsController, self)._route(args)
+
     def _get_ports_collection(self, node_uuid, address, marker, limit,
                               sort_key, sort_dir, expand=False,
-                              resource_url=None):
+                              resource_url=None, fields=None):
         if self.from_nodes and not node_uuid:
             raise exception.InvalidParameterValue(_(
                   "Node id not specified."))
 
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
+        fields = api_utils.validate_fields(fields, Port.field_names())
 
         marker_obj = None
         if marker:
             marker_obj = objects.Port.get_by_uuid(pecan.request.context,
                                                   marker)
 
+        filters = {}
         if node_uuid:
             # FIXME(comstud): Since all we need is the node ID, we can
             #                 make this more efficient by only querying
             #                 for that column. This will get cleaned up
             #                 as we move to the object interface.
             node = objects.Node.get_by_uuid(pecan.request.context, node_uuid)
+            filters['node_id'] = node.id
+        elif address:
+            filters['address'] = address
+
+        digest = pecan.request.dbapi.get_port_digest(filters)
+        if api_utils.check_etag(digest):
+            return
+
+        if fields is not None:
+            ports = _get_ports_projection(fields, filters, limit, marker_obj,
+                                          sort_key=sort_key,
+                                          sort_dir=sort_dir)
+        elif node_uuid:
             ports = pecan.request.dbapi.get_ports_by_node_id(node.id, limit,
                                                              marker_obj,
                                                              sort_key=sort_key,
@@ -198,6 +281,7 @@ class PortsController(rest.RestController):
         return PortCollection.convert_with_links(ports, limit,
                                                  url=resource_url,
                                                  expand=expand,
+                                                 fields=fields,
                                                  sort_key=sort_key,
                                                  sort_dir=sort_dir)
 
@@ -216,9 +300,10 @@ class PortsController(rest.RestController):
             return []
 
     @wsme_pecan.wsexpose(PortCollection, types.uuid, types.macaddress,
-                         types.uuid, int, wtypes.text, wtypes.text)
+                         types.uuid, int, wtypes.text, wtypes.text,
+                         wtypes.text)
     def get_all(self, node_uuid=None, address=None, marker=None, limit=None,
-                sort_key='id', sort_dir='asc'):
+                sort_key='id', sort_dir='asc', fields=None):
         """Retrieve a list of ports.
 
         :param node_uuid: UUID of a node, to get only ports for that node.
@@ -228,14 +313,17 @@ class PortsController(rest.RestController):
         :param limit: maximum number of resources to return in a single result.
         :param sort_key: column to sort results by. Default: id.
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to a brief subset of the fields.
         """
         return self._get_ports_collection(node_uuid, address, marker, limit,
-                                          sort_key, sort_dir)
+                                          sort_key, sort_dir, fields=fields)
 
     @wsme_pecan.wsexpose(PortCollection, types.uuid, types.macaddress,
-                         types.uuid, int, wtypes.text, wtypes.text)
+                         types.uuid, int, wtypes.text, wtypes.text,
+                         wtypes.text)
     def detail(self, node_uuid=None, address=None, marker=None, limit=None,
-                sort_key='id', sort_dir='asc'):
+                sort_key='id', sort_dir='asc', fields=None):
         """Retrieve a list of ports with detail.
 
         :param node_uuid: UUID of a node, to get only ports for that node.
@@ -245,6 +333,8 @@ class PortsController(rest.RestController):
         :param limit: maximum number of resources to return in a single result.
         :param sort_key: column to sort results by. Default: id.
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to all fields.
         """
         # NOTE(lucasagomes): /detail should only work agaist collections
         parent = pecan.request.path.split('/')[:-1][-1]
@@ -255,19 +345,74 @@ class PortsController(rest.RestController):
         resource_url = '/'.join(['ports', 'detail'])
         return self._get_ports_collection(node_uuid, address, marker, limit,
                                           sort_key, sort_dir, expand,
-                                          resource_url)
+                                          resource_url, fields)
 
-    @wsme_pecan.wsexpose(Port, types.uuid)
-    def get_one(self, port_uuid):
+    @api_utils.expose_stream
+    def export(self, node_uuid=None, sort_key='id', sort_dir='asc',
+               fields=None):
+        """Stream the list of all ports with detail, without pagination.
+
+        The response is written in chunks while the ports are read from
+        the database, so the memory used does not depend on the number of
+        ports.
+
+        :param node_uuid: UUID of a node, to get only ports for that node.
+        :param sort_key: column to sort results by. Default: id.
+        :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to all fields.
+        """
+        if self.from_nodes:
+            raise exception.OperationNotPermitted
+
+        # /export should only work against collections
+        parent = pecan.request.path.split('/')[:-1][-1]
+        if parent != "ports":
+            raise exception.HTTPNotFound
+
+        sort_dir = api_utils.validate_sort_dir(sort_dir)
+        fields = api_utils.validate_fields(fields, Port.field_names())
+
+        filters = {}
+        if node_uuid:
+            node = objects.Node.get_by_uuid(pecan.request.context,
+                                            types.uuid.validate(node_uuid))
+            filters['node_id'] = node.id
+
+        ports = pecan.request.dbapi.get_port_iter(
+                    filters, sort_key=sort_key, sort_dir=sort_dir,
+                    batch_size=CONF.api.export_batch_size)
+        serializer = PortSerializer(pecan.request.host_url,
+                                    pecan.request.dbapi, fields=fields)
+        return collection.stream('ports', serializer.iter(
+                                     ports, CONF.api.export_batch_size))
+
+    @wsme_pecan.wsexpose(Port, types.uuid, wtypes.text)
+    def get_one(self, port_uuid, fields=None):
         """Retrieve information about the given port.
 
         :param port_uuid: UUID of a port.
+        :param fields: Optional comma-separated list of the fields to
+                       return. Defaults to all fields.
         """
         if self.from_nodes:
             raise exception.OperationNotPermitted
 
-        rpc_port = objects.Port.get_by_uuid(pecan.request.context, port_uuid)
-        return Port.convert_with_links(rpc_port)
+        fields = api_utils.validate_fields(fields, Port.field_names())
+
+        digest = pecan.request.dbapi.get_port_digest({'uuid': port_uuid})
+        if digest[0] and api_utils.check_etag(digest):
+            return
+
+        if fields is None:
+            rpc_port = objects.Port.get_by_uuid(pecan.request.context,
+                                                port_uuid)
+        else:
+            ports = _get_ports_projection(fields, {'uuid': port_uuid})
+            if not ports:
+                raise exception.PortNotFound(port=port_uuid)
+            rpc_port = ports[0]
+        return Port.convert_with_links(rpc_port, fields=fields)
 
     @wsme_pecan.wsexpose(Port, body=Port, status_code=201)
     def post(self, port):
@@ -314,6 +459,65 @@ class PortsController(rest.RestController):
 
         return Port.convert_with_links(new_port)
 
+    @wsme.validate([PortsPatchType])
+    @wsme_pecan.wsexpose(PortCollection, body=[PortsPatchType])
+    def patch_many(self, patch):
+        """Update several ports of a node at once.
+
+        The ports are updated in a single transaction by the conductor of
+        their node, so either all or none of the operations are applied.
+
+        :param patch: a json PATCH document, each operation of which also
+                      has the UUID of the port it applies to.
+        :raises: InvalidParameterValue (HTTP 400) if no port is given, or
+                 if the ports do not all belong to the same node.
+        """
+        if not patch:
+            raise exception.InvalidParameterValue(
+                    _("No ports were specified."))
+
+        # The ports, in the order they were given, and the operations on
+        # each of them
+        port_uuids = []
+        port_patches = {}
+        for p in patch:
+            port_uuid = p.pop('uuid')
+            if port_uuid not in port_patches:
+                port_uuids.append(port_uuid)
+                port_patches[port_uuid] = []
+            port_patches[port_uuid].append(p)
+
+        context = pecan.request.context
+        rpc_ports = []
+        for port_uuid in port_uuids:
+            port_patch = port_patches[port_uuid]
+            rpc_port = objects.Port.get_by_uuid(context, port_uuid)
+            try:
+                port = Port(**api_utils.apply_jsonpatch(rpc_port.as_dict(),
+                                                        port_patch))
+            except api_utils.JSONPATCH_EXCEPTIONS as e:
+                raise exception.PatchError(patch=port_patch, reason=e)
+
+            # Update only the fields that have changed
+            for field in objects.Port.fields:
+                if rpc_port[field] != getattr(port, field):
+                    rpc_port[field] = getattr(port, field)
+            rpc_ports.append(rpc_port)
+
+        node_ids = set(p.node_id for p in rpc_ports)
+        if len(node_ids) != 1:
+            raise exception.InvalidParameterValue(
+                    _("The ports must all belong to the same node."))
+
+        rpc_node = objects.Node.get_by_id(context, node_ids.pop())
+        topic = pecan.request.rpcapi.get_topic_for(rpc_node)
+
+        new_ports = pecan.request.rpcapi.update_ports(context, rpc_ports,
+                                                      topic)
+
+        return PortCollection.convert_with_links(new_ports, None,
+                                                 expand=True)
+
     @wsme_pecan.wsexpose(None, types.uuid, status_code=204)
     def delete(self, port_uuid):
         """Delete a port.
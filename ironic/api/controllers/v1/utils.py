@@ -13,11 +13,22 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+import functools
+import hashlib
+import inspect
+import sys
+
 import jsonpatch
+import pecan
 import wsme
+import wsme.api
+from wsme import utils as wsme_utils
 
 from oslo.config import cfg
 
+from ironic.openstack.common import jsonutils
+
 CONF = cfg.CONF
 
 
@@ -26,6 +37,39 @@ JSONPATCH_EXCEPTIONS = (jsonpatch.JsonPatchException,
                         KeyError)
 
 
+def expose_stream(f):
+    """Expose a controller method which writes its own response body.
+
+    Such methods bypass WSME rendering, so that the body can be streamed
+    (see :func:`collection.stream`). Errors raised before streaming starts
+    are reported to the client in the same format ``wsexpose`` uses.
+    """
+    @functools.wraps(f)
+    def callfunction(self, *args, **kwargs):
+        try:
+            return f(self, *args, **kwargs)
+        except Exception:
+            exc_info = sys.exc_info()
+            try:
+                code = getattr(exc_info[1], 'code', None)
+                data = wsme.api.format_exception(
+                    exc_info, pecan.conf.get('wsme', {}).get('debug', False))
+            finally:
+                del exc_info
+
+            if code and wsme_utils.is_valid_code(code):
+                pecan.response.status = code
+            else:
+                pecan.response.status = 500
+            pecan.response.content_type = 'application/json'
+            pecan.response.body = jsonutils.dumps(data)
+            return pecan.response
+
+    pecan.expose(content_type='application/json')(callfunction)
+    pecan.util._cfg(callfunction)['argspec'] = inspect.getargspec(f)
+    return callfunction
+
+
 def validate_limit(limit):
     if limit and limit < 0:
         raise wsme.exc.ClientSideError(_("Limit must be positive"))
@@ -41,6 +85,30 @@ def validate_sort_dir(sort_dir):
     return sort_dir
 
 
+def validate_fields(fields, allowed):
+    """Parse and validate the value of a ``fields`` query parameter.
+
+    The 'uuid' field is always included in the result, because it is
+    needed to build resource links and pagination markers.
+
+    :param fields: a comma-separated string of field names, or None.
+    :param allowed: the names of the fields which may be requested.
+    :returns: a list of field names, or None if all fields are wanted.
+    :raises: ClientSideError (HTTP 400) if an unknown field is requested.
+    """
+    if not fields:
+        return None
+
+    fields = [f.strip() for f in fields.split(',') if f.strip()]
+    invalid = set(fields) - set(allowed)
+    if invalid:
+        raise wsme.exc.ClientSideError(_("Invalid field(s) requested: %s") %
+                                       ', '.join(sorted(invalid)))
+    if 'uuid' not in fields:
+        fields.insert(0, 'uuid')
+    return fields
+
+
 def apply_jsonpatch(doc, patch):
     for p in patch:
         if p['op'] == 'add' and p['path'].count('/') == 1:
@@ -49,3 +117,29 @@ def apply_jsonpatch(doc, patch):
                         ' the resource is not allowed')
                 raise wsme.exc.ClientSideError(msg % p['path'])
     return jsonpatch.apply_patch(doc, jsonpatch.JsonPatch(patch))
+
+
+def check_etag(digest):
+    """Set an ETag on the response and check it against the request.
+
+    The entity tag is derived from the requested URL and from a digest of
+    the resources being returned, so it can be computed with a single
+    cheap query, before the resources themselves are loaded. It is weak,
+    since the response may be compressed or not with the same tag.
+
+    :param digest: a (count, last_modified, ids, generations) tuple, as
+                   returned by the get_*_digest() methods of the DB API.
+    :returns: True if the representation cached by the client is still
+              current. The caller should then skip building the response
+              body; a "304 Not Modified" will be returned instead.
+    """
+    parts = [pecan.request.host_url, pecan.request.path_qs]
+    for part in digest:
+        if isinstance(part, datetime.datetime):
+            part = part.isoformat()
+        parts.append(str(part))
+    etag = hashlib.sha1('\n'.join(parts)).hexdigest()
+
+    pecan.response.etag = (etag, False)
+    pecan.response.conditional_response = True
+    return etag in pecan.request.if_none_match
@@ -16,14 +16,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import time
+
 from oslo.config import cfg
 from pecan import hooks
 from webob import exc
 
+from ironic.api import metrics
 from ironic.common import context
+from ironic.common import policy
 from ironic.conductor import rpcapi
 from ironic.db import api as dbapi
-from ironic.openstack.common import policy
 
 
 class ConfigHook(hooks.PecanHook):
@@ -94,6 +97,44 @@ class RPCHook(hooks.PecanHook):
         state.request.rpcapi = rpcapi.ConductorAPI()
 
 
+class MetricsHook(hooks.PecanHook):
+    """Record the latency and throughput of each route of the API.
+
+    The time spent looking up conductor topics, calling conductors,
+    querying the database and serializing results is accounted separately,
+    see :mod:`ironic.api.metrics`.
+
+    """
+    def on_route(self, state):
+        state.request.metrics_started_at = time.time()
+        metrics.start()
+
+    def before(self, state):
+        rpcapi = getattr(state.request, 'rpcapi', None)
+        if rpcapi is not None:
+            state.request.rpcapi = metrics.TimedConductorAPI(rpcapi)
+
+    def after(self, state):
+        started_at = getattr(state.request, 'metrics_started_at', None)
+        accounted = metrics.stop()
+        if started_at is None or accounted is None:
+            return
+        controller = state.controller
+        if controller is None:
+            route = 'unmatched'
+        else:
+            owner = getattr(controller, '__self__', None)
+            route = getattr(controller, '__name__', 'unknown')
+            if owner is not None:
+                route = '%s.%s' % (owner.__class__.__name__, route)
+        times, calls = accounted
+        metrics.get_registry().record(state.request.method, route,
+                                      state.response.status_int,
+                                      time.time() - started_at,
+                                      state.response.content_length or 0,
+                                      times, calls)
+
+
 class AdminAuthHook(hooks.PecanHook):
     """Verify that the user has admin rights.
 
@@ -122,14 +163,16 @@ class NoExceptionTracebackHook(hooks.PecanHook):
     # catches and handles all the errors, so 'on_error' dedicated for unhandled
     # exceptions never fired.
     def after(self, state):
-        # Omit empty body. Some errors may not have body at this level yet.
-        if not state.response.body:
-            return
-
         # Do nothing if there is no error.
+        # NOTE: this is checked first, as reading the body of a streamed
+        # response would load all of it in memory.
         if 200 <= state.response.status_int < 400:
             return
 
+        # Omit empty body. Some errors may not have body at this level yet.
+        if not state.response.body:
+            return
+
         json_body = state.response.json
         # Do not remove traceback when server in debug mode (except 'Server'
         # errors when 'debuginfo' will be used for traces).
@@ -0,0 +1,301 @@
+# -*- encoding: utf-8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Per-route latency and throughput metrics of the API service.
+
+The time of a request is broken down in the following components, each
+accounted exclusively of the components nested in it:
+
+topic
+    Looking up the conductor topic of a node or a driver.
+rpc
+    Calling or casting to a conductor.
+db
+    Executing SQL statements.
+serialize
+    Encoding the result of a controller with WSME.
+other
+    Everything else: routing, hooks and the controller code itself.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+
+from sqlalchemy.engine import Engine
+from sqlalchemy import event
+import wsmeext.pecan as wsme_pecan
+
+# Upper bounds, in seconds, of the buckets of the latency histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COMPONENTS = ('topic', 'rpc', 'db', 'serialize', 'other')
+
+_local = threading.local()
+
+# Whether the DB listeners are registered; event.contains() only exists
+# from SQLAlchemy 0.9
+_db_listening = False
+_db_listen_lock = threading.Lock()
+
+
+def start():
+    """Start accounting the components of the current request."""
+    _local.frames = []
+    _local.times = collections.defaultdict(float)
+    _local.calls = collections.defaultdict(int)
+
+
+def stop():
+    """Stop accounting the components of the current request.
+
+    :returns: a tuple of two dicts, the time spent in and the number of
+              calls to each component, or None if accounting was not started.
+    """
+    times = getattr(_local, 'times', None)
+    if times is None:
+        return None
+    calls = _local.calls
+    _local.frames = _local.times = _local.calls = None
+    return times, calls
+
+
+def _push():
+    if getattr(_local, 'times', None) is None:
+        return None
+    # [start time, time spent in nested components]
+    frame = [time.time(), 0.0]
+    _local.frames.append(frame)
+    return frame
+
+
+def _pop(frame, component):
+    if frame is None or getattr(_local, 'times', None) is None:
+        return
+    elapsed = time.time() - frame[0]
+    frames = _local.frames
+    # NOTE: a frame may have been left behind by a statement which failed,
+    # drop it along with the current one.
+    for i in range(len(frames) - 1, -1, -1):
+        if frames[i] is frame:
+            del frames[i:]
+            break
+    if frames:
+        frames[-1][1] += elapsed
+    _local.times[component] += elapsed - frame[1]
+    _local.calls[component] += 1
+
+
+@contextlib.contextmanager
+def timed(component):
+    """Account the time spent in the block to a component of the request."""
+    frame = _push()
+    try:
+        yield
+    finally:
+        _pop(frame, component)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('ironic_metrics', []).append(_push())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    frames = conn.info.get('ironic_metrics')
+    if frames:
+        _pop(frames.pop(), 'db')
+
+
+def listen_db():
+    """Account the SQL statements executed by any engine as DB time."""
+    global _db_listening
+    with _db_listen_lock:
+        if not _db_listening:
+            event.listen(Engine, 'before_cursor_execute',
+                         _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute',
+                         _after_cursor_execute)
+            _db_listening = True
+
+
+class TimedConductorAPI(object):
+    """Account the time spent in the methods of a ConductorAPI.
+
+    Looking up a topic is accounted as 'topic' time, and any other public
+    method as 'rpc' time. Other attributes are passed through unchanged.
+    """
+
+    def __init__(self, rpcapi):
+        self._rpcapi = rpcapi
+
+    def __getattr__(self, name):
+        attr = getattr(self._rpcapi, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        component = 'topic' if name.startswith('get_topic_for') else 'rpc'
+
+        def wrapper(*args, **kwargs):
+            with timed(component):
+                return attr(*args, **kwargs)
+        return wrapper
+
+
+def _timed_renderer(renderer_cls):
+
+    class TimedRenderer(object):
+        """Account the time spent rendering a result as serialization."""
+
+        def __init__(self, path, extra_vars):
+            self._renderer = renderer_cls(path, extra_vars)
+
+        def render(self, template_path, namespace):
+            with timed('serialize'):
+                return self._renderer.render(template_path, namespace)
+
+    return TimedRenderer
+
+
+def timed_renderers():
+    """Return the pecan renderers of WSME, wrapped to be accounted."""
+    return {'wsmejson': _timed_renderer(wsme_pecan.JSonRenderer),
+            'wsmexml': _timed_renderer(wsme_pecan.XMLRenderer)}
+
+
+class RouteStats(object):
+    """The metrics of the requests to a route, with a given method."""
+
+    def __init__(self):
+        # cumulative counts, one per bucket
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = collections.defaultdict(int)
+        self.bytes = 0
+        self.times = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+
+    def add(self, status, elapsed, nbytes, times, calls):
+        self.count += 1
+        self.seconds += elapsed
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                self.buckets[i] += 1
+        self.statuses[status] += 1
+        self.bytes += nbytes
+        accounted = 0.0
+        for component, seconds in times.items():
+            self.times[component] += seconds
+            accounted += seconds
+        self.times['other'] += max(elapsed - accounted, 0.0)
+        for component, count in calls.items():
+            self.calls[component] += count
+
+
+class Registry(object):
+    """The metrics of all the routes of the API service."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, method, route, status, elapsed, nbytes, times=None,
+               calls=None):
+        """Record a request.
+
+        :param method: the HTTP method of the request.
+        :param route: the name of the controller method which handled it.
+        :param status: the HTTP status code of the response.
+        :param elapsed: the time, in seconds, spent handling the request.
+        :param nbytes: the length of the body of the response.
+        :param times: a dict of the time spent in each component.
+        :param calls: a dict of the number of calls to each component.
+        """
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats()
+            stats.add(status, elapsed, nbytes, times or {}, calls or {})
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def render(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+
+            def family(name, kind, help):
+                lines.append('# HELP %s %s' % (name, help))
+                lines.append('# TYPE %s %s' % (name, kind))
+
+            def sample(name, labels, value):
+                labels = ','.join('%s="%s"' % label for label in labels)
+                lines.append('%s{%s} %s' % (name, labels, repr(value)))
+
+            name = 'ironic_api_request_duration_seconds'
+            family(name, 'histogram', 'Time spent handling requests.')
+            for (method, route), stats in routes:
+                labels = [('method', method), ('route', route)]
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    sample(name + '_bucket', labels + [('le', repr(bound))],
+                           count)
+                sample(name + '_bucket', labels + [('le', '+Inf')],
+                       stats.count)
+                sample(name + '_sum', labels, stats.seconds)
+                sample(name + '_count', labels, stats.count)
+
+            name = 'ironic_api_responses_total'
+            family(name, 'counter', 'Responses, by status code.')
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    sample(name, [('method', method), ('route', route),
+                                  ('status', status)], count)
+
+            name = 'ironic_api_response_bytes_total'
+            family(name, 'counter', 'Bytes sent in the bodies of responses.')
+            for (method, route), stats in routes:
+                sample(name, [('method', method), ('route', route)],
+                       stats.bytes)
+
+            name = 'ironic_api_component_seconds_total'
+            family(name, 'counter', 'Time spent handling requests, by '
+                                    'component.')
+            for (method, route), stats in routes:
+                for component in COMPONENTS:
+                    sample(name, [('method', method), ('route', route),
+                                  ('component', component)],
+                           stats.times[component])
+
+            name = 'ironic_api_component_calls_total'
+            family(name, 'counter', 'Calls made handling requests, by '
+                                    'component.')
+            for (method, route), stats in routes:
+                for component in COMPONENTS[:-1]:
+                    sample(name, [('method', method), ('route', route),
+                                  ('component', component)],
+                           stats.calls[component])
+
+        return '\n'.join(lines) + '\n'
+
+
+_REGISTRY = Registry()
+
+
+def get_registry():
+    return _REGISTRY
@@ -13,11 +13,14 @@
 # under the License.
 
 from ironic.api.middleware import auth_token
+from ironic.api.middleware import compress
 from ironic.api.middleware import parsable_error
 
 
 ParsableErrorMiddleware = parsable_error.ParsableErrorMiddleware
 AuthTokenMiddleware = auth_token.AuthTokenMiddleware
+CompressMiddleware = compress.CompressMiddleware
 
 __all__ = (ParsableErrorMiddleware,
-           AuthTokenMiddleware)
+           AuthTokenMiddleware,
+           CompressMiddleware)
@@ -0,0 +1,130 @@
+# -*- encoding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+Middleware to compress the body of a response with gzip or deflate, as
+negotiated with the client through the Accept-Encoding header.
+"""
+
+import zlib
+
+import webob
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'application/xml', 'text/')
+
+# Window bits of zlib for each content coding; gzip adds a header and
+# a trailer to the deflate stream.
+_WBITS = {'gzip': 16 + zlib.MAX_WBITS,
+          'deflate': zlib.MAX_WBITS}
+
+
+class CompressMiddleware(object):
+    """Compress the body of responses which are large enough.
+
+    A response is compressed when the client accepts gzip or deflate, its
+    content type is textual, it is not already encoded, and its body is at
+    least min_size bytes long. Responses of unknown length, like exports,
+    are compressed as they are streamed.
+    """
+    def __init__(self, app, min_size=1024, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    def _get_encoding(self, environ):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return None
+        if not environ.get('HTTP_ACCEPT_ENCODING'):
+            return None
+        req = webob.Request(environ)
+        return req.accept_encoding.best_match(['gzip', 'deflate'])
+
+    def _is_compressible(self, headers):
+        for (h, v) in headers:
+            h = h.lower()
+            if h == 'content-encoding':
+                return False
+            if h == 'content-type' and v.startswith(COMPRESSIBLE_TYPES):
+                return True
+        return False
+
+    def _compress(self, encoding, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                      _WBITS[encoding])
+        try:
+            for chunk in chunks:
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        yield compressor.flush()
+
+    def __call__(self, environ, start_response):
+        encoding = self._get_encoding(environ)
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        # The response is only started once it is known whether its
+        # body will be compressed.
+        state = {'written': []}
+
+        def replacement_start_response(status, headers, exc_info=None):
+            state['status'] = status
+            state['headers'] = headers
+            state['exc_info'] = exc_info
+            return state['written'].append
+
+        app_iter = self.app(environ, replacement_start_response)
+        headers = state['headers']
+        length = None
+        for (h, v) in headers:
+            if h.lower() == 'content-length':
+                length = int(v)
+
+        compressible = self._is_compressible(headers)
+        if compressible and length is not None:
+            # Small enough to be read at once, and to decide on its size.
+            try:
+                body = b''.join(state['written'] + list(app_iter))
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+            app_iter = [body]
+            if len(body) < self.min_size:
+                compressible = False
+            else:
+                body = b''.join(self._compress(encoding, app_iter))
+                app_iter = [body]
+                length = len(body)
+        elif state['written']:
+            app_iter = state['written'] + list(app_iter)
+
+        if not compressible:
+            start_response(state['status'], headers, state['exc_info'])
+            return app_iter
+
+        headers = [(h, v) for (h, v) in headers
+                   if h.lower() not in ('content-length', 'vary')]
+        vary = [v for (h, v) in state['headers'] if h.lower() == 'vary']
+        vary.append('Accept-Encoding')
+        headers.append(('Vary', ', '.join(vary)))
+        headers.append(('Content-Encoding', encoding))
+        if length is None:
+            app_iter = self._compress(encoding, app_iter)
+        else:
+            headers.append(('Content-Length', str(length)))
+        start_response(state['status'], headers, state['exc_info'])
+        return app_iter
@@ -158,6 +158,16 @@ class ImageConvertFailed(IronicException):
     message = _("Image %(image_id)s is unacceptable: %(reason)s")
 
 
+class ImageChecksumMismatch(IronicException):
+    message = _("Checksum of image %(image_id)s does not match: expected "
+                "%(expected)s, got %(actual)s.")
+
+
+class ImageDownloadFailed(IronicException):
+    message = _("Failed to download image %(image_href)s, reason: "
+                "%(reason)s")
+
+
 # Cannot be templated as the error syntax varies.
 # msg needs to be constructed when raised.
 class InvalidParameterValue(Invalid):
@@ -213,6 +223,10 @@ class ConductorNotFound(NotFound):
     message = _("Conductor %(conductor)s could not be found.")
 
 
+class OperationNotFound(NotFound):
+    message = _("Operation %(operation)s could not be found.")
+
+
 class ConductorAlreadyRegistered(IronicException):
     message = _("Conductor %(conductor)s already registered.")
 
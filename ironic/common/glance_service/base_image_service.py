@@ -16,6 +16,7 @@
 
 
 import functools
+import hashlib
 import logging
 import os
 import sys
@@ -28,6 +29,7 @@ import six.moves.urllib.parse as urlparse
 
 from ironic.common import exception
 from ironic.common.glance_service import service_utils
+from ironic.common import ranged_download
 
 from oslo.config import cfg
 
@@ -58,6 +60,22 @@ def _translate_plain_exception(exc_value):
     return exc_value
 
 
+def _check_checksum(image_id, expected, digest):
+    """Compare the digest of a downloaded image to its glance checksum.
+
+    :returns: the checksum, or None if glance has none for the image.
+    :raises: ImageChecksumMismatch
+    """
+    if not expected:
+        return None
+    actual = digest.hexdigest()
+    if actual != expected:
+        raise exception.ImageChecksumMismatch(image_id=image_id,
+                                              expected=expected,
+                                              actual=actual)
+    return actual
+
+
 def check_image_service(func):
     """Creates a glance client if doesn't exists and calls the function."""
     @functools.wraps(func)
@@ -79,6 +97,7 @@ def check_image_service(func):
             scheme = 'http'
         params = {}
         params['insecure'] = CONF.glance.glance_api_insecure
+        params['cacert'] = CONF.glance.glance_cafile
         if CONF.glance.auth_strategy == 'keystone':
             params['token'] = self.context.auth_token
         endpoint = '%s://%s:%s' % (scheme, self.glance_host, self.glance_port)
@@ -195,33 +214,58 @@ class BaseImageService(object):
         return base_image_meta
 
     @check_image_service
-    def _download(self, image_id, data=None, method='data'):
+    def _download(self, image_id, data=None, method='data', checksum=None):
         """Calls out to Glance for data and writes data.
 
         :param image_id: The opaque image identifier.
         :param data: (Optional) File object to write data to.
+        :param checksum: (Optional) The checksum of the image, if it is
+                         already known, to save asking Glance for it.
+        :returns: the image chunks if no file object is given. Otherwise,
+                  the checksum of the image as verified while writing it,
+                  or None if it could not be verified.
+        :raises: ImageChecksumMismatch
         """
         (image_id, self.glance_host,
          self.glance_port, use_ssl) = service_utils.parse_image_ref(image_id)
 
-        if self.version == 2 \
-                and 'file' in CONF.glance.allowed_direct_url_schemes:
-
-            location = self._get_location(image_id)
+        image_meta = None
+        if self.version == 2 and CONF.glance.allowed_direct_url_schemes:
+            allowed_schemes = CONF.glance.allowed_direct_url_schemes
+            image_meta = self.call('get', image_id)
+            location = self._get_location(image_id, image_meta=image_meta)
             url = urlparse.urlparse(location)
-            if url.scheme == "file":
+            if url.scheme == "file" and 'file' in allowed_schemes:
                 with open(url.path, "r") as f:
                     filesize = os.path.getsize(f.name)
                     sendfile.sendfile(data.fileno(), f.fileno(), 0, filesize)
                 return
-
-        image_chunks = self.call(method, image_id)
+            if (data is not None and url.scheme in ('http', 'https')
+                    and url.scheme in allowed_schemes):
+                expected = self._get_checksum(image_id, checksum, image_meta)
+                digest = hashlib.md5() if expected else None
+                ranged_download.download(location, data, digest=digest)
+                return _check_checksum(image_id, expected, digest)
 
         if data is None:
-            return image_chunks
-        else:
-            for chunk in image_chunks:
-                data.write(chunk)
+            return self.call(method, image_id)
+
+        expected = self._get_checksum(image_id, checksum, image_meta)
+        image_chunks = self.call(method, image_id)
+        digest = hashlib.md5()
+        for chunk in image_chunks:
+            digest.update(chunk)
+            data.write(chunk)
+        return _check_checksum(image_id, expected, digest)
+
+    def _get_checksum(self, image_id, checksum=None, image_meta=None):
+        """Return the checksum of an image, asking Glance only if needed."""
+        if checksum is None:
+            if image_meta is None:
+                image_meta = self.call('get', image_id)
+            # NOTE: glance computes the checksum of images with md5
+            checksum = getattr(image_meta, 'checksum', None)
+        return checksum
 
     @check_image_service
     def _create(self, image_meta, data=None, method='create'):
@@ -41,11 +41,17 @@ class ImageService(object):
         """
 
     @abc.abstractmethod
-    def download(self, image_id, data=None):
+    def download(self, image_id, data=None, checksum=None):
         """Calls out to Glance for data and writes data.
 
         :param image_id: The opaque image identifier.
         :param data: (Optional) File object to write data to.
+        :param checksum: (Optional) The checksum of the image, if it is
+                         already known, to save asking Glance for it.
+        :returns: the image chunks if no file object is given. Otherwise,
+                  the checksum of the image as verified while writing it,
+                  or None if it could not be verified.
+        :raises: ImageChecksumMismatch
         """
 
     @abc.abstractmethod
@@ -26,7 +26,7 @@ glance_opts = [
                 default=[],
                 help='A list of URL schemes that can be downloaded directly '
                 'via the direct_url.  Currently supported schemes: '
-                '[file].')
+                '[file, http, https].')
 ]
 
 CONF = cfg.CONF
@@ -42,8 +42,9 @@ class GlanceImageService(base_image_service.BaseImageService,
     def show(self, image_id):
         return self._show(image_id, method='get')
 
-    def download(self, image_id, data=None):
-        return self._download(image_id, method='data', data=data)
+    def download(self, image_id, data=None, checksum=None):
+        return self._download(image_id, method='data', data=data,
+                              checksum=checksum)
 
     def create(self, image_meta, data=None):
         image_id = self._create(image_meta, method='create', data=None)['id']
@@ -57,11 +58,14 @@ class GlanceImageService(base_image_service.BaseImageService,
     def delete(self, image_id):
         return self._delete(image_id, method='delete')
 
-    def _get_location(self, image_id):
+    def _get_location(self, image_id, image_meta=None):
         """Returns the direct url representing the backend storage location,
         or None if this attribute is not shown by Glance.
+
+        :param image_meta: (Optional) The image as already returned by Glance.
         """
-        image_meta = self.call('get', image_id)
+        if image_meta is None:
+            image_meta = self.call('get', image_id)
 
         if not service_utils.is_image_available(self.context, image_meta):
             raise exc.ImageNotFound(image_id=image_id)
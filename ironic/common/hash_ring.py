@@ -22,6 +22,7 @@ from oslo.config import cfg
 
 from ironic.common import exception
 from ironic.db import api as dbapi
+from ironic.openstack.common import timeutils
 
 hash_opts = [
     cfg.IntOpt('hash_partition_exponent',
@@ -39,6 +40,14 @@ hash_opts = [
                     'conductor services to prepare deployment environments '
                     'and potentially allow the Ironic cluster to recover '
                     'more quickly if a conductor instance is terminated.'),
+    cfg.IntOpt('hash_ring_reset_interval',
+               default=5,
+               help='Interval, in seconds, after which the API service '
+                    'reloads its cached list of the drivers of the active '
+                    'conductors, used to list the drivers and to route '
+                    'their vendor passthru calls. The list is also '
+                    'reloaded when a driver is not found in it, or when a '
+                    'call routed with it times out.'),
 ]
 
 CONF = cfg.CONF
@@ -113,28 +122,72 @@ class HashRing(object):
 
 
 class HashRingManager(object):
-    def __init__(self):
+    """Build and cache the hash rings of the active drivers.
+
+    The rings are loaded from the conductors table the first time they
+    are needed. If a reset interval is given, they are loaded again once
+    they are older than it; the rings of the drivers whose hosts did not
+    change are kept, and the generation is only increased when the
+    drivers or their hosts changed.
+    """
+
+    def __init__(self, reset_interval=None):
+        """Create a hash ring manager.
+
+        :param reset_interval: the number of seconds after which the rings
+                               are loaded again. Default: never.
+        """
         self._lock = threading.Lock()
         self.dbapi = dbapi.get_instance()
+        self.reset_interval = reset_interval
         self.hash_rings = None
+        self.generation = 0
+        self._loaded_at = None
+        self._reset = False
+        # the generation and the hosts of each driver, built once for
+        # each generation
+        self._driver_hosts = (0, {})
 
     def _load_hash_rings(self):
         rings = {}
         d2c = self.dbapi.get_active_driver_dict()
 
         for driver_name, hosts in d2c.iteritems():
-            rings[driver_name] = HashRing(hosts)
+            ring = (self.hash_rings or {}).get(driver_name)
+            if ring is None or set(ring.hosts) != set(hosts):
+                ring = HashRing(hosts)
+            rings[driver_name] = ring
         return rings
 
+    def _is_stale(self):
+        return self._reset or (self.reset_interval is not None and
+                               timeutils.is_older_than(self._loaded_at,
+                                                       self.reset_interval))
+
+    def reset(self):
+        """Load the rings again the next time they are needed."""
+        self._reset = True
+
     def _ensure_rings_fresh(self):
         # Hot path, no lock
-        # TODO(russell_h): Consider adding time-based invalidation of rings
-        if self.hash_rings is not None:
+        if self.hash_rings is not None and not self._is_stale():
             return
 
         with self._lock:
-            if self.hash_rings is None:
-                self.hash_rings = self._load_hash_rings()
+            if self.hash_rings is None or self._is_stale():
+                old_rings = self.hash_rings or {}
+                rings = self._load_hash_rings()
+                if (set(rings) != set(old_rings) or
+                        any(rings[name] is not old_rings[name]
+                            for name in rings)):
+                    self.generation += 1
+                    self._driver_hosts = (
+                            self.generation,
+                            dict((name, sorted(ring.hosts))
+                                 for name, ring in rings.items()))
+                self.hash_rings = rings
+                self._loaded_at = timeutils.utcnow()
+                self._reset = False
 
     def get_hash_ring(self, driver_name):
         self._ensure_rings_fresh()
@@ -143,3 +196,36 @@ class HashRingManager(object):
             return self.hash_rings[driver_name]
         except KeyError:
             raise exception.DriverNotFound(driver_name=driver_name)
+
+    def get_driver_hosts(self):
+        """Return the active drivers and the hosts which support them.
+
+        :returns: a tuple (generation, dict mapping each driver name to
+                  the sorted list of its hosts). The same generation, and
+                  the same dict, are returned for as long as the drivers
+                  and their hosts do not change; the dict must not be
+                  modified.
+        """
+        self._ensure_rings_fresh()
+        return self._driver_hosts
+
+
+_SHARED_MANAGER = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_shared_ring_manager():
+    """Return the hash ring manager shared by the whole process.
+
+    Its rings are loaded again every CONF.hash_ring_reset_interval seconds.
+    It is only meant for the driver listing and the routing of driver vendor
+    passthru: nodes are routed with the current conductors, by a manager
+    of each ConductorAPI.
+    """
+    global _SHARED_MANAGER
+    if _SHARED_MANAGER is None:
+        with _SHARED_LOCK:
+            if _SHARED_MANAGER is None:
+                _SHARED_MANAGER = HashRingManager(
+                        reset_interval=CONF.hash_ring_reset_interval)
+    return _SHARED_MANAGER
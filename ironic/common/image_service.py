@@ -39,6 +39,11 @@ glance_opts = [
                 default=False,
                 help='Allow to perform insecure SSL (https) requests to '
                      'glance.'),
+    cfg.StrOpt('glance_cafile',
+               help='CA certificates file to verify the SSL (https) '
+                    'certificates of glance, and of the image locations '
+                    'downloaded directly. Defaults to the system CA '
+                    'certificates.'),
     cfg.IntOpt('glance_num_retries',
                default=0,
                help='Number of retries when downloading an image from '
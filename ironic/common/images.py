@@ -21,6 +21,8 @@ Handling of VM disk images.
 
 import os
 import re
+import threading
+import time
 
 from oslo.config import cfg
 
@@ -37,11 +39,36 @@ image_opts = [
     cfg.BoolOpt('force_raw_images',
                 default=True,
                 help='Force backing images to raw format.'),
+    cfg.IntOpt('image_download_bandwidth',
+               default=0,
+               help='Maximum total rate, in MiB per second, at which the '
+                    'images are downloaded by a process. 0 means no limit.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(image_opts)
 
+# Magic numbers, and their offsets, of the image formats known to qemu-img.
+# Images matching none of them are raw.
+_FORMAT_MAGICS = [
+    ('qcow2', 0, b'QFI\xfb'),
+    ('qed', 0, b'QED\x00'),
+    ('vmdk', 0, b'KDMV'),
+    ('vmdk', 0, b'COWD'),
+    ('vmdk', 0, b'# Disk DescriptorFile'),
+    ('vdi', 64, b'\x7f\x10\xda\xbe'),
+    ('vpc', 0, b'conectix'),
+    ('vhdx', 0, b'vhdxfile'),
+    ('bochs', 0, b'Bochs Virtual HD Image'),
+    ('cloop', 0, b'#!/bin/sh\n#V2.0 Format\n'),
+    ('parallels', 0, b'WithoutFreeSpace'),
+    ('parallels', 0, b'WithouFreSpacExt'),
+    ('luks', 0, b'LUKS\xba\xbe'),
+]
+
+# Number of bytes needed to tell the format of an image
+_SNIFF_SIZE = 512
+
 
 class QemuImgInfo(object):
     BACKING_FILE_RE = re.compile((r"^(.*?)\s*\(actual\s+path\s*:"
@@ -174,7 +201,81 @@ def convert_image(source, dest, out_format, run_as_root=False):
     utils.execute(*cmd, run_as_root=run_as_root)
 
 
-def fetch(context, image_href, path, image_service=None):
+class _Throttle(object):
+    """Share a maximum rate between the image downloads of the process.
+
+    Each write reserves the time needed to send its data at the maximum
+    rate after the previous reservations, and waits for its turn.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self, size, rate):
+        with self._lock:
+            now = time.time()
+            start = max(self._next, now)
+            self._next = start + float(size) / rate
+        if start > now:
+            time.sleep(start - now)
+
+
+_THROTTLE = _Throttle()
+
+
+class _ThrottledFile(object):
+    """A file whose writes are limited to image_download_bandwidth."""
+
+    def __init__(self, image_file):
+        self._file = image_file
+
+    def write(self, data):
+        rate = CONF.image_download_bandwidth * 1024 * 1024
+        if rate > 0:
+            _THROTTLE.wait(len(data), rate)
+        self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class _SniffingFile(object):
+    """A file which keeps the first bytes written to it."""
+
+    def __init__(self, image_file):
+        self._file = image_file
+        self.head = b''
+
+    def write(self, data):
+        if len(self.head) < _SNIFF_SIZE:
+            self.head += data[:_SNIFF_SIZE - len(self.head)]
+        self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def sniff_format(head):
+    """Tell the format of an image from its first bytes.
+
+    :param head: the first bytes of the image.
+    :returns: the name of the format, 'raw' if it is not a known one.
+    """
+    for fmt, offset, magic in _FORMAT_MAGICS:
+        if head[offset:offset + len(magic)] == magic:
+            return fmt
+    return 'raw'
+
+
+def fetch(context, image_href, path, image_service=None, checksum=None):
+    """Download an image to a path.
+
+    :param checksum: the checksum of the image, if it is already known.
+    :returns: tuple (the format of the image, as told by its first bytes,
+                     the checksum of the image as verified while downloading
+                     it, or None)
+    """
     # TODO(vish): Improve context handling and add owner and auth data
     #             when it is added to glance.  Right now there is no
     #             auth checking in glance, so we assume that access was
@@ -184,13 +285,43 @@ def fetch(context, image_href, path, image_service=None):
 
     with fileutils.remove_path_on_error(path):
         with open(path, "wb") as image_file:
-            image_service.download(image_href, image_file)
-
-
-def fetch_to_raw(context, image_href, path, image_service=None):
+            sniffer = _SniffingFile(image_file)
+            if CONF.image_download_bandwidth > 0:
+                image_file = _ThrottledFile(sniffer)
+            else:
+                image_file = sniffer
+            checksum = image_service.download(image_href, image_file,
+                                              checksum=checksum)
+
+        head = sniffer.head
+        if not head:
+            # NOTE: the image was copied without going through write()
+            with open(path, "rb") as image_file:
+                head = image_file.read(_SNIFF_SIZE)
+    return sniff_format(head), checksum
+
+
+def fetch_to_raw(context, image_href, path, image_service=None,
+                 checksum=None):
+    """Download an image to a path, converting it to raw if needed.
+
+    :param checksum: the checksum of the image, if it is already known.
+    :returns: the checksum of the image as verified while downloading it,
+              or None.
+    """
     path_tmp = "%s.part" % path
-    fetch(context, image_href, path_tmp, image_service)
-    image_to_raw(image_href, path, path_tmp)
+    fmt, checksum = fetch(context, image_href, path_tmp, image_service,
+                          checksum=checksum)
+    if fmt == 'raw':
+        # NOTE: raw images need no conversion and can not have a backing
+        # file, no need to have qemu-img look at them.
+        LOG.debug("%(image)s is raw, no conversion needed" %
+                  {'image': image_href})
+        with fileutils.remove_path_on_error(path_tmp):
+            os.rename(path_tmp, path)
+    else:
+        image_to_raw(image_href, path, path_tmp)
+    return checksum
 
 
 def image_to_raw(image_href, path, path_tmp):
@@ -229,7 +360,12 @@ def image_to_raw(image_href, path, path_tmp):
             os.rename(path_tmp, path)
 
 
-def download_size(context, image_href, image_service=None):
+def show(context, image_href, image_service=None):
+    """Return the metadata of an image."""
     if not image_service:
         image_service = service.Service(version=1, context=context)
-    return image_service.show(image_href)['size']
+    return image_service.show(image_href)
+
+
+def download_size(context, image_href, image_service=None):
+    return show(context, image_href, image_service)['size']
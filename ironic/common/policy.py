@@ -15,9 +15,13 @@
 
 """Policy Engine For Ironic."""
 
+import collections
 import os.path
+import threading
+import time
 
 from oslo.config import cfg
+import six
 
 from ironic.common import exception
 from ironic.common import utils
@@ -32,6 +36,11 @@ policy_opts = [
     cfg.StrOpt('policy_default_rule',
                default='default',
                help=_('Rule checked when requested rule is not found.')),
+    cfg.IntOpt('policy_reload_interval',
+               default=60,
+               help=_('Interval, in seconds, at which the policy file is '
+                      'checked for changes by check(). Set to 0 to only '
+                      'load it once.')),
     ]
 
 CONF = cfg.CONF
@@ -39,13 +48,28 @@ CONF.register_opts(policy_opts)
 
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+_NEXT_RELOAD = None
+# The rules last set by set_rules()
+_RULES = None
+
+# The most recently used results of check(), for the rules they were
+# computed with, from the least to the most recently used
+_CHECK_CACHE_SIZE = 1024
+_CHECK_CACHE = collections.OrderedDict()
+_CHECK_DEPS = {}
+_CHECK_RULES = None
+_CHECK_LOCK = threading.Lock()
 
 
 def reset():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _NEXT_RELOAD
+    global _RULES
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _NEXT_RELOAD = None
+    _RULES = None
     policy.reset()
 
 
@@ -62,6 +86,132 @@ def init():
                            reload_func=_set_rules)
 
 
+def set_rules(rules):
+    """Set the rules in use, and drop the results check() cached.
+
+    :param rules: a :class:`ironic.openstack.common.policy.Rules` object.
+    """
+    global _RULES
+    _RULES = rules
+    policy.set_rules(rules)
+
+
 def _set_rules(data):
     default_rule = CONF.policy_default_rule
-    policy.set_rules(policy.Rules.load_json(data, default_rule))
+    set_rules(policy.Rules.load_json(data, default_rule))
+
+
+def _get_creds_deps(rule, rules, seen=None):
+    """Return the credentials a rule depends on.
+
+    :param rule: the name of a rule, or a check.
+    :param rules: the rules in use.
+    :returns: a frozenset of the keys of the credentials which the result
+              of the rule depends on, or None if it also depends on the
+              target, or on something else.
+    """
+    if isinstance(rule, six.string_types):
+        seen = seen or set()
+        if rule in seen:
+            return None
+        seen = seen | set([rule])
+        try:
+            rule = rules[rule]
+        except KeyError:
+            # an undefined rule always fails
+            return frozenset()
+
+    if isinstance(rule, (policy.TrueCheck, policy.FalseCheck)):
+        return frozenset()
+    if isinstance(rule, policy.NotCheck):
+        return _get_creds_deps(rule.rule, rules, seen)
+    if isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        deps = frozenset()
+        for sub_rule in rule.rules:
+            sub_deps = _get_creds_deps(sub_rule, rules, seen)
+            if sub_deps is None:
+                return None
+            deps |= sub_deps
+        return deps
+    if isinstance(rule, policy.RuleCheck):
+        return _get_creds_deps(rule.match, rules, seen)
+    if isinstance(rule, policy.RoleCheck):
+        return frozenset(['roles'])
+    if isinstance(rule, policy.GenericCheck) and '%' not in rule.match:
+        return frozenset([rule.kind])
+    return None
+
+
+def _get_cache_key(rule, deps, creds):
+    key = [rule]
+    for name in sorted(deps):
+        if name not in creds:
+            key.append((name,))
+        elif name == 'roles':
+            key.append((name, frozenset(r.lower() for r in creds[name])))
+        else:
+            key.append((name, six.text_type(creds[name])))
+    return tuple(key)
+
+
+def _reload_if_due():
+    global _NEXT_RELOAD
+    interval = CONF.policy_reload_interval
+    if not _POLICY_PATH or interval <= 0:
+        return
+    now = time.time()
+    if _NEXT_RELOAD is None:
+        _NEXT_RELOAD = now + interval
+    elif now >= _NEXT_RELOAD:
+        _NEXT_RELOAD = now + interval
+        init()
+
+
+def check(rule, target, creds):
+    """Check a rule, memoizing the result when possible.
+
+    This behaves as :func:`ironic.openstack.common.policy.check`. When the
+    result of a rule only depends on some of the credentials, and not on
+    the target, it is cached using these credentials as the key, until the
+    rules change through :func:`set_rules`, or the result is the least
+    recently used one of a full cache. The policy file is checked for
+    changes at most every CONF.policy_reload_interval seconds.
+
+    :param rule: the name of the rule to check.
+    :param target: the target of the action, as a dict.
+    :param creds: the credentials of the user, as a dict.
+    :returns: a true value if the rule allows the action, else False.
+    """
+    global _CHECK_RULES
+    _reload_if_due()
+
+    rules = _RULES
+    with _CHECK_LOCK:
+        if rules is not _CHECK_RULES:
+            _CHECK_CACHE.clear()
+            _CHECK_DEPS.clear()
+            _CHECK_RULES = rules
+        try:
+            deps = _CHECK_DEPS[rule]
+        except KeyError:
+            deps = _CHECK_DEPS[rule] = (
+                    _get_creds_deps(rule, rules) if rules else None)
+
+    if deps is None:
+        return policy.check(rule, target, creds)
+
+    key = _get_cache_key(rule, deps, creds)
+    with _CHECK_LOCK:
+        if key in _CHECK_CACHE:
+            # move the result to the most recently used end
+            result = _CHECK_CACHE[key] = _CHECK_CACHE.pop(key)
+            return result
+
+    result = policy.check(rule, target, creds)
+    with _CHECK_LOCK:
+        if rules is _CHECK_RULES and key not in _CHECK_CACHE:
+            _CHECK_CACHE[key] = result
+            # evict the least recently used results
+            while len(_CHECK_CACHE) > _CHECK_CACHE_SIZE:
+                _CHECK_CACHE.popitem(last=False)
+    return result
@@ -0,0 +1,265 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Download of images over HTTP, in concurrent ranges when they are large.
+"""
+
+import os
+import ssl
+import sys
+import threading
+
+from oslo.config import cfg
+import six
+from six.moves import http_client
+import six.moves.urllib.parse as urlparse
+
+from ironic.common import exception
+from ironic.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+ranged_download_opts = [
+    cfg.IntOpt('image_download_ranges',
+               default=4,
+               help='Number of ranges of a large image downloaded at the '
+                    'same time over HTTP, when the server supports range '
+                    'requests. 1 disables ranged downloads.'),
+    cfg.IntOpt('image_download_range_threshold',
+               default=256,
+               help='Minimum size, in MiB, of the images downloaded in '
+                    'ranges.'),
+    cfg.IntOpt('image_download_timeout',
+               default=60,
+               help='Timeout, in seconds, of the connections and reads of '
+                    'the images downloaded over HTTP. 0 means no timeout.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(ranged_download_opts)
+CONF.import_opt('glance_api_insecure', 'ironic.common.image_service',
+                group='glance')
+CONF.import_opt('glance_cafile', 'ironic.common.image_service',
+                group='glance')
+
+CHUNK_SIZE = 65536
+
+
+def _connect(url, parsed):
+    """Open a connection to the server of a URL.
+
+    Certificates of https servers are verified against the CA of the
+    [glance] section, unless glance_api_insecure is set.
+    """
+    timeout = CONF.image_download_timeout or None
+    if parsed.scheme != 'https':
+        return http_client.HTTPConnection(parsed.hostname, parsed.port,
+                                          timeout=timeout)
+    if not hasattr(ssl, 'create_default_context'):
+        # NOTE: python older than 2.7.9 does not verify certificates.
+        if not CONF.glance.glance_api_insecure:
+            raise exception.ImageDownloadFailed(image_href=url,
+                reason=_("certificates can not be verified with this "
+                         "version of python, [glance]glance_api_insecure "
+                         "has to be set to download over https"))
+        return http_client.HTTPSConnection(parsed.hostname, parsed.port,
+                                           timeout=timeout)
+    context = ssl.create_default_context(cafile=CONF.glance.glance_cafile)
+    if CONF.glance.glance_api_insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return http_client.HTTPSConnection(parsed.hostname, parsed.port,
+                                       timeout=timeout, context=context)
+
+
+def _request(url, method='GET', headers=None):
+    """Send a request to the server of a URL.
+
+    :returns: the connection and the response. The caller has to close
+              the connection.
+    """
+    parsed = urlparse.urlsplit(url)
+    path = parsed.path or '/'
+    if parsed.query:
+        path += '?' + parsed.query
+    conn = None
+    try:
+        conn = _connect(url, parsed)
+        conn.request(method, path, headers=headers or {})
+        return conn, conn.getresponse()
+    # NOTE: a certificate which does not match the host name raises a
+    # ValueError.
+    except (http_client.HTTPException, EnvironmentError, ValueError) as e:
+        if conn is not None:
+            conn.close()
+        raise exception.ImageDownloadFailed(image_href=url, reason=e)
+
+
+def _ranged_size(url):
+    """Return the size of a file, if it can be downloaded in ranges.
+
+    :returns: the size of the file, or None if the server does not tell
+              it or does not support range requests.
+    """
+    conn, resp = _request(url, 'HEAD')
+    try:
+        resp.read()
+        if resp.status != http_client.OK:
+            return None
+        if 'bytes' not in resp.getheader('accept-ranges', '').lower():
+            return None
+        length = resp.getheader('content-length')
+        return int(length) if length else None
+    finally:
+        conn.close()
+
+
+def _read(url, resp, expected):
+    """Read a response in chunks, checking its length."""
+    read = 0
+    while True:
+        try:
+            chunk = resp.read(CHUNK_SIZE)
+        except (http_client.HTTPException, EnvironmentError) as e:
+            raise exception.ImageDownloadFailed(image_href=url, reason=e)
+        if not chunk:
+            break
+        read += len(chunk)
+        yield chunk
+    if expected is not None and read != expected:
+        raise exception.ImageDownloadFailed(image_href=url,
+            reason=_("got %(read)d bytes out of %(expected)d") %
+                   {'read': read, 'expected': expected})
+
+
+def _stream(url, image_file, digest):
+    conn, resp = _request(url)
+    try:
+        if resp.status != http_client.OK:
+            raise exception.ImageDownloadFailed(image_href=url,
+                reason=_("HTTP status %d") % resp.status)
+        length = resp.getheader('content-length')
+        for chunk in _read(url, resp, int(length) if length else None):
+            if digest is not None:
+                digest.update(chunk)
+            image_file.write(chunk)
+    finally:
+        conn.close()
+
+
+def _write_at(fd, data, offset, lock):
+    # NOTE: there is no os.pwrite in python 2, seeking and writing have
+    # to be done at once.
+    with lock:
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            data = data[os.write(fd, data):]
+
+
+def _download_range(url, fd, start, end, lock):
+    conn, resp = _request(url,
+                          headers={'Range': 'bytes=%d-%d' % (start, end)})
+    try:
+        content_range = resp.getheader('content-range', '')
+        if (resp.status != http_client.PARTIAL_CONTENT or
+                not content_range.startswith('bytes %d-%d/' % (start, end))):
+            raise exception.ImageDownloadFailed(image_href=url,
+                reason=_("range %(start)d-%(end)d not served, got HTTP "
+                         "status %(status)d") %
+                       {'start': start, 'end': end, 'status': resp.status})
+        offset = start
+        for chunk in _read(url, resp, end - start + 1):
+            _write_at(fd, chunk, offset, lock)
+            offset += len(chunk)
+    finally:
+        conn.close()
+
+
+def _preallocate(fd, size):
+    """Allocate the blocks of a file of a given size, if possible.
+
+    There is no os.posix_fallocate before python 3.3, the file is only
+    extended to the size, and left sparse.
+    """
+    fallocate = getattr(os, 'posix_fallocate', None)
+    if fallocate is not None:
+        try:
+            fallocate(fd, 0, size)
+            return
+        except OSError as e:
+            LOG.debug("Unable to preallocate %(size)d bytes: %(error)s" %
+                      {'size': size, 'error': e})
+    os.ftruncate(fd, size)
+
+
+def _download_ranges(url, image_file, size, ranges):
+    fd = image_file.fileno()
+    _preallocate(fd, size)
+    step = -(-size // ranges)
+    lock = threading.Lock()
+    errors = []
+
+    def _worker(start, end):
+        try:
+            _download_range(url, fd, start, end, lock)
+        except Exception:
+            errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=_worker,
+                                args=(start, min(start + step, size) - 1))
+               for start in range(0, size, step)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        six.reraise(*errors[0])
+    os.lseek(fd, size, os.SEEK_SET)
+
+
+def _file_digest(path, digest):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+
+def download(url, image_file, digest=None):
+    """Download a file over HTTP to a file object.
+
+    Files of at least image_download_range_threshold MiB are split in
+    image_download_ranges ranges, downloaded at the same time and written
+    at their offset in the file, if the server supports range requests.
+    Other files are streamed through the write() method of the file object.
+
+    :param url: the URL of the file.
+    :param image_file: the file object to write to. It must have a file
+                       descriptor, and a name to be read back from if a
+                       digest is given and the file is downloaded in ranges.
+    :param digest: (Optional) a hashlib object to update with the data.
+    :raises: ImageDownloadFailed
+    """
+    size = None
+    ranges = CONF.image_download_ranges
+    if ranges > 1:
+        size = _ranged_size(url)
+    if size is None or size < CONF.image_download_range_threshold * 1048576:
+        _stream(url, image_file, digest)
+        return
+
+    LOG.debug("Downloading %(url)s in %(ranges)d ranges" %
+              {'url': url, 'ranges': ranges})
+    _download_ranges(url, image_file, size, ranges)
+    if digest is not None:
+        # NOTE: the ranges arrive out of order, the file has to be read
+        # back to compute its digest. It is most likely still cached.
+        _file_digest(image_file.name, digest)
@@ -64,3 +64,11 @@ POWER_ON = 'power on'
 POWER_OFF = 'power off'
 REBOOT = 'rebooting'
 SUSPEND = 'suspended'
+
+# States of an asynchronous operation on a node. An operation is QUEUED
+# when the API accepts it, RUNNING once a conductor picks it up, and
+# DONE or FAILED when the conductor has finished with it.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
@@ -49,6 +49,7 @@ from eventlet import greenpool
 
 from oslo.config import cfg
 from oslo import messaging
+import six
 
 from ironic.common import driver_factory
 from ironic.common import exception
@@ -113,6 +114,14 @@ conductor_opts = [
         cfg.IntOpt('workers_pool_size',
                    default=100,
                    help='The size of the workers greenthread pool.'),
+        cfg.IntOpt('operation_retention',
+                   default=86400,
+                   help='Time, in seconds, for which finished operations are '
+                        'kept in the database. 0 - unlimited.'),
+        cfg.IntOpt('purge_operations_interval',
+                   default=3600,
+                   help='Interval between purges of the finished operations '
+                        'older than operation_retention, in seconds.'),
 ]
 
 CONF = cfg.CONF
@@ -123,7 +132,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
     """Ironic Conductor manager main class."""
 
     # NOTE(rloo): This must be in sync with rpcapi.ConductorAPI's.
-    RPC_API_VERSION = '1.15'
+    RPC_API_VERSION = '1.18'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -225,7 +234,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
     @messaging.expected_exceptions(exception.InvalidParameterValue,
                                    exception.NoFreeConductorWorker,
                                    exception.NodeLocked)
-    def change_node_power_state(self, context, node_id, new_state):
+    def change_node_power_state(self, context, node_id, new_state,
+                                operation_id=None):
         """RPC method to encapsulate changes to a node's state.
 
         Perform actions such as power on, power off. The validation is
@@ -237,6 +247,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
         :param context: an admin context.
         :param node_id: the id or uuid of a node.
         :param new_state: the desired power state of the node.
+        :param operation_id: the uuid of an operation recording the
+                             progress and outcome of the power action.
         :raises: NoFreeConductorWorker when there is no free worker to start
                  async task.
 
@@ -245,10 +257,59 @@ class ConductorManager(periodic_task.PeriodicTasks):
                   "The desired new state is %(state)s."
                   % {'node': node_id, 'state': new_state})
 
-        with task_manager.acquire(context, node_id, shared=False) as task:
-            task.driver.power.validate(task)
-            task.spawn_after(self._spawn_worker, utils.node_power_action,
-                             task, new_state)
+        with utils.operation_failure_guard(context,
+                                           operation_id) as operation:
+            with task_manager.acquire(context, node_id, shared=False) as task:
+                task.driver.power.validate(task)
+                task.spawn_after(self._spawn_worker,
+                                 utils.track_operation(
+                                     operation, utils.node_power_action),
+                                 task, new_state)
+
+    def _for_each_node(self, method, context, node_ids, **kwargs):
+        """Call an RPC method for each of several nodes.
+
+        :returns: a dict mapping each of the node_ids to None if the call
+                  succeeded, or to the message of the error it raised.
+        """
+        results = {}
+        for node_id in node_ids:
+            try:
+                method(context, node_id, **kwargs)
+            except messaging.ExpectedException as e:
+                results[node_id] = six.text_type(e.exc_info[1])
+            except exception.IronicException as e:
+                results[node_id] = six.text_type(e)
+            except Exception as e:
+                # NOTE: an unexpected error must not prevent the other
+                #       nodes from being handled.
+                LOG.exception(_('Unexpected error while handling node '
+                                '%(node)s: %(err)s'),
+                              {'node': node_id, 'err': e})
+                results[node_id] = six.text_type(e)
+            else:
+                results[node_id] = None
+        return results
+
+    def change_nodes_power_state(self, context, node_ids, new_state):
+        """RPC method to change the power state of several nodes.
+
+        Does what change_node_power_state() does for each of the nodes in
+        turn. A failure for one node does not prevent the others from
+        being handled.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :param new_state: the desired power state of the nodes.
+        :returns: a dict mapping each of the node_ids to None if its power
+                  state change was started, or to an error message.
+
+        """
+        LOG.debug("RPC change_nodes_power_state called for %(count)d nodes. "
+                  "The desired new state is %(state)s."
+                  % {'count': len(node_ids), 'state': new_state})
+        return self._for_each_node(self.change_node_power_state, context,
+                                   node_ids, new_state=new_state)
 
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
                                    exception.NodeLocked,
@@ -286,9 +347,19 @@ class ConductorManager(periodic_task.PeriodicTasks):
             task.driver.vendor.validate(task, method=driver_method,
                                         **info)
             task.spawn_after(self._spawn_worker,
-                             task.driver.vendor.vendor_passthru, task,
+                             self._do_vendor_passthru, task,
                              method=driver_method, **info)
 
+    def _do_vendor_passthru(self, task, **kwargs):
+        """Run a vendor action, eg. the callback which continues a
+        deployment, then finish the provision operations of the node if
+        it settled.
+        """
+        try:
+            task.driver.vendor.vendor_passthru(task, **kwargs)
+        finally:
+            utils.finish_provision_operations(task)
+
     @messaging.expected_exceptions(exception.InvalidParameterValue,
                                    exception.UnsupportedDriverExtension,
                                    exception.DriverNotFound)
@@ -331,7 +402,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
                                    exception.NodeLocked,
                                    exception.NodeInMaintenance,
                                    exception.InstanceDeployFailure)
-    def do_node_deploy(self, context, node_id, rebuild=False):
+    def do_node_deploy(self, context, node_id, rebuild=False,
+                       operation_id=None):
         """RPC method to initiate deployment to a node.
 
         Initiate the deployment of a node. Validations are done
@@ -344,6 +416,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
                         recreate the instance on the same node, overwriting
                         all disk. The ephemeral partition, if it exists, can
                         optionally be preserved.
+        :param operation_id: the uuid of an operation recording the
+                             progress and outcome of the deployment.
         :raises: InstanceDeployFailure
         :raises: NodeInMaintenance if the node is in maintenance mode.
         :raises: NoFreeConductorWorker when there is no free worker to start
@@ -356,39 +430,61 @@ class ConductorManager(periodic_task.PeriodicTasks):
         # to have locked this node, we'll fail to acquire the lock. The
         # client should perhaps retry in this case unless we decide we
         # want to add retries or extra synchronization here.
-        with task_manager.acquire(context, node_id, shared=False) as task:
-            node = task.node
-            # May only rebuild a node in ACTIVE state
-            if rebuild and (node.provision_state != states.ACTIVE):
-                raise exception.InstanceDeployFailure(_(
-                    "RPC do_node_deploy called to rebuild %(node)s, but "
-                    "provision state is %(curstate)s. Must be %(state)s.") %
-                    {'node': node.uuid, 'curstate': node.provision_state,
-                     'state': states.ACTIVE})
-            elif node.provision_state != states.NOSTATE and not rebuild:
-                raise exception.InstanceDeployFailure(_(
-                    "RPC do_node_deploy called for %(node)s, but provision "
-                    "state is already %(state)s.") %
-                    {'node': node.uuid, 'state': node.provision_state})
-
-            if node.maintenance:
-                raise exception.NodeInMaintenance(op=_('provisioning'),
-                                                  node=node.uuid)
+        with utils.operation_failure_guard(context, operation_id):
+            with task_manager.acquire(context, node_id, shared=False) as task:
+                node = task.node
+                # May only rebuild a node in ACTIVE state
+                if rebuild and (node.provision_state != states.ACTIVE):
+                    raise exception.InstanceDeployFailure(_(
+                        "RPC do_node_deploy called to rebuild %(node)s, but "
+                        "provision state is %(curstate)s. Must be "
+                        "%(state)s.") %
+                        {'node': node.uuid, 'curstate': node.provision_state,
+                         'state': states.ACTIVE})
+                elif node.provision_state != states.NOSTATE and not rebuild:
+                    raise exception.InstanceDeployFailure(_(
+                        "RPC do_node_deploy called for %(node)s, but "
+                        "provision state is already %(state)s.") %
+                        {'node': node.uuid, 'state': node.provision_state})
+
+                if node.maintenance:
+                    raise exception.NodeInMaintenance(op=_('provisioning'),
+                                                      node=node.uuid)
+
+                try:
+                    task.driver.deploy.validate(task)
+                except exception.InvalidParameterValue as e:
+                    raise exception.InstanceDeployFailure(_(
+                        "RPC do_node_deploy failed to validate deploy info. "
+                        "Error: %(msg)s") % {'msg': e})
+
+                # Set target state to expose that work is in progress
+                node.provision_state = states.DEPLOYING
+                node.target_provision_state = states.DEPLOYDONE
+                node.last_error = None
+                node.save(context)
+                # NOTE: the operation is finished once the node settles,
+                #       which may be after the worker returned.
+                task.spawn_after(self._spawn_worker, self._do_node_deploy,
+                                 context, task)
 
-            try:
-                task.driver.deploy.validate(task)
-            except exception.InvalidParameterValue as e:
-                raise exception.InstanceDeployFailure(_(
-                    "RPC do_node_deploy failed to validate deploy info. "
-                    "Error: %(msg)s") % {'msg': e})
-
-            # Set target state to expose that work is in progress
-            node.provision_state = states.DEPLOYING
-            node.target_provision_state = states.DEPLOYDONE
-            node.last_error = None
-            node.save(context)
-            task.spawn_after(self._spawn_worker, self._do_node_deploy,
-                             context, task)
+    def do_nodes_deploy(self, context, node_ids, rebuild=False):
+        """RPC method to initiate deployment to several nodes.
+
+        Does what do_node_deploy() does for each of the nodes in turn. A
+        failure for one node does not prevent the others from being
+        handled.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :param rebuild: True if this is a rebuild request.
+        :returns: a dict mapping each of the node_ids to None if its
+                  deployment was started, or to an error message.
+
+        """
+        LOG.debug("RPC do_nodes_deploy called for %d nodes." % len(node_ids))
+        return self._for_each_node(self.do_node_deploy, context, node_ids,
+                                   rebuild=rebuild)
 
     def _do_node_deploy(self, context, task):
         """Prepare the environment and deploy a node."""
@@ -413,11 +509,12 @@ class ConductorManager(periodic_task.PeriodicTasks):
                 node.provision_state = new_state
         finally:
             node.save(context)
+            utils.finish_provision_operations(task)
 
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
                                    exception.NodeLocked,
                                    exception.InstanceDeployFailure)
-    def do_node_tear_down(self, context, node_id):
+    def do_node_tear_down(self, context, node_id, operation_id=None):
         """RPC method to tear down an existing node deployment.
 
         Validate driver specific information synchronously, and then
@@ -425,6 +522,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
         :param context: an admin context.
         :param node_id: the id or uuid of a node.
+        :param operation_id: the uuid of an operation recording the
+                             progress and outcome of the tear down.
         :raises: InstanceDeployFailure
         :raises: NoFreeConductorWorker when there is no free worker to start
                  async task
@@ -432,30 +531,50 @@ class ConductorManager(periodic_task.PeriodicTasks):
         """
         LOG.debug("RPC do_node_tear_down called for node %s." % node_id)
 
-        with task_manager.acquire(context, node_id, shared=False) as task:
-            node = task.node
-            if node.provision_state not in [states.ACTIVE,
-                                            states.DEPLOYFAIL,
-                                            states.ERROR,
-                                            states.DEPLOYWAIT]:
-                raise exception.InstanceDeployFailure(_(
-                    "RPC do_node_tear_down "
-                    "not allowed for node %(node)s in state %(state)s")
-                    % {'node': node_id, 'state': node.provision_state})
+        with utils.operation_failure_guard(context, operation_id):
+            with task_manager.acquire(context, node_id, shared=False) as task:
+                node = task.node
+                if node.provision_state not in [states.ACTIVE,
+                                                states.DEPLOYFAIL,
+                                                states.ERROR,
+                                                states.DEPLOYWAIT]:
+                    raise exception.InstanceDeployFailure(_(
+                        "RPC do_node_tear_down "
+                        "not allowed for node %(node)s in state %(state)s")
+                        % {'node': node_id, 'state': node.provision_state})
+
+                try:
+                    task.driver.deploy.validate(task)
+                except exception.InvalidParameterValue as e:
+                    raise exception.InstanceDeployFailure(_(
+                        "RPC do_node_tear_down failed to validate deploy "
+                        "info. Error: %(msg)s") % {'msg': e})
+
+                node.provision_state = states.DELETING
+                node.target_provision_state = states.DELETED
+                node.last_error = None
+                node.save(context)
+                # NOTE: the operation is finished once the node settles,
+                #       which may be after the worker returned.
+                task.spawn_after(self._spawn_worker, self._do_node_tear_down,
+                                 context, task)
 
-            try:
-                task.driver.deploy.validate(task)
-            except exception.InvalidParameterValue as e:
-                raise exception.InstanceDeployFailure(_(
-                    "RPC do_node_tear_down failed to validate deploy info. "
-                    "Error: %(msg)s") % {'msg': e})
-
-            node.provision_state = states.DELETING
-            node.target_provision_state = states.DELETED
-            node.last_error = None
-            node.save(context)
-            task.spawn_after(self._spawn_worker, self._do_node_tear_down,
-                             context, task)
+    def do_nodes_tear_down(self, context, node_ids):
+        """RPC method to tear down several existing node deployments.
+
+        Does what do_node_tear_down() does for each of the nodes in turn.
+        A failure for one node does not prevent the others from being
+        handled.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :returns: a dict mapping each of the node_ids to None if its tear
+                  down was started, or to an error message.
+
+        """
+        LOG.debug("RPC do_nodes_tear_down called for %d nodes."
+                  % len(node_ids))
+        return self._for_each_node(self.do_node_tear_down, context, node_ids)
 
     def _do_node_tear_down(self, context, task):
         """Internal RPC method to tear down an existing node deployment."""
@@ -482,6 +601,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
             # Clean the instance_info
             node.instance_info = {}
             node.save(context)
+            utils.finish_provision_operations(task)
 
     def _conductor_service_record_keepalive(self):
         while not self._keepalive_evt.is_set():
@@ -647,6 +767,17 @@ class ConductorManager(periodic_task.PeriodicTasks):
                 # Yield on every iteration
                 eventlet.sleep(0)
 
+    @periodic_task.periodic_task(
+            spacing=CONF.conductor.purge_operations_interval)
+    def _purge_operations(self, context):
+        retention = CONF.conductor.operation_retention
+        if not retention:
+            return
+
+        count = self.dbapi.purge_operations(retention)
+        if count:
+            LOG.debug('Purged %d finished operations.' % count)
+
     @periodic_task.periodic_task(
             spacing=CONF.conductor.check_provision_state_interval)
     def _check_deploy_timeouts(self, context):
@@ -853,7 +984,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
                                    exception.NodeLocked,
                                    exception.UnsupportedDriverExtension,
                                    exception.InvalidParameterValue)
-    def set_console_mode(self, context, node_id, enabled):
+    def set_console_mode(self, context, node_id, enabled, operation_id=None):
         """Enable/Disable the console.
 
         Validate driver specific information synchronously, and then
@@ -863,6 +994,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
         :param node_id: node id or uuid.
         :param enabled: Boolean value; whether the console is enabled or
                         disabled.
+        :param operation_id: the uuid of an operation recording the
+                             progress and outcome of the console change.
         :raises: UnsupportedDriverExtension if the node's driver doesn't
                  support console.
         :raises: InvalidParameterValue when the wrong driver info is specified.
@@ -873,24 +1006,29 @@ class ConductorManager(periodic_task.PeriodicTasks):
                   'enabled %(enabled)s' % {'node': node_id,
                                            'enabled': enabled})
 
-        with task_manager.acquire(context, node_id, shared=False) as task:
-            node = task.node
-            if not getattr(task.driver, 'console', None):
-                raise exception.UnsupportedDriverExtension(driver=node.driver,
-                                                           extension='console')
-
-            task.driver.console.validate(task)
-
-            if enabled == node.console_enabled:
-                op = _('enabled') if enabled else _('disabled')
-                LOG.info(_("No console action was triggered because the "
-                           "console is already %s") % op)
-                task.release_resources()
-            else:
-                node.last_error = None
-                node.save(context)
-                task.spawn_after(self._spawn_worker,
-                                 self._set_console_mode, task, enabled)
+        with utils.operation_failure_guard(context,
+                                           operation_id) as operation:
+            with task_manager.acquire(context, node_id, shared=False) as task:
+                node = task.node
+                if not getattr(task.driver, 'console', None):
+                    raise exception.UnsupportedDriverExtension(
+                            driver=node.driver, extension='console')
+
+                task.driver.console.validate(task)
+
+                if enabled == node.console_enabled:
+                    op = _('enabled') if enabled else _('disabled')
+                    LOG.info(_("No console action was triggered because the "
+                               "console is already %s") % op)
+                    task.release_resources()
+                    utils.finish_operation(operation)
+                else:
+                    node.last_error = None
+                    node.save(context)
+                    task.spawn_after(self._spawn_worker,
+                                     utils.track_operation(
+                                         operation, self._set_console_mode),
+                                     task, enabled)
 
     def _set_console_mode(self, task, enabled):
         """Internal method to set console mode on a node."""
@@ -914,6 +1052,27 @@ class ConductorManager(periodic_task.PeriodicTasks):
         finally:
             node.save(task.context)
 
+    def _update_port_address(self, context, node, port_obj):
+        """Update the MAC address of the Neutron port of a port.
+
+        Does nothing if the address of the port is unchanged.
+
+        :raises: FailedToUpdateMacOnPort if updating Neutron failed.
+        """
+        if 'address' not in port_obj.obj_what_changed():
+            return
+        vif = port_obj.extra.get('vif_port_id')
+        if vif:
+            api = neutron.NeutronAPI(context)
+            api.update_port_address(vif, port_obj.address)
+        # Log warning if there is no vif_port_id and an instance
+        # is associated with the node.
+        elif node.instance_uuid:
+            LOG.warning(_("No VIF found for instance %(instance)s "
+                "port %(port)s when attempting to update Neutron "
+                "port MAC address."),
+                {'port': port_obj.uuid, 'instance': node.instance_uuid})
+
     @messaging.expected_exceptions(exception.NodeLocked,
                                    exception.FailedToUpdateMacOnPort)
     def update_port(self, context, port_obj):
@@ -928,20 +1087,42 @@ class ConductorManager(periodic_task.PeriodicTasks):
         LOG.debug("RPC update_port called for port %s.", port_uuid)
 
         with task_manager.acquire(context, port_obj.node_id) as task:
-            node = task.node
-            if 'address' in port_obj.obj_what_changed():
-                vif = port_obj.extra.get('vif_port_id')
-                if vif:
-                    api = neutron.NeutronAPI(context)
-                    api.update_port_address(vif, port_obj.address)
-                # Log warning if there is no vif_port_id and an instance
-                # is associated with the node.
-                elif node.instance_uuid:
-                    LOG.warning(_("No VIF found for instance %(instance)s "
-                        "port %(port)s when attempting to update Neutron "
-                        "port MAC address."),
-                        {'port': port_uuid, 'instance': node.instance_uuid})
-
+            self._update_port_address(context, task.node, port_obj)
             port_obj.save(context)
 
             return port_obj
+
+    @messaging.expected_exceptions(exception.NodeLocked,
+                                   exception.FailedToUpdateMacOnPort,
+                                   exception.InvalidParameterValue,
+                                   exception.MACAlreadyExists,
+                                   exception.PortNotFound)
+    def update_ports(self, context, port_objs):
+        """Update several ports of a node, in a single transaction.
+
+        :param context: request context.
+        :param port_objs: a list of changed (but not saved) port objects,
+                          which all belong to the same node.
+        :raises: InvalidParameterValue if the ports do not all belong to
+                 the same node.
+        :raises: FailedToUpdateMacOnPort if a MAC address changed and
+                 update Neutron failed.
+        :raises: MACAlreadyExists if a MAC address is already in use.
+        :raises: PortNotFound if a port was deleted meanwhile.
+        :returns: the list of updated port objects.
+        """
+        node_ids = set(p.node_id for p in port_objs)
+        if len(node_ids) != 1:
+            raise exception.InvalidParameterValue(
+                    _("The ports must all belong to the same node."))
+        LOG.debug("RPC update_ports called for %d ports.", len(port_objs))
+
+        with task_manager.acquire(context, node_ids.pop()) as task:
+            for port_obj in port_objs:
+                self._update_port_address(context, task.node, port_obj)
+            self.dbapi.update_ports(dict((p.uuid, p.obj_get_changes())
+                                         for p in port_objs))
+            for port_obj in port_objs:
+                port_obj.obj_reset_changes()
+
+            return port_objs
@@ -53,11 +53,16 @@ class ConductorAPI(object):
         1.13 - Added update_port.
         1.14 - Added driver_vendor_passthru.
         1.15 - Added rebuild parameter to do_node_deploy.
+        1.16 - Added change_nodes_power_state, do_nodes_deploy and
+               do_nodes_tear_down.
+        1.17 - Added operation_id parameter to change_node_power_state,
+               do_node_deploy, do_node_tear_down and set_console_mode.
+        1.18 - Added update_ports.
 
     """
 
     # NOTE(rloo): This must be in sync with manager.ConductorManager's.
-    RPC_API_VERSION = '1.15'
+    RPC_API_VERSION = '1.18'
 
     def __init__(self, topic=None):
         super(ConductorAPI, self).__init__()
@@ -96,12 +101,22 @@ class ConductorAPI(object):
         supports the specified driver. A conductor is selected at
         random from the set of qualified conductors.
 
+        The conductors come from the hash ring manager shared by the
+        process, which is reloaded if it does not know the driver.
+
         :param driver_name: the name of the driver to route to.
         :returns: an RPC topic string.
         :raises: DriverNotFound
 
         """
-        hash_ring = self.ring_manager.get_hash_ring(driver_name)
+        ring_manager = hash.get_shared_ring_manager()
+        try:
+            hash_ring = ring_manager.get_hash_ring(driver_name)
+        except exception.DriverNotFound:
+            # NOTE: the driver may be supported by a conductor which
+            # registered after the rings were loaded.
+            ring_manager.reset()
+            hash_ring = ring_manager.get_hash_ring(driver_name)
         host = random.choice(hash_ring.hosts)
         return self.topic + "." + host
 
@@ -126,7 +141,8 @@ class ConductorAPI(object):
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.1')
         return cctxt.call(context, 'update_node', node_obj=node_obj)
 
-    def change_node_power_state(self, context, node_id, new_state, topic=None):
+    def change_node_power_state(self, context, node_id, new_state, topic=None,
+                                operation_id=None):
         """Synchronously, acquire lock and start the conductor background task
         to change power state of a node.
 
@@ -134,14 +150,43 @@ class ConductorAPI(object):
         :param node_id: node id or uuid.
         :param new_state: one of ironic.common.states power state values
         :param topic: RPC topic. Defaults to self.topic.
+        :param operation_id: the uuid of an operation to record the
+                             progress and outcome of the background task
+                             in.
         :raises: NoFreeConductorWorker when there is no free worker to start
                  async task.
 
         """
+        if operation_id is not None:
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.17')
+            return cctxt.call(context, 'change_node_power_state',
+                              node_id=node_id, new_state=new_state,
+                              operation_id=operation_id)
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.6')
         return cctxt.call(context, 'change_node_power_state', node_id=node_id,
                           new_state=new_state)
 
+    def change_nodes_power_state(self, context, node_ids, new_state,
+                                 topic=None):
+        """Synchronously, start changing the power state of several nodes.
+
+        This does what change_node_power_state does for each of the nodes,
+        with a single RPC call. The nodes should all be mapped to the
+        conductor service which topic is sent to.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids.
+        :param new_state: one of ironic.common.states power state values
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dict mapping each of the node_ids to None if its power
+                  state change was started, or to an error message.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.16')
+        return cctxt.call(context, 'change_nodes_power_state',
+                          node_ids=node_ids, new_state=new_state)
+
     def vendor_passthru(self, context, node_id, driver_method, info,
                         topic=None):
         """Synchronously, acquire lock, validate given parameters and start
@@ -179,18 +224,31 @@ class ConductorAPI(object):
 
         """
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.14')
-        return cctxt.call(context, 'driver_vendor_passthru',
-                          driver_name=driver_name,
-                          driver_method=driver_method,
-                          info=info)
-
-    def do_node_deploy(self, context, node_id, rebuild, topic=None):
-        """Signal to conductor service to perform a deployment.
+        try:
+            return cctxt.call(context, 'driver_vendor_passthru',
+                              driver_name=driver_name,
+                              driver_method=driver_method,
+                              info=info)
+        except messaging.MessagingTimeout:
+            # NOTE: the conductor routed to by get_topic_for_driver() may be
+            # gone, route the next calls with the current conductors.
+            hash.get_shared_ring_manager().reset()
+            raise
+
+    def do_node_deploy(self, context, node_id, rebuild, topic=None,
+                       operation_id=None):
+        """Synchronously, have a conductor start a deployment.
+
+        The call returns once the conductor has checked the request and
+        started the deployment in a background task.
 
         :param context: request context.
         :param node_id: node id or uuid.
         :param rebuild: True if this is a rebuild request.
         :param topic: RPC topic. Defaults to self.topic.
+        :param operation_id: the uuid of an operation to record the
+                             progress and outcome of the background task
+                             in.
         :raises: InstanceDeployFailure
         :raises: InvalidParameterValue if validation fails
         :raises: NoFreeConductorWorker when there is no free worker to start
@@ -200,16 +258,28 @@ class ConductorAPI(object):
         undeployed state before this method is called.
 
         """
+        if operation_id is not None:
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.17')
+            return cctxt.call(context, 'do_node_deploy', node_id=node_id,
+                              rebuild=rebuild, operation_id=operation_id)
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.15')
         return cctxt.call(context, 'do_node_deploy', node_id=node_id,
                           rebuild=rebuild)
 
-    def do_node_tear_down(self, context, node_id, topic=None):
-        """Signal to conductor service to tear down a deployment.
+    def do_node_tear_down(self, context, node_id, topic=None,
+                          operation_id=None):
+        """Synchronously, have a conductor start tearing down a deployment.
+
+        The call returns once the conductor has checked the request and
+        started the tear down in a background task.
 
         :param context: request context.
         :param node_id: node id or uuid.
         :param topic: RPC topic. Defaults to self.topic.
+        :param operation_id: the uuid of an operation to record the
+                             progress and outcome of the background task
+                             in.
         :raises: InstanceDeployFailure
         :raises: InvalidParameterValue if validation fails
         :raises: NoFreeConductorWorker when there is no free worker to start
@@ -219,9 +289,50 @@ class ConductorAPI(object):
         deployed state before this method is called.
 
         """
+        if operation_id is not None:
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.17')
+            return cctxt.call(context, 'do_node_tear_down', node_id=node_id,
+                              operation_id=operation_id)
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.6')
         return cctxt.call(context, 'do_node_tear_down', node_id=node_id)
 
+    def do_nodes_deploy(self, context, node_ids, rebuild, topic=None):
+        """Signal to conductor service to deploy several nodes.
+
+        This does what do_node_deploy does for each of the nodes, with a
+        single RPC call. The nodes should all be mapped to the conductor
+        service which topic is sent to.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids.
+        :param rebuild: True if this is a rebuild request.
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dict mapping each of the node_ids to None if its
+                  deployment was started, or to an error message.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.16')
+        return cctxt.call(context, 'do_nodes_deploy', node_ids=node_ids,
+                          rebuild=rebuild)
+
+    def do_nodes_tear_down(self, context, node_ids, topic=None):
+        """Signal to conductor service to tear down several deployments.
+
+        This does what do_node_tear_down does for each of the nodes, with
+        a single RPC call. The nodes should all be mapped to the conductor
+        service which topic is sent to.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids.
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dict mapping each of the node_ids to None if its tear
+                  down was started, or to an error message.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.16')
+        return cctxt.call(context, 'do_nodes_tear_down', node_ids=node_ids)
+
     def validate_driver_interfaces(self, context, node_id, topic=None):
         """Validate the `core` and `standardized` interfaces for drivers.
 
@@ -278,20 +389,32 @@ class ConductorAPI(object):
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.11')
         return cctxt.call(context, 'get_console_information', node_id=node_id)
 
-    def set_console_mode(self, context, node_id, enabled, topic=None):
-        """Enable/Disable the console.
+    def set_console_mode(self, context, node_id, enabled, topic=None,
+                         operation_id=None):
+        """Synchronously, have a conductor enable/disable the console.
+
+        The call returns once the conductor has checked the request and
+        started changing the console mode in a background task.
 
         :param context: request context.
         :param node_id: node id or uuid.
         :param topic: RPC topic. Defaults to self.topic.
         :param enabled: Boolean value; whether the console is enabled or
                         disabled.
+        :param operation_id: the uuid of an operation to record the
+                             progress and outcome of the background task
+                             in.
         :raises: UnsupportedDriverExtension if the node's driver doesn't
                  support console.
         :raises: InvalidParameterValue when the wrong driver info is specified.
         :raises: NoFreeConductorWorker when there is no free worker to start
                  async task.
         """
+        if operation_id is not None:
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.17')
+            return cctxt.call(context, 'set_console_mode', node_id=node_id,
+                              enabled=enabled, operation_id=operation_id)
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.11')
         return cctxt.call(context, 'set_console_mode', node_id=node_id,
                           enabled=enabled)
@@ -311,3 +434,19 @@ class ConductorAPI(object):
         """
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.13')
         return cctxt.call(context, 'update_port', port_obj=port_obj)
+
+    def update_ports(self, context, port_objs, topic=None):
+        """Synchronously, have a conductor update several ports of a node.
+
+        The ports are updated in a single transaction, under a single lock
+        of their node.
+
+        :param context: request context.
+        :param port_objs: a list of changed (but not saved) port objects,
+                          which all belong to the same node.
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a list of the updated port objects, including all fields.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.18')
+        return cctxt.call(context, 'update_ports', port_objs=port_objs)
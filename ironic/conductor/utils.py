@@ -12,11 +12,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
+import six
+
 from ironic.common import exception
 from ironic.common import states
 from ironic.conductor import task_manager
+from ironic.db import api as dbapi
+from ironic import objects
 from ironic.openstack.common import excutils
 from ironic.openstack.common import log
+from ironic.openstack.common import timeutils
 
 LOG = log.getLogger(__name__)
 
@@ -149,3 +156,135 @@ def cleanup_after_timeout(task):
                             'encountered while aborting. More info may be '
                             'found in the log file.')
         node.save(context)
+    finally:
+        finish_provision_operations(task)
+
+
+def start_operation(context, operation_id):
+    """Mark an operation as running.
+
+    :param context: request context.
+    :param operation_id: the uuid of an operation, or None.
+    :returns: the Operation object, or None if operation_id is None.
+    """
+    if operation_id is None:
+        return None
+    operation = objects.Operation.get_by_uuid(context, operation_id)
+    operation.state = states.RUNNING
+    operation.started_at = timeutils.utcnow()
+    operation.save()
+    return operation
+
+
+def finish_operation(operation, error=None):
+    """Mark an operation as done, or as failed if an error is given.
+
+    :param operation: an Operation object, or None.
+    :param error: the exception which made the operation fail.
+    """
+    if operation is None:
+        return
+    operation.state = states.FAILED if error else states.DONE
+    operation.error = six.text_type(error) if error else None
+    operation.finished_at = timeutils.utcnow()
+    operation.save()
+
+
+def _fail_operation(context, operation_id, operation, error):
+    """Mark an operation as failed, logging rather than raising on error.
+
+    :param context: request context.
+    :param operation_id: the uuid of an operation, or None.
+    :param operation: the Operation object, or None if it was not loaded.
+    :param error: the exception which made the operation fail.
+    """
+    if operation_id is None:
+        return
+    try:
+        if operation is None:
+            operation = objects.Operation.get_by_uuid(context, operation_id)
+        finish_operation(operation, error=error)
+    except Exception:
+        LOG.exception(_('Failed to mark operation %s as failed.')
+                      % operation_id)
+
+
+@contextlib.contextmanager
+def operation_failure_guard(context, operation_id):
+    """Start an operation, marking it as failed if the enclosed code raises.
+
+    The operation is started inside the guard, so that it is marked as
+    failed if starting it raises too. The exception is re-raised.
+
+    :param context: request context.
+    :param operation_id: the uuid of an operation, or None.
+    :returns: the started Operation object, or None if operation_id is None.
+    """
+    operation = None
+    try:
+        operation = start_operation(context, operation_id)
+        yield operation
+    except Exception as e:
+        with excutils.save_and_reraise_exception():
+            _fail_operation(context, operation_id, operation, e)
+
+
+# The provision states a node settles in when a deployment or a tear down
+# ends, successfully or not.
+_PROVISION_SETTLED_STATES = (states.ACTIVE, states.NOSTATE,
+                             states.DEPLOYFAIL, states.ERROR)
+
+
+def finish_provision_operations(task):
+    """Finish the running provision operations of a node which settled.
+
+    A deployment may go on after its worker returned, eg. while the
+    driver waits for a callback from the deploy ramdisk, so provision
+    operations are finished when the node reaches a settled provision
+    state rather than when a worker returns. They are done if the node
+    reached the state they asked for, failed otherwise.
+
+    :param task: a TaskManager instance.
+    """
+    node = task.node
+    if node.provision_state not in _PROVISION_SETTLED_STATES:
+        return
+    db_operations = dbapi.get_instance().get_operation_list(
+            filters={'node_id': node.id, 'action': 'provision',
+                     'state': states.RUNNING})
+    for db_operation in db_operations:
+        operation = objects.Operation.get_by_uuid(task.context,
+                                                  db_operation.uuid)
+        if operation.target == states.DELETED:
+            expected_state = states.NOSTATE
+        else:
+            expected_state = states.ACTIVE
+        error = None
+        if node.provision_state != expected_state:
+            error = node.last_error or (
+                _('Node %(node)s ended in provision state %(state)s.')
+                % {'node': node.uuid, 'state': node.provision_state})
+        finish_operation(operation, error=error)
+
+
+def track_operation(operation, func):
+    """Wrap a function so that its outcome is recorded in an operation.
+
+    :param operation: an Operation object, or None.
+    :param func: the function which completes the operation, usually in
+                 a worker thread.
+    :returns: a function marking the operation as done when func returns,
+              or as failed if it raises; func itself if operation is None.
+    """
+    if operation is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            with excutils.save_and_reraise_exception():
+                finish_operation(operation, error=e)
+        finish_operation(operation)
+        return result
+    return wrapper
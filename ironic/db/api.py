@@ -60,9 +60,19 @@ class Connection(object):
                         'maintenance': True | False
                         'chassis_uuid': uuid of chassis
                         'driver': driver's name
+                        'power_state': power state of node
                         'provision_state': provision state of node
+                        'updated_since': nodes created or updated at or
+                         after this datetime
+                        'min_cpus': nodes with at least this many CPUs
+                        'min_memory_mb': nodes with at least this much RAM
+                        'min_local_gb': nodes with at least this much disk
+                        'cpu_arch': CPU architecture of node
                         'provisioned_before': nodes with provision_updated_at
                          field before this interval in seconds
+                        'uuid': uuid of node
+                        'uuids': list of uuids of nodes
+                        'instance_uuid': uuid of instance
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
@@ -83,9 +93,19 @@ class Connection(object):
                         'maintenance': True | False
                         'chassis_uuid': uuid of chassis
                         'driver': driver's name
+                        'power_state': power state of node
                         'provision_state': provision state of node
+                        'updated_since': nodes created or updated at or
+                         after this datetime
+                        'min_cpus': nodes with at least this many CPUs
+                        'min_memory_mb': nodes with at least this much RAM
+                        'min_local_gb': nodes with at least this much disk
+                        'cpu_arch': CPU architecture of node
                         'provisioned_before': nodes with provision_updated_at
                          field before this interval in seconds
+                        'uuid': uuid of node
+                        'uuids': list of uuids of nodes
+                        'instance_uuid': uuid of instance
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
@@ -94,6 +114,39 @@ class Connection(object):
                          (asc, desc)
         """
 
+    @abc.abstractmethod
+    def get_node_iter(self, filters=None, sort_key=None, sort_dir=None,
+                      batch_size=100):
+        """Return an iterator over all the nodes that match the filters.
+
+        Nodes are fetched from the database batch_size rows at a time, so
+        the memory used does not grow with the number of matching nodes.
+
+        :param filters: Filters to apply, as for get_node_list().
+        :param sort_key: Attribute by which results should be sorted.
+        :param sort_dir: direction in which results should be sorted.
+                         (asc, desc)
+        :param batch_size: Number of rows to fetch at a time.
+        """
+
+    @abc.abstractmethod
+    def get_node_digest(self, filters=None):
+        """Return a cheap summary of the nodes that match the filters.
+
+        The summary changes whenever a matching node is created, updated
+        or deleted, so it can be used to validate cached representations
+        without loading the nodes themselves.
+
+        :param filters: Filters to apply. Defaults to None. Accepts the
+                        same filters as get_node_list().
+        :returns: A tuple of (count, last_modified, ids, generations) where
+                  last_modified is the most recent updated_at (or
+                  created_at, if never updated) timestamp of the matching
+                  nodes, and ids and generations the sums of their ids and
+                  of their generations, which change on every update. All
+                  but count are None if nothing matches.
+        """
+
     @abc.abstractmethod
     def reserve_node(self, tag, node_id):
         """Reserve a node.
@@ -165,6 +218,14 @@ class Connection(object):
         :returns: A node.
         """
 
+    @abc.abstractmethod
+    def get_node_uuids(self, node_ids):
+        """Return the uuids of several nodes at once.
+
+        :param node_ids: A list of node ids.
+        :returns: A dict mapping each id of an existing node to its uuid.
+        """
+
     @abc.abstractmethod
     def destroy_node(self, node_id):
         """Destroy a node and all associated interfaces.
@@ -209,6 +270,27 @@ class Connection(object):
         :returns: A port.
         """
 
+    @abc.abstractmethod
+    def get_portinfo_list(self, columns=None, filters=None, limit=None,
+                          marker=None, sort_key=None, sort_dir=None):
+        """Return a list of the specified columns for all ports that match
+        the specified filters.
+
+        :param columns: List of column names to return.
+                        Defaults to 'id' column when columns == None.
+        :param filters: Filters to apply. Defaults to None.
+                        'uuid': uuid of port
+                        'address': MAC address of port
+                        'node_id': integer id of the node
+        :param limit: Maximum number of ports to return.
+        :param marker: the last item of the previous page; we return the next
+                       result set.
+        :param sort_key: Attribute by which results should be sorted.
+        :param sort_dir: direction in which results should be sorted.
+                         (asc, desc)
+        :returns: A list of tuples of the specified columns.
+        """
+
     @abc.abstractmethod
     def get_port_list(self, limit=None, marker=None,
                       sort_key=None, sort_dir=None):
@@ -237,6 +319,40 @@ class Connection(object):
         :returns: A list of ports.
         """
 
+    @abc.abstractmethod
+    def get_port_iter(self, filters=None, sort_key=None, sort_dir=None,
+                      batch_size=100):
+        """Return an iterator over all the ports that match the filters.
+
+        Ports are fetched from the database batch_size rows at a time, so
+        the memory used does not grow with the number of matching ports.
+
+        :param filters: Filters to apply. Defaults to None.
+                        'uuid': uuid of port
+                        'address': MAC address of port
+                        'node_id': integer id of the node
+        :param sort_key: Attribute by which results should be sorted.
+        :param sort_dir: direction in which results should be sorted.
+                         (asc, desc)
+        :param batch_size: Number of rows to fetch at a time.
+        """
+
+    @abc.abstractmethod
+    def get_port_digest(self, filters=None):
+        """Return a cheap summary of the ports that match the filters.
+
+        :param filters: Filters to apply. Defaults to None.
+                        'uuid': uuid of port
+                        'address': MAC address of port
+                        'node_id': integer id of the node
+        :returns: A tuple of (count, last_modified, ids, generations) where
+                  last_modified is the most recent updated_at (or
+                  created_at, if never updated) timestamp of the matching
+                  ports, and ids and generations the sums of their ids and
+                  of their generations, which change on every update. All
+                  but count are None if nothing matches.
+        """
+
     @abc.abstractmethod
     def create_port(self, values):
         """Create a new port.
@@ -253,6 +369,17 @@ class Connection(object):
         :returns: A port.
         """
 
+    @abc.abstractmethod
+    def update_ports(self, updates):
+        """Update properties of several ports, in a single transaction.
+
+        Either all the ports are updated, or none is.
+
+        :param updates: Dict mapping the id, uuid or MAC of each port to
+                        a dict of values to update.
+        :returns: A list of the ports.
+        """
+
     @abc.abstractmethod
     def destroy_port(self, port_id):
         """Destroy an port.
@@ -288,6 +415,28 @@ class Connection(object):
                          (asc, desc)
         """
 
+    @abc.abstractmethod
+    def get_chassis_uuids(self, chassis_ids):
+        """Return the uuids of several chassis at once.
+
+        :param chassis_ids: A list of chassis ids.
+        :returns: A dict mapping each id of an existing chassis to its uuid.
+        """
+
+    @abc.abstractmethod
+    def get_chassis_digest(self, filters=None):
+        """Return a cheap summary of the chassis that match the filters.
+
+        :param filters: Filters to apply. Defaults to None.
+                        'uuid': uuid of chassis
+        :returns: A tuple of (count, last_modified, ids, generations) where
+                  last_modified is the most recent updated_at (or
+                  created_at, if never updated) timestamp of the matching
+                  chassis, and ids and generations the sums of their ids and
+                  of their generations, which change on every update. All
+                  but count are None if nothing matches.
+        """
+
     @abc.abstractmethod
     def update_chassis(self, chassis_id, values):
         """Update properties of an chassis.
@@ -304,6 +453,58 @@ class Connection(object):
         :param chassis_id: The id or the uuid of a chassis.
         """
 
+    @abc.abstractmethod
+    def create_operation(self, values):
+        """Create a new operation.
+
+        :param values: Dict of values.
+        :returns: An operation.
+        """
+
+    @abc.abstractmethod
+    def get_operation(self, operation_id):
+        """Return an operation.
+
+        :param operation_id: The id or the UUID of an operation.
+        :returns: An operation.
+        """
+
+    @abc.abstractmethod
+    def get_operation_list(self, filters=None, limit=None, marker=None,
+                           sort_key=None, sort_dir=None):
+        """Return a list of operations.
+
+        :param filters: Filters to apply. Defaults to None.
+                        'node_id': id of the node acted upon
+                        'action': 'power', 'provision' or 'console'
+                        'state': state of the operation
+        :param limit: Maximum number of operations to return.
+        :param marker: the last item of the previous page; we return the next
+                       result set.
+        :param sort_key: Attribute by which results should be sorted.
+        :param sort_dir: direction in which results should be sorted.
+                         (asc, desc)
+        """
+
+    @abc.abstractmethod
+    def update_operation(self, operation_id, values):
+        """Update properties of an operation.
+
+        :param operation_id: The id or the uuid of an operation.
+        :param values: Dict of values to update.
+        :returns: An operation.
+        """
+
+    @abc.abstractmethod
+    def purge_operations(self, finished_before):
+        """Delete the operations which finished some time ago.
+
+        :param finished_before: Delete the operations which are done or
+                                failed and finished more than this many
+                                seconds ago.
+        :returns: The number of deleted operations.
+        """
+
     @abc.abstractmethod
     def register_conductor(self, values):
         """Register a new conductor service at the specified hostname.
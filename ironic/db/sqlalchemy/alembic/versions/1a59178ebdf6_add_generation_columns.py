@@ -0,0 +1,40 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add generation columns to chassis, nodes and ports
+
+Revision ID: 1a59178ebdf6
+Revises: 3e6395449cee
+Create Date: 2014-07-16 10:12:45.318706
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1a59178ebdf6'
+down_revision = '3e6395449cee'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+_TABLES = ('chassis', 'nodes', 'ports')
+
+
+def upgrade():
+    for table in _TABLES:
+        op.add_column(table, sa.Column('generation', sa.Integer(),
+                                       nullable=True, server_default='0'))
+
+
+def downgrade():
+    for table in _TABLES:
+        op.drop_column(table, 'generation')
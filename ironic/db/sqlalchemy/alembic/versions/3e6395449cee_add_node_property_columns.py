@@ -0,0 +1,75 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add indexed node property columns
+
+Revision ID: 3e6395449cee
+Revises: 4f399b21ae71
+Create Date: 2014-07-09 14:27:03.906417
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3e6395449cee'
+down_revision = '4f399b21ae71'
+
+import json
+
+from alembic import op
+import six
+import sqlalchemy as sa
+from sqlalchemy.sql import column
+from sqlalchemy.sql import table
+
+
+_COLUMNS = (('cpus', sa.Integer(), int),
+            ('memory_mb', sa.Integer(), int),
+            ('local_gb', sa.Integer(), int),
+            ('cpu_arch', sa.String(length=255), six.text_type))
+
+
+def _property_values(properties):
+    try:
+        properties = json.loads(properties or '{}')
+    except ValueError:
+        properties = {}
+    values = {}
+    for name, _type, convert in _COLUMNS:
+        try:
+            values[name] = convert(properties[name])
+        except (KeyError, TypeError, ValueError):
+            values[name] = None
+    return values
+
+
+def upgrade():
+    for name, type_, _convert in _COLUMNS:
+        op.add_column('nodes', sa.Column(name, type_, nullable=True))
+        op.create_index('nodes_%s_idx' % name, 'nodes', [name])
+
+    # Copy the properties of the existing nodes to the new columns
+    nodes = table('nodes', column('id', sa.Integer()),
+                  column('properties', sa.Text()),
+                  *[column(name, type_) for name, type_, _c in _COLUMNS])
+    connection = op.get_bind()
+    for node_id, properties in connection.execute(
+            sa.select([nodes.c.id, nodes.c.properties])).fetchall():
+        values = _property_values(properties)
+        if any(value is not None for value in values.values()):
+            op.execute(nodes.update().where(nodes.c.id == node_id).
+                       values(**values))
+
+
+def downgrade():
+    for name, _type, _convert in _COLUMNS:
+        op.drop_index('nodes_%s_idx' % name, 'nodes')
+        op.drop_column('nodes', name)
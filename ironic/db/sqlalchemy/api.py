@@ -20,7 +20,9 @@ import collections
 import datetime
 
 from oslo.config import cfg
+import six
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.sql import func
 
 from ironic.common import exception
 from ironic.common import paths
@@ -164,6 +166,103 @@ def _paginate_query(model, limit=None, marker=None, sort_key=None,
     return query.all()
 
 
+def _iter_query(model, batch_size, sort_key=None, sort_dir=None,
+                query=None):
+    """Iterate over the rows of a query, batch_size rows at a time.
+
+    Each batch is a query of its own which starts after the last row of
+    the previous batch (keyset paging), rather than a single streamed
+    query: most DB drivers, MySQLdb included, buffer the whole result of
+    a query on the client whatever yield_per says.
+    """
+    if not query:
+        query = model_query(model)
+    sort_keys = ['id']
+    if sort_key and sort_key not in sort_keys:
+        sort_keys.insert(0, sort_key)
+    marker = None
+    while True:
+        rows = db_utils.paginate_query(query, model, batch_size, sort_keys,
+                                       marker=marker,
+                                       sort_dir=sort_dir).all()
+        for row in rows:
+            yield row
+        if len(rows) < batch_size:
+            return
+        marker = rows[-1]
+
+
+def _get_digest(model, query=None):
+    """Return the (count, last_modified, ids, generations) summary of the
+    rows of a query.
+
+    The sums of the ids and of the generations of the rows change when rows
+    are replaced or updated, even within the resolution of the timestamps.
+    """
+    if not query:
+        query = model_query(model)
+    last_modified = func.coalesce(model.updated_at, model.created_at)
+    return tuple(query.with_entities(func.count(model.id),
+                                     func.max(last_modified),
+                                     func.sum(model.id),
+                                     func.sum(model.generation)).one())
+
+
+# The node properties which are copied to columns of the same name, and
+# the type of the columns.
+_NODE_PROPERTY_COLUMNS = (('cpus', int),
+                          ('memory_mb', int),
+                          ('local_gb', int),
+                          ('cpu_arch', six.text_type))
+
+
+def _set_node_property_columns(values):
+    """Copy the properties of a node to their own columns.
+
+    The properties which are missing or cannot be converted to the type
+    of their column are set to None.
+
+    :param values: the values of a node being created or updated. They
+                   are left unchanged if they do not include properties.
+    """
+    if 'properties' not in values:
+        return
+    properties = values['properties'] or {}
+    for name, convert in _NODE_PROPERTY_COLUMNS:
+        try:
+            values[name] = convert(properties[name])
+        except (KeyError, TypeError, ValueError):
+            values[name] = None
+
+
+def _add_ports_filters(query, filters):
+    if filters is None:
+        filters = []
+
+    if 'uuid' in filters:
+        query = query.filter_by(uuid=filters['uuid'])
+    if 'address' in filters:
+        query = query.filter_by(address=filters['address'])
+    if 'node_id' in filters:
+        query = query.filter_by(node_id=filters['node_id'])
+
+    return query
+
+
+def _add_operations_filters(query, filters):
+    if filters is None:
+        filters = []
+
+    if 'node_id' in filters:
+        query = query.filter_by(node_id=filters['node_id'])
+    if 'action' in filters:
+        query = query.filter_by(action=filters['action'])
+    if 'state' in filters:
+        query = query.filter_by(state=filters['state'])
+
+    return query
+
+
 class Connection(api.Connection):
     """SqlAlchemy connection."""
 
@@ -192,12 +291,34 @@ class Connection(api.Connection):
             query = query.filter_by(maintenance=filters['maintenance'])
         if 'driver' in filters:
             query = query.filter_by(driver=filters['driver'])
+        if 'power_state' in filters:
+            query = query.filter_by(power_state=filters['power_state'])
         if 'provision_state' in filters:
             query = query.filter_by(provision_state=filters['provision_state'])
+        if 'updated_since' in filters:
+            last_modified = func.coalesce(models.Node.updated_at,
+                                          models.Node.created_at)
+            query = query.filter(last_modified >= filters['updated_since'])
+        if 'min_cpus' in filters:
+            query = query.filter(models.Node.cpus >= filters['min_cpus'])
+        if 'min_memory_mb' in filters:
+            query = query.filter(
+                    models.Node.memory_mb >= filters['min_memory_mb'])
+        if 'min_local_gb' in filters:
+            query = query.filter(
+                    models.Node.local_gb >= filters['min_local_gb'])
+        if 'cpu_arch' in filters:
+            query = query.filter_by(cpu_arch=filters['cpu_arch'])
         if 'provisioned_before' in filters:
             limit = timeutils.utcnow() - datetime.timedelta(
                                          seconds=filters['provisioned_before'])
             query = query.filter(models.Node.provision_updated_at < limit)
+        if 'uuid' in filters:
+            query = query.filter_by(uuid=filters['uuid'])
+        if 'uuids' in filters:
+            query = query.filter(models.Node.uuid.in_(filters['uuids']))
+        if 'instance_uuid' in filters:
+            query = query.filter_by(instance_uuid=filters['instance_uuid'])
 
         return query
 
@@ -223,6 +344,20 @@ class Connection(api.Connection):
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query)
 
+    def get_node_iter(self, filters=None, sort_key=None, sort_dir=None,
+                      batch_size=100):
+        query = model_query(models.Node)
+        query = self._add_nodes_filters(query, filters)
+        query = _iter_query(models.Node, batch_size, sort_key, sort_dir,
+                            query)
+        return (objects.Node._from_db_object(objects.Node(), n)
+                for n in query)
+
+    def get_node_digest(self, filters=None):
+        query = model_query(models.Node)
+        query = self._add_nodes_filters(query, filters)
+        return _get_digest(models.Node, query)
+
     @objects.objectify(objects.Node)
     def reserve_node(self, tag, node_id):
         session = get_session()
@@ -270,6 +405,7 @@ class Connection(api.Connection):
             values['power_state'] = states.NOSTATE
         if not values.get('provision_state'):
             values['provision_state'] = states.NOSTATE
+        _set_node_property_columns(values)
 
         node = models.Node()
         node.update(values)
@@ -305,6 +441,12 @@ class Connection(api.Connection):
 
         return result
 
+    def get_node_uuids(self, node_ids):
+        query = model_query(models.Node.id, models.Node.uuid,
+                            base_model=models.Node)
+        query = query.filter(models.Node.id.in_(node_ids))
+        return dict(query.all())
+
     def destroy_node(self, node_id):
         session = get_session()
         with session.begin():
@@ -325,6 +467,10 @@ class Connection(api.Connection):
             port_query = add_port_filter_by_node(port_query, node_id)
             port_query.delete()
 
+            op_query = model_query(models.Operation, session=session)
+            op_query = op_query.filter_by(node_id=node_id)
+            op_query.delete()
+
             query.delete()
 
     @objects.objectify(objects.Node)
@@ -345,6 +491,7 @@ class Connection(api.Connection):
 
             if 'provision_state' in values:
                 values['provision_updated_at'] = timeutils.utcnow()
+            _set_node_property_columns(values)
 
             ref.update(values)
         return ref
@@ -365,6 +512,18 @@ class Connection(api.Connection):
     def get_port_by_vif(self, vif):
         pass
 
+    def get_portinfo_list(self, columns=None, filters=None, limit=None,
+                          marker=None, sort_key=None, sort_dir=None):
+        if columns is None:
+            columns = [models.Port.id]
+        else:
+            columns = [getattr(models.Port, c) for c in columns]
+
+        query = model_query(*columns, base_model=models.Port)
+        query = _add_ports_filters(query, filters)
+        return _paginate_query(models.Port, limit, marker,
+                               sort_key, sort_dir, query)
+
     @objects.objectify(objects.Port)
     def get_port_list(self, limit=None, marker=None,
                       sort_key=None, sort_dir=None):
@@ -379,6 +538,20 @@ class Connection(api.Connection):
         return _paginate_query(models.Port, limit, marker,
                                sort_key, sort_dir, query)
 
+    def get_port_iter(self, filters=None, sort_key=None, sort_dir=None,
+                      batch_size=100):
+        query = model_query(models.Port)
+        query = _add_ports_filters(query, filters)
+        query = _iter_query(models.Port, batch_size, sort_key, sort_dir,
+                            query)
+        return (objects.Port._from_db_object(objects.Port(), p)
+                for p in query)
+
+    def get_port_digest(self, filters=None):
+        query = model_query(models.Port)
+        query = _add_ports_filters(query, filters)
+        return _get_digest(models.Port, query)
+
     @objects.objectify(objects.Port)
     def create_port(self, values):
         if not values.get('uuid'):
@@ -406,6 +579,26 @@ class Connection(api.Connection):
             raise exception.MACAlreadyExists(mac=values['address'])
         return ref
 
+    def update_ports(self, updates):
+        session = get_session()
+        refs = []
+        try:
+            with session.begin():
+                for port_id, values in updates.items():
+                    query = model_query(models.Port, session=session)
+                    query = add_port_filter(query, port_id)
+                    try:
+                        ref = query.one()
+                    except NoResultFound:
+                        raise exception.PortNotFound(port=port_id)
+                    ref.update(values)
+                    refs.append(ref)
+        except db_exc.DBDuplicateEntry:
+            macs = [values['address'] for values in updates.values()
+                    if 'address' in values]
+            raise exception.MACAlreadyExists(mac=', '.join(macs))
+        return refs
+
     def destroy_port(self, port_id):
         session = get_session()
         with session.begin():
@@ -436,6 +629,18 @@ class Connection(api.Connection):
         return _paginate_query(models.Chassis, limit, marker,
                                sort_key, sort_dir)
 
+    def get_chassis_uuids(self, chassis_ids):
+        query = model_query(models.Chassis.id, models.Chassis.uuid,
+                            base_model=models.Chassis)
+        query = query.filter(models.Chassis.id.in_(chassis_ids))
+        return dict(query.all())
+
+    def get_chassis_digest(self, filters=None):
+        query = model_query(models.Chassis)
+        if filters and 'uuid' in filters:
+            query = query.filter_by(uuid=filters['uuid'])
+        return _get_digest(models.Chassis, query)
+
     @objects.objectify(objects.Chassis)
     def create_chassis(self, values):
         if not values.get('uuid'):
@@ -479,6 +684,57 @@ class Connection(api.Connection):
             if count != 1:
                 raise exception.ChassisNotFound(chassis=chassis_id)
 
+    @objects.objectify(objects.Operation)
+    def create_operation(self, values):
+        if not values.get('uuid'):
+            values['uuid'] = utils.generate_uuid()
+        operation = models.Operation()
+        operation.update(values)
+        operation.save()
+        return operation
+
+    @objects.objectify(objects.Operation)
+    def get_operation(self, operation_id):
+        query = model_query(models.Operation)
+        query = add_identity_filter(query, operation_id)
+
+        try:
+            return query.one()
+        except NoResultFound:
+            raise exception.OperationNotFound(operation=operation_id)
+
+    @objects.objectify(objects.Operation)
+    def get_operation_list(self, filters=None, limit=None, marker=None,
+                           sort_key=None, sort_dir=None):
+        query = model_query(models.Operation)
+        query = _add_operations_filters(query, filters)
+        return _paginate_query(models.Operation, limit, marker,
+                               sort_key, sort_dir, query)
+
+    @objects.objectify(objects.Operation)
+    def update_operation(self, operation_id, values):
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Operation, session=session)
+            query = add_identity_filter(query, operation_id)
+
+            count = query.update(values)
+            if count != 1:
+                raise exception.OperationNotFound(operation=operation_id)
+            ref = query.one()
+        return ref
+
+    def purge_operations(self, finished_before):
+        limit = timeutils.utcnow() - datetime.timedelta(
+                                                     seconds=finished_before)
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Operation, session=session)
+            query = query.filter(models.Operation.state.in_(
+                                                [states.DONE, states.FAILED]))
+            query = query.filter(models.Operation.finished_at < limit)
+            return query.delete(synchronize_session=False)
+
     @objects.objectify(objects.Conductor)
     def register_conductor(self, values):
         try:
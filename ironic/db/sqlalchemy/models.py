@@ -24,9 +24,10 @@ from oslo.config import cfg
 import six.moves.urllib.parse as urlparse
 
 from sqlalchemy import Boolean, Column, DateTime
-from sqlalchemy import ForeignKey, Integer
+from sqlalchemy import ForeignKey, Index, Integer
 from sqlalchemy import schema, String, Text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.types import TypeDecorator, TEXT
 
 from ironic.openstack.common.db.sqlalchemy import models
@@ -115,6 +116,10 @@ class Chassis(Base):
     uuid = Column(String(36))
     extra = Column(JSONEncodedDict)
     description = Column(String(255), nullable=True)
+    # NOTE: incremented by every update of the row, as updated_at may not
+    #       change between updates made within a second on some databases
+    generation = Column(Integer, default=0,
+                        onupdate=literal_column('generation') + 1)
 
 
 class Conductor(Base):
@@ -136,7 +141,11 @@ class Node(Base):
     __table_args__ = (
         schema.UniqueConstraint('uuid', name='uniq_nodes0uuid'),
         schema.UniqueConstraint('instance_uuid',
-                                name='uniq_nodes0instance_uuid'))
+                                name='uniq_nodes0instance_uuid'),
+        Index('nodes_cpus_idx', 'cpus'),
+        Index('nodes_memory_mb_idx', 'memory_mb'),
+        Index('nodes_local_gb_idx', 'local_gb'),
+        Index('nodes_cpu_arch_idx', 'cpu_arch'))
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36))
     # NOTE(deva): we store instance_uuid directly on the node so that we can
@@ -152,12 +161,22 @@ class Node(Base):
     last_error = Column(Text, nullable=True)
     instance_info = Column(JSONEncodedDict)
     properties = Column(JSONEncodedDict)
+    # NOTE: copies of the properties of the same name, kept up to date
+    #       by the DB API so that nodes can be filtered on them
+    cpus = Column(Integer, nullable=True)
+    memory_mb = Column(Integer, nullable=True)
+    local_gb = Column(Integer, nullable=True)
+    cpu_arch = Column(String(255), nullable=True)
     driver = Column(String(15))
     driver_info = Column(JSONEncodedDict)
     reservation = Column(String(255), nullable=True)
     maintenance = Column(Boolean, default=False)
     console_enabled = Column(Boolean, default=False)
     extra = Column(JSONEncodedDict)
+    # NOTE: incremented by every update of the row, as updated_at may not
+    #       change between updates made within a second on some databases
+    generation = Column(Integer, default=0,
+                        onupdate=literal_column('generation') + 1)
 
 
 class Port(Base):
@@ -172,3 +191,25 @@ class Port(Base):
     address = Column(String(18))
     node_id = Column(Integer, ForeignKey('nodes.id'), nullable=True)
     extra = Column(JSONEncodedDict)
+    # NOTE: incremented by every update of the row, as updated_at may not
+    #       change between updates made within a second on some databases
+    generation = Column(Integer, default=0,
+                        onupdate=literal_column('generation') + 1)
+
+
+class Operation(Base):
+    """Represents an asynchronous operation on a bare metal node."""
+
+    __tablename__ = 'operations'
+    __table_args__ = (
+        schema.UniqueConstraint('uuid', name='uniq_operations0uuid'),
+        )
+    id = Column(Integer, primary_key=True)
+    uuid = Column(String(36))
+    node_id = Column(Integer, ForeignKey('nodes.id'), nullable=True)
+    action = Column(String(15))
+    target = Column(String(15), nullable=True)
+    state = Column(String(15))
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -18,8 +18,11 @@
 Utility for caching master images.
 """
 
+import contextlib
 import os
+import stat
 import tempfile
+import threading
 import time
 
 from oslo.config import cfg
@@ -39,11 +42,216 @@ img_cache_opts = [
                 default=False,
                 help='Run image downloads and raw format conversions in '
                      'parallel.'),
+    cfg.IntOpt('image_download_concurrency',
+               default=4,
+               help='Maximum number of images downloaded at the same time, '
+                    'when parallel_image_downloads is enabled. 0 means no '
+                    'limit.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(img_cache_opts)
 
+# Downloads in progress, by master image path
+_DOWNLOADS = {}
+# Semaphores limiting the number of concurrent downloads, by limit
+_DOWNLOAD_SLOTS = {}
+_DOWNLOADS_LOCK = threading.Lock()
+
+# The index of each master image directory, by path
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+# Seconds after which an index is rebuilt anyway, in case a change to its
+# directory went unnoticed
+_REINDEX_INTERVAL = 600
+# Seconds during which another change to a directory may leave its
+# modification time unchanged, for file systems with a coarse resolution
+_MTIME_RESOLUTION = 1
+# Suffix of the file next to a master image, which holds the checksum of
+# the image as verified when it was downloaded
+_CHECKSUM_SUFFIX = '.md5'
+
+
+def _get_index(master_dir):
+    """Return the index of a master image directory, building it if needed.
+
+    Indexes live as long as the process, so the directory is only listed
+    the first time it is used, or when it was changed by someone else.
+    """
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(master_dir)
+        if index is None:
+            index = _INDEXES[master_dir] = _CacheIndex(master_dir)
+        return index
+
+
+def _checksum_path(master_path):
+    return master_path + _CHECKSUM_SUFFIX
+
+
+def _read_checksum(master_path):
+    """Return the checksum recorded for a master image, or None."""
+    try:
+        with open(_checksum_path(master_path)) as f:
+            return f.read().strip() or None
+    except IOError:
+        return None
+
+
+@contextlib.contextmanager
+def _download_slot():
+    """Hold one of the download slots of the process during the block.
+
+    Downloads are run one at a time, unless parallel_image_downloads is
+    enabled, in which case at most image_download_concurrency of them are.
+    """
+    if CONF.parallel_image_downloads:
+        limit = CONF.image_download_concurrency
+    else:
+        limit = 1
+    if limit <= 0:
+        yield
+        return
+    with _DOWNLOADS_LOCK:
+        slots = _DOWNLOAD_SLOTS.get(limit)
+        if slots is None:
+            slots = _DOWNLOAD_SLOTS[limit] = threading.Semaphore(limit)
+    with slots:
+        yield
+
+
+def _start_download(master_path):
+    """Register a download of an image, unless one is already in progress.
+
+    :param master_path: the master path of the image
+    :returns: tuple (event set when the download is over,
+                     whether the caller has to download the image)
+    """
+    with _DOWNLOADS_LOCK:
+        done = _DOWNLOADS.get(master_path)
+        if done is not None:
+            return done, False
+        done = _DOWNLOADS[master_path] = threading.Event()
+        return done, True
+
+
+def _finish_download(master_path):
+    """Unregister a download, waking up the requesters waiting on it."""
+    with _DOWNLOADS_LOCK:
+        done = _DOWNLOADS.pop(master_path)
+    done.set()
+
+
+class _CacheIndex(object):
+    """The size, link count and last use time of the images in a cache.
+
+    The index is updated as images are fetched and deleted through an
+    ImageCache. It is reconciled with a listing of the directory when the
+    modification time of the latter shows it was changed otherwise, when
+    that time was too recent to tell as it was listed, and every
+    _REINDEX_INTERVAL seconds.
+
+    Link counts are only as of the last time an image was looked at: they
+    also change when the copies of an image are deleted, so they must be
+    checked again before deleting an image.
+    """
+
+    def __init__(self, master_dir):
+        self.master_dir = master_dir
+        # file name -> [size, link count, last used time]
+        self.entries = {}
+        self.total_size = 0
+        self._dir_mtime = None
+        self._dir_racy = True
+        self._reindex_at = 0
+        self.reconcile()
+
+    def _record_dir(self):
+        self._dir_mtime = os.stat(self.master_dir).st_mtime
+        # NOTE: another change made within the same tick would not change
+        # the modification time, so it can only be trusted once it is old
+        # enough.
+        self._dir_racy = time.time() - self._dir_mtime < _MTIME_RESOLUTION
+
+    def _record_own_change(self):
+        # NOTE: the modification time resulting from a change made through
+        # the index is trusted, as much as the one it replaces.
+        self._dir_mtime = os.stat(self.master_dir).st_mtime
+
+    def reconcile(self):
+        """Rebuild the index from a listing of the directory."""
+        LOG.debug("Indexing master image cache %(dir)s" %
+                  {'dir': self.master_dir})
+        # NOTE: record the modification time first, so that changes made
+        # while listing are noticed by the next refresh().
+        self._record_dir()
+        self._reindex_at = time.time() + _REINDEX_INTERVAL
+        entries = {}
+        for file_name in os.listdir(self.master_dir):
+            if file_name.endswith(_CHECKSUM_SUFFIX):
+                continue
+            file_name = os.path.join(self.master_dir, file_name)
+            try:
+                st = os.stat(file_name)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            # NOTE(dtantsur): Detect most recently accessed files,
+            # seeing atime can be disabled by the mount option
+            # Also include ctime as it changes when image is linked to
+            last_used = max(st.st_mtime, st.st_atime, st.st_ctime)
+            entries[file_name] = [st.st_size, st.st_nlink, last_used]
+        self.entries = entries
+        self.total_size = sum(e[0] for e in entries.values())
+
+    def refresh(self):
+        """Reconcile the index, if the directory may have been changed."""
+        if (self._dir_racy or time.time() >= self._reindex_at or
+                os.stat(self.master_dir).st_mtime != self._dir_mtime):
+            self.reconcile()
+
+    def _add_entry(self, file_name):
+        st = os.stat(file_name)
+        self._discard(file_name)
+        self.entries[file_name] = [st.st_size, st.st_nlink, time.time()]
+        self.total_size += st.st_size
+
+    def add(self, file_name):
+        """Index an image which was just stored in the cache."""
+        self._add_entry(file_name)
+        self._record_own_change()
+
+    def use(self, file_name):
+        """Record that an image was just linked to."""
+        entry = self.entries.get(file_name)
+        if entry is None:
+            # NOTE: stored by someone else, the next refresh() tells
+            # whether there were other changes.
+            self._add_entry(file_name)
+        else:
+            entry[1] += 1
+            entry[2] = time.time()
+
+    def _discard(self, file_name):
+        entry = self.entries.pop(file_name, None)
+        if entry is not None:
+            self.total_size -= entry[0]
+
+    def remove(self, file_name):
+        """Forget an image which was just deleted from the cache."""
+        self._discard(file_name)
+        self._record_own_change()
+
+    def listing(self):
+        """Return a list of tuples (file name, last used time, size).
+
+        The least recently used images come first.
+        """
+        return sorted(((file_name, entry[2], entry[0])
+                       for file_name, entry in self.entries.items()),
+                      key=lambda entry: entry[1])
+
 
 class ImageCache(object):
     """Class handling access to cache for master images."""
@@ -61,10 +269,12 @@ class ImageCache(object):
         self._cache_size = cache_size
         self._cache_ttl = cache_ttl
         self._image_service = image_service
+        self._index = None
         if master_dir is not None:
             fileutils.ensure_tree(master_dir)
+            self._index = _get_index(master_dir)
 
-    def fetch_image(self, uuid, dest_path, ctx=None):
+    def fetch_image(self, uuid, dest_path, ctx=None, checksum=None):
         """Fetch image with given uuid to the destination path.
 
         Does nothing if destination path exists.
@@ -74,17 +284,15 @@ class ImageCache(object):
         :param uuid: image UUID or href to fetch
         :param dest_path: destination file path
         :param ctx: context
+        :param checksum: checksum of the image, if already known. The master
+                         image is downloaded again if it was stored with
+                         another checksum.
         """
-        img_download_lock_name = 'download-image'
         if self.master_dir is None:
             #NOTE(ghe): We don't share images between instances/hosts
-            if not CONF.parallel_image_downloads:
-                with lockutils.lock(img_download_lock_name, 'ironic-'):
-                    images.fetch_to_raw(ctx, uuid, dest_path,
-                                        self._image_service)
-            else:
+            with _download_slot():
                 images.fetch_to_raw(ctx, uuid, dest_path,
-                                    self._image_service)
+                                    self._image_service, checksum=checksum)
             return
 
         #TODO(ghe): have hard links and counts the same behaviour in all fs
@@ -92,11 +300,9 @@ class ImageCache(object):
         master_file_name = service_utils.parse_image_ref(uuid)[0]
         master_path = os.path.join(self.master_dir, master_file_name)
 
-        if CONF.parallel_image_downloads:
-            img_download_lock_name = 'download-image:%s' % master_file_name
-
-        # TODO(dtantsur): lock expiration time
-        with lockutils.lock(img_download_lock_name, 'ironic-'):
+        # NOTE: only the first requester of an image downloads it, the
+        # others wait for it to be done and link to the master image.
+        while True:
             if os.path.exists(dest_path):
                 LOG.debug("Destination %(dest)s already exists for "
                             "image %(uuid)s" %
@@ -104,46 +310,120 @@ class ImageCache(object):
                            'dest': dest_path})
                 return
 
-            try:
-                # NOTE(dtantsur): ensure we're not in the middle of clean up
-                with lockutils.lock('master_image', 'ironic-'):
-                    os.link(master_path, dest_path)
-            except OSError:
-                LOG.info(_("Master cache miss for image %(uuid)s, "
-                           "starting download") %
-                         {'uuid': uuid})
-            else:
-                LOG.debug("Master cache hit for image %(uuid)s",
-                          {'uuid': uuid})
+            if self._link_master_image(uuid, master_path, dest_path,
+                                       checksum=checksum):
                 return
 
-            self._download_image(uuid, master_path, dest_path, ctx=ctx)
+            done, first = _start_download(master_path)
+            if first:
+                break
+            LOG.debug("Waiting for the download of image %(uuid)s in "
+                      "progress", {'uuid': uuid})
+            done.wait()
+
+        try:
+            # NOTE: the download may have been over right before it was
+            # registered.
+            if self._link_master_image(uuid, master_path, dest_path,
+                                       checksum=checksum):
+                return
+            LOG.info(_("Master cache miss for image %(uuid)s, "
+                       "starting download") %
+                     {'uuid': uuid})
+            with _download_slot():
+                self._download_image(uuid, master_path, dest_path, ctx=ctx,
+                                     checksum=checksum)
+        finally:
+            _finish_download(master_path)
 
         # NOTE(dtantsur): we increased cache size - time to clean up
         self.clean_up()
 
-    def _download_image(self, uuid, master_path, dest_path, ctx=None):
+    def _link_master_image(self, uuid, master_path, dest_path, checksum=None):
+        """Link to the master image, if it is in the cache.
+
+        A master image stored with another checksum than the given one is
+        deleted instead.
+
+        :returns: whether the master image was linked to.
+        """
+        try:
+            # NOTE(dtantsur): ensure we're not in the middle of clean up
+            with lockutils.lock('master_image', 'ironic-'):
+                if not self._check_master_image(uuid, master_path, checksum):
+                    return False
+                os.link(master_path, dest_path)
+                self._index.use(master_path)
+        except OSError:
+            return False
+        LOG.debug("Master cache hit for image %(uuid)s",
+                  {'uuid': uuid})
+        return True
+
+    def _check_master_image(self, uuid, master_path, checksum):
+        """Compare a master image to the checksum its image has now.
+
+        Master images with no recorded checksum, downloaded by an older
+        version or for images with none, are trusted. Should be called with
+        the master_image lock held.
+
+        :returns: False if the master image was stored with another checksum
+                  and was deleted, True otherwise.
+        """
+        recorded = _read_checksum(master_path)
+        if not checksum or not recorded or recorded == checksum:
+            return True
+        LOG.warn(_("Master image %(path)s of image %(uuid)s was stored with "
+                   "checksum %(recorded)s, but the image has checksum "
+                   "%(checksum)s now, deleting it"),
+                 {'path': master_path, 'uuid': uuid, 'recorded': recorded,
+                  'checksum': checksum})
+        utils.unlink_without_raise(master_path)
+        utils.unlink_without_raise(_checksum_path(master_path))
+        self._index.remove(master_path)
+        return False
+
+    def _download_image(self, uuid, master_path, dest_path, ctx=None,
+                        checksum=None):
         """Download image from Glance and store at a given path.
-        This method should be called with uuid-specific lock taken.
+        This method should only be called by the requester which registered
+        the download of the image.
+
+        The checksum verified while downloading the image is stored next to
+        the master image.
 
         :param uuid: image UUID or href to fetch
         :param master_path: destination master path
         :param dest_path: destination file path
         :param ctx: context
+        :param checksum: checksum of the image, if already known
         """
         #TODO(ghe): timeout and retry for downloads
         #TODO(ghe): logging when image cannot be created
         tmp_dir = tempfile.mkdtemp(dir=self.master_dir)
         tmp_path = os.path.join(tmp_dir, uuid)
         try:
-            images.fetch_to_raw(ctx, uuid, tmp_path,
-                                self._image_service)
+            checksum = images.fetch_to_raw(ctx, uuid, tmp_path,
+                                           self._image_service,
+                                           checksum=checksum)
+            # NOTE: record the checksum before the master image shows up,
+            # so that it is never linked to with a stale one.
+            if checksum:
+                tmp_checksum_path = _checksum_path(tmp_path)
+                with open(tmp_checksum_path, 'w') as f:
+                    f.write(checksum)
+                os.rename(tmp_checksum_path, _checksum_path(master_path))
+            else:
+                utils.unlink_without_raise(_checksum_path(master_path))
             # NOTE(dtantsur): no need for global lock here - master_path
             # will have link count >1 at any moment, so won't be cleaned up
             os.link(tmp_path, master_path)
             os.link(master_path, dest_path)
         finally:
             utils.rmtree_without_raise(tmp_dir)
+        # NOTE: index once the temporary directory is gone, so that the
+        # index is in sync with the master directory.
+        self._index.add(master_path)
 
     @lockutils.synchronized('master_image', 'ironic-')
     def clean_up(self, amount=None):
@@ -153,6 +433,9 @@ class ImageCache(object):
         Protected by global lock, so that no one messes with master images
         after we get listing and before we actually delete files.
 
+        The listing comes from the index of the cache, so only the files
+        considered for deletion are looked at.
+
         :param amount: if present, amount of space to reclaim in bytes,
                        cleaning will stop, if this goal was reached,
                        even if it is possible to clean up more files
@@ -164,7 +447,8 @@ class ImageCache(object):
                   {'dir': self.master_dir})
 
         amount_copy = amount
-        listing = _find_candidates_for_deletion(self.master_dir)
+        self._index.refresh()
+        listing = self._index.listing()
         survived, amount = self._clean_up_too_old(listing, amount)
         if amount is not None and amount <= 0:
             return
@@ -175,6 +459,33 @@ class ImageCache(object):
                      {'required': amount_copy / 1024 / 1024,
                       'left': amount / 1024 / 1024})
 
+    def _delete_if_unused(self, file_name):
+        """Delete a master image, unless it has other links.
+
+        :returns: the size of the deleted file, or None if it was not
+                  deleted.
+        """
+        try:
+            st = os.stat(file_name)
+        except OSError:
+            # already gone
+            utils.unlink_without_raise(_checksum_path(file_name))
+            self._index.remove(file_name)
+            return None
+        if st.st_nlink > 1:
+            self._index.entries[file_name][1] = st.st_nlink
+            return None
+        try:
+            os.unlink(file_name)
+        except EnvironmentError as exc:
+            LOG.warn(_("Unable to delete file %(name)s from "
+                       "master image cache: %(exc)s") %
+                     {'name': file_name, 'exc': exc})
+            return None
+        utils.unlink_without_raise(_checksum_path(file_name))
+        self._index.remove(file_name)
+        return st.st_size
+
     def _clean_up_too_old(self, listing, amount):
         """Clean up stage 1: drop images that are older than TTL.
 
@@ -183,7 +494,8 @@ class ImageCache(object):
         it starts removing files older than TTL seconds,
         oldest first, until the required 'amount' of space is reclaimed.
 
-        :param listing: list of tuples (file name, last used time)
+        :param listing: list of tuples (file name, last used time, size),
+                        oldest first
         :param amount: if not None, amount of space to reclaim in bytes,
                        cleaning will stop, if this goal was reached,
                        even if it is possible to clean up more files
@@ -191,31 +503,22 @@ class ImageCache(object):
                          amount still to reclaim)
         """
         threshold = time.time() - self._cache_ttl
-        survived = []
-        for file_name, last_used, stat in listing:
-            if last_used < threshold:
-                try:
-                    os.unlink(file_name)
-                except EnvironmentError as exc:
-                    LOG.warn(_("Unable to delete file %(name)s from "
-                               "master image cache: %(exc)s") %
-                             {'name': file_name, 'exc': exc})
-                else:
-                    if amount is not None:
-                        amount -= stat.st_size
-                        if amount <= 0:
-                            amount = 0
-                            break
-            else:
-                survived.append((file_name, last_used, stat))
-        return survived, amount
+        for i, (file_name, last_used, size) in enumerate(listing):
+            if last_used >= threshold:
+                return listing[i:], amount
+            deleted_size = self._delete_if_unused(file_name)
+            if deleted_size is not None and amount is not None:
+                amount -= deleted_size
+                if amount <= 0:
+                    return [], 0
+        return [], amount
 
     def _clean_up_ensure_cache_size(self, listing, amount):
         """Clean up stage 2: try to ensure cache size < threshold.
         Try to delete the oldest files until conditions is satisfied
         or no more files are eligable for delition.
 
-        :param listing: list of tuples (file name, last used time)
+        :param listing: list of tuples (file name, last used time, size)
         :param amount: amount of space to reclaim, if possible.
                        if amount is not None, it has higher priority than
                        cache size in settings
@@ -225,23 +528,15 @@ class ImageCache(object):
         listing = sorted(listing,
                          key=lambda entry: entry[1],
                          reverse=True)
-        total_listing = (os.path.join(self.master_dir, f)
-                         for f in os.listdir(self.master_dir))
-        total_size = sum(os.path.getsize(f)
-                         for f in total_listing)
+        total_size = self._index.total_size
         while listing and (total_size > self._cache_size or
                (amount is not None and amount > 0)):
-            file_name, last_used, stat = listing.pop()
-            try:
-                os.unlink(file_name)
-            except EnvironmentError as exc:
-                LOG.warn(_("Unable to delete file %(name)s from "
-                           "master image cache: %(exc)s") %
-                         {'name': file_name, 'exc': exc})
-            else:
-                total_size -= stat.st_size
+            file_name, last_used, size = listing.pop()
+            deleted_size = self._delete_if_unused(file_name)
+            if deleted_size is not None:
+                total_size -= deleted_size
                 if amount is not None:
-                    amount -= stat.st_size
+                    amount -= deleted_size
 
         if total_size > self._cache_size:
             LOG.info(_("After cleaning up cache dir %(dir)s "
@@ -250,21 +545,3 @@ class ImageCache(object):
                      {'dir': self.master_dir, 'actual': total_size,
                       'expected': self._cache_size})
         return max(amount, 0)
-
-
-def _find_candidates_for_deletion(master_dir):
-    """Find files eligible for deletion i.e. with link count ==1.
-
-    :param master_dir: directory to operate on
-    :returns: iterator yielding tuples (file name, last used time, stat)
-    """
-    for filename in os.listdir(master_dir):
-        filename = os.path.join(master_dir, filename)
-        stat = os.stat(filename)
-        if not os.path.isfile(filename) or stat.st_nlink > 1:
-            continue
-        # NOTE(dtantsur): Detect most recently accessed files,
-        # seeing atime can be disabled by the mount option
-        # Also include ctime as it changes when image is linked to
-        last_used_time = max(stat.st_mtime, stat.st_atime, stat.st_ctime)
-        yield filename, last_used_time, stat
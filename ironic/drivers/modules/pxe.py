@@ -262,13 +262,11 @@ def _free_disk_space_for(path):
     return stat.f_frsize * stat.f_bavail
 
 
-def _cleanup_caches_if_required(ctx, cache, images_info):
+def _cleanup_caches_if_required(cache, total_size):
     # NOTE(dtantsur): I'd prefer to have this code inside ImageCache. But:
     # To reclaim disk space efficiently, this code needs to be aware of
     # all existing caches (e.g. cleaning instance image cache can be
     # much more efficient, than cleaning TFTP cache).
-    total_size = sum(images.download_size(ctx, uuid)
-                     for (uuid, path) in images_info)
     free = _free_disk_space_for(cache.master_dir)
     if total_size >= free:
         # NOTE(dtantsur): instance cache is larger - always clean it first
@@ -302,13 +300,17 @@ def _fetch_images(ctx, cache, images_info):
     :param images_info: list of tuples (image uuid, destination path)
     :raises: InstanceDeployFailure if unable to find enough disk space
     """
-    _cleanup_caches_if_required(ctx, cache, images_info)
+    # NOTE: the metadata of the images tells both the space they need and
+    # the checksums the cached images are checked against.
+    images_meta = [images.show(ctx, uuid) for (uuid, path) in images_info]
+    _cleanup_caches_if_required(cache,
+                                sum(meta['size'] for meta in images_meta))
     # NOTE(dtantsur): This code can suffer from race condition,
     # if disk space is used between the check and actual download.
     # This is probably unavoidable, as we can't control other
     # (probably unrelated) processes
-    for uuid, path in images_info:
-        cache.fetch_image(uuid, path, ctx=ctx)
+    for (uuid, path), meta in zip(images_info, images_meta):
+        cache.fetch_image(uuid, path, ctx=ctx, checksum=meta.get('checksum'))
 
 
 def _cache_tftp_images(ctx, node, pxe_info):
@@ -20,6 +20,8 @@ This host manager will consume all cpu's, disk space, and
 ram from a host / node as it is supporting Baremetal hosts, which can not be
 subdivided into multiple instances.
 """
+import re
+
 from oslo.config import cfg
 
 from nova.openstack.common import jsonutils
@@ -53,6 +55,64 @@ CONF.register_opts(host_manager_opts)
 
 LOG = logging.getLogger(__name__)
 
+# The filters which are answered by looking up the flavor index
+EXACT_FILTERS = ('ExactRamFilter', 'ExactDiskFilter', 'ExactCoreFilter')
+
+# An extra spec value which ComputeCapabilitiesFilter compares for equality
+_PLAIN_SPEC = re.compile(r'^[\w.-]+$')
+
+
+class FlavorIndex(object):
+    """Baremetal nodes, bucketed by the resources they have free.
+
+    The nodes are keyed by (free_ram_mb, free_disk_mb, free vcpus, cpu_arch),
+    so that the nodes exactly matching a flavor are found by looking at each
+    distinct key, rather than by testing each node. The host manager removes
+    the nodes it no longer tracks.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+
+    def _discard(self, state, key):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.discard(state)
+            if not bucket:
+                del self._buckets[key]
+
+    def update(self, state):
+        """(Re-)index a node, after its resources changed."""
+        key = state.flavor_key()
+        old_key = getattr(state, '_flavor_key', None)
+        if old_key is not None and old_key != key:
+            self._discard(state, old_key)
+        self._buckets.setdefault(key, set()).add(state)
+        state._flavor_key = key
+
+    def remove(self, state):
+        """Stop indexing a node."""
+        key = getattr(state, '_flavor_key', None)
+        if key is not None:
+            self._discard(state, key)
+            state._flavor_key = None
+
+    def lookup(self, memory_mb=None, disk_mb=None, vcpus=None, cpu_arch=None):
+        """Return the set of the nodes which have these resources free.
+
+        A resource which is None matches any node. Nodes whose vcpus are not
+        known match any number of vcpus, like ExactCoreFilter lets them pass.
+        """
+        found = set()
+        for key, bucket in self._buckets.items():
+            ram, disk, cores, arch = key
+            if ((memory_mb is None or ram == memory_mb) and
+                    (disk_mb is None or disk == disk_mb) and
+                    (vcpus is None or cores is None or cores == vcpus) and
+                    (cpu_arch is None or arch == cpu_arch)):
+                found.update(bucket)
+        return found
+
 
 class IronicNodeState(host_manager.HostState):
     """Mutable and immutable information tracked for a host.
@@ -60,8 +120,40 @@ class IronicNodeState(host_manager.HostState):
     previously used and lock down access.
     """
 
+    # The FlavorIndex of the host manager tracking the node, if any
+    flavor_index = None
+
+    # The (id, updated_at) of the compute node record last applied, or None
+    # if the state has been changed since.
+    _compute_version = None
+
+    # The JSON stats last parsed
+    _stats_json = None
+
+    def flavor_key(self):
+        """Return the key of the node in a FlavorIndex."""
+        free_vcpus = None
+        if self.vcpus_total:
+            free_vcpus = self.vcpus_total - self.vcpus_used
+        return (self.free_ram_mb, self.free_disk_mb, free_vcpus,
+                str(self.stats.get('cpu_arch')))
+
+    def _update_index(self):
+        if self.flavor_index is not None:
+            self.flavor_index.update(self)
+
     def update_from_compute_node(self, compute):
-        """Update information about a host from its compute_node info."""
+        """Update information about a host from its compute_node info.
+
+        Baremetal nodes rarely change: nothing is done if the compute node
+        record was already applied, and has not been updated since, and its
+        stats are only parsed again if they changed.
+        """
+        version = (compute.get('id'), compute['updated_at'])
+        if (compute['updated_at'] is not None and
+                version == self._compute_version):
+            return
+
         self.free_ram_mb = compute['free_ram_mb']
         self.total_usable_ram_mb = compute['memory_mb']
 
@@ -72,9 +164,13 @@ class IronicNodeState(host_manager.HostState):
         self.vcpus_used = compute['vcpus_used']
 
         stats = compute.get('stats', '{}')
-        self.stats = jsonutils.loads(stats)
+        if stats != self._stats_json:
+            self.stats = jsonutils.loads(stats)
+            self._stats_json = stats
 
         self.updated = compute['updated_at']
+        self._compute_version = version
+        self._update_index()
 
     def consume_from_instance(self, instance):
         """Consume nodes entire resources regardless of instance request."""
@@ -82,6 +178,9 @@ class IronicNodeState(host_manager.HostState):
         self.free_disk_mb = 0
         self.vcpus_used = self.vcpus_total
         self.updated = timeutils.utcnow()
+        # the compute node record must be applied again on the next refresh
+        self._compute_version = None
+        self._update_index()
 
 
 def new_host_state(self, host, node, **kwargs):
@@ -92,7 +191,14 @@ def new_host_state(self, host, node, **kwargs):
     compute = kwargs.get('compute')
 
     if compute and compute.get('cpu_info') == 'baremetal cpu':
-        return IronicNodeState(host, node, **kwargs)
+        state = IronicNodeState(host, node, **kwargs)
+        state.flavor_index = self.flavor_index
+        # NOTE: the constructor may already have applied the compute node
+        # record, before there was an index to add the node to; apply it
+        # again, or the node would only be indexed once the record changes.
+        state._compute_version = None
+        state.update_from_compute_node(compute)
+        return state
     else:
         return host_manager.HostState(host, node, **kwargs)
 
@@ -109,3 +215,72 @@ class IronicHostManager(host_manager.HostManager):
         if CONF.scheduler_use_baremetal_filters:
             baremetal_default = CONF.baremetal_scheduler_default_filters
             CONF.scheduler_default_filters = baremetal_default
+        self.flavor_index = FlavorIndex()
+
+    def get_all_host_states(self, context):
+        """Returns a list of HostStates that represents all the hosts
+        the HostManager knows about.
+
+        The nodes which are no longer tracked are also removed from the
+        flavor index.
+        """
+        old_states = dict(self.host_state_map)
+        host_states = super(IronicHostManager, self).get_all_host_states(
+                context)
+        for state_key, state in old_states.items():
+            if self.host_state_map.get(state_key) is not state:
+                self.flavor_index.remove(state)
+        return host_states
+
+    def _match_flavor(self, instance_type, filter_class_names):
+        """Return the set of the nodes passing the exact filters in use."""
+        kwargs = {}
+        if 'ExactRamFilter' in filter_class_names:
+            kwargs['memory_mb'] = instance_type['memory_mb']
+        if 'ExactDiskFilter' in filter_class_names:
+            kwargs['disk_mb'] = (1024 * (instance_type['root_gb'] +
+                                         instance_type['ephemeral_gb']) +
+                                 instance_type['swap'])
+        if 'ExactCoreFilter' in filter_class_names:
+            kwargs['vcpus'] = instance_type['vcpus']
+        if 'ComputeCapabilitiesFilter' in filter_class_names:
+            # NOTE: ComputeCapabilitiesFilter still runs afterwards, only
+            # narrow the nodes down when it would compare the cpu_arch of
+            # the nodes for equality.
+            extra_specs = instance_type.get('extra_specs') or {}
+            for key in ('cpu_arch', 'capabilities:cpu_arch'):
+                cpu_arch = extra_specs.get(key)
+                if cpu_arch and _PLAIN_SPEC.match(cpu_arch):
+                    kwargs['cpu_arch'] = cpu_arch
+        return self.flavor_index.lookup(**kwargs)
+
+    def get_filtered_hosts(self, hosts, filter_properties,
+                           filter_class_names=None, index=0):
+        """Filter hosts and return only ones passing all filters.
+
+        When all the hosts are baremetal nodes tracked by this host manager,
+        the exact filters are not run against each of them: the nodes
+        exactly matching the flavor are looked up in the flavor index
+        instead.
+        """
+        names = filter_class_names
+        if names is None:
+            names = CONF.scheduler_default_filters
+        if not isinstance(names, (list, tuple)):
+            names = [names]
+        instance_type = filter_properties.get('instance_type')
+        if (instance_type and any(n in EXACT_FILTERS for n in names)
+                and not filter_properties.get('force_hosts')
+                and not filter_properties.get('force_nodes')):
+            hosts = list(hosts)
+            if all(getattr(h, 'flavor_index', None) is self.flavor_index
+                   for h in hosts):
+                matching = self._match_flavor(instance_type, names)
+                LOG.debug("%(matching)d of %(hosts)d baremetal nodes exactly "
+                          "match the flavor.",
+                          {'matching': len(matching), 'hosts': len(hosts)})
+                hosts = [h for h in hosts if h in matching]
+                filter_class_names = [n for n in names
+                                      if n not in EXACT_FILTERS]
+        return super(IronicHostManager, self).get_filtered_hosts(
+                hosts, filter_properties, filter_class_names, index)
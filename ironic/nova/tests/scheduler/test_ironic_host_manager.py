@@ -17,6 +17,8 @@
 Tests For IronicHostManager
 """
 
+import datetime
+
 import mock
 
 from ironic.nova.scheduler import ironic_host_manager
@@ -25,6 +27,7 @@ from ironic.nova.tests.scheduler import ironic_fakes
 from nova import db
 from nova import exception
 from nova.openstack.common import jsonutils
+from nova.openstack.common import timeutils
 from nova.scheduler import filters
 from nova.scheduler import host_manager
 from nova import test
@@ -90,14 +93,34 @@ class IronicHostManagerChangedNodesTestCase(test.NoDBTestCase):
                                         '[["i386", "baremetal", "baremetal"]]',
                             free_disk_gb=10, free_ram_mb=1024)
 
+    @mock.patch.object(ironic_host_manager.IronicNodeState,
+                       'update_from_compute_node')
     @mock.patch.object(ironic_host_manager.IronicNodeState, '__init__')
-    def test_create_ironic_node_state(self, init_mock):
+    def test_create_ironic_node_state(self, init_mock, update_mock):
         init_mock.return_value = None
         compute = {'cpu_info': 'baremetal cpu'}
         host_state = self.host_manager.host_state_cls('fake-host', 'fake-node',
                                                       compute=compute)
         self.assertIs(ironic_host_manager.IronicNodeState, type(host_state))
 
+    def test_create_ironic_node_state_indexed(self):
+        compute = dict(self.compute_node, updated_at=timeutils.utcnow())
+        orig_init = ironic_host_manager.IronicNodeState.__init__
+
+        def init(state, host, node, compute=None):
+            # apply the compute node record in the constructor, like the
+            # HostState of some nova releases does
+            orig_init(state, host, node)
+            state.update_from_compute_node(compute)
+
+        with mock.patch.object(ironic_host_manager.IronicNodeState,
+                               '__init__', init):
+            host_state = self.host_manager.host_state_cls(
+                    'fake-host', 'fake-node', compute=compute)
+        self.assertEqual(set([host_state]),
+                         self.host_manager.flavor_index.lookup(
+                                 memory_mb=1024, disk_mb=10240, vcpus=1))
+
     @mock.patch.object(host_manager.HostState, '__init__')
     def test_create_non_ironic_host_state(self, init_mock):
         init_mock.return_value = None
@@ -122,6 +145,9 @@ class IronicHostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.host_manager.get_all_host_states(context)
         host_states_map = self.host_manager.host_state_map
         self.assertEqual(3, len(host_states_map))
+        # the deleted node is no longer indexed
+        self.assertEqual(set(host_states_map.values()),
+                         self.host_manager.flavor_index.lookup())
 
     def test_get_all_host_states_after_delete_all(self):
         context = 'fake_context'
@@ -150,6 +176,48 @@ class IronicHostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(jsonutils.loads(self.compute_node['stats']),
                          host.stats)
 
+    @mock.patch.object(jsonutils, 'loads', wraps=jsonutils.loads)
+    def test_update_from_unchanged_compute_node(self, loads_mock):
+        self.compute_node['updated_at'] = timeutils.utcnow()
+        host = ironic_host_manager.IronicNodeState("fakehost", "fakenode")
+        host.update_from_compute_node(self.compute_node)
+        host.free_ram_mb = 42
+        host.update_from_compute_node(dict(self.compute_node))
+
+        # the compute node record was not applied again
+        self.assertEqual(42, host.free_ram_mb)
+        self.assertEqual(1, loads_mock.call_count)
+
+    @mock.patch.object(jsonutils, 'loads', wraps=jsonutils.loads)
+    def test_update_from_updated_compute_node(self, loads_mock):
+        self.compute_node['updated_at'] = timeutils.utcnow()
+        host = ironic_host_manager.IronicNodeState("fakehost", "fakenode")
+        host.update_from_compute_node(self.compute_node)
+        compute = dict(self.compute_node, free_ram_mb=512,
+                       updated_at=timeutils.utcnow() +
+                                  datetime.timedelta(seconds=1))
+        host.update_from_compute_node(compute)
+
+        self.assertEqual(512, host.free_ram_mb)
+        # the stats did not change, they were not parsed again
+        self.assertEqual(1, loads_mock.call_count)
+
+        compute['stats'] = jsonutils.dumps(dict(cpu_arch='x86_64'))
+        compute['updated_at'] += datetime.timedelta(seconds=1)
+        host.update_from_compute_node(compute)
+        self.assertEqual({'cpu_arch': 'x86_64'}, host.stats)
+
+    def test_update_from_compute_node_after_consume(self):
+        self.compute_node['updated_at'] = timeutils.utcnow()
+        host = ironic_host_manager.IronicNodeState("fakehost", "fakenode")
+        host.update_from_compute_node(self.compute_node)
+        instance = dict(root_gb=10, ephemeral_gb=0, memory_mb=1024, vcpus=1)
+        host.consume_from_instance(instance)
+        host.update_from_compute_node(self.compute_node)
+
+        self.assertEqual(1024, host.free_ram_mb)
+        self.assertEqual(0, host.vcpus_used)
+
     def test_consume_identical_instance_from_compute(self):
         host = ironic_host_manager.IronicNodeState("fakehost", "fakenode")
         host.update_from_compute_node(self.compute_node)
@@ -184,6 +252,122 @@ class IronicHostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(0, host.free_disk_mb)
 
 
+class IronicHostManagerFlavorIndexTestCase(test.NoDBTestCase):
+    """Test the flavor index of IronicHostManager."""
+
+    def setUp(self):
+        super(IronicHostManagerFlavorIndexTestCase, self).setUp()
+        self.host_manager = ironic_host_manager.IronicHostManager()
+        self.hosts = []
+        # the last compute node has no service
+        for compute in ironic_fakes.COMPUTE_NODES[:4]:
+            host = self.host_manager.host_state_cls(
+                    compute['service']['host'],
+                    compute['hypervisor_hostname'], compute=compute)
+            host.update_from_compute_node(compute)
+            self.hosts.append(host)
+        self.instance_type = dict(memory_mb=2048, root_gb=20, ephemeral_gb=0,
+                                  swap=0, vcpus=1)
+
+    def test_lookup(self):
+        index = self.host_manager.flavor_index
+        self.assertEqual(set([self.hosts[1]]),
+                         index.lookup(memory_mb=2048, disk_mb=20480,
+                                      vcpus=1, cpu_arch='i386'))
+        self.assertEqual(set(self.hosts), index.lookup(vcpus=1))
+        self.assertEqual(set(), index.lookup(memory_mb=2048,
+                                             cpu_arch='x86_64'))
+
+    def test_lookup_after_consume(self):
+        index = self.host_manager.flavor_index
+        self.hosts[1].consume_from_instance(self.instance_type)
+        self.assertEqual(set(), index.lookup(memory_mb=2048))
+        self.assertEqual(set([self.hosts[1]]),
+                         index.lookup(memory_mb=0, disk_mb=0, vcpus=0))
+
+    def test_lookup_after_update(self):
+        index = self.host_manager.flavor_index
+        compute = dict(ironic_fakes.COMPUTE_NODES[0], free_ram_mb=512)
+        self.hosts[0].update_from_compute_node(compute)
+        self.assertEqual(set([self.hosts[0]]), index.lookup(memory_mb=512))
+        self.assertEqual(set(), index.lookup(memory_mb=1024))
+
+    def test_lookup_unknown_vcpus(self):
+        index = self.host_manager.flavor_index
+        compute = dict(ironic_fakes.COMPUTE_NODES[0], vcpus=0)
+        self.hosts[0].update_from_compute_node(compute)
+        self.assertIn(self.hosts[0], index.lookup(memory_mb=1024, vcpus=4))
+
+    def test_lookup_after_remove(self):
+        index = self.host_manager.flavor_index
+        for host in self.hosts[1:]:
+            index.remove(host)
+        self.assertEqual(set(self.hosts[:1]), index.lookup())
+        # removing again, or re-indexing, is harmless
+        index.remove(self.hosts[1])
+        self.hosts[0].update_from_compute_node(
+                dict(ironic_fakes.COMPUTE_NODES[0], free_ram_mb=512))
+        self.assertEqual(set(self.hosts[:1]), index.lookup())
+
+    def _mock_choose_host_filters(self, expected_names):
+        self.mox.StubOutWithMock(self.host_manager, '_choose_host_filters')
+        self.stubs.Set(FakeFilterClass1, '_filter_one',
+                       lambda _self, obj, filter_props: True)
+        self.host_manager._choose_host_filters(expected_names).AndReturn(
+                [FakeFilterClass1])
+        self.mox.ReplayAll()
+
+    def test_get_filtered_hosts(self):
+        self.flags(scheduler_default_filters=['FakeFilterClass1',
+                                              'ExactRamFilter',
+                                              'ExactDiskFilter',
+                                              'ExactCoreFilter'])
+        self._mock_choose_host_filters(['FakeFilterClass1'])
+
+        result = self.host_manager.get_filtered_hosts(
+                iter(self.hosts), {'instance_type': self.instance_type})
+        self.assertEqual([self.hosts[1]], list(result))
+
+    def test_get_filtered_hosts_only_exact_ram(self):
+        self.flags(scheduler_default_filters=['ExactRamFilter'])
+        self._mock_choose_host_filters([])
+        instance_type = dict(self.instance_type, root_gb=100, vcpus=8)
+
+        result = self.host_manager.get_filtered_hosts(
+                self.hosts, {'instance_type': instance_type})
+        self.assertEqual([self.hosts[1]], list(result))
+
+    def test_get_filtered_hosts_cpu_arch(self):
+        self.flags(scheduler_default_filters=['ComputeCapabilitiesFilter',
+                                              'ExactRamFilter'])
+        self._mock_choose_host_filters(['ComputeCapabilitiesFilter'])
+        instance_type = dict(self.instance_type,
+                             extra_specs={'cpu_arch': 'x86_64'})
+
+        result = self.host_manager.get_filtered_hosts(
+                self.hosts, {'instance_type': instance_type})
+        self.assertEqual([], list(result))
+
+    def test_get_filtered_hosts_force_hosts(self):
+        self._mock_choose_host_filters(None)
+        filter_properties = {'instance_type': self.instance_type,
+                             'force_hosts': ['host1']}
+
+        result = self.host_manager.get_filtered_hosts(self.hosts,
+                                                      filter_properties)
+        self.assertEqual([self.hosts[0]], list(result))
+
+    def test_get_filtered_hosts_untracked_hosts(self):
+        self.flags(scheduler_default_filters=['ExactRamFilter'])
+        self._mock_choose_host_filters(['ExactRamFilter'])
+        hosts = self.hosts + [ironic_host_manager.IronicNodeState(
+                                    'fake_host', 'fake-node')]
+
+        result = self.host_manager.get_filtered_hosts(
+                hosts, {'instance_type': self.instance_type})
+        self.assertEqual(hosts, list(result))
+
+
 class IronicHostManagerTestFilters(test.NoDBTestCase):
     """Test filters work for IronicHostManager."""
 
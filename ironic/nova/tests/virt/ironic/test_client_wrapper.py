@@ -19,6 +19,7 @@ from oslo.config import cfg
 from ironic.nova.tests.virt.ironic import utils as ironic_utils
 from ironic.nova.virt.ironic import client_wrapper
 from ironicclient import client as ironic_client
+from ironicclient import exc as ironic_exception
 
 from nova import test
 
@@ -32,6 +33,8 @@ class IronicClientWrapperTestCase(test.NoDBTestCase):
     def setUp(self):
         super(IronicClientWrapperTestCase, self).setUp()
         self.icli = client_wrapper.IronicClientWrapper()
+        client_wrapper._CLIENTS.clear()
+        self.addCleanup(client_wrapper._CLIENTS.clear)
 
     @mock.patch.object(client_wrapper.IronicClientWrapper, '_multi_getattr')
     @mock.patch.object(client_wrapper.IronicClientWrapper, '_get_client')
@@ -77,3 +80,55 @@ class IronicClientWrapperTestCase(test.NoDBTestCase):
                     'ironic_url': CONF.ironic.api_endpoint}
         mock_ir_cli.assert_called_once_with(CONF.ironic.api_version,
                                             **expected)
+
+    @mock.patch.object(ironic_client, 'get_client')
+    def test__get_client_reused(self, mock_ir_cli):
+        self.flags(admin_auth_token=None, group='ironic')
+        client_wrapper.IronicClientWrapper().call("node.list")
+        client_wrapper.IronicClientWrapper().call("node.get", 'fake-uuid')
+        self.assertEqual(1, mock_ir_cli.call_count)
+        mock_ir_cli.return_value.node.get.assert_called_once_with('fake-uuid')
+
+    @mock.patch.object(ironic_client, 'get_client')
+    def test__get_client_concurrent_authentication(self, mock_ir_cli):
+        self.flags(admin_auth_token='fake-token', group='ironic')
+        first = mock.Mock()
+
+        def _get_client(*args, **kwargs):
+            # another thread stores its client while this one authenticates
+            client_wrapper._CLIENTS.clear()
+            mock_ir_cli.side_effect = None
+            mock_ir_cli.return_value = first
+            client_wrapper.IronicClientWrapper()._get_client()
+            return mock.Mock()
+
+        mock_ir_cli.side_effect = _get_client
+        self.assertIs(first, self.icli._get_client())
+        self.assertIs(first, self.icli._get_client())
+
+    @mock.patch.object(ironic_client, 'get_client')
+    def test__get_client_new_credentials(self, mock_ir_cli):
+        self.flags(admin_auth_token='fake-token', group='ironic')
+        self.icli.call("node.list")
+        self.flags(admin_auth_token='other-token', group='ironic')
+        self.icli.call("node.list")
+        self.assertEqual(2, mock_ir_cli.call_count)
+
+    @mock.patch.object(ironic_client, 'get_client')
+    def test_call_unauthorized_authenticates_again(self, mock_ir_cli):
+        expired = mock.Mock()
+        expired.node.list.side_effect = ironic_exception.Unauthorized()
+        fresh = mock.Mock()
+        mock_ir_cli.side_effect = [expired, fresh]
+        self.icli.call("node.list")
+        self.icli.call("node.list")
+        self.assertEqual(2, mock_ir_cli.call_count)
+        self.assertEqual(2, fresh.node.list.call_count)
+
+    @mock.patch.object(ironic_client, 'get_client')
+    def test_call_unauthorized_twice(self, mock_ir_cli):
+        mock_ir_cli.return_value.node.list.side_effect = (
+                ironic_exception.Unauthorized())
+        self.assertRaises(ironic_exception.Unauthorized,
+                          self.icli.call, "node.list")
+        self.assertEqual(2, mock_ir_cli.call_count)
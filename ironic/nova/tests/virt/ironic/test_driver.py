@@ -67,6 +67,81 @@ class FakeLoopingCall(object):
 FAKE_CLIENT_WRAPPER = FakeClientWrapper()
 
 
+class NodeWaiterTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(NodeWaiterTestCase, self).setUp()
+        self.flags(api_retry_interval=2, api_max_retry_interval=5,
+                   api_watch_timeout=30, group='ironic')
+        self.icli = mock.Mock()
+        self.node_uuid = uuidutils.generate_uuid()
+        ironic_driver.NodeWaiter.watch_supported = True
+        self.addCleanup(setattr, ironic_driver.NodeWaiter,
+                        'watch_supported', True)
+
+    def test_watch(self):
+        self.icli.call.return_value = (
+                None, {'provision_state': ironic_states.ACTIVE})
+        waiter = ironic_driver.NodeWaiter(self.icli,
+                                          wait_until=ironic_states.ACTIVE)
+        self.assertEqual(0, waiter(self.node_uuid))
+        self.icli.call.assert_called_once_with(
+                'http_client.json_request', 'GET', mock.ANY)
+        url = self.icli.call.call_args[0][2]
+        self.assertTrue(url.startswith('/v1/nodes/%s/states?'
+                                       % self.node_uuid))
+        self.assertIn('wait_until=active', url)
+        self.assertIn('timeout=30', url)
+
+    def test_watch_settled_in_error(self):
+        # ironic ends the watch of a failed node right away
+        self.icli.call.return_value = (
+                None, {'provision_state': ironic_states.ERROR})
+        waiter = ironic_driver.NodeWaiter(self.icli,
+                                          wait_until=ironic_states.ACTIVE)
+        self.assertEqual([2, 4], [waiter(self.node_uuid) for i in range(2)])
+
+    def test_watch_deleted(self):
+        self.icli.call.return_value = (
+                None, {'provision_state': ironic_states.NOSTATE})
+        waiter = ironic_driver.NodeWaiter(self.icli,
+                                          wait_until=ironic_states.DELETED)
+        self.assertEqual(0, waiter(self.node_uuid))
+
+    def test_watch_capped_by_timeout(self):
+        self.icli.call.return_value = (None, {})
+        waiter = ironic_driver.NodeWaiter(self.icli)
+        self.assertEqual(0, waiter(self.node_uuid, timeout=12.5))
+        url = self.icli.call.call_args[0][2]
+        self.assertIn('timeout=12', url)
+        self.assertNotIn('wait_until', url)
+
+    def test_watch_not_supported_backs_off(self):
+        self.icli.call.side_effect = ironic_exception.BadRequest(
+                'Unknown argument: "timeout"')
+        waiter = ironic_driver.NodeWaiter(self.icli)
+        self.assertEqual([2, 4, 5, 5],
+                         [waiter(self.node_uuid) for i in range(4)])
+        # only tried once, for every waiter
+        self.assertEqual(1, self.icli.call.call_count)
+        self.assertFalse(ironic_driver.NodeWaiter.watch_supported)
+
+    def test_watch_rejected(self):
+        self.icli.call.side_effect = ironic_exception.BadRequest()
+        waiter = ironic_driver.NodeWaiter(self.icli)
+        self.assertEqual([2, 4], [waiter(self.node_uuid) for i in range(2)])
+        # other errors do not disable the watches of other waiters
+        self.assertEqual(2, self.icli.call.call_count)
+        self.assertTrue(ironic_driver.NodeWaiter.watch_supported)
+
+    def test_watch_disabled(self):
+        self.flags(api_watch_timeout=0, group='ironic')
+        waiter = ironic_driver.NodeWaiter(self.icli)
+        self.assertEqual(2, waiter(self.node_uuid))
+        self.assertEqual(1, waiter(self.node_uuid, timeout=1))
+        self.assertFalse(self.icli.call.called)
+
+
 @mock.patch.object(cw, 'IronicClientWrapper', lambda *_: FAKE_CLIENT_WRAPPER)
 class IronicDriverTestCase(test.NoDBTestCase):
 
@@ -194,6 +269,40 @@ class IronicDriverTestCase(test.NoDBTestCase):
                          '"test_spec": "test_value"}',
                          result['stats'])
 
+    def test__node_resource_memoised(self):
+        properties = {'cpus': 2, 'memory_mb': 512, 'local_gb': 10,
+                      'cpu_arch': 'x86_64'}
+        node = ironic_utils.get_test_node(instance_uuid=None,
+                                          power_state=ironic_states.POWER_OFF,
+                                          properties=properties)
+
+        with mock.patch.object(ironic_driver.jsonutils, 'dumps',
+                               wraps=ironic_driver.jsonutils.dumps) as dumps:
+            result = self.driver._node_resource(node)
+            result['vcpus_used'] = 1
+            self.assertEqual(0, self.driver._node_resource(node)['vcpus_used'])
+            # another node with the same cpu_arch
+            other = ironic_utils.get_test_node(
+                    uuid=uuidutils.generate_uuid(), instance_uuid=None,
+                    power_state=ironic_states.POWER_OFF,
+                    properties=properties)
+            self.driver._node_resource(other)
+            # supported_instances and stats, encoded once
+            self.assertEqual(2, dumps.call_count)
+
+        node.power_state = ironic_states.ERROR
+        self.assertEqual(0, self.driver._node_resource(node)['vcpus'])
+        node.power_state = ironic_states.POWER_OFF
+        node.instance_uuid = uuidutils.generate_uuid()
+        self.assertEqual(2, self.driver._node_resource(node)['vcpus_used'])
+
+    def test__node_resource_keeps_extra_specs(self):
+        properties = {'cpu_arch': 'x86_64'}
+        node = ironic_utils.get_test_node(properties=properties)
+        result = self.driver._node_resource(node)
+        self.assertEqual('x86_64', result['cpu_arch'])
+        self.assertEqual('', self.driver.extra_specs['cpu_arch'])
+
     @mock.patch.object(firewall.NoopFirewallDriver, 'prepare_instance_filter',
                        create=True)
     @mock.patch.object(firewall.NoopFirewallDriver, 'setup_basic_filtering',
@@ -237,8 +346,8 @@ class IronicDriverTestCase(test.NoDBTestCase):
                                           instance_uuid)
 
     @mock.patch.object(cw.IronicClientWrapper, 'call')
-    @mock.patch.object(instance_obj.Instance, 'get_by_uuid')
-    def test_list_instances(self, mock_inst_by_uuid, mock_call):
+    @mock.patch.object(instance_obj.InstanceList, 'get_by_filters')
+    def test_list_instances(self, mock_inst_by_filters, mock_call):
         nodes = []
         instances = []
         for i in range(2):
@@ -248,17 +357,43 @@ class IronicDriverTestCase(test.NoDBTestCase):
                                                              uuid=uuid))
             nodes.append(ironic_utils.get_test_node(instance_uuid=uuid))
 
-        mock_inst_by_uuid.side_effect = instances
+        mock_inst_by_filters.return_value = instances
         mock_call.return_value = nodes
 
         response = self.driver.list_instances()
         mock_call.assert_called_with("node.list", associated=True)
-        expected_calls = [mock.call(mock.ANY, instances[0].uuid),
-                          mock.call(mock.ANY, instances[1].uuid)]
-        mock_inst_by_uuid.assert_has_calls(expected_calls)
+        mock_inst_by_filters.assert_called_once_with(
+                mock.ANY, {'uuid': mock.ANY}, expected_attrs=[])
+        filters = mock_inst_by_filters.call_args[0][1]
+        self.assertEqual(sorted(i.uuid for i in instances),
+                         sorted(filters['uuid']))
         self.assertEqual(['instance-00000000', 'instance-00000001'],
                           sorted(response))
 
+    @mock.patch.object(cw.IronicClientWrapper, 'call')
+    @mock.patch.object(instance_obj.InstanceList, 'get_by_filters')
+    def test_list_instances_none(self, mock_inst_by_filters, mock_call):
+        mock_call.return_value = []
+        self.assertEqual([], self.driver.list_instances())
+        self.assertFalse(mock_inst_by_filters.called)
+
+    @mock.patch.object(FAKE_CLIENT.node, 'list')
+    @mock.patch.object(instance_obj.InstanceList, 'get_by_filters')
+    def test_list_instances_from_cache(self, mock_inst_by_filters,
+                                       mock_list):
+        uuid = uuidutils.generate_uuid()
+        mock_list.return_value = [
+                ironic_utils.get_test_node(uuid=uuidutils.generate_uuid(),
+                                           instance_uuid=uuid),
+                ironic_utils.get_test_node(uuid=uuidutils.generate_uuid())]
+        mock_inst_by_filters.return_value = [
+                fake_instance.fake_instance_obj(self.ctx, id=0, uuid=uuid)]
+        self.driver.get_available_nodes()
+        self.assertEqual(['instance-00000000'], self.driver.list_instances())
+        mock_list.assert_called_once_with(detail=True, limit=0)
+        mock_inst_by_filters.assert_called_once_with(
+                mock.ANY, {'uuid': [uuid]}, expected_attrs=[])
+
     @mock.patch.object(cw.IronicClientWrapper, 'call')
     def test_list_instance_uuids(self, mock_call):
         num_nodes = 2
@@ -325,6 +460,54 @@ class IronicDriverTestCase(test.NoDBTestCase):
         available_nodes = self.driver.get_available_nodes()
         expected_uuids = [n['uuid'] for n in node_dicts]
         self.assertEqual(sorted(expected_uuids), sorted(available_nodes))
+        mock_list.assert_called_once_with(detail=True, limit=0)
+
+    @mock.patch.object(FAKE_CLIENT.node, 'get')
+    @mock.patch.object(FAKE_CLIENT.node, 'list')
+    def test_get_available_resource_from_cache(self, mock_list, mock_get):
+        node = ironic_utils.get_test_node(properties={'cpus': 2})
+        mock_list.return_value = [node]
+        self.driver.get_available_nodes()
+        self.assertTrue(self.driver.node_is_available(node.uuid))
+        result = self.driver.get_available_resource(node.uuid)
+        self.assertEqual(2, result['vcpus'])
+        self.assertFalse(mock_get.called)
+
+    @mock.patch.object(ironic_driver.time, 'time')
+    @mock.patch.object(FAKE_CLIENT.node, 'get')
+    @mock.patch.object(FAKE_CLIENT.node, 'list')
+    def test_get_available_resource_stale_cache(self, mock_list, mock_get,
+                                                mock_time):
+        self.flags(node_cache_ttl=60, group='ironic')
+        node = ironic_utils.get_test_node()
+        mock_list.return_value = [node]
+        mock_get.return_value = node
+        mock_time.return_value = 1000
+        self.driver.get_available_nodes()
+        mock_time.return_value = 1060
+        self.driver.get_available_resource(node.uuid)
+        mock_get.assert_called_once_with(node.uuid)
+
+    @mock.patch.object(FAKE_CLIENT.node, 'list')
+    def test_get_host_stats(self, mock_list):
+        nodes = [ironic_utils.get_test_node(uuid=uuidutils.generate_uuid())
+                 for i in range(2)]
+        mock_list.return_value = nodes
+        stats = self.driver.get_host_stats()
+        self.assertEqual(sorted(n.uuid for n in nodes),
+                         sorted(s['node'] for s in stats))
+        self.driver.get_host_stats()
+        mock_list.assert_called_once_with(detail=True, limit=0)
+
+    @mock.patch.object(FAKE_CLIENT.node, 'list')
+    def test_get_host_stats_forgets_deleted_nodes(self, mock_list):
+        nodes = [ironic_utils.get_test_node(uuid=uuidutils.generate_uuid())
+                 for i in range(2)]
+        mock_list.return_value = nodes
+        self.driver.get_host_stats()
+        mock_list.return_value = nodes[1:]
+        self.driver.get_host_stats(refresh=True)
+        self.assertEqual([nodes[1].uuid], list(self.driver._node_resources))
 
     @mock.patch.object(FAKE_CLIENT.node, 'get')
     @mock.patch.object(ironic_driver.IronicDriver, '_node_resource')
@@ -396,7 +579,7 @@ class IronicDriverTestCase(test.NoDBTestCase):
         self.assertEqual([], result)
 
     @mock.patch.object(instance_obj.Instance, 'save')
-    @mock.patch.object(loopingcall, 'FixedIntervalLoopingCall')
+    @mock.patch.object(loopingcall, 'DynamicLoopingCall')
     @mock.patch.object(FAKE_CLIENT, 'node')
     @mock.patch.object(flavor_obj, 'get_by_id')
     @mock.patch.object(ironic_driver.IronicDriver, '_wait_for_active')
@@ -435,12 +618,14 @@ class IronicDriverTestCase(test.NoDBTestCase):
 
         mock_looping.assert_called_once_with(mock_wait_active,
                                              FAKE_CLIENT_WRAPPER,
-                                             instance)
-        fake_looping_call.start.assert_called_once_with(
-            interval=CONF.ironic.api_retry_interval)
+                                             instance, mock.ANY)
+        waiter = mock_looping.call_args[0][3]
+        self.assertIsInstance(waiter, ironic_driver.NodeWaiter)
+        self.assertEqual(ironic_states.ACTIVE, waiter.wait_until)
+        fake_looping_call.start.assert_called_once_with()
         fake_looping_call.wait.assert_called_once()
 
-    @mock.patch.object(loopingcall, 'FixedIntervalLoopingCall')
+    @mock.patch.object(loopingcall, 'DynamicLoopingCall')
     @mock.patch.object(FAKE_CLIENT, 'node')
     @mock.patch.object(flavor_obj, 'get_by_id')
     @mock.patch.object(ironic_driver.IronicDriver, 'destroy')
@@ -473,6 +658,43 @@ class IronicDriverTestCase(test.NoDBTestCase):
             self.driver.spawn, self.ctx, instance, None, [], None)
         mock_destroy.assert_called_once_with(self.ctx, instance, None)
 
+    @mock.patch.object(FAKE_CLIENT.node, 'get_by_instance_uuid')
+    def test__wait_for_active_waits(self, mock_gbiu):
+        node = ironic_utils.get_test_node(
+                provision_state=ironic_states.DEPLOYING,
+                target_provision_state=ironic_states.ACTIVE)
+        instance = fake_instance.fake_instance_obj(self.ctx, node=node.uuid)
+        mock_gbiu.return_value = node
+        waiter = mock.Mock(return_value=0)
+        self.assertEqual(0, self.driver._wait_for_active(FAKE_CLIENT_WRAPPER,
+                                                         instance, waiter))
+        waiter.assert_called_once_with(node.uuid)
+
+    @mock.patch.object(FAKE_CLIENT.node, 'get_by_instance_uuid')
+    def test__wait_for_active_error(self, mock_gbiu):
+        node = ironic_utils.get_test_node(
+                provision_state=ironic_states.ERROR,
+                target_provision_state=ironic_states.ACTIVE)
+        instance = fake_instance.fake_instance_obj(self.ctx, node=node.uuid)
+        mock_gbiu.return_value = node
+        waiter = mock.Mock()
+        self.assertRaises(exception.InstanceDeployFailure,
+                          self.driver._wait_for_active,
+                          FAKE_CLIENT_WRAPPER, instance, waiter)
+        self.assertFalse(waiter.called)
+
+    @mock.patch.object(FAKE_CLIENT.node, 'get_by_instance_uuid')
+    def test__wait_for_active_done(self, mock_gbiu):
+        node = ironic_utils.get_test_node(
+                provision_state=ironic_states.ACTIVE)
+        instance = fake_instance.fake_instance_obj(self.ctx, node=node.uuid)
+        mock_gbiu.return_value = node
+        waiter = mock.Mock()
+        self.assertRaises(loopingcall.LoopingCallDone,
+                          self.driver._wait_for_active,
+                          FAKE_CLIENT_WRAPPER, instance, waiter)
+        self.assertFalse(waiter.called)
+
     @mock.patch.object(FAKE_CLIENT.node, 'update')
     def test__add_driver_fields_good(self, mock_update):
         node = ironic_utils.get_test_node(driver='fake')
@@ -619,7 +841,7 @@ class IronicDriverTestCase(test.NoDBTestCase):
                                             instance['instance_type_id'])
         mock_cleanup_deploy.assert_called_once_with(node, instance, None)
 
-    @mock.patch.object(loopingcall, 'FixedIntervalLoopingCall')
+    @mock.patch.object(loopingcall, 'DynamicLoopingCall')
     @mock.patch.object(instance_obj.Instance, 'save')
     @mock.patch.object(FAKE_CLIENT, 'node')
     @mock.patch.object(flavor_obj, 'get_by_id')
@@ -659,7 +881,10 @@ class IronicDriverTestCase(test.NoDBTestCase):
 
         mock_node.get_by_instance_uuid.return_value = node
         mock_node.set_provision_state.side_effect = fake_set_provision_state
-        self.driver.destroy(self.ctx, instance, network_info, None)
+        with mock.patch.object(ironic_driver, 'NodeWaiter') as mock_waiter:
+            self.driver.destroy(self.ctx, instance, network_info, None)
+        mock_waiter.assert_called_once_with(
+                FAKE_CLIENT_WRAPPER, wait_until=ironic_states.DELETED)
         mock_node.set_provision_state.assert_called_once_with(node_uuid,
                                                               'deleted')
         mock_node.get_by_instance_uuid.assert_called_with(instance.uuid)
@@ -766,10 +991,57 @@ class IronicDriverTestCase(test.NoDBTestCase):
                              utils.get_test_network_info())
         mock_sp.assert_called_once_with(node_uuid, 'on')
 
-    @mock.patch.object(FAKE_CLIENT.node, 'list_ports')
     @mock.patch.object(FAKE_CLIENT.port, 'update')
-    @mock.patch.object(ironic_driver.IronicDriver, '_unplug_vifs')
-    def test_plug_vifs_with_port(self, mock_uvifs, mock_port_udt, mock_lp):
+    @mock.patch.object(FAKE_CLIENT.http_client, 'json_request')
+    def test__update_ports(self, mock_jr, mock_port_udt):
+        patch = [{'op': 'add', 'path': '/extra/vif_port_id', 'value': 'v1'}]
+        self.driver._update_ports(FAKE_CLIENT_WRAPPER,
+                                  [('p1', patch), ('p2', patch)])
+
+        body = [dict(patch[0], uuid='p1'), dict(patch[0], uuid='p2')]
+        mock_jr.assert_called_once_with('PATCH', '/v1/ports', body=body)
+        self.assertFalse(mock_port_udt.called)
+
+    @mock.patch.object(FAKE_CLIENT.port, 'update')
+    @mock.patch.object(FAKE_CLIENT.http_client, 'json_request')
+    def test__update_ports_none(self, mock_jr, mock_port_udt):
+        self.driver._update_ports(FAKE_CLIENT_WRAPPER, [])
+        self.assertFalse(mock_jr.called)
+        self.assertFalse(mock_port_udt.called)
+
+    @mock.patch.object(FAKE_CLIENT.port, 'update')
+    @mock.patch.object(FAKE_CLIENT.http_client, 'json_request')
+    def test__update_ports_fallback(self, mock_jr, mock_port_udt):
+        mock_jr.side_effect = ironic_exception.MethodNotAllowed()
+        patch = [{'op': 'add', 'path': '/extra/vif_port_id', 'value': 'v1'}]
+        self.driver._update_ports(FAKE_CLIENT_WRAPPER,
+                                  [('p1', patch), ('p2', patch)])
+
+        self.assertEqual(1, mock_jr.call_count)
+        self.assertEqual([mock.call('p1', patch), mock.call('p2', patch)],
+                         mock_port_udt.call_args_list)
+
+    @mock.patch.object(FAKE_CLIENT.port, 'update')
+    @mock.patch.object(FAKE_CLIENT.http_client, 'json_request')
+    def test__update_ports_fallback_bad_request(self, mock_jr,
+                                                mock_port_udt):
+        mock_jr.side_effect = ironic_exception.BadRequest()
+        mock_port_udt.side_effect = ironic_exception.BadRequest()
+        patch = [{'op': 'remove', 'path': '/extra/vif_port_id'}]
+        self.assertRaises(ironic_exception.BadRequest,
+                          self.driver._update_ports, FAKE_CLIENT_WRAPPER,
+                          [('p1', patch), ('p2', patch)])
+        mock_port_udt.assert_called_once_with('p1', patch)
+
+        mock_port_udt.reset_mock()
+        self.driver._update_ports(FAKE_CLIENT_WRAPPER,
+                                  [('p1', patch), ('p2', patch)],
+                                  ignore_bad_request=True)
+        self.assertEqual(2, mock_port_udt.call_count)
+
+    @mock.patch.object(FAKE_CLIENT.node, 'list_ports')
+    @mock.patch.object(ironic_driver.IronicDriver, '_update_ports')
+    def test_plug_vifs_with_port(self, mock_up, mock_lp):
         node_uuid = 'aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee'
         node = ironic_utils.get_test_node(uuid=node_uuid)
         port = ironic_utils.get_test_port()
@@ -787,9 +1059,9 @@ class IronicDriverTestCase(test.NoDBTestCase):
         self.driver._plug_vifs(node, instance, network_info)
 
         # asserts
-        mock_uvifs.assert_called_once_with(node, instance, network_info)
         mock_lp.assert_called_once_with(node_uuid)
-        mock_port_udt.assert_called_with(port.uuid, expected_patch)
+        mock_up.assert_called_once_with(mock.ANY,
+                                        [(port.uuid, expected_patch)])
 
     @mock.patch.object(FAKE_CLIENT.node, 'get')
     @mock.patch.object(ironic_driver.IronicDriver, '_plug_vifs')
@@ -806,11 +1078,9 @@ class IronicDriverTestCase(test.NoDBTestCase):
         mock_get.assert_called_once_with(node_uuid)
         mock__plug_vifs.assert_called_once_with(node, instance, network_info)
 
-    @mock.patch.object(FAKE_CLIENT.port, 'update')
     @mock.patch.object(FAKE_CLIENT.node, 'list_ports')
-    @mock.patch.object(ironic_driver.IronicDriver, '_unplug_vifs')
-    def test_plug_vifs_count_mismatch(self, mock_uvifs, mock_lp,
-                                      mock_port_udt):
+    @mock.patch.object(ironic_driver.IronicDriver, '_update_ports')
+    def test_plug_vifs_count_mismatch(self, mock_up, mock_lp):
         node_uuid = 'aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee'
         node = ironic_utils.get_test_node(uuid=node_uuid)
         port = ironic_utils.get_test_port()
@@ -827,16 +1097,13 @@ class IronicDriverTestCase(test.NoDBTestCase):
                           network_info)
 
         # asserts
-        mock_uvifs.assert_called_once_with(node, instance, network_info)
         mock_lp.assert_called_once_with(node_uuid)
-        # assert port.update() was not called
-        self.assertFalse(mock_port_udt.called)
+        # assert no port was updated
+        self.assertFalse(mock_up.called)
 
-    @mock.patch.object(FAKE_CLIENT.port, 'update')
+    @mock.patch.object(FAKE_CLIENT.http_client, 'json_request')
     @mock.patch.object(FAKE_CLIENT.node, 'list_ports')
-    @mock.patch.object(ironic_driver.IronicDriver, '_unplug_vifs')
-    def test_plug_vifs_no_network_info(self, mock_uvifs, mock_lp,
-                                       mock_port_udt):
+    def test_plug_vifs_no_network_info(self, mock_lp, mock_jr):
         node_uuid = 'aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee'
         node = ironic_utils.get_test_node(uuid=node_uuid)
         port = ironic_utils.get_test_port()
@@ -849,14 +1116,14 @@ class IronicDriverTestCase(test.NoDBTestCase):
         self.driver._plug_vifs(node, instance, network_info)
 
         # asserts
-        mock_uvifs.assert_called_once_with(node, instance, network_info)
         mock_lp.assert_called_once_with(node_uuid)
-        # assert port.update() was not called
-        self.assertFalse(mock_port_udt.called)
+        # assert no port was updated
+        self.assertFalse(mock_jr.called)
 
     @mock.patch.object(FAKE_CLIENT.port, 'update')
+    @mock.patch.object(FAKE_CLIENT.http_client, 'json_request')
     @mock.patch.object(FAKE_CLIENT, 'node')
-    def test_unplug_vifs(self, mock_node, mock_update):
+    def test_unplug_vifs(self, mock_node, mock_jr, mock_update):
         node_uuid = 'aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee'
         node = ironic_utils.get_test_node(uuid=node_uuid)
         port = ironic_utils.get_test_port()
@@ -866,14 +1133,38 @@ class IronicDriverTestCase(test.NoDBTestCase):
 
         instance = fake_instance.fake_instance_obj(self.ctx,
                                                    node=node_uuid)
-        expected_patch = [{'op': 'remove', 'path':
-                           '/extra/vif_port_id'}]
+        expected_body = [{'op': 'remove', 'path': '/extra/vif_port_id',
+                          'uuid': port.uuid}]
         self.driver.unplug_vifs(instance,
                                 utils.get_test_network_info())
 
         # asserts
         mock_node.get.assert_called_once_with(node_uuid)
         mock_node.list_ports.assert_called_once_with(node_uuid)
+        mock_jr.assert_called_once_with('PATCH', '/v1/ports',
+                                        body=expected_body)
+        self.assertFalse(mock_update.called)
+
+    @mock.patch.object(FAKE_CLIENT.port, 'update')
+    @mock.patch.object(FAKE_CLIENT.http_client, 'json_request')
+    @mock.patch.object(FAKE_CLIENT, 'node')
+    def test_unplug_vifs_not_plugged(self, mock_node, mock_jr, mock_update):
+        node_uuid = 'aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee'
+        node = ironic_utils.get_test_node(uuid=node_uuid)
+        port = ironic_utils.get_test_port()
+
+        mock_node.get.return_value = node
+        mock_node.list_ports.return_value = [port]
+        mock_jr.side_effect = ironic_exception.BadRequest()
+        mock_update.side_effect = ironic_exception.BadRequest()
+
+        instance = fake_instance.fake_instance_obj(self.ctx,
+                                                   node=node_uuid)
+        expected_patch = [{'op': 'remove', 'path':
+                           '/extra/vif_port_id'}]
+        self.driver.unplug_vifs(instance,
+                                utils.get_test_network_info())
+
         mock_update.assert_called_once_with(port.uuid, expected_patch)
 
     @mock.patch.object(FAKE_CLIENT.port, 'update')
@@ -82,9 +82,16 @@ class FakePortClient(object):
         pass
 
 
+class FakeHTTPClient(object):
+
+    def json_request(self, method, url, **kwargs):
+        pass
+
+
 class FakeNodeClient(object):
 
-    def list(self):
+    def list(self, associated=None, maintenance=None, marker=None, limit=None,
+             detail=False):
         return []
 
     def get(self, node_uuid):
@@ -111,5 +118,6 @@ class FakeNodeClient(object):
 
 class FakeClient(object):
 
+    http_client = FakeHTTPClient()
     node = FakeNodeClient()
     port = FakePortClient()
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
 import time
 
 from ironicclient import client as ironic_client
@@ -28,13 +29,16 @@ from oslo.config import cfg
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
+# The authenticated clients of the process, keyed by their credentials.
+# A client is reused, with its token, until the token is rejected.
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
 
 class IronicClientWrapper(object):
     """Ironic client wrapper class that encapsulates retry logic."""
 
     def _get_client(self):
-        # TODO(deva): save and reuse existing client & auth token
-        #             until it expires or is no longer valid
         auth_token = CONF.ironic.admin_auth_token
         if auth_token is None:
             kwargs = {'os_username': CONF.ironic.admin_username,
@@ -47,6 +51,12 @@ class IronicClientWrapper(object):
             kwargs = {'os_auth_token': auth_token,
                       'ironic_url': CONF.ironic.api_endpoint}
 
+        key = (CONF.ironic.api_version, tuple(sorted(kwargs.items())))
+        with _CLIENTS_LOCK:
+            cli = _CLIENTS.get(key)
+        if cli is not None:
+            return cli
+
         try:
             cli = ironic_client.get_client(CONF.ironic.api_version, **kwargs)
         except ironic_exception.Unauthorized:
@@ -54,7 +64,17 @@ class IronicClientWrapper(object):
             LOG.error(msg)
             raise exception.NovaException(msg)
 
-        return cli
+        # NOTE: another thread may have authenticated meanwhile, use the
+        # client it stored so that only one is kept.
+        with _CLIENTS_LOCK:
+            return _CLIENTS.setdefault(key, cli)
+
+    def _invalidate_client(self, client):
+        """Forget a client, so that the next one authenticates again."""
+        with _CLIENTS_LOCK:
+            for key, cli in list(_CLIENTS.items()):
+                if cli is client:
+                    del _CLIENTS[key]
 
     def _multi_getattr(self, obj, attr):
         """Support nested attribute path for getattr().
@@ -69,6 +89,18 @@ class IronicClientWrapper(object):
             obj = getattr(obj, attribute)
         return obj
 
+    def _call(self, client, method, *args, **kwargs):
+        try:
+            return self._multi_getattr(client, method)(*args, **kwargs)
+        except ironic_exception.Unauthorized:
+            # NOTE: the token of a reused client expired or was revoked,
+            # authenticate again and retry once.
+            LOG.debug("Ironic rejected the token of the client, "
+                      "authenticating again.")
+            self._invalidate_client(client)
+            client = self._get_client()
+            return self._multi_getattr(client, method)(*args, **kwargs)
+
     def call(self, method, *args, **kwargs):
         """Call an Ironic client method and retry on errors.
 
@@ -77,6 +109,8 @@ class IronicClientWrapper(object):
         :param kwargs: Client method keyword arguments.
 
         :raises: NovaException if all retries failed.
+        :raises: Unauthorized if the token is rejected, even after
+                 authenticating again.
         """
         retry_excs = (ironic_exception.ServiceUnavailable,
                       ironic_exception.ConnectionRefused,
@@ -86,7 +120,7 @@ class IronicClientWrapper(object):
         for attempt in range(1, num_attempts + 1):
             client = self._get_client()
             try:
-                return self._multi_getattr(client, method)(*args, **kwargs)
+                return self._call(client, method, *args, **kwargs)
             except retry_excs:
                 msg = (_("Error contacting Ironic server for '%(method)s'. "
                          "Attempt %(attempt)d of %(total)d")
@@ -21,8 +21,11 @@ A driver wrapping the Ironic API, such that Nova may provision
 bare metal resources.
 """
 
+import time
+
 from ironicclient import exc as ironic_exception
 from oslo.config import cfg
+from six.moves.urllib import parse as urlparse
 
 from ironic.nova.virt.ironic import client_wrapper
 from ironic.nova.virt.ironic import ironic_states
@@ -76,6 +79,22 @@ opts = [
                default=2,
                help=('How often to retry in seconds when a request '
                      'does conflict')),
+    cfg.IntOpt('api_max_retry_interval',
+               default=10,
+               help=('The maximum number of seconds to wait between two '
+                     'checks of the state of a node, when the interval is '
+                     'backed off.')),
+    cfg.IntOpt('api_watch_timeout',
+               default=30,
+               help=('How long, in seconds, Ironic is asked to hold a '
+                     'request until the state of a node changes, while '
+                     'waiting for a deploy or a tear down to complete. '
+                     '0 disables watches, and the state is then polled.')),
+    cfg.IntOpt('node_cache_ttl',
+               default=60,
+               help=('How long, in seconds, the nodes listed when the '
+                     'resources are updated are reused for, instead of '
+                     'getting each node again. 0 disables the reuse.')),
     ]
 
 ironic_group = cfg.OptGroup(name='ironic',
@@ -153,6 +172,93 @@ def _log_ironic_polling(what, node, instance):
               instance=instance)
 
 
+class NodeWaiter(object):
+    """Wait for the state of a node to change, between two checks of it.
+
+    Ironic is asked to hold the request until the state of the node changes,
+    or reaches wait_until. The node is checked again right away only if it
+    did reach wait_until. Otherwise, as when Ironic does not support such
+    watches, the state is polled, at an interval backed off exponentially
+    from api_retry_interval to api_max_retry_interval seconds.
+
+    """
+    # Cleared the first time Ironic rejects the parameters of a watch
+    watch_supported = True
+
+    def __init__(self, icli, wait_until=None):
+        self.icli = icli
+        self.wait_until = wait_until
+        self.interval = CONF.ironic.api_retry_interval
+
+    @staticmethod
+    def _watch_unsupported(e):
+        """Whether a BadRequest rejects the parameters of a watch, as an
+        Ironic API which does not support them does for any argument it
+        does not know.
+        """
+        text = '%s %s' % (e, getattr(e, 'details', None) or '')
+        return 'Unknown argument' in text
+
+    def _watch(self, node_uuid, timeout):
+        params = {'timeout': timeout}
+        if self.wait_until:
+            params['wait_until'] = self.wait_until
+        url = '/v1/nodes/%s/states?%s' % (node_uuid,
+                                          urlparse.urlencode(params))
+        resp, body = self.icli.call('http_client.json_request', 'GET', url)
+        return body or {}
+
+    def _reached(self, states):
+        """Whether the states returned by a watch are the awaited ones.
+
+        Ironic also ends the watch of a node which failed, or whose
+        wait_until state was not reached before the timeout.
+        """
+        if not self.wait_until:
+            # any change of state ends the watch
+            return True
+        if self.wait_until == ironic_states.DELETED:
+            return states.get('provision_state') == ironic_states.NOSTATE
+        return self.wait_until in (states.get('power_state'),
+                                   states.get('provision_state'))
+
+    def __call__(self, node_uuid, timeout=None):
+        """Wait for the node.
+
+        :param node_uuid: the uuid of the node.
+        :param timeout: the maximum number of seconds to wait.
+        :returns: the number of seconds to sleep before checking the
+                  state of the node again.
+
+        """
+        watch_timeout = CONF.ironic.api_watch_timeout
+        if timeout is not None:
+            watch_timeout = min(watch_timeout, int(timeout))
+        if watch_timeout > 0 and NodeWaiter.watch_supported:
+            try:
+                if self._reached(self._watch(node_uuid, watch_timeout)):
+                    return 0
+            except ironic_exception.NotFound:
+                # the node is gone, let the next check tell
+                return 0
+            except ironic_exception.BadRequest as e:
+                if self._watch_unsupported(e):
+                    LOG.info(_("Ironic does not support watching the states "
+                               "of nodes, polling them instead."))
+                    NodeWaiter.watch_supported = False
+                else:
+                    LOG.warning(_("Ironic rejected a watch of node "
+                                  "%(node)s, polling it instead: %(err)s"),
+                                {'node': node_uuid, 'err': e})
+
+        interval = self.interval
+        self.interval = min(self.interval * 2,
+                            CONF.ironic.api_max_retry_interval)
+        if timeout is not None:
+            interval = min(interval, timeout)
+        return interval
+
+
 class IronicDriver(virt_driver.ComputeDriver):
     """Hypervisor driver for Ironic - bare metal provisioning."""
 
@@ -175,6 +281,37 @@ class IronicDriver(virt_driver.ComputeDriver):
             extra_specs[keyval[0]] = keyval[1]
 
         self.extra_specs = extra_specs
+        # The extra specs and JSON fields of resources, by cpu_arch
+        self._arch_resources = {}
+        # The resource dict of each node, by uuid, with the node fields
+        # it was built from
+        self._node_resources = {}
+
+        # A snapshot of all the nodes, by uuid, and when it was taken
+        self.node_cache = {}
+        self.node_cache_time = 0
+
+    def _refresh_cache(self):
+        """Take a new snapshot of all the nodes, in a single listing."""
+        icli = client_wrapper.IronicClientWrapper()
+        node_list = icli.call("node.list", detail=True, limit=0)
+        self.node_cache = dict((n.uuid, n) for n in node_list)
+        self.node_cache_time = time.time()
+        # forget the resources of the nodes which are gone
+        for node_uuid in list(self._node_resources):
+            if node_uuid not in self.node_cache:
+                del self._node_resources[node_uuid]
+
+    def _cache_is_fresh(self):
+        age = time.time() - self.node_cache_time
+        return age < CONF.ironic.node_cache_ttl
+
+    def _get_node(self, node_uuid):
+        """Get a node from the snapshot, or from Ironic if it is stale."""
+        if self._cache_is_fresh() and node_uuid in self.node_cache:
+            return self.node_cache[node_uuid]
+        icli = client_wrapper.IronicClientWrapper()
+        return icli.call("node.get", node_uuid)
 
     def _node_resources_unavailable(self, node_obj):
         """Determines whether the node's resources should be presented
@@ -184,14 +321,47 @@ class IronicDriver(virt_driver.ComputeDriver):
         return (node_obj.maintenance or
                 node_obj.power_state in bad_states)
 
+    def _arch_resource(self, cpu_arch):
+        """Return the parts of a resource dict depending on the cpu_arch.
+
+        :returns: a tuple of the extra specs, and of the JSON encoded
+                  supported instances and stats, computed once per cpu_arch.
+        """
+        fields = self._arch_resources.get(cpu_arch)
+        if fields is None:
+            nodes_extra_specs = dict(self.extra_specs, cpu_arch=cpu_arch)
+            fields = (nodes_extra_specs,
+                      jsonutils.dumps(
+                              _get_nodes_supported_instances(cpu_arch)),
+                      jsonutils.dumps(nodes_extra_specs))
+            self._arch_resources[cpu_arch] = fields
+        return fields
+
     def _node_resource(self, node):
-        """Helper method to create resource dict from node stats."""
+        """Helper method to create resource dict from node stats.
+
+        The dict is memoised per node, until any of the fields of the node
+        it depends on changes. A copy of it is returned, which the caller
+        may modify.
+        """
+        properties = node.properties
+        key = (properties.get('cpus'), properties.get('memory_mb'),
+               properties.get('local_gb'), properties.get('cpu_arch'),
+               node.instance_uuid, node.provision_state, node.power_state,
+               node.maintenance, CONF.host)
+        cached = self._node_resources.get(node.uuid)
+        if cached is None or cached[0] != key:
+            cached = (key, self._build_node_resource(node))
+            self._node_resources[node.uuid] = cached
+        return dict(cached[1])
+
+    def _build_node_resource(self, node):
         vcpus = int(node.properties.get('cpus', 0))
         memory_mb = int(node.properties.get('memory_mb', 0))
         local_gb = int(node.properties.get('local_gb', 0))
         cpu_arch = str(node.properties.get('cpu_arch', 'NotFound'))
-        nodes_extra_specs = self.extra_specs
-        nodes_extra_specs['cpu_arch'] = cpu_arch
+        nodes_extra_specs, supported_instances, stats = (
+                self._arch_resource(cpu_arch))
 
         vcpus_used = 0
         memory_mb_used = 0
@@ -225,9 +395,8 @@ class IronicDriver(virt_driver.ComputeDriver):
                'memory_mb_used': memory_mb_used,
                'host_memory_total': memory_mb,
                'host_memory_free': memory_mb - memory_mb_used,
-               'supported_instances': jsonutils.dumps(
-                                     _get_nodes_supported_instances(cpu_arch)),
-               'stats': jsonutils.dumps(nodes_extra_specs),
+               'supported_instances': supported_instances,
+               'stats': stats,
                'host': CONF.host,
                }
         dic.update(nodes_extra_specs)
@@ -281,8 +450,11 @@ class IronicDriver(virt_driver.ComputeDriver):
         self._unplug_vifs(node, instance, network_info)
         self._stop_firewall(instance, network_info)
 
-    def _wait_for_active(self, icli, instance):
-        """ Wait for the node to be marked as ACTIVE in Ironic """
+    def _wait_for_active(self, icli, instance, waiter):
+        """Wait for the node to be marked as ACTIVE in Ironic.
+
+        :returns: the number of seconds to sleep before checking again.
+        """
         node = validate_instance_and_node(icli, instance)
         if node.provision_state == ironic_states.ACTIVE:
             # job is done
@@ -298,13 +470,15 @@ class IronicDriver(virt_driver.ComputeDriver):
             # ironic already deleted it
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
-        if node.provision_state == ironic_states.DEPLOYFAIL:
+        if node.provision_state in (ironic_states.DEPLOYFAIL,
+                                    ironic_states.ERROR):
             # ironic failed to deploy
             msg = (_("Failed to provision instance %(inst)s: %(reason)s")
                    % {'inst': instance['uuid'], 'reason': node.last_error})
             raise exception.InstanceDeployFailure(msg)
 
         _log_ironic_polling('become ACTIVE', node, instance)
+        return waiter(node.uuid)
 
     @classmethod
     def instance(cls):
@@ -338,33 +512,45 @@ class IronicDriver(virt_driver.ComputeDriver):
         except exception.InstanceNotFound:
             return False
 
+    def _get_associated_nodes(self):
+        """Return the nodes with an instance, from the snapshot if fresh."""
+        if self._cache_is_fresh():
+            return [n for n in self.node_cache.values() if n.instance_uuid]
+        icli = client_wrapper.IronicClientWrapper()
+        return icli.call("node.list", associated=True)
+
     def list_instances(self):
         """Return the names of all the instances provisioned."""
-        icli = client_wrapper.IronicClientWrapper()
-        node_list = icli.call("node.list", associated=True)
+        uuids = list(set(n.instance_uuid
+                         for n in self._get_associated_nodes()))
+        if not uuids:
+            return []
         context = nova_context.get_admin_context()
-        return [instance_obj.Instance.get_by_uuid(context,
-                                                  i.instance_uuid).name
-                for i in node_list]
+        instances = instance_obj.InstanceList.get_by_filters(
+                context, {'uuid': uuids}, expected_attrs=[])
+        return [i.name for i in instances]
 
     def list_instance_uuids(self):
-        icli = client_wrapper.IronicClientWrapper()
-        node_list = icli.call("node.list", associated=True)
-        return list(set(n.instance_uuid for n in node_list))
+        return list(set(n.instance_uuid
+                        for n in self._get_associated_nodes()))
 
     def node_is_available(self, nodename):
         """Confirms a Nova hypervisor node exists in the Ironic inventory."""
-        icli = client_wrapper.IronicClientWrapper()
         try:
-            icli.call("node.get", nodename)
+            self._get_node(nodename)
             return True
         except ironic_exception.NotFound:
             return False
 
     def get_available_nodes(self, refresh=False):
-        icli = client_wrapper.IronicClientWrapper()
-        node_list = icli.call("node.list")
-        nodes = [n.uuid for n in node_list]
+        """Return the uuids of all the nodes.
+
+        The nodes are listed once per update of the resources, and kept in
+        a snapshot from which the resources of each node are then served.
+
+        """
+        self._refresh_cache()
+        nodes = list(self.node_cache)
         LOG.debug("Returning %(num_nodes)s available node(s): %(nodes)s",
                   dict(num_nodes=len(nodes), nodes=nodes))
         return nodes
@@ -379,8 +565,7 @@ class IronicDriver(virt_driver.ComputeDriver):
         :returns: dictionary describing resources
 
         """
-        icli = client_wrapper.IronicClientWrapper()
-        node = icli.call("node.get", node)
+        node = self._get_node(node)
         return self._node_resource(node)
 
     def get_info(self, instance):
@@ -471,10 +656,11 @@ class IronicDriver(virt_driver.ComputeDriver):
             self._cleanup_deploy(node, instance, network_info)
             raise exception.InstanceDeployFailure(msg)
 
-        timer = loopingcall.FixedIntervalLoopingCall(self._wait_for_active,
-                                                     icli, instance)
+        waiter = NodeWaiter(icli, wait_until=ironic_states.ACTIVE)
+        timer = loopingcall.DynamicLoopingCall(self._wait_for_active,
+                                               icli, instance, waiter)
         try:
-            timer.start(interval=CONF.ironic.api_retry_interval).wait()
+            timer.start().wait()
         except exception.InstanceDeployFailure:
             with excutils.save_and_reraise_exception():
                 LOG.error(_("Error deploying instance %(instance)s on "
@@ -500,8 +686,10 @@ class IronicDriver(virt_driver.ComputeDriver):
             else:
                 raise
 
-        # using a dict because this is modified in the local method
-        data = {'tries': 0}
+        # as long as api_max_retries checks, api_retry_interval apart
+        deadline = time.time() + (CONF.ironic.api_max_retries *
+                                  CONF.ironic.api_retry_interval)
+        waiter = NodeWaiter(icli, wait_until=ironic_states.DELETED)
 
         def _wait_for_provision_state():
             node = validate_instance_and_node(icli, instance)
@@ -510,21 +698,21 @@ class IronicDriver(virt_driver.ComputeDriver):
                           dict(node=node.uuid), instance=instance)
                 raise loopingcall.LoopingCallDone()
 
-            if data['tries'] >= CONF.ironic.api_max_retries:
+            remaining = deadline - time.time()
+            if remaining <= 0:
                 msg = (_("Error destroying the instance on node %(node)s. "
                          "Provision state still '%(state)s'.")
                        % {'state': node.provision_state,
                           'node': node.uuid})
                 LOG.error(msg)
                 raise exception.NovaException(msg)
-            else:
-                data['tries'] += 1
 
             _log_ironic_polling('unprovision', node, instance)
+            return waiter(node.uuid, timeout=remaining)
 
         # wait for the state transition to finish
-        timer = loopingcall.FixedIntervalLoopingCall(_wait_for_provision_state)
-        timer.start(interval=CONF.ironic.api_retry_interval).wait()
+        timer = loopingcall.DynamicLoopingCall(_wait_for_provision_state)
+        timer.start().wait()
 
     def destroy(self, context, instance, network_info,
                 block_device_info=None):
@@ -582,9 +770,9 @@ class IronicDriver(virt_driver.ComputeDriver):
 
     def get_host_stats(self, refresh=False):
         caps = []
-        icli = client_wrapper.IronicClientWrapper()
-        node_list = icli.call("node.list")
-        for node in node_list:
+        if refresh or not self._cache_is_fresh():
+            self._refresh_cache()
+        for node in self.node_cache.values():
             data = self._node_resource(node)
             caps.append(data)
         return caps
@@ -650,12 +838,44 @@ class IronicDriver(virt_driver.ComputeDriver):
         """
         self.firewall_driver.unfilter_instance(instance, network_info)
 
+    def _update_ports(self, icli, patches, ignore_bad_request=False):
+        """Apply a JSON patch to each of several ports of a node.
+
+        The patches are sent to Ironic in a single request, and applied in
+        a single transaction. Should Ironic reject it, because it does not
+        support updating several ports at once or because of any of the
+        patches, each port is updated on its own instead.
+
+        :param icli: an IronicClientWrapper.
+        :param patches: a list of (port uuid, JSON patch) tuples.
+        :param ignore_bad_request: whether to ignore the ports which can not
+            be updated on their own, because their patch is rejected.
+
+        """
+        if not patches:
+            return
+        body = [dict(op, uuid=port_uuid)
+                for port_uuid, patch in patches for op in patch]
+        try:
+            icli.call('http_client.json_request', 'PATCH', '/v1/ports',
+                      body=body)
+            return
+        except (ironic_exception.BadRequest,
+                ironic_exception.NotFound,
+                ironic_exception.MethodNotAllowed):
+            LOG.debug("Ironic rejected updating %d ports at once, updating "
+                      "them one by one.", len(patches))
+
+        for port_uuid, patch in patches:
+            try:
+                icli.call("port.update", port_uuid, patch)
+            except ironic_exception.BadRequest:
+                if not ignore_bad_request:
+                    raise
+
     def _plug_vifs(self, node, instance, network_info):
         LOG.debug("plug: instance_uuid=%(uuid)s vif=%(network_info)s"
                   % {'uuid': instance['uuid'], 'network_info': network_info})
-        # start by ensuring the ports are clear
-        self._unplug_vifs(node, instance, network_info)
-
         icli = client_wrapper.IronicClientWrapper()
         ports = icli.call("node.list_ports", node.uuid)
 
@@ -668,15 +888,15 @@ class IronicDriver(virt_driver.ComputeDriver):
                    'vif_count': len(network_info),
                    'pif_count': len(ports)})
 
-        if len(network_info) > 0:
-            # not needed if no vif are defined
-            for vif, pif in zip(network_info, ports):
-                # attach what neutron needs directly to the port
-                port_id = unicode(vif['id'])
-                patch = [{'op': 'add',
-                          'path': '/extra/vif_port_id',
-                          'value': port_id}]
-                icli.call("port.update", pif.uuid, patch)
+        # attach what neutron needs directly to the ports; adding the
+        # vif_port_id replaces any left over on a port.
+        patches = []
+        for vif, pif in zip(network_info, ports):
+            port_id = unicode(vif['id'])
+            patches.append((pif.uuid, [{'op': 'add',
+                                        'path': '/extra/vif_port_id',
+                                        'value': port_id}]))
+        self._update_ports(icli, patches)
 
     def _unplug_vifs(self, node, instance, network_info):
         LOG.debug("unplug: instance_uuid=%(uuid)s vif=%(network_info)s"
@@ -686,13 +906,11 @@ class IronicDriver(virt_driver.ComputeDriver):
             ports = icli.call("node.list_ports", node.uuid)
 
             # not needed if no vif are defined
-            for vif, pif in zip(network_info, ports):
-                # we can not attach a dict directly
-                patch = [{'op': 'remove', 'path': '/extra/vif_port_id'}]
-                try:
-                    icli.call("port.update", pif.uuid, patch)
-                except ironic_exception.BadRequest:
-                    pass
+            patches = [(pif.uuid, [{'op': 'remove',
+                                    'path': '/extra/vif_port_id'}])
+                       for vif, pif in zip(network_info, ports)]
+            # a port without any vif_port_id can not have it removed
+            self._update_ports(icli, patches, ignore_bad_request=True)
 
     def plug_vifs(self, instance, network_info):
         icli = client_wrapper.IronicClientWrapper()
@@ -751,6 +969,7 @@ class IronicDriver(virt_driver.ComputeDriver):
 
         # Although the target provision state is REBUILD, it will actually go
         # to ACTIVE once the redeploy is finished.
-        timer = loopingcall.FixedIntervalLoopingCall(self._wait_for_active,
-                                                     icli, instance)
-        timer.start(interval=CONF.ironic.api_retry_interval).wait()
+        waiter = NodeWaiter(icli, wait_until=ironic_states.ACTIVE)
+        timer = loopingcall.DynamicLoopingCall(self._wait_for_active,
+                                               icli, instance, waiter)
+        timer.start().wait()
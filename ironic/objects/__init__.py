@@ -17,6 +17,7 @@ import functools
 from ironic.objects import chassis
 from ironic.objects import conductor
 from ironic.objects import node
+from ironic.objects import operation
 from ironic.objects import port
 
 
@@ -38,10 +39,12 @@ def objectify(klass):
 Chassis = chassis.Chassis
 Conductor = conductor.Conductor
 Node = node.Node
+Operation = operation.Operation
 Port = port.Port
 
 __all__ = (Chassis,
            Conductor,
            Node,
+           Operation,
            Port,
            objectify)
@@ -0,0 +1,108 @@
+# coding=utf-8
+#
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from ironic.db import api as db_api
+from ironic.objects import base
+from ironic.objects import utils as obj_utils
+
+
+class Operation(base.IronicObject):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    dbapi = db_api.get_instance()
+
+    fields = {
+            'id': int,
+            'uuid': obj_utils.str_or_none,
+            'node_id': obj_utils.int_or_none,
+
+            # One of 'power', 'provision' or 'console'
+            'action': obj_utils.str_or_none,
+            # The requested state, eg. states.POWER_ON for a power action
+            'target': obj_utils.str_or_none,
+
+            # One of states.QUEUED|RUNNING|DONE|FAILED
+            'state': obj_utils.str_or_none,
+            'error': obj_utils.str_or_none,
+
+            'started_at': obj_utils.datetime_or_str_or_none,
+            'finished_at': obj_utils.datetime_or_str_or_none,
+            }
+
+    _attr_started_at_from_primitive = obj_utils.dt_deserializer
+    _attr_finished_at_from_primitive = obj_utils.dt_deserializer
+    _attr_started_at_to_primitive = obj_utils.dt_serializer('started_at')
+    _attr_finished_at_to_primitive = obj_utils.dt_serializer('finished_at')
+
+    @staticmethod
+    def _from_db_object(operation, db_operation):
+        """Converts a database entity to a formal object."""
+        for field in operation.fields:
+            operation[field] = db_operation[field]
+        operation.obj_reset_changes()
+        return operation
+
+    @base.remotable_classmethod
+    def get_by_uuid(cls, context, uuid):
+        """Find an operation based on uuid and return an Operation object.
+
+        :param uuid: the uuid of an operation.
+        :returns: a :class:`Operation` object.
+        """
+        db_operation = cls.dbapi.get_operation(uuid)
+        operation = Operation._from_db_object(cls(), db_operation)
+        operation._context = context
+        return operation
+
+    @base.remotable
+    def create(self, context=None):
+        """Create an Operation record in the DB.
+
+        :param context: Security context. NOTE: This should only
+                        be used internally by the indirection_api.
+                        Unfortunately, RPC requires context as the first
+                        argument, even though we don't use it.
+                        A context should be set when instantiating the
+                        object, e.g.: Operation(context=context)
+
+        """
+        values = self.obj_get_changes()
+        db_operation = self.dbapi.create_operation(values)
+        self._from_db_object(self, db_operation)
+
+    @base.remotable
+    def save(self, context=None):
+        """Save updates to this Operation.
+
+        :param context: Security context. NOTE: This is only used
+                        internally by the indirection_api.
+        """
+        updates = self.obj_get_changes()
+        self.dbapi.update_operation(self.uuid, updates)
+        self.obj_reset_changes()
+
+    @base.remotable
+    def refresh(self, context=None):
+        """Refresh the object by re-fetching from the DB.
+
+        :param context: Security context. NOTE: This is only used
+                        internally by the indirection_api.
+        """
+        current = self.__class__.get_by_uuid(self._context, self.uuid)
+        for field in self.fields:
+            if (hasattr(self, base.get_attrname(field)) and
+                    self[field] != current[field]):
+                self[field] = current[field]
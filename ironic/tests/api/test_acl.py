@@ -71,6 +71,20 @@ class TestACL(base.FunctionalTest):
 
         self.assertEqual(403, response.status_int)
 
+    def test_admin_metrics(self):
+        response = self.get_json('/metrics',
+                                 headers={'X-Auth-Token': utils.ADMIN_TOKEN},
+                                 expect_errors=True)
+
+        self.assertEqual(200, response.status_int)
+
+    def test_non_admin_metrics(self):
+        response = self.get_json('/metrics',
+                                 headers={'X-Auth-Token': utils.MEMBER_TOKEN},
+                                 expect_errors=True)
+
+        self.assertEqual(403, response.status_int)
+
     def test_non_admin_with_admin_header(self):
         response = self.get_json(self.node_path,
                                  headers={'X-Auth-Token': utils.MEMBER_TOKEN,
@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the compression of API responses."""
+
+import json
+import zlib
+
+import webob
+
+from ironic.api.middleware import compress
+from ironic.tests.api import base
+from ironic.tests import base as tests_base
+from ironic.tests.objects import utils as obj_utils
+
+
+def _gunzip(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+def _get(app, path='/', **headers):
+    # NOTE: webtest would decode the responses, so use webob directly
+    return webob.Request.blank(path, headers=headers).get_response(app)
+
+
+class TestCompressMiddleware(tests_base.TestCase):
+
+    def _make_app(self, body, content_type='application/json', stream=False,
+                  **kwargs):
+        def app(environ, start_response):
+            resp = webob.Response(content_type=content_type)
+            if stream:
+                resp.app_iter = iter([body[:10], body[10:]])
+            else:
+                resp.body = body
+            return resp(environ, start_response)
+        return compress.CompressMiddleware(app, **kwargs)
+
+    def test_gzip(self):
+        app = self._make_app(b'x' * 2048)
+        response = _get(app, **{'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(len(response.body),
+                         int(response.headers['Content-Length']))
+        self.assertEqual(b'x' * 2048, _gunzip(response.body))
+
+    def test_deflate(self):
+        app = self._make_app(b'x' * 2048)
+        response = _get(app, **{'Accept-Encoding': 'deflate'})
+        self.assertEqual('deflate', response.headers['Content-Encoding'])
+        self.assertEqual(b'x' * 2048, zlib.decompress(response.body))
+
+    def test_not_accepted(self):
+        app = self._make_app(b'x' * 2048)
+        response = _get(app)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(b'x' * 2048, response.body)
+
+    def test_below_min_size(self):
+        app = self._make_app(b'x' * 2048, min_size=4096)
+        response = _get(app, **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(b'x' * 2048, response.body)
+
+    def test_not_compressible(self):
+        app = self._make_app(b'x' * 2048,
+                             content_type='application/octet-stream')
+        response = _get(app, **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_stream(self):
+        app = self._make_app(b'x' * 2048, stream=True)
+        response = _get(app, **{'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(b'x' * 2048, _gunzip(response.body))
+
+
+class TestCompressResponses(base.FunctionalTest):
+
+    def test_nodes_detail(self):
+        extra = dict(('key%d' % i, 'value%d' % i) for i in range(100))
+        obj_utils.create_test_node(self.context, extra=extra)
+        response = _get(self.app.app, '/v1/nodes/detail',
+                        **{'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        data = json.loads(_gunzip(response.body))
+        self.assertEqual(extra, data['nodes'][0]['extra'])
+
+    def test_error(self):
+        response = _get(self.app.app, '/v1/nodes/detail?limit=-1',
+                        **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(400, response.status_int)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('error_message', response.json)
@@ -51,6 +51,13 @@ class TestListChassis(base.FunctionalTest):
         self.assertIn('extra', data)
         self.assertIn('nodes', data)
 
+    def test_get_one_not_modified(self):
+        chassis = self.dbapi.create_chassis(dbutils.get_test_chassis())
+        path = '%s/chassis/%s' % (base.PATH_PREFIX, chassis.uuid)
+        etag = self.app.get(path).headers['ETag']
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+
     def test_detail(self):
         cdict = dbutils.get_test_chassis()
         chassis = self.dbapi.create_chassis(cdict)
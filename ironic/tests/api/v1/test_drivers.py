@@ -17,6 +17,7 @@ import json
 import mock
 from testtools.matchers import HasLength
 
+from ironic.common import hash_ring
 from ironic.conductor import rpcapi
 from ironic.tests.api import base
 
@@ -66,6 +67,40 @@ class TestListDrivers(base.FunctionalTest):
         self.validate_link(data['links'][0]['href'])
         self.validate_link(data['links'][1]['href'])
 
+    def test_drivers_cached(self):
+        self.register_fake_conductors()
+        with mock.patch.object(self.dbapi, 'get_active_driver_dict',
+                               wraps=self.dbapi.get_active_driver_dict) \
+                as mock_gadd:
+            data = self.get_json('/drivers')
+            self.assertEqual(self.d1, self.get_json('/drivers/%s'
+                                                    % self.d1)['name'])
+            self.assertEqual(data, self.get_json('/drivers'))
+            self.assertEqual(1, mock_gadd.call_count)
+
+    def test_drivers_links_follow_host(self):
+        self.register_fake_conductors()
+        for host in ('host-a.example.com', 'host-b.example.com'):
+            data = self.get_json('/drivers/%s' % self.d1,
+                                 headers={'Host': host})
+            self.assertEqual('http://%s/v1/drivers/%s' % (host, self.d1),
+                             data['links'][0]['href'])
+
+    @mock.patch.object(hash_ring.HashRingManager, '_is_stale')
+    def test_drivers_cache_reset(self, mock_is_stale):
+        mock_is_stale.return_value = True
+        self.assertEqual([], self.get_json('/drivers')['drivers'])
+        self.register_fake_conductors()
+        data = self.get_json('/drivers')
+        self.assertEqual([self.d1, self.d2],
+                         [d['name'] for d in data['drivers']])
+
+    def test_drivers_get_one_new_conductor(self):
+        self.assertEqual([], self.get_json('/drivers')['drivers'])
+        self.register_fake_conductors()
+        data = self.get_json('/drivers/%s' % self.d1)
+        self.assertEqual(self.d1, data['name'])
+
     def test_drivers_get_one_not_found(self):
         response = self.get_json('/drivers/%s' % self.d1, expect_errors=True)
         self.assertEqual(404, response.status_int)
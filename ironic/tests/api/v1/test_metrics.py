@@ -0,0 +1,137 @@
+# -*- encoding: utf-8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests for the API /metrics/ methods.
+"""
+
+import fixtures
+import mock
+from oslo.config import cfg
+
+from ironic.api import metrics
+from ironic.common import utils
+from ironic.conductor import rpcapi
+from ironic.tests.api import base
+from ironic.tests import base as tests_base
+from ironic.tests.objects import utils as obj_utils
+
+
+class TestTimed(tests_base.TestCase):
+
+    def test_not_started(self):
+        with metrics.timed('db'):
+            pass
+        self.assertIsNone(metrics.stop())
+
+    def test_nested_components_are_exclusive(self):
+        metrics.start()
+        with mock.patch('time.time') as time_mock:
+            # rpc starts at 0, db runs from 1 to 3, rpc stops at 4
+            time_mock.side_effect = [0.0, 1.0, 3.0, 4.0]
+            with metrics.timed('rpc'):
+                with metrics.timed('db'):
+                    pass
+        times, calls = metrics.stop()
+        self.assertEqual({'rpc': 2.0, 'db': 2.0}, dict(times))
+        self.assertEqual({'rpc': 1, 'db': 1}, dict(calls))
+
+    @mock.patch.object(metrics.event, 'listen')
+    def test_listen_db_once(self, mock_listen):
+        self.useFixture(fixtures.MonkeyPatch(
+                'ironic.api.metrics._db_listening', False))
+        metrics.listen_db()
+        metrics.listen_db()
+        self.assertEqual(2, mock_listen.call_count)
+
+
+class TestRegistry(tests_base.TestCase):
+
+    def test_render(self):
+        registry = metrics.Registry()
+        registry.record('GET', 'NodesController.get_all', 200, 0.02, 10,
+                        {'db': 0.005}, {'db': 2})
+        registry.record('GET', 'NodesController.get_all', 404, 0.3, 5)
+        text = registry.render()
+        labels = 'method="GET",route="NodesController.get_all"'
+        self.assertIn('ironic_api_request_duration_seconds_bucket{%s,'
+                      'le="0.01"} 0' % labels, text)
+        self.assertIn('ironic_api_request_duration_seconds_bucket{%s,'
+                      'le="0.025"} 1' % labels, text)
+        self.assertIn('ironic_api_request_duration_seconds_bucket{%s,'
+                      'le="+Inf"} 2' % labels, text)
+        self.assertIn('ironic_api_request_duration_seconds_count{%s} 2'
+                      % labels, text)
+        self.assertIn('ironic_api_responses_total{%s,status="404"} 1'
+                      % labels, text)
+        self.assertIn('ironic_api_response_bytes_total{%s} 15' % labels, text)
+        self.assertIn('ironic_api_component_seconds_total{%s,'
+                      'component="db"} 0.005' % labels, text)
+        self.assertIn('ironic_api_component_calls_total{%s,'
+                      'component="db"} 2' % labels, text)
+
+
+class TestGetMetrics(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestGetMetrics, self).setUp()
+        self.registry = metrics.Registry()
+        self.useFixture(fixtures.MonkeyPatch('ironic.api.metrics._REGISTRY',
+                                             self.registry))
+
+    def _get_metrics(self, **kwargs):
+        return self.app.get('/v1/metrics', **kwargs)
+
+    def test_plain_text(self):
+        response = self._get_metrics()
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('text/plain', response.content_type)
+        self.assertIn('# TYPE ironic_api_request_duration_seconds histogram',
+                      response.text)
+
+    def test_records_routes(self):
+        obj_utils.create_test_node(self.context)
+        self.get_json('/nodes')
+        self.get_json('/nodes/%s' % utils.generate_uuid(),
+                      expect_errors=True)
+        text = self._get_metrics().text
+        labels = 'method="GET",route="NodesController.get_all"'
+        self.assertIn('ironic_api_responses_total{%s,status="200"} 1'
+                      % labels, text)
+        self.assertIn('ironic_api_component_calls_total{%s,'
+                      'component="serialize"} 1' % labels, text)
+        self.assertNotIn('ironic_api_component_calls_total{%s,'
+                         'component="db"} 0' % labels, text)
+        self.assertIn('ironic_api_responses_total{method="GET",'
+                      'route="NodesController.get_one",status="404"} 1', text)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'validate_driver_interfaces')
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topic_for')
+    def test_records_rpc(self, mock_topic, mock_validate):
+        mock_topic.return_value = 'test-topic'
+        mock_validate.return_value = {}
+        node = obj_utils.create_test_node(self.context)
+        self.get_json('/nodes/%s/validate' % node.uuid)
+        text = self._get_metrics().text
+        labels = 'method="GET",route="NodesController.validate"'
+        self.assertIn('ironic_api_component_calls_total{%s,'
+                      'component="topic"} 1' % labels, text)
+        self.assertIn('ironic_api_component_calls_total{%s,'
+                      'component="rpc"} 1' % labels, text)
+
+    def test_disabled(self):
+        cfg.CONF.set_override('enable_metrics', False, group='api')
+        self.app = self._make_app()
+        self.get_json('/nodes')
+        self.assertEqual(200, self._get_metrics().status_int)
+        self.assertNotIn('NodesController', self._get_metrics().text)
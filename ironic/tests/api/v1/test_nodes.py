@@ -16,12 +16,19 @@ Tests for the API /nodes/ methods.
 """
 
 import datetime
+import json
+import time
+import zlib
 
 import mock
 from oslo.config import cfg
+from oslo import messaging
 from six.moves.urllib import parse as urlparse
 from testtools.matchers import HasLength
+import webob
 
+from ironic.api.controllers.v1 import collection
+from ironic.api.controllers.v1 import node as api_node
 from ironic.common import exception
 from ironic.common import states
 from ironic.common import utils
@@ -138,6 +145,339 @@ class TestListNodes(base.FunctionalTest):
                                  expect_errors=True)
         self.assertEqual(404, response.status_int)
 
+    def _test_serializer_matches(self, path):
+        for id in range(3):
+            obj_utils.create_test_node(self.context, id=id,
+                                       uuid=utils.generate_uuid(),
+                                       chassis_id=self.chassis.id if id
+                                       else None)
+        with mock.patch.object(collection.Collection, 'can_serialize',
+                               return_value=False):
+            expected = self.get_json(path)
+        with mock.patch.object(objects.Chassis, 'get_by_uuid') as mock_get:
+            data = self.get_json(path)
+            self.assertFalse(mock_get.called)
+        self.assertEqual(expected, data)
+
+    def test_serializer_matches_collection(self):
+        self._test_serializer_matches('/nodes?limit=2')
+
+    def test_serializer_matches_detail(self):
+        self._test_serializer_matches('/nodes/detail')
+
+    def test_serializer_matches_fields(self):
+        self._test_serializer_matches('/nodes?fields=chassis_uuid,ports')
+
+    def test_serializer_resolves_chassis_in_bulk(self):
+        for id in range(3):
+            obj_utils.create_test_node(self.context, id=id,
+                                       uuid=utils.generate_uuid(),
+                                       chassis_id=self.chassis.id)
+        with mock.patch.object(self.dbapi, 'get_chassis_uuids',
+                               wraps=self.dbapi.get_chassis_uuids) as mock_g:
+            data = self.get_json('/nodes/detail')
+            mock_g.assert_called_once_with([self.chassis.id])
+        self.assertEqual([self.chassis.uuid] * 3,
+                         [n['chassis_uuid'] for n in data['nodes']])
+
+    def test_export(self):
+        uuids = []
+        for id in range(3):
+            node = obj_utils.create_test_node(self.context, id=id,
+                                              uuid=utils.generate_uuid())
+            uuids.append(node.uuid)
+        response = self.app.get('%s/nodes/export' % base.PATH_PREFIX)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('application/json', response.content_type)
+        self.assertEqual(uuids, [n['uuid'] for n in response.json['nodes']])
+        detail = self.get_json('/nodes/detail')
+        self.assertEqual(detail['nodes'], response.json['nodes'])
+
+    def _export_streamed(self, **headers):
+        node = obj_utils.create_test_node(self.context, chassis_id=None)
+        events = []
+
+        def _iter_nodes(*args, **kwargs):
+            events.append('iterated')
+            yield node
+
+        status = []
+        environ = webob.Request.blank('%s/nodes/export?fields=chassis_uuid'
+                                      % base.PATH_PREFIX,
+                                      headers=headers).environ
+        with mock.patch.object(self.dbapi, 'get_node_iter',
+                               side_effect=_iter_nodes):
+            app_iter = self.app.app(environ,
+                                    lambda s, h, e=None: status.append(h))
+            events.append('returned')
+            body = ''.join(app_iter)
+
+        # The nodes are only read once the application returned
+        self.assertEqual(['returned', 'iterated'], events)
+        headers = dict(status[0])
+        self.assertNotIn('Content-Length', headers)
+        return node, headers, body
+
+    def test_export_streamed(self):
+        node, headers, body = self._export_streamed()
+        self.assertEqual({'nodes': [{'uuid': node.uuid,
+                                     'chassis_uuid': None}]},
+                         json.loads(body))
+
+    def test_export_streamed_compressed(self):
+        node, headers, body = self._export_streamed(**{'Accept-Encoding':
+                                                       'gzip'})
+        self.assertEqual('gzip', headers['Content-Encoding'])
+        body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        self.assertEqual({'nodes': [{'uuid': node.uuid,
+                                     'chassis_uuid': None}]},
+                         json.loads(body))
+
+    def test_export_empty(self):
+        response = self.app.get('%s/nodes/export' % base.PATH_PREFIX)
+        self.assertEqual({'nodes': []}, response.json)
+
+    def test_export_filters_and_fields(self):
+        obj_utils.create_test_node(self.context, id=1, maintenance=True,
+                                   uuid=utils.generate_uuid())
+        node = obj_utils.create_test_node(self.context, id=2,
+                                          maintenance=False,
+                                          uuid=utils.generate_uuid())
+        response = self.app.get('%s/nodes/export?maintenance=false'
+                                '&fields=maintenance' % base.PATH_PREFIX)
+        self.assertEqual([{'uuid': node.uuid, 'maintenance': False}],
+                         response.json['nodes'])
+
+    def test_export_property_filters(self):
+        obj_utils.create_test_node(self.context, id=1,
+                                   uuid=utils.generate_uuid(),
+                                   properties={'cpus': 2})
+        node = obj_utils.create_test_node(self.context, id=2,
+                                          uuid=utils.generate_uuid(),
+                                          properties={'cpus': 32})
+        response = self.app.get('%s/nodes/export?min_cpus=16&fields=uuid'
+                                % base.PATH_PREFIX)
+        self.assertEqual([{'uuid': node.uuid}], response.json['nodes'])
+
+        response = self.app.get('%s/nodes/export?min_cpus=lots'
+                                % base.PATH_PREFIX, expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_export_uses_batches(self):
+        cfg.CONF.set_override('export_batch_size', 7, 'api')
+        with mock.patch.object(self.dbapi, 'get_node_iter') as mock_iter:
+            mock_iter.return_value = iter([])
+            self.app.get('%s/nodes/export?sort_dir=desc' % base.PATH_PREFIX)
+            mock_iter.assert_called_once_with({}, sort_key='id',
+                                              sort_dir='desc', batch_size=7)
+
+    def test_export_invalid_parameter(self):
+        response = self.app.get('%s/nodes/export?maintenance=spam'
+                                % base.PATH_PREFIX, expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        self.assertEqual('application/json', response.content_type)
+        self.assertTrue(response.json['error_message'])
+
+    def test_export_against_single(self):
+        node = obj_utils.create_test_node(self.context)
+        response = self.app.get('%s/nodes/%s/export' % (base.PATH_PREFIX,
+                                                        node.uuid),
+                                expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
+    def test_get_one_not_modified(self):
+        node = obj_utils.create_test_node(self.context)
+        path = '%s/nodes/%s' % (base.PATH_PREFIX, node.uuid)
+        etag = self.app.get(path).headers['ETag']
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('', response.body)
+
+    def test_get_one_modified(self):
+        node = obj_utils.create_test_node(self.context)
+        path = '%s/nodes/%s' % (base.PATH_PREFIX, node.uuid)
+        etag = self.app.get(path).headers['ETag']
+        self.dbapi.update_node(node.id, {'extra': {'foo': 'bar'}})
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertEqual({'foo': 'bar'}, response.json['extra'])
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_get_one_modified_same_second(self):
+        node = obj_utils.create_test_node(self.context)
+        path = '%s/nodes/%s' % (base.PATH_PREFIX, node.uuid)
+        with mock.patch.object(timeutils, 'utcnow') as mock_utcnow:
+            mock_utcnow.return_value = datetime.datetime(2000, 1, 1, 0, 0)
+            self.dbapi.update_node(node.id, {'extra': {'foo': 'bar'}})
+            etag = self.app.get(path).headers['ETag']
+            self.dbapi.update_node(node.id, {'extra': {'foo': 'baz'}})
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertEqual({'foo': 'baz'}, response.json['extra'])
+
+    def test_get_one_etag_weak(self):
+        node = obj_utils.create_test_node(self.context)
+        path = '%s/nodes/%s' % (base.PATH_PREFIX, node.uuid)
+        self.assertTrue(self.app.get(path).headers['ETag'].startswith('W/'))
+
+    def test_get_one_not_found_with_etag(self):
+        response = self.app.get('%s/nodes/%s' % (base.PATH_PREFIX,
+                                                 utils.generate_uuid()),
+                                headers={'If-None-Match': '*'},
+                                expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
+    def test_collection_not_modified(self):
+        obj_utils.create_test_node(self.context)
+        path = '%s/nodes/detail' % base.PATH_PREFIX
+        etag = self.app.get(path).headers['ETag']
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+
+    def test_collection_modified(self):
+        obj_utils.create_test_node(self.context)
+        path = '%s/nodes' % base.PATH_PREFIX
+        etag = self.app.get(path).headers['ETag']
+        obj_utils.create_test_node(self.context, id=2,
+                                   uuid=utils.generate_uuid())
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(2, len(response.json['nodes']))
+
+    def test_collection_etag_depends_on_query(self):
+        obj_utils.create_test_node(self.context)
+        path = '%s/nodes' % base.PATH_PREFIX
+        etag = self.app.get(path).headers['ETag']
+        response = self.app.get(path + '/detail',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_get_one_fields(self):
+        node = obj_utils.create_test_node(self.context)
+        data = self.get_json('/nodes/%s?fields=driver,power_state' %
+                             node.uuid)
+        self.assertEqual(set(['uuid', 'driver', 'power_state']),
+                         set(data.keys()))
+        self.assertEqual(node.driver, data['driver'])
+
+    def test_get_one_fields_links(self):
+        node = obj_utils.create_test_node(self.context)
+        data = self.get_json('/nodes/%s?fields=links,chassis_uuid' %
+                             node.uuid)
+        self.assertEqual(set(['uuid', 'links', 'chassis_uuid']),
+                         set(data.keys()))
+        self.assertEqual(2, len(data['links']))
+
+    def test_get_one_fields_not_found(self):
+        response = self.get_json('/nodes/%s?fields=driver' %
+                                 utils.generate_uuid(), expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
+    def test_get_one_invalid_fields(self):
+        node = obj_utils.create_test_node(self.context)
+        response = self.get_json('/nodes/%s?fields=driver,spam' % node.uuid,
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        self.assertEqual('application/json', response.content_type)
+        self.assertTrue(response.json['error_message'])
+
+    def test_detail_fields(self):
+        node = obj_utils.create_test_node(self.context)
+        data = self.get_json('/nodes/detail?fields=extra,ports')
+        self.assertEqual(1, len(data['nodes']))
+        self.assertEqual(set(['uuid', 'extra', 'ports']),
+                         set(data['nodes'][0].keys()))
+        self.assertEqual(node.uuid, data['nodes'][0]['uuid'])
+
+    def test_collection_fields_next_link(self):
+        for id in range(3):
+            obj_utils.create_test_node(self.context, id=id,
+                                       uuid=utils.generate_uuid())
+        data = self.get_json('/nodes?limit=2&fields=maintenance')
+        self.assertEqual(2, len(data['nodes']))
+        self.assertIn('fields=uuid,maintenance', data['next'])
+        self.assertIn(data['nodes'][-1]['uuid'], data['next'])
+
+    def test_filters(self):
+        n1 = obj_utils.create_test_node(self.context, id=1,
+                                        uuid=utils.generate_uuid(),
+                                        driver='fake',
+                                        power_state=states.POWER_ON,
+                                        properties={'memory_mb': 131072,
+                                                    'cpu_arch': 'x86_64'})
+        n2 = obj_utils.create_test_node(self.context, id=2,
+                                        uuid=utils.generate_uuid(),
+                                        driver='pxe_ssh',
+                                        power_state=states.POWER_OFF,
+                                        provision_state=states.ACTIVE,
+                                        reservation='fake-host',
+                                        properties={'cpus': 4,
+                                                    'local_gb': 10,
+                                                    'cpu_arch': 'ppc64'})
+
+        def uuids(query):
+            data = self.get_json('/nodes?%s' % query)
+            return [n['uuid'] for n in data['nodes']]
+
+        self.assertEqual([n1.uuid], uuids('driver=fake'))
+        self.assertEqual([n2.uuid],
+                         uuids('power_state=%s' % states.POWER_OFF))
+        self.assertEqual([n2.uuid],
+                         uuids('provision_state=%s' % states.ACTIVE))
+        self.assertEqual([n2.uuid], uuids('reserved=true'))
+        self.assertEqual([n1.uuid], uuids('reserved=false'))
+        self.assertEqual([n1.uuid], uuids('min_memory_mb=131072'))
+        self.assertEqual([n2.uuid], uuids('min_cpus=2&min_local_gb=10'))
+        self.assertEqual([n1.uuid], uuids('cpu_arch=x86_64'))
+        self.assertEqual([], uuids('cpu_arch=x86_64&min_cpus=1'))
+
+        data = self.get_json('/nodes/detail?cpu_arch=ppc64')
+        self.assertEqual([n2.uuid], [n['uuid'] for n in data['nodes']])
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_filter_updated_since(self, mock_utcnow):
+        mock_utcnow.return_value = datetime.datetime(2000, 1, 1, 0, 0)
+        obj_utils.create_test_node(self.context, id=1,
+                                   uuid=utils.generate_uuid())
+        node = obj_utils.create_test_node(self.context, id=2,
+                                          uuid=utils.generate_uuid())
+        mock_utcnow.return_value = datetime.datetime(2000, 1, 2, 0, 0)
+        node.extra = {'foo': 'bar'}
+        node.save()
+
+        data = self.get_json('/nodes?updated_since=2000-01-01T12:00:00Z')
+        self.assertEqual([node.uuid], [n['uuid'] for n in data['nodes']])
+        data = self.get_json('/nodes?updated_since=2000-01-01T12:00:00')
+        self.assertEqual([node.uuid], [n['uuid'] for n in data['nodes']])
+
+    def test_filter_invalid(self):
+        response = self.get_json('/nodes?min_cpus=-1', expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        response = self.get_json('/nodes?min_cpus=many', expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_filters_next_link(self):
+        for id in range(3):
+            obj_utils.create_test_node(self.context, id=id,
+                                       uuid=utils.generate_uuid(),
+                                       power_state=states.POWER_ON)
+        data = self.get_json('/nodes?limit=2&power_state=%s&cpu_arch=x86_64'
+                             % states.POWER_ON)
+        self.assertEqual(2, len(data['nodes']))
+        next_args = urlparse.parse_qs(urlparse.urlparse(data['next']).query)
+        self.assertEqual([states.POWER_ON], next_args['power_state'])
+        self.assertEqual(['x86_64'], next_args['cpu_arch'])
+
+    def test_collection_fields_instance_uuid(self):
+        node = obj_utils.create_test_node(self.context,
+                                          instance_uuid=utils.generate_uuid())
+        data = self.get_json('/nodes?instance_uuid=%s&fields=instance_uuid'
+                             % node.instance_uuid)
+        self.assertEqual([{'uuid': node.uuid,
+                           'instance_uuid': node.instance_uuid}],
+                         data['nodes'])
+
     def test_many(self):
         nodes = []
         for id in range(5):
@@ -430,6 +770,28 @@ class TestListNodes(base.FunctionalTest):
             mock_gci.assert_called_once_with(mock.ANY, node.uuid, 'test-topic')
 
 
+class TestNodeSerializer(base.FunctionalTest):
+
+    def test_serialize_outside_request(self):
+        node = obj_utils.get_test_node(self.context, chassis_id=42)
+        dbapi = mock.Mock()
+        dbapi.get_chassis_uuids.return_value = {42: 'chassis-uuid'}
+        serializer = api_node.NodeSerializer('http://localhost', dbapi,
+                                             fields=['uuid', 'chassis_uuid'])
+        self.assertEqual([{'uuid': node.uuid,
+                           'chassis_uuid': 'chassis-uuid'}],
+                         list(serializer.iter([node], 10)))
+        dbapi.get_chassis_uuids.assert_called_once_with([42])
+
+    def test_get_parent_uuids_required(self):
+        class NoParentSerializer(collection.Serializer):
+            datatype = api_node.Node
+            resource = 'nodes'
+
+        self.assertRaises(TypeError, NoParentSerializer, 'http://localhost',
+                          self.dbapi)
+
+
 class TestPatch(base.FunctionalTest):
 
     def setUp(self):
@@ -894,20 +1256,36 @@ class TestPut(base.FunctionalTest):
         self.mock_dntd = p.start()
         self.addCleanup(p.stop)
 
+    def _check_operation(self, response, node, action, target):
+        """Check the operation returned for an accepted state change.
+
+        :returns: the UUID of the operation.
+        """
+        self.assertEqual(202, response.status_code)
+        self.assertEqual(node.uuid, response.json['node_uuid'])
+        self.assertEqual(action, response.json['action'])
+        self.assertEqual(target, response.json['target'])
+        self.assertEqual(states.QUEUED, response.json['state'])
+        op_uuid = response.json['uuid']
+        # Check location header
+        self.assertIsNotNone(response.location)
+        expected_location = '/v1/operations/%s' % op_uuid
+        self.assertEqual(urlparse.urlparse(response.location).path,
+                         expected_location)
+        return op_uuid
+
     def test_power_state(self):
         response = self.put_json('/nodes/%s/states/power' % self.node['uuid'],
                                  {'target': states.POWER_ON})
-        self.assertEqual(202, response.status_code)
-        self.assertEqual('', response.body)
+        op_uuid = self._check_operation(response, self.node, 'power',
+                                        states.POWER_ON)
         self.mock_cnps.assert_called_once_with(mock.ANY,
                                                self.node['uuid'],
                                                states.POWER_ON,
-                                               'test-topic')
-        # Check location header
-        self.assertIsNotNone(response.location)
-        expected_location = '/v1/nodes/%s/states' % self.node.uuid
-        self.assertEqual(urlparse.urlparse(response.location).path,
-                         expected_location)
+                                               'test-topic',
+                                               operation_id=op_uuid)
+        op = self.dbapi.get_operation(op_uuid)
+        self.assertEqual(self.node.id, op.node_id)
 
     def test_power_invalid_state_request(self):
         ret = self.put_json('/nodes/%s/states/power' % self.node.uuid,
@@ -917,28 +1295,33 @@ class TestPut(base.FunctionalTest):
     def test_provision_with_deploy(self):
         ret = self.put_json('/nodes/%s/states/provision' % self.node.uuid,
                             {'target': states.ACTIVE})
-        self.assertEqual(202, ret.status_code)
-        self.assertEqual('', ret.body)
+        op_uuid = self._check_operation(ret, self.node, 'provision',
+                                        states.ACTIVE)
         self.mock_dnd.assert_called_once_with(
-                mock.ANY, self.node.uuid, False, 'test-topic')
-        # Check location header
-        self.assertIsNotNone(ret.location)
-        expected_location = '/v1/nodes/%s/states' % self.node.uuid
-        self.assertEqual(urlparse.urlparse(ret.location).path,
-                         expected_location)
+                mock.ANY, self.node.uuid, False, 'test-topic',
+                operation_id=op_uuid)
 
     def test_provision_with_tear_down(self):
         ret = self.put_json('/nodes/%s/states/provision' % self.node.uuid,
                             {'target': states.DELETED})
-        self.assertEqual(202, ret.status_code)
-        self.assertEqual('', ret.body)
+        op_uuid = self._check_operation(ret, self.node, 'provision',
+                                        states.DELETED)
         self.mock_dntd.assert_called_once_with(
-                mock.ANY, self.node.uuid, 'test-topic')
-        # Check location header
-        self.assertIsNotNone(ret.location)
-        expected_location = '/v1/nodes/%s/states' % self.node.uuid
-        self.assertEqual(urlparse.urlparse(ret.location).path,
-                         expected_location)
+                mock.ANY, self.node.uuid, 'test-topic', operation_id=op_uuid)
+
+    def test_provision_node_locked(self):
+        self.mock_dnd.side_effect = exception.NodeLocked(node=self.node.uuid,
+                                                         host='fake-host')
+        ret = self.put_json('/nodes/%s/states/provision' % self.node.uuid,
+                            {'target': states.ACTIVE}, expect_errors=True)
+        self.assertEqual(409, ret.status_code)  # Conflict
+
+    def test_provision_in_maintenance(self):
+        self.mock_dnd.side_effect = exception.NodeInMaintenance(
+                op='provisioning', node=self.node.uuid)
+        ret = self.put_json('/nodes/%s/states/provision' % self.node.uuid,
+                            {'target': states.ACTIVE}, expect_errors=True)
+        self.assertEqual(400, ret.status_code)
 
     def test_provision_invalid_state_request(self):
         ret = self.put_json('/nodes/%s/states/provision' % self.node.uuid,
@@ -961,15 +1344,10 @@ class TestPut(base.FunctionalTest):
                 target_provision_state=states.DEPLOYDONE)
         ret = self.put_json('/nodes/%s/states/provision' % node.uuid,
                             {'target': states.DELETED})
-        self.assertEqual(202, ret.status_code)
-        self.assertEqual('', ret.body)
+        op_uuid = self._check_operation(ret, node, 'provision',
+                                        states.DELETED)
         self.mock_dntd.assert_called_once_with(
-                mock.ANY, node.uuid, 'test-topic')
-        # Check location header
-        self.assertIsNotNone(ret.location)
-        expected_location = '/v1/nodes/%s/states' % node.uuid
-        self.assertEqual(urlparse.urlparse(ret.location).path,
-                         expected_location)
+                mock.ANY, node.uuid, 'test-topic', operation_id=op_uuid)
 
     def test_provision_already_in_state(self):
         node = obj_utils.create_test_node(
@@ -986,30 +1364,22 @@ class TestPut(base.FunctionalTest):
                 as mock_scm:
             ret = self.put_json('/nodes/%s/states/console' % self.node.uuid,
                                 {'enabled': "true"})
-            self.assertEqual(202, ret.status_code)
-            self.assertEqual('', ret.body)
+            op_uuid = self._check_operation(ret, self.node, 'console',
+                                            'enabled')
             mock_scm.assert_called_once_with(mock.ANY, self.node.uuid,
-                                             True, 'test-topic')
-            # Check location header
-            self.assertIsNotNone(ret.location)
-            expected_location = '/v1/nodes/%s/states/console' % self.node.uuid
-            self.assertEqual(urlparse.urlparse(ret.location).path,
-                             expected_location)
+                                             True, 'test-topic',
+                                             operation_id=op_uuid)
 
     def test_set_console_mode_disabled(self):
         with mock.patch.object(rpcapi.ConductorAPI, 'set_console_mode') \
                 as mock_scm:
             ret = self.put_json('/nodes/%s/states/console' % self.node.uuid,
                                 {'enabled': "false"})
-            self.assertEqual(202, ret.status_code)
-            self.assertEqual('', ret.body)
+            op_uuid = self._check_operation(ret, self.node, 'console',
+                                            'disabled')
             mock_scm.assert_called_once_with(mock.ANY, self.node.uuid,
-                                             False, 'test-topic')
-            # Check location header
-            self.assertIsNotNone(ret.location)
-            expected_location = '/v1/nodes/%s/states/console' % self.node.uuid
-            self.assertEqual(urlparse.urlparse(ret.location).path,
-                             expected_location)
+                                             False, 'test-topic',
+                                             operation_id=op_uuid)
 
     def test_set_console_mode_bad_request(self):
         with mock.patch.object(rpcapi.ConductorAPI, 'set_console_mode') \
@@ -1039,7 +1409,8 @@ class TestPut(base.FunctionalTest):
                                 {'enabled': "true"}, expect_errors=True)
             self.assertEqual(400, ret.status_code)
             mock_scm.assert_called_once_with(mock.ANY, self.node.uuid,
-                                             True, 'test-topic')
+                                             True, 'test-topic',
+                                             operation_id=mock.ANY)
 
     def test_provision_node_in_maintenance_fail(self):
         with mock.patch.object(rpcapi.ConductorAPI, 'do_node_deploy') as dnd:
@@ -1054,3 +1425,256 @@ class TestPut(base.FunctionalTest):
                                 expect_errors=True)
             self.assertEqual(400, ret.status_code)
             self.assertTrue(ret.json['error_message'])
+
+
+class TestPutStates(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestPutStates, self).setUp()
+        self.nodes = [obj_utils.create_test_node(self.context, id=i,
+                                                 uuid=utils.generate_uuid())
+                      for i in range(3)]
+        self.uuids = [n.uuid for n in self.nodes]
+        p = mock.patch.object(rpcapi.ConductorAPI, 'get_topic_for')
+        self.mock_gtf = p.start()
+        self.mock_gtf.side_effect = lambda n: 'topic-%d' % (n.id % 2)
+        self.addCleanup(p.stop)
+
+    def _accept_all(self, context, uuids, *args):
+        return dict((u, None) for u in uuids)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state')
+    def test_power(self, mock_cnps):
+        mock_cnps.side_effect = self._accept_all
+        response = self.put_json('/nodes/states/power',
+                                 {'nodes': self.uuids,
+                                  'target': states.POWER_ON})
+        self.assertEqual(202, response.status_code)
+        self.assertEqual([{'uuid': u, 'accepted': True, 'error': None}
+                          for u in self.uuids], response.json['nodes'])
+        # one RPC call per conductor
+        mock_cnps.assert_has_calls([
+            mock.call(mock.ANY, [self.uuids[0], self.uuids[2]],
+                      states.POWER_ON, 'topic-0'),
+            mock.call(mock.ANY, [self.uuids[1]], states.POWER_ON, 'topic-1')],
+            any_order=True)
+        self.assertEqual(2, mock_cnps.call_count)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state')
+    def test_power_partial(self, mock_cnps):
+        mock_cnps.side_effect = lambda c, uuids, s, t: dict(
+                (u, 'locked' if u == self.uuids[2] else None) for u in uuids)
+        missing = utils.generate_uuid()
+        response = self.put_json('/nodes/states/power',
+                                 {'nodes': self.uuids + [missing],
+                                  'target': states.REBOOT})
+        self.assertEqual(202, response.status_code)
+        results = response.json['nodes']
+        self.assertEqual([True, True, False, False],
+                         [r['accepted'] for r in results])
+        self.assertEqual('locked', results[2]['error'])
+        self.assertIn(missing, results[3]['error'])
+        self.assertNotIn(self.uuids[0], results[3]['error'])
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state')
+    def test_power_single_query(self, mock_cnps):
+        mock_cnps.side_effect = self._accept_all
+        with mock.patch.object(self.dbapi, 'get_node_list',
+                               wraps=self.dbapi.get_node_list) as mock_gnl:
+            self.put_json('/nodes/states/power',
+                          {'nodes': self.uuids, 'target': states.POWER_ON})
+        mock_gnl.assert_called_once_with({'uuids': self.uuids})
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state')
+    def test_power_messaging_error(self, mock_cnps):
+        def send(context, uuids, state, topic):
+            if topic == 'topic-1':
+                raise messaging.MessagingTimeout('timed out')
+            return self._accept_all(context, uuids)
+        mock_cnps.side_effect = send
+        response = self.put_json('/nodes/states/power',
+                                 {'nodes': self.uuids,
+                                  'target': states.POWER_OFF})
+        self.assertEqual([True, False, True],
+                         [r['accepted'] for r in response.json['nodes']])
+
+    def test_power_invalid_state_request(self):
+        response = self.put_json('/nodes/states/power',
+                                 {'nodes': self.uuids,
+                                  'target': 'not-supported'},
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_code)
+
+    def test_invalid_kind(self):
+        response = self.put_json('/nodes/states/spam',
+                                 {'nodes': self.uuids,
+                                  'target': states.POWER_ON},
+                                 expect_errors=True)
+        self.assertEqual(404, response.status_code)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'do_nodes_deploy')
+    def test_provision_deploy(self, mock_dnd):
+        mock_dnd.side_effect = self._accept_all
+        self.nodes[1].target_provision_state = states.ACTIVE
+        self.nodes[1].save()
+        response = self.put_json('/nodes/states/provision',
+                                 {'nodes': self.uuids,
+                                  'target': states.ACTIVE})
+        self.assertEqual(202, response.status_code)
+        self.assertEqual([True, False, True],
+                         [r['accepted'] for r in response.json['nodes']])
+        mock_dnd.assert_called_once_with(mock.ANY,
+                                         [self.uuids[0], self.uuids[2]],
+                                         False, 'topic-0')
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'do_nodes_tear_down')
+    def test_provision_tear_down(self, mock_dntd):
+        mock_dntd.side_effect = self._accept_all
+        response = self.put_json('/nodes/states/provision',
+                                 {'nodes': self.uuids[:1],
+                                  'target': states.DELETED})
+        self.assertEqual(202, response.status_code)
+        mock_dntd.assert_called_once_with(mock.ANY, self.uuids[:1],
+                                          'topic-0')
+
+    def test_provision_invalid_state_request(self):
+        response = self.put_json('/nodes/states/provision',
+                                 {'nodes': self.uuids,
+                                  'target': states.POWER_ON},
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_code)
+
+
+@mock.patch.object(time, 'sleep')
+class TestWatchStates(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestWatchStates, self).setUp()
+        self.nodes = [obj_utils.create_test_node(self.context, id=i,
+                                                 uuid=utils.generate_uuid(),
+                                                 power_state=states.POWER_OFF)
+                      for i in range(2)]
+        self.uuids = [n.uuid for n in self.nodes]
+        self.sleeps = []
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+    def _sleep(self, mock_sleep, node=None, **values):
+        def sleep(interval):
+            # the DB layer sleeps 0 seconds to yield to other threads
+            if not interval:
+                return
+            self.sleeps.append(interval)
+            timeutils.advance_time_seconds(interval)
+            if node is not None:
+                self.dbapi.update_node(node.id, values)
+        mock_sleep.side_effect = sleep
+
+    def test_no_wait(self, mock_sleep):
+        self._sleep(mock_sleep)
+        data = self.get_json('/nodes/%s/states' % self.uuids[0])
+        self.assertEqual(states.POWER_OFF, data['power_state'])
+        self.assertEqual([], self.sleeps)
+
+    def test_wait_until(self, mock_sleep):
+        self._sleep(mock_sleep, self.nodes[0], power_state=states.POWER_ON)
+        data = self.get_json('/nodes/%s/states?wait_until=%s&timeout=10'
+                             % (self.uuids[0], states.POWER_ON))
+        self.assertEqual(states.POWER_ON, data['power_state'])
+        self.assertEqual([cfg.CONF.api.watch_interval], self.sleeps)
+
+    def test_wait_until_already_reached(self, mock_sleep):
+        self._sleep(mock_sleep)
+        data = self.get_json('/nodes/%s/states?wait_until=%s'
+                             % (self.uuids[0], states.POWER_OFF))
+        self.assertEqual(states.POWER_OFF, data['power_state'])
+        self.assertEqual([], self.sleeps)
+
+    def test_wait_until_deploy_failed(self, mock_sleep):
+        self._sleep(mock_sleep, self.nodes[0],
+                    provision_state=states.DEPLOYFAIL)
+        data = self.get_json('/nodes/%s/states?wait_until=%s&timeout=10'
+                             % (self.uuids[0], states.ACTIVE))
+        self.assertEqual(states.DEPLOYFAIL, data['provision_state'])
+        self.assertEqual(1, len(self.sleeps))
+
+    def test_wait_until_deleted(self, mock_sleep):
+        self.dbapi.update_node(self.nodes[0].id,
+                               {'provision_state': states.DELETING})
+        self._sleep(mock_sleep, self.nodes[0],
+                    provision_state=states.NOSTATE)
+        data = self.get_json('/nodes/%s/states?wait_until=%s&timeout=10'
+                             % (self.uuids[0], states.DELETED))
+        self.assertIsNone(data['provision_state'])
+        self.assertEqual(1, len(self.sleeps))
+
+    def test_wait_until_unknown_state(self, mock_sleep):
+        response = self.get_json('/nodes/%s/states?wait_until=foo'
+                                 % self.uuids[0], expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        self.assertEqual([], self.sleeps)
+
+    def test_wait_for_any_change(self, mock_sleep):
+        self._sleep(mock_sleep, self.nodes[0], last_error='boom')
+        data = self.get_json('/nodes/%s/states?timeout=10' % self.uuids[0])
+        self.assertEqual('boom', data['last_error'])
+        self.assertEqual(1, len(self.sleeps))
+
+    def test_timeout(self, mock_sleep):
+        cfg.CONF.set_override('watch_interval', 0.4, 'api')
+        self._sleep(mock_sleep)
+        data = self.get_json('/nodes/%s/states?wait_until=%s&timeout=1'
+                             % (self.uuids[0], states.POWER_ON))
+        self.assertEqual(states.POWER_OFF, data['power_state'])
+        self.assertEqual(1, round(sum(self.sleeps), 6))
+        self.assertEqual(3, len(self.sleeps))
+
+    def test_timeout_capped(self, mock_sleep):
+        cfg.CONF.set_override('max_watch_timeout', 0, 'api')
+        self._sleep(mock_sleep)
+        data = self.get_json('/nodes/%s/states?wait_until=%s&timeout=100'
+                             % (self.uuids[0], states.POWER_ON))
+        self.assertEqual(states.POWER_OFF, data['power_state'])
+        self.assertEqual([], self.sleeps)
+
+    def test_negative_timeout(self, mock_sleep):
+        response = self.get_json('/nodes/%s/states?timeout=-1'
+                                 % self.uuids[0], expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_watch_nodes(self, mock_sleep):
+        self.dbapi.update_node(self.nodes[1].id,
+                               {'power_state': states.POWER_ON})
+        self._sleep(mock_sleep, self.nodes[0], power_state=states.POWER_ON)
+        data = self.get_json('/nodes/states?nodes=%s&wait_until=%s'
+                             % (','.join(self.uuids), states.POWER_ON))
+        self.assertEqual(sorted(self.uuids), sorted(data['nodes']))
+        for node_uuid in self.uuids:
+            self.assertEqual(states.POWER_ON,
+                             data['nodes'][node_uuid]['power_state'])
+        self.assertEqual(1, len(self.sleeps))
+
+    def test_watch_nodes_any_change(self, mock_sleep):
+        self._sleep(mock_sleep, self.nodes[1], power_state=states.POWER_ON)
+        data = self.get_json('/nodes/states?nodes=%s&timeout=10'
+                             % ','.join(self.uuids))
+        self.assertEqual(states.POWER_OFF,
+                         data['nodes'][self.uuids[0]]['power_state'])
+        self.assertEqual(states.POWER_ON,
+                         data['nodes'][self.uuids[1]]['power_state'])
+
+    def test_watch_nodes_not_found(self, mock_sleep):
+        response = self.get_json('/nodes/states?nodes=%s,%s'
+                                 % (self.uuids[0], utils.generate_uuid()),
+                                 expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
+    def test_watch_nodes_invalid_uuid(self, mock_sleep):
+        response = self.get_json('/nodes/states?nodes=%s,foo'
+                                 % self.uuids[0], expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_watch_nodes_no_nodes(self, mock_sleep):
+        response = self.get_json('/nodes/states?nodes=',
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
@@ -0,0 +1,112 @@
+# -*- encoding: utf-8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests for the API /operations/ methods.
+"""
+
+from oslo.config import cfg
+from six.moves.urllib import parse as urlparse
+
+from ironic.common import states
+from ironic.common import utils
+from ironic.tests.api import base
+from ironic.tests.db import utils as dbutils
+from ironic.tests.objects import utils as obj_utils
+
+
+class TestListOperations(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestListOperations, self).setUp()
+        self.node = obj_utils.create_test_node(self.context)
+
+    def _create_test_operation(self, **kwargs):
+        kwargs.setdefault('node_id', self.node.id)
+        return self.dbapi.create_operation(
+                dbutils.get_test_operation(**kwargs))
+
+    def test_empty(self):
+        data = self.get_json('/operations')
+        self.assertEqual([], data['operations'])
+
+    def test_get_one(self):
+        op = self._create_test_operation()
+        data = self.get_json('/operations/%s' % op.uuid)
+        self.assertEqual(op.uuid, data['uuid'])
+        self.assertEqual(self.node.uuid, data['node_uuid'])
+        self.assertEqual('power', data['action'])
+        self.assertEqual(states.POWER_ON, data['target'])
+        self.assertEqual(states.QUEUED, data['state'])
+        self.assertNotIn('id', data)
+        self.assertNotIn('node_id', data)
+        self.assertIn('links', data)
+
+    def test_get_one_not_found(self):
+        response = self.get_json('/operations/%s' % utils.generate_uuid(),
+                                 expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
+    def test_many(self):
+        uuids = [self._create_test_operation(
+                    id=i, uuid=utils.generate_uuid()).uuid
+                 for i in range(1, 6)]
+        data = self.get_json('/operations')
+        self.assertEqual(uuids, [op['uuid'] for op in data['operations']])
+        self.assertEqual([self.node.uuid] * 5,
+                         [op['node_uuid'] for op in data['operations']])
+
+    def test_filter_by_node_and_state(self):
+        node2 = obj_utils.create_test_node(self.context, id=2,
+                                           uuid=utils.generate_uuid())
+        self._create_test_operation(id=1, uuid=utils.generate_uuid())
+        op2 = self._create_test_operation(id=2, uuid=utils.generate_uuid(),
+                                          node_id=node2.id)
+        op3 = self._create_test_operation(id=3, uuid=utils.generate_uuid(),
+                                          state=states.DONE)
+
+        data = self.get_json('/operations?node_uuid=%s' % node2.uuid)
+        self.assertEqual([op2.uuid],
+                         [op['uuid'] for op in data['operations']])
+
+        data = self.get_json('/operations?state=%s' % states.DONE)
+        self.assertEqual([op3.uuid],
+                         [op['uuid'] for op in data['operations']])
+
+    def test_filter_by_unknown_node(self):
+        response = self.get_json('/operations?node_uuid=%s'
+                                 % utils.generate_uuid(),
+                                 expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
+    def test_collection_links(self):
+        for i in range(1, 4):
+            self._create_test_operation(id=i, uuid=utils.generate_uuid())
+        data = self.get_json('/operations?limit=2&state=%s' % states.QUEUED)
+        self.assertEqual(2, len(data['operations']))
+        next_marker = data['operations'][-1]['uuid']
+        self.assertIn(next_marker, data['next'])
+        self.assertIn('state=%s' % states.QUEUED, data['next'])
+
+    def test_collection_links_default_limit(self):
+        cfg.CONF.set_override('max_limit', 2, 'api')
+        for i in range(1, 4):
+            self._create_test_operation(id=i, uuid=utils.generate_uuid())
+        data = self.get_json('/operations')
+        self.assertEqual(2, len(data['operations']))
+
+    def test_links(self):
+        op = self._create_test_operation()
+        data = self.get_json('/operations/%s' % op.uuid)
+        self.assertEqual('/v1/operations/%s' % op.uuid,
+                         urlparse.urlparse(data['links'][0]['href']).path)
@@ -22,9 +22,11 @@ from oslo.config import cfg
 from six.moves.urllib import parse as urlparse
 from testtools.matchers import HasLength
 
+from ironic.api.controllers.v1 import collection
 from ironic.common import exception
 from ironic.common import utils
 from ironic.conductor import rpcapi
+from ironic import objects
 from ironic.openstack.common import context
 from ironic.openstack.common import timeutils
 from ironic.tests.api import base
@@ -73,6 +75,24 @@ class TestListPorts(base.FunctionalTest):
         # never expose the node_id
         self.assertNotIn('node_id', data)
 
+    def test_get_one_not_modified(self):
+        port = self.dbapi.create_port(dbutils.get_test_port())
+        path = '%s/ports/%s' % (base.PATH_PREFIX, port.uuid)
+        etag = self.app.get(path).headers['ETag']
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+
+    def test_collection_modified(self):
+        self.dbapi.create_port(dbutils.get_test_port())
+        path = '%s/ports' % base.PATH_PREFIX
+        etag = self.app.get(path).headers['ETag']
+        self.dbapi.create_port(dbutils.get_test_port(
+                                        id=2, uuid=utils.generate_uuid(),
+                                        address='52:54:00:cf:2d:32'))
+        response = self.app.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(2, len(response.json['ports']))
+
     def test_detail(self):
         pdict = dbutils.get_test_port()
         port = self.dbapi.create_port(pdict)
@@ -90,6 +110,59 @@ class TestListPorts(base.FunctionalTest):
                                  expect_errors=True)
         self.assertEqual(404, response.status_int)
 
+    def test_get_one_fields(self):
+        pdict = dbutils.get_test_port()
+        port = self.dbapi.create_port(pdict)
+        data = self.get_json('/ports/%s?fields=address,node_uuid' %
+                             port.uuid)
+        self.assertEqual(set(['uuid', 'address', 'node_uuid']),
+                         set(data.keys()))
+        self.assertEqual(port.address, data['address'])
+
+    def test_get_one_invalid_fields(self):
+        pdict = dbutils.get_test_port()
+        port = self.dbapi.create_port(pdict)
+        response = self.get_json('/ports/%s?fields=node_id' % port.uuid,
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        self.assertTrue(response.json['error_message'])
+
+    def test_detail_fields(self):
+        pdict = dbutils.get_test_port()
+        port = self.dbapi.create_port(pdict)
+        data = self.get_json('/ports/detail?fields=extra,links')
+        self.assertEqual(set(['uuid', 'extra', 'links']),
+                         set(data['ports'][0].keys()))
+        self.assertEqual(port.uuid, data['ports'][0]['uuid'])
+
+    def test_serializer_matches(self):
+        for id in range(3):
+            pdict = dbutils.get_test_port(id=id, uuid=utils.generate_uuid(),
+                                          address='52:54:00:cf:2d:3%s' % id)
+            self.dbapi.create_port(pdict)
+        with mock.patch.object(collection.Collection, 'can_serialize',
+                               return_value=False):
+            expected = self.get_json('/ports/detail')
+        with mock.patch.object(objects.Node, 'get') as mock_get:
+            data = self.get_json('/ports/detail')
+            self.assertFalse(mock_get.called)
+        self.assertEqual(expected, data)
+
+    def test_export(self):
+        pdict = dbutils.get_test_port()
+        self.dbapi.create_port(pdict)
+        response = self.app.get('%s/ports/export?node_uuid=%s'
+                                % (base.PATH_PREFIX, self.node.uuid))
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(self.get_json('/ports/detail')['ports'],
+                         response.json['ports'])
+
+    def test_export_node_not_found(self):
+        response = self.app.get('%s/ports/export?node_uuid=%s'
+                                % (base.PATH_PREFIX, utils.generate_uuid()),
+                                expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
     def test_many(self):
         ports = []
         for id in range(5):
@@ -435,6 +508,113 @@ class TestPatch(base.FunctionalTest):
         self.assertEqual(address.lower(), kargs.address)
 
 
+@mock.patch.object(rpcapi.ConductorAPI, 'update_ports')
+class TestPatchMany(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestPatchMany, self).setUp()
+        self.node = obj_utils.create_test_node(context.get_admin_context())
+        self.port1 = self.dbapi.create_port(dbutils.get_test_port(id=None))
+        self.port2 = self.dbapi.create_port(dbutils.get_test_port(
+                                id=None, uuid=utils.generate_uuid(),
+                                address='52:54:00:cf:2d:32'))
+
+        p = mock.patch.object(rpcapi.ConductorAPI, 'get_topic_for')
+        self.mock_gtf = p.start()
+        self.mock_gtf.return_value = 'test-topic'
+        self.addCleanup(p.stop)
+
+    def _vif_patch(self, port, vif):
+        return {'uuid': port.uuid, 'path': '/extra/vif_port_id',
+                'value': vif, 'op': 'add'}
+
+    def test_update_many(self, mock_upd):
+        mock_upd.side_effect = lambda ctxt, ports, topic: ports
+        response = self.patch_json('/ports',
+                                   [self._vif_patch(self.port1, 'vif-1'),
+                                    self._vif_patch(self.port2, 'vif-2')])
+        self.assertEqual('application/json', response.content_type)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([{'vif_port_id': 'vif-1'}, {'vif_port_id': 'vif-2'}],
+                         [p['extra'] for p in response.json['ports']])
+        self.assertEqual([self.port1.uuid, self.port2.uuid],
+                         [p['uuid'] for p in response.json['ports']])
+
+        self.assertEqual(1, mock_upd.call_count)
+        ports, topic = mock_upd.call_args[0][1:]
+        self.assertEqual('test-topic', topic)
+        self.assertEqual([{'extra'}, {'extra'}],
+                         [p.obj_what_changed() for p in ports])
+
+    def test_update_many_several_operations(self, mock_upd):
+        mock_upd.side_effect = lambda ctxt, ports, topic: ports
+        response = self.patch_json('/ports',
+                                   [self._vif_patch(self.port1, 'vif-1'),
+                                    {'uuid': self.port1.uuid,
+                                     'path': '/extra/foo',
+                                     'value': 'bar', 'op': 'add'}])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([{'vif_port_id': 'vif-1', 'foo': 'bar'}],
+                         [p['extra'] for p in response.json['ports']])
+        ports = mock_upd.call_args[0][1]
+        self.assertEqual([self.port1.uuid], [p.uuid for p in ports])
+
+    def test_update_many_no_uuid(self, mock_upd):
+        response = self.patch_json('/ports',
+                                   [{'path': '/extra/foo', 'value': 'bar',
+                                     'op': 'add'}],
+                                   expect_errors=True)
+        self.assertEqual(400, response.status_code)
+        self.assertFalse(mock_upd.called)
+
+    def test_update_many_empty(self, mock_upd):
+        response = self.patch_json('/ports', [], expect_errors=True)
+        self.assertEqual('application/json', response.content_type)
+        self.assertEqual(400, response.status_code)
+        self.assertTrue(response.json['error_message'])
+        self.assertFalse(mock_upd.called)
+
+    def test_update_many_not_found(self, mock_upd):
+        uuid = utils.generate_uuid()
+        response = self.patch_json('/ports',
+                                   [self._vif_patch(self.port1, 'vif-1'),
+                                    {'uuid': uuid, 'path': '/extra/foo',
+                                     'value': 'bar', 'op': 'add'}],
+                                   expect_errors=True)
+        self.assertEqual('application/json', response.content_type)
+        self.assertEqual(404, response.status_code)
+        self.assertTrue(response.json['error_message'])
+        self.assertFalse(mock_upd.called)
+
+    def test_update_many_different_nodes(self, mock_upd):
+        node = obj_utils.create_test_node(context.get_admin_context(),
+                                          id=124,
+                                          uuid=utils.generate_uuid())
+        port = self.dbapi.create_port(dbutils.get_test_port(
+                                id=None, uuid=utils.generate_uuid(),
+                                address='52:54:00:cf:2d:33',
+                                node_id=node.id))
+        response = self.patch_json('/ports',
+                                   [self._vif_patch(self.port1, 'vif-1'),
+                                    self._vif_patch(port, 'vif-2')],
+                                   expect_errors=True)
+        self.assertEqual('application/json', response.content_type)
+        self.assertEqual(400, response.status_code)
+        self.assertTrue(response.json['error_message'])
+        self.assertFalse(mock_upd.called)
+
+    def test_update_many_remove_mandatory_field(self, mock_upd):
+        response = self.patch_json('/ports',
+                                   [{'uuid': self.port1.uuid,
+                                     'path': '/address',
+                                     'op': 'remove'}],
+                                   expect_errors=True)
+        self.assertEqual('application/json', response.content_type)
+        self.assertEqual(400, response.status_code)
+        self.assertTrue(response.json['error_message'])
+        self.assertFalse(mock_upd.called)
+
+
 class TestPost(base.FunctionalTest):
 
     def setUp(self):
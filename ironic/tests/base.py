@@ -182,6 +182,11 @@ class TestCase(testtools.TestCase):
                 objects_base.IronicObject._obj_classes)
         self.addCleanup(self._restore_obj_registry)
 
+        # NOTE: the shared hash ring manager caches the conductors
+        # registered by other tests
+        self.useFixture(fixtures.MonkeyPatch(
+                'ironic.common.hash_ring._SHARED_MANAGER', None))
+
         self.addCleanup(self._clear_attrs)
         self.useFixture(fixtures.EnvironmentVariable('http_proxy'))
         self.policy = self.useFixture(policy_fixture.PolicyFixture())
@@ -279,6 +279,10 @@ class CleanupAfterTimeoutTestCase(tests_base.TestCase):
         self.task.shared = False
         self.task.node = mock.Mock(spec_set=objects.Node)
         self.node = self.task.node
+        finish_patcher = mock.patch.object(conductor_utils,
+                                           'finish_provision_operations')
+        self.finish_mock = finish_patcher.start()
+        self.addCleanup(finish_patcher.stop)
 
     def test_cleanup_after_timeout(self):
         conductor_utils.cleanup_after_timeout(self.task)
@@ -288,6 +292,7 @@ class CleanupAfterTimeoutTestCase(tests_base.TestCase):
         self.assertEqual(states.DEPLOYFAIL, self.node.provision_state)
         self.assertEqual(states.NOSTATE, self.node.target_provision_state)
         self.assertIn('Timeout reached', self.node.last_error)
+        self.finish_mock.assert_called_once_with(self.task)
 
     def test_cleanup_after_timeout_shared_lock(self):
         self.task.shared = True
@@ -321,3 +326,136 @@ class CleanupAfterTimeoutTestCase(tests_base.TestCase):
         self.assertEqual(states.DEPLOYFAIL, self.node.provision_state)
         self.assertEqual(states.NOSTATE, self.node.target_provision_state)
         self.assertIn('Deploy timed out', self.node.last_error)
+
+
+class OperationTrackingTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(OperationTrackingTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.dbapi = dbapi.get_instance()
+        self.node = obj_utils.create_test_node(self.context)
+        self.op_uuid = self.dbapi.create_operation(
+                utils.get_test_operation(node_id=self.node.id)).uuid
+
+    def _get_operation(self):
+        return objects.Operation.get_by_uuid(self.context, self.op_uuid)
+
+    def test_start_operation(self):
+        op = conductor_utils.start_operation(self.context, self.op_uuid)
+        self.assertEqual(states.RUNNING, op.state)
+        self.assertIsNotNone(op.started_at)
+        self.assertEqual(states.RUNNING, self._get_operation().state)
+
+    def test_start_operation_none(self):
+        self.assertIsNone(conductor_utils.start_operation(self.context, None))
+
+    def test_track_operation_done(self):
+        op = self._get_operation()
+        func = mock.Mock(return_value='result')
+        wrapped = conductor_utils.track_operation(op, func)
+        self.assertEqual('result', wrapped('arg', kw='kwarg'))
+        func.assert_called_once_with('arg', kw='kwarg')
+        op = self._get_operation()
+        self.assertEqual(states.DONE, op.state)
+        self.assertIsNone(op.error)
+        self.assertIsNotNone(op.finished_at)
+
+    def test_track_operation_failed(self):
+        op = self._get_operation()
+        func = mock.Mock(side_effect=exception.NodeLocked(node='n',
+                                                          host='h'))
+        wrapped = conductor_utils.track_operation(op, func)
+        self.assertRaises(exception.NodeLocked, wrapped)
+        op = self._get_operation()
+        self.assertEqual(states.FAILED, op.state)
+        self.assertIn('locked', op.error)
+        self.assertIsNotNone(op.finished_at)
+
+    def test_track_operation_none(self):
+        func = mock.Mock()
+        self.assertIs(func, conductor_utils.track_operation(None, func))
+
+    def test_operation_failure_guard(self):
+        with conductor_utils.operation_failure_guard(
+                self.context, self.op_uuid) as op:
+            self.assertEqual(self.op_uuid, op.uuid)
+        self.assertEqual(states.RUNNING, self._get_operation().state)
+
+        def fail():
+            with conductor_utils.operation_failure_guard(self.context,
+                                                         self.op_uuid):
+                raise exception.IronicException('boom')
+
+        self.assertRaises(exception.IronicException, fail)
+        op = self._get_operation()
+        self.assertEqual(states.FAILED, op.state)
+        self.assertEqual('boom', op.error)
+
+    def test_operation_failure_guard_none(self):
+        with conductor_utils.operation_failure_guard(self.context,
+                                                     None) as op:
+            self.assertIsNone(op)
+
+    @mock.patch.object(conductor_utils, 'start_operation')
+    def test_operation_failure_guard_start_failed(self, start_mock):
+        start_mock.side_effect = exception.IronicException('boom')
+
+        def fail():
+            with conductor_utils.operation_failure_guard(self.context,
+                                                         self.op_uuid):
+                self.fail('The guarded code should not run.')
+
+        self.assertRaises(exception.IronicException, fail)
+        op = self._get_operation()
+        self.assertEqual(states.FAILED, op.state)
+        self.assertEqual('boom', op.error)
+
+    @mock.patch.object(conductor_utils, 'finish_operation')
+    def test_operation_failure_guard_mark_failed(self, finish_mock):
+        finish_mock.side_effect = exception.IronicException('db down')
+
+        def fail():
+            with conductor_utils.operation_failure_guard(self.context,
+                                                         self.op_uuid):
+                raise exception.NodeLocked(node='n', host='h')
+
+        self.assertRaises(exception.NodeLocked, fail)
+        self.assertEqual(1, finish_mock.call_count)
+
+    def _test_finish_provision_operations(self, target, provision_state):
+        op_uuid = self.dbapi.create_operation(
+                utils.get_test_operation(id=2, uuid=cmn_utils.generate_uuid(),
+                                         node_id=self.node.id,
+                                         action='provision', target=target,
+                                         state=states.RUNNING)).uuid
+        self.node.provision_state = provision_state
+        task = mock.Mock(node=self.node, context=self.context)
+        conductor_utils.finish_provision_operations(task)
+        # The power operation is left alone
+        self.assertEqual(states.QUEUED, self._get_operation().state)
+        return objects.Operation.get_by_uuid(self.context, op_uuid)
+
+    def test_finish_provision_operations_done(self):
+        op = self._test_finish_provision_operations(states.ACTIVE,
+                                                    states.ACTIVE)
+        self.assertEqual(states.DONE, op.state)
+        self.assertIsNotNone(op.finished_at)
+
+    def test_finish_provision_operations_failed(self):
+        self.node.last_error = 'boom'
+        op = self._test_finish_provision_operations(states.ACTIVE,
+                                                    states.DEPLOYFAIL)
+        self.assertEqual(states.FAILED, op.state)
+        self.assertEqual('boom', op.error)
+
+    def test_finish_provision_operations_tear_down(self):
+        op = self._test_finish_provision_operations(states.DELETED,
+                                                    states.NOSTATE)
+        self.assertEqual(states.DONE, op.state)
+
+    def test_finish_provision_operations_not_settled(self):
+        op = self._test_finish_provision_operations(states.ACTIVE,
+                                                    states.DEPLOYWAIT)
+        self.assertEqual(states.RUNNING, op.state)
+        self.assertIsNone(op.finished_at)
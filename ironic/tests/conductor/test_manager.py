@@ -840,6 +840,226 @@ class ManagerTestCase(tests_db_base.DbTestCase):
         # Verify reservation has been cleared.
         self.assertIsNone(node.reservation)
 
+    @mock.patch.object(conductor_utils, 'node_power_action')
+    def test_change_nodes_power_state(self, pwr_act_mock):
+        node1 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=1,
+                                           uuid=ironic_utils.generate_uuid())
+        node2 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=2,
+                                           uuid=ironic_utils.generate_uuid(),
+                                           reservation='fake-reserv')
+        missing = ironic_utils.generate_uuid()
+        self._start_service()
+
+        ret = self.service.change_nodes_power_state(
+                self.context, [node1.uuid, node2.uuid, missing],
+                states.POWER_ON)
+        self.service._worker_pool.waitall()
+
+        self.assertEqual(3, len(ret))
+        self.assertIsNone(ret[node1.uuid])
+        self.assertIn('fake-reserv', ret[node2.uuid])
+        self.assertIn(missing, ret[missing])
+        pwr_act_mock.assert_called_once_with(mock.ANY, states.POWER_ON)
+
+    @mock.patch.object(conductor_utils, 'node_power_action')
+    def test_change_nodes_power_state_unexpected_error(self, pwr_act_mock):
+        node1 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=1,
+                                           uuid=ironic_utils.generate_uuid())
+        node2 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=2,
+                                           uuid=ironic_utils.generate_uuid())
+        self._start_service()
+
+        with mock.patch.object(self.driver.power, 'validate') as mock_val:
+            mock_val.side_effect = [RuntimeError('boom'), None]
+            ret = self.service.change_nodes_power_state(
+                    self.context, [node1.uuid, node2.uuid], states.POWER_ON)
+        self.service._worker_pool.waitall()
+
+        self.assertEqual({node1.uuid: 'boom', node2.uuid: None}, ret)
+        pwr_act_mock.assert_called_once_with(mock.ANY, states.POWER_ON)
+
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.deploy')
+    def test_do_nodes_deploy(self, mock_deploy):
+        node1 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=1,
+                                           uuid=ironic_utils.generate_uuid())
+        node2 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=2,
+                                           uuid=ironic_utils.generate_uuid(),
+                                           provision_state=states.ACTIVE)
+        self._start_service()
+        mock_deploy.return_value = states.DEPLOYDONE
+
+        ret = self.service.do_nodes_deploy(self.context,
+                                           [node1.uuid, node2.uuid])
+        self.service._worker_pool.waitall()
+
+        self.assertIsNone(ret[node1.uuid])
+        self.assertIsNotNone(ret[node2.uuid])
+        mock_deploy.assert_called_once_with(mock.ANY)
+        node1.refresh()
+        self.assertEqual(states.ACTIVE, node1.provision_state)
+
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.tear_down')
+    def test_do_nodes_tear_down(self, mock_tear_down):
+        node1 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=1,
+                                           uuid=ironic_utils.generate_uuid(),
+                                           provision_state=states.ACTIVE)
+        node2 = obj_utils.create_test_node(self.context, driver='fake',
+                                           id=2,
+                                           uuid=ironic_utils.generate_uuid())
+        self._start_service()
+        mock_tear_down.return_value = states.DELETED
+
+        ret = self.service.do_nodes_tear_down(self.context,
+                                              [node1.uuid, node2.uuid])
+        self.service._worker_pool.waitall()
+
+        self.assertIsNone(ret[node1.uuid])
+        self.assertIsNotNone(ret[node2.uuid])
+        mock_tear_down.assert_called_once_with(mock.ANY)
+
+    def _create_test_operation(self, node, **kwargs):
+        return self.dbapi.create_operation(
+                utils.get_test_operation(node_id=node.id, **kwargs))
+
+    @mock.patch.object(conductor_utils, 'node_power_action')
+    def test_change_node_power_state_with_operation(self, pwr_act_mock):
+        node = obj_utils.create_test_node(self.context, driver='fake')
+        op = self._create_test_operation(node)
+        self._start_service()
+
+        self.service.change_node_power_state(self.context, node.uuid,
+                                             states.POWER_ON,
+                                             operation_id=op.uuid)
+        self.service._worker_pool.waitall()
+
+        pwr_act_mock.assert_called_once_with(mock.ANY, states.POWER_ON)
+        op = self.dbapi.get_operation(op.uuid)
+        self.assertEqual(states.DONE, op.state)
+        self.assertIsNotNone(op.started_at)
+        self.assertIsNotNone(op.finished_at)
+        self.assertIsNone(op.error)
+
+    def test_change_node_power_state_with_operation_node_locked(self):
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          reservation='fake-reserv')
+        op = self._create_test_operation(node)
+        self._start_service()
+
+        exc = self.assertRaises(messaging.rpc.ExpectedException,
+                                self.service.change_node_power_state,
+                                self.context, node.uuid, states.POWER_ON,
+                                operation_id=op.uuid)
+        self.assertEqual(exception.NodeLocked, exc.exc_info[0])
+        op = self.dbapi.get_operation(op.uuid)
+        self.assertEqual(states.FAILED, op.state)
+        self.assertIn('fake-reserv', op.error)
+
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.deploy')
+    def test_do_node_deploy_with_operation_driver_fails(self, mock_deploy):
+        node = obj_utils.create_test_node(self.context, driver='fake')
+        op = self._create_test_operation(node, action='provision',
+                                         target=states.ACTIVE)
+        self._start_service()
+        mock_deploy.side_effect = exception.InstanceDeployFailure('boom')
+
+        self.service.do_node_deploy(self.context, node.uuid,
+                                    operation_id=op.uuid)
+        self.service._worker_pool.waitall()
+
+        op = self.dbapi.get_operation(op.uuid)
+        self.assertEqual(states.FAILED, op.state)
+        self.assertIn('boom', op.error)
+        node.refresh()
+        self.assertEqual(states.DEPLOYFAIL, node.provision_state)
+
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.deploy')
+    def test_do_node_deploy_with_operation_wait(self, mock_deploy):
+        node = obj_utils.create_test_node(self.context, driver='fake')
+        op = self._create_test_operation(node, action='provision',
+                                         target=states.ACTIVE)
+        self._start_service()
+        mock_deploy.return_value = states.DEPLOYWAIT
+
+        self.service.do_node_deploy(self.context, node.uuid,
+                                    operation_id=op.uuid)
+        self.service._worker_pool.waitall()
+
+        # The deployment goes on, until the ramdisk calls back
+        self.assertEqual(states.RUNNING,
+                         self.dbapi.get_operation(op.uuid).state)
+
+        def _continue_deploy(task, **kwargs):
+            task.node.provision_state = states.ACTIVE
+            task.node.save(task.context)
+
+        with mock.patch.object(self.driver.vendor, 'vendor_passthru',
+                               side_effect=_continue_deploy):
+            self.service.vendor_passthru(self.context, node.uuid,
+                                         'first_method', {'bar': 'baz'})
+            self.service._worker_pool.waitall()
+
+        op = self.dbapi.get_operation(op.uuid)
+        self.assertEqual(states.DONE, op.state)
+        self.assertIsNotNone(op.finished_at)
+
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.tear_down')
+    def test_do_node_tear_down_aborts_deploy_operation(self, mock_tear_down):
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          provision_state=states.DEPLOYWAIT)
+        deploy_op = self._create_test_operation(
+                node, id=1, uuid=ironic_utils.generate_uuid(),
+                action='provision', target=states.ACTIVE,
+                state=states.RUNNING)
+        op = self._create_test_operation(
+                node, id=2, uuid=ironic_utils.generate_uuid(),
+                action='provision', target=states.DELETED)
+        self._start_service()
+        mock_tear_down.return_value = states.DELETED
+
+        self.service.do_node_tear_down(self.context, node.uuid,
+                                       operation_id=op.uuid)
+        self.service._worker_pool.waitall()
+
+        self.assertEqual(states.DONE, self.dbapi.get_operation(op.uuid).state)
+        deploy_op = self.dbapi.get_operation(deploy_op.uuid)
+        self.assertEqual(states.FAILED, deploy_op.state)
+        self.assertIsNotNone(deploy_op.error)
+
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.tear_down')
+    def test_do_node_tear_down_with_operation(self, mock_tear_down):
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          provision_state=states.ACTIVE)
+        op = self._create_test_operation(node, action='provision',
+                                         target=states.DELETED)
+        self._start_service()
+        mock_tear_down.return_value = states.DELETED
+
+        self.service.do_node_tear_down(self.context, node.uuid,
+                                       operation_id=op.uuid)
+        self.service._worker_pool.waitall()
+
+        self.assertEqual(states.DONE, self.dbapi.get_operation(op.uuid).state)
+
+    def test_set_console_mode_with_operation_no_change(self):
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          console_enabled=True)
+        op = self._create_test_operation(node, action='console',
+                                         target='enabled')
+        self._start_service()
+
+        self.service.set_console_mode(self.context, node.uuid, True,
+                                      operation_id=op.uuid)
+        self.service._worker_pool.waitall()
+
+        self.assertEqual(states.DONE, self.dbapi.get_operation(op.uuid).state)
+
     def test_validate_driver_interfaces(self):
         node = obj_utils.create_test_node(self.context, driver='fake')
         ret = self.service.validate_driver_interfaces(self.context,
@@ -1168,6 +1388,88 @@ class ManagerTestCase(tests_db_base.DbTestCase):
         self.assertEqual(new_address, res.address)
         self.assertFalse(mac_update_mock.called)
 
+    def _create_ports(self):
+        port1 = self.dbapi.create_port(utils.get_test_port(
+                                        extra={'vif_port_id': 'fake-id'}))
+        port2 = self.dbapi.create_port(utils.get_test_port(
+                                id=988,
+                                uuid='c8e3a8ae-3f58-4a0a-89c3-4e8b3f0e5a49',
+                                address='52:54:00:cf:2d:32'))
+        return port1, port2
+
+    @mock.patch('ironic.common.neutron.NeutronAPI.update_port_address')
+    def test_update_ports(self, mac_update_mock):
+        obj_utils.create_test_node(self.context, driver='fake')
+        self._start_service()
+        port1, port2 = self._create_ports()
+        port1.extra = {}
+        port2.extra = {'vif_port_id': 'fake-id2'}
+        port2.address = '11:22:33:44:55:bb'
+        res = self.service.update_ports(self.context, [port1, port2])
+        self.assertEqual([{}, {'vif_port_id': 'fake-id2'}],
+                         [p.extra for p in res])
+        mac_update_mock.assert_called_once_with('fake-id2',
+                                                '11:22:33:44:55:bb')
+        for port in (port1, port2):
+            self.assertEqual(set(), port.obj_what_changed())
+        port2.refresh(self.context)
+        self.assertEqual('11:22:33:44:55:bb', port2.address)
+
+    def test_update_ports_node_locked(self):
+        obj_utils.create_test_node(self.context, driver='fake',
+                                   reservation='fake-reserv')
+        self._start_service()
+        port1, port2 = self._create_ports()
+        port1.extra = {'foo': 'baz'}
+        exc = self.assertRaises(messaging.rpc.ExpectedException,
+                                self.service.update_ports,
+                                self.context, [port1, port2])
+        # Compare true exception hidden by @messaging.expected_exceptions
+        self.assertEqual(exception.NodeLocked, exc.exc_info[0])
+
+    def test_update_ports_different_nodes(self):
+        obj_utils.create_test_node(self.context, driver='fake')
+        self._start_service()
+        port1, port2 = self._create_ports()
+        port2.node_id = 124
+        exc = self.assertRaises(messaging.rpc.ExpectedException,
+                                self.service.update_ports,
+                                self.context, [port1, port2])
+        # Compare true exception hidden by @messaging.expected_exceptions
+        self.assertEqual(exception.InvalidParameterValue, exc.exc_info[0])
+
+    def test_update_ports_port_deleted(self):
+        obj_utils.create_test_node(self.context, driver='fake')
+        self._start_service()
+        port1, port2 = self._create_ports()
+        port1.extra = {'foo': 'baz'}
+        self.dbapi.destroy_port(port2.uuid)
+        port2.extra = {'foo': 'baz'}
+        exc = self.assertRaises(messaging.rpc.ExpectedException,
+                                self.service.update_ports,
+                                self.context, [port1, port2])
+        # Compare true exception hidden by @messaging.expected_exceptions
+        self.assertEqual(exception.PortNotFound, exc.exc_info[0])
+        port1.refresh(self.context)
+        self.assertEqual({'vif_port_id': 'fake-id'}, port1.extra)
+
+    @mock.patch('ironic.common.neutron.NeutronAPI.update_port_address')
+    def test_update_ports_address_fail(self, mac_update_mock):
+        obj_utils.create_test_node(self.context, driver='fake')
+        self._start_service()
+        port1, port2 = self._create_ports()
+        port2.extra = {'foo': 'bar'}
+        port1.address = '11:22:33:44:55:bb'
+        mac_update_mock.side_effect = exception.FailedToUpdateMacOnPort(
+                                                            port_id=port1.uuid)
+        exc = self.assertRaises(messaging.rpc.ExpectedException,
+                                self.service.update_ports,
+                                self.context, [port2, port1])
+        # Compare true exception hidden by @messaging.expected_exceptions
+        self.assertEqual(exception.FailedToUpdateMacOnPort, exc.exc_info[0])
+        port2.refresh(self.context)
+        self.assertEqual({}, port2.extra)
+
 
 class ManagerSpawnWorkerTestCase(tests_base.TestCase):
     def setUp(self):
@@ -1858,3 +2160,23 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn, tests_base.TestCase):
                                      self.task)
         self.assertEqual([spawn_after_call] * 2,
                          self.task.spawn_after.call_args_list)
+
+
+@mock.patch.object(dbapi.IMPL, 'purge_operations')
+class ManagerPurgeOperationsTestCase(tests_base.TestCase):
+    def setUp(self):
+        super(ManagerPurgeOperationsTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.service = manager.ConductorManager('hostname', 'test-topic')
+        self.service.dbapi = dbapi.get_instance()
+
+    def test_purge(self, purge_mock):
+        self.config(operation_retention=600, group='conductor')
+        purge_mock.return_value = 3
+        self.service._purge_operations(self.context)
+        purge_mock.assert_called_once_with(600)
+
+    def test_disabled(self, purge_mock):
+        self.config(operation_retention=0, group='conductor')
+        self.service._purge_operations(self.context)
+        self.assertFalse(purge_mock.called)
@@ -22,8 +22,10 @@ import copy
 
 import mock
 from oslo.config import cfg
+from oslo import messaging
 
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common import states
 from ironic.conductor import manager as conductor_manager
 from ironic.conductor import rpcapi as conductor_rpcapi
@@ -100,6 +102,40 @@ class RPCAPITestCase(base.DbTestCase):
                           rpcapi.get_topic_for_driver,
                           'fake-driver')
 
+    def test_get_topic_for_new_conductor(self):
+        # nodes are routed with the current conductors, even if the
+        # drivers were cached before
+        self.dbapi.register_conductor({'hostname': 'other-host',
+                                       'drivers': ['other-driver']})
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        rpcapi.get_topic_for_driver('other-driver')
+        self.dbapi.register_conductor({'hostname': 'fake-host',
+                                       'drivers': ['fake-driver']})
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        self.assertEqual('fake-topic.fake-host',
+                         rpcapi.get_topic_for(self.fake_node_obj))
+
+    def test_get_topic_for_driver_reloaded(self):
+        self.dbapi.register_conductor({'hostname': 'other-host',
+                                       'drivers': ['other-driver']})
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        rpcapi.get_topic_for_driver('other-driver')
+        self.dbapi.register_conductor({'hostname': 'fake-host',
+                                       'drivers': ['fake-driver']})
+        self.assertEqual('fake-topic.fake-host',
+                         rpcapi.get_topic_for_driver('fake-driver'))
+
+    @mock.patch.object(hash_ring.HashRingManager, 'reset')
+    def test_driver_vendor_passthru_timeout(self, mock_reset):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.client, 'prepare') as mock_prepare:
+            mock_prepare.return_value.call.side_effect = (
+                    messaging.MessagingTimeout())
+            self.assertRaises(messaging.MessagingTimeout,
+                              rpcapi.driver_vendor_passthru, self.context,
+                              'fake-driver', 'method', {})
+        mock_reset.assert_called_once_with()
+
     def _test_rpcapi(self, method, rpc_method, **kwargs):
         ctxt = context.get_admin_context()
         rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
@@ -154,6 +190,14 @@ class RPCAPITestCase(base.DbTestCase):
                           node_id=self.fake_node['uuid'],
                           new_state=states.POWER_ON)
 
+    def test_change_node_power_state_with_operation(self):
+        self._test_rpcapi('change_node_power_state',
+                          'call',
+                          version='1.17',
+                          node_id=self.fake_node['uuid'],
+                          new_state=states.POWER_ON,
+                          operation_id='fake-operation')
+
     def test_pass_vendor_info(self):
         self._test_rpcapi('vendor_passthru',
                           'call',
@@ -177,12 +221,47 @@ class RPCAPITestCase(base.DbTestCase):
                           node_id=self.fake_node['uuid'],
                           rebuild=False)
 
+    def test_do_node_deploy_with_operation(self):
+        self._test_rpcapi('do_node_deploy',
+                          'call',
+                          version='1.17',
+                          node_id=self.fake_node['uuid'],
+                          rebuild=False,
+                          operation_id='fake-operation')
+
     def test_do_node_tear_down(self):
         self._test_rpcapi('do_node_tear_down',
                           'call',
                           version='1.6',
                           node_id=self.fake_node['uuid'])
 
+    def test_do_node_tear_down_with_operation(self):
+        self._test_rpcapi('do_node_tear_down',
+                          'call',
+                          version='1.17',
+                          node_id=self.fake_node['uuid'],
+                          operation_id='fake-operation')
+
+    def test_change_nodes_power_state(self):
+        self._test_rpcapi('change_nodes_power_state',
+                          'call',
+                          version='1.16',
+                          node_ids=[self.fake_node['uuid']],
+                          new_state=states.POWER_ON)
+
+    def test_do_nodes_deploy(self):
+        self._test_rpcapi('do_nodes_deploy',
+                          'call',
+                          version='1.16',
+                          node_ids=[self.fake_node['uuid']],
+                          rebuild=False)
+
+    def test_do_nodes_tear_down(self):
+        self._test_rpcapi('do_nodes_tear_down',
+                          'call',
+                          version='1.16',
+                          node_ids=[self.fake_node['uuid']])
+
     def test_validate_driver_interfaces(self):
         self._test_rpcapi('validate_driver_interfaces',
                           'call',
@@ -215,9 +294,24 @@ class RPCAPITestCase(base.DbTestCase):
                           node_id=self.fake_node['uuid'],
                           enabled=True)
 
+    def test_set_console_mode_with_operation(self):
+        self._test_rpcapi('set_console_mode',
+                          'call',
+                          version='1.17',
+                          node_id=self.fake_node['uuid'],
+                          enabled=True,
+                          operation_id='fake-operation')
+
     def test_update_port(self):
         fake_port = dbutils.get_test_port()
         self._test_rpcapi('update_port',
                           'call',
                           version='1.13',
                           port_obj=fake_port)
+
+    def test_update_ports(self):
+        fake_port = dbutils.get_test_port()
+        self._test_rpcapi('update_ports',
+                          'call',
+                          version='1.18',
+                          port_objs=[fake_port])
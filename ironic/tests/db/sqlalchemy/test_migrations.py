@@ -53,6 +53,7 @@ import sqlalchemy.exc
 from ironic.common import utils
 from ironic.db.sqlalchemy import migration
 from ironic.openstack.common.db.sqlalchemy import utils as db_utils
+from ironic.openstack.common import jsonutils
 from ironic.openstack.common import lockutils
 from ironic.openstack.common import log as logging
 from ironic.tests import base
@@ -533,3 +534,43 @@ class TestMigrations(BaseMigrationTestCase, WalkVersionsMixin):
         data['uuid'] = utils.generate_uuid()
         self.assertRaises(sqlalchemy.exc.IntegrityError,
                           nodes.insert().execute, data)
+
+    def _check_4f399b21ae71(self, engine, data):
+        operations = db_utils.get_table(engine, 'operations')
+        col_names = [column.name for column in operations.c]
+        for col in ('uuid', 'node_id', 'action', 'target', 'state', 'error',
+                    'started_at', 'finished_at'):
+            self.assertIn(col, col_names)
+        self.assertIsInstance(operations.c.started_at.type,
+                              sqlalchemy.types.DateTime)
+
+    def _pre_upgrade_3e6395449cee(self, engine):
+        nodes = db_utils.get_table(engine, 'nodes')
+        data = {'driver': 'fake',
+                'uuid': utils.generate_uuid(),
+                'properties': jsonutils.dumps({'cpus': 8,
+                                               'memory_mb': '4096',
+                                               'local_gb': 'many',
+                                               'cpu_arch': 'x86_64'})}
+        nodes.insert().values(data).execute()
+        return data
+
+    def _check_3e6395449cee(self, engine, data):
+        nodes = db_utils.get_table(engine, 'nodes')
+        col_names = [column.name for column in nodes.c]
+        for col in ('cpus', 'memory_mb', 'local_gb', 'cpu_arch'):
+            self.assertIn(col, col_names)
+        self.assertIsInstance(nodes.c.cpus.type, sqlalchemy.types.Integer)
+
+        node = nodes.select(nodes.c.uuid == data['uuid']).execute().first()
+        self.assertEqual(8, node['cpus'])
+        self.assertEqual(4096, node['memory_mb'])
+        self.assertIsNone(node['local_gb'])
+        self.assertEqual('x86_64', node['cpu_arch'])
+
+    def _check_1a59178ebdf6(self, engine, data):
+        for table in ('chassis', 'nodes', 'ports'):
+            table = db_utils.get_table(engine, table)
+            self.assertIn('generation', [column.name for column in table.c])
+            self.assertIsInstance(table.c.generation.type,
+                                  sqlalchemy.types.Integer)
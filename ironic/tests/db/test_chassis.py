@@ -40,6 +40,11 @@ class DbChassisTestCase(base.DbTestCase):
         node = utils.get_test_node(**kwargs)
         return self.dbapi.create_node(node)
 
+    def test_get_chassis_uuids(self):
+        ch = self._create_test_chassis()
+        self.assertEqual({ch['id']: ch['uuid']},
+                         self.dbapi.get_chassis_uuids([ch['id'], 99]))
+
     def test_get_chassis_list(self):
         uuids = []
         for i in range(1, 6):
@@ -50,6 +55,17 @@ class DbChassisTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertEqual(uuids.sort(), res_uuids.sort())
 
+    def test_get_chassis_digest(self):
+        self.assertEqual((0, None, None, None),
+                         self.dbapi.get_chassis_digest())
+        ch = self._create_test_chassis()
+        count, last_modified, ids, generations = (
+                self.dbapi.get_chassis_digest({'uuid': ch['uuid']}))
+        self.assertEqual(1, count)
+        self.assertIsNotNone(last_modified)
+        self.assertEqual(ch['id'], ids)
+        self.assertEqual(0, generations)
+
     def test_get_chassis_by_id(self):
         ch = self._create_test_chassis()
         chassis = self.dbapi.get_chassis(ch['id'])
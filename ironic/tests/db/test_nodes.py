@@ -24,6 +24,7 @@ from ironic.common import exception
 from ironic.common import states
 from ironic.common import utils as ironic_utils
 from ironic.db import api as dbapi
+from ironic.db.sqlalchemy import api as sqla_api
 from ironic.openstack.common import timeutils
 from ironic.tests.db import base
 from ironic.tests.db import utils
@@ -161,6 +162,44 @@ class DbNodeTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertEqual(uuids.sort(), res_uuids.sort())
 
+    def test_get_node_uuids(self):
+        n = utils.get_test_node()
+        self.dbapi.create_node(n)
+        self.assertEqual({n['id']: n['uuid']},
+                         self.dbapi.get_node_uuids([n['id'], 99]))
+
+    def test_get_node_iter(self):
+        uuids = []
+        for i in range(1, 6):
+            n = utils.get_test_node(id=i, uuid=ironic_utils.generate_uuid())
+            self.dbapi.create_node(n)
+            uuids.append(six.text_type(n['uuid']))
+        res = self.dbapi.get_node_iter(sort_dir='desc', batch_size=2)
+        self.assertNotIsInstance(res, list)
+        self.assertEqual(list(reversed(uuids)), [r.uuid for r in res])
+
+    def test_get_node_iter_batches(self):
+        uuids = []
+        for i in range(1, 6):
+            n = utils.get_test_node(id=i, uuid=ironic_utils.generate_uuid(),
+                                    driver='driver-%d' % (i % 2))
+            self.dbapi.create_node(n)
+            uuids.append((n['driver'], n['id'], six.text_type(n['uuid'])))
+        with mock.patch.object(sqla_api.db_utils, 'paginate_query',
+                               wraps=sqla_api.db_utils.paginate_query
+                               ) as mock_pq:
+            res = list(self.dbapi.get_node_iter(sort_key='driver',
+                                                batch_size=2))
+        self.assertEqual([u for d, i, u in sorted(uuids)],
+                         [r.uuid for r in res])
+        # 2 + 2 + 1 rows, one query for each batch
+        self.assertEqual(3, mock_pq.call_count)
+        for call in mock_pq.call_args_list:
+            self.assertEqual(2, call[0][2])
+        self.assertIsNone(mock_pq.call_args_list[0][1]['marker'])
+        self.assertEqual(res[3].uuid,
+                         mock_pq.call_args_list[2][1]['marker'].uuid)
+
     def test_get_node_list_with_filters(self):
         ch1 = utils.get_test_chassis(id=1, uuid=ironic_utils.generate_uuid())
         ch2 = utils.get_test_chassis(id=2, uuid=ironic_utils.generate_uuid())
@@ -188,6 +227,13 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.get_node_list(filters={'driver': 'driver-one'})
         self.assertEqual([1], [r.id for r in res])
 
+        res = self.dbapi.get_node_list(filters={'uuids': [n2['uuid']]})
+        self.assertEqual([2], [r.id for r in res])
+
+        res = self.dbapi.get_node_list(
+                filters={'uuids': [n1['uuid'], n2['uuid']]})
+        self.assertEqual([1, 2], [r.id for r in res])
+
         res = self.dbapi.get_node_list(filters={'driver': 'bad-driver'})
         self.assertEqual([], [r.id for r in res])
 
@@ -209,6 +255,126 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.get_node_list(filters={'maintenance': False})
         self.assertEqual([1], [r.id for r in res])
 
+    def test_get_node_list_with_state_filters(self):
+        n1 = utils.get_test_node(id=1, uuid=ironic_utils.generate_uuid(),
+                                 power_state=states.POWER_ON,
+                                 provision_state=states.ACTIVE)
+        n2 = utils.get_test_node(id=2, uuid=ironic_utils.generate_uuid(),
+                                 power_state=states.POWER_OFF)
+        self.dbapi.create_node(n1)
+        self.dbapi.create_node(n2)
+
+        res = self.dbapi.get_node_list(
+                filters={'power_state': states.POWER_OFF})
+        self.assertEqual([2], [r.id for r in res])
+
+        res = self.dbapi.get_node_list(
+                filters={'provision_state': states.ACTIVE})
+        self.assertEqual([1], [r.id for r in res])
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_get_node_list_updated_since(self, mock_utcnow):
+        create_time = datetime.datetime(2000, 1, 1, 0, 0)
+        update_time = datetime.datetime(2000, 1, 2, 0, 0)
+        mock_utcnow.return_value = create_time
+        for i in (1, 2):
+            n = utils.get_test_node(id=i, uuid=ironic_utils.generate_uuid())
+            # let the DB fill in the timestamps
+            del n['created_at']
+            del n['updated_at']
+            self.dbapi.create_node(n)
+        mock_utcnow.return_value = update_time
+        self.dbapi.update_node(2, {'extra': {'foo': 'bar'}})
+
+        res = self.dbapi.get_node_list(
+                filters={'updated_since': create_time})
+        self.assertEqual([1, 2], [r.id for r in res])
+        res = self.dbapi.get_node_list(
+                filters={'updated_since': update_time})
+        self.assertEqual([2], [r.id for r in res])
+
+    def test_get_node_list_with_property_filters(self):
+        n1 = utils.get_test_node(id=1, uuid=ironic_utils.generate_uuid(),
+                                 properties={'cpus': 4, 'memory_mb': 8192,
+                                             'local_gb': 100,
+                                             'cpu_arch': 'x86_64'})
+        n2 = utils.get_test_node(id=2, uuid=ironic_utils.generate_uuid(),
+                                 properties={'cpus': '16',
+                                             'memory_mb': 131072,
+                                             'local_gb': 1000,
+                                             'cpu_arch': 'ppc64'})
+        n3 = utils.get_test_node(id=3, uuid=ironic_utils.generate_uuid(),
+                                 properties={})
+        for n in (n1, n2, n3):
+            self.dbapi.create_node(n)
+
+        res = self.dbapi.get_node_list(filters={'min_cpus': 8})
+        self.assertEqual([2], [r.id for r in res])
+        res = self.dbapi.get_node_list(filters={'min_memory_mb': 8192})
+        self.assertEqual([1, 2], [r.id for r in res])
+        res = self.dbapi.get_node_list(filters={'min_local_gb': 101})
+        self.assertEqual([2], [r.id for r in res])
+        res = self.dbapi.get_node_list(filters={'cpu_arch': 'x86_64'})
+        self.assertEqual([1], [r.id for r in res])
+        res = self.dbapi.get_node_list(filters={'min_cpus': 4,
+                                                'cpu_arch': 'ppc64'})
+        self.assertEqual([2], [r.id for r in res])
+
+    def test_update_node_properties_columns(self):
+        n = self._create_test_node(properties={'cpus': 4})
+        res = self.dbapi.get_node_list(filters={'min_cpus': 8})
+        self.assertEqual([], res)
+
+        self.dbapi.update_node(n['id'], {'properties': {'cpus': 8,
+                                                        'memory_mb': 'x'}})
+        res = self.dbapi.get_node_list(filters={'min_cpus': 8})
+        self.assertEqual([n['id']], [r.id for r in res])
+
+        # updates which leave the properties alone keep the columns
+        self.dbapi.update_node(n['id'], {'extra': {'foo': 'bar'}})
+        res = self.dbapi.get_node_list(filters={'min_cpus': 8})
+        self.assertEqual([n['id']], [r.id for r in res])
+
+        self.dbapi.update_node(n['id'], {'properties': {}})
+        res = self.dbapi.get_node_list(filters={'min_cpus': 1})
+        self.assertEqual([], res)
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_get_node_digest(self, mock_utcnow):
+        self.assertEqual((0, None, None, None), self.dbapi.get_node_digest())
+
+        create_time = datetime.datetime(2000, 1, 1, 0, 0)
+        update_time = datetime.datetime(2000, 1, 2, 0, 0)
+        mock_utcnow.return_value = create_time
+        n1 = utils.get_test_node(id=1, uuid=ironic_utils.generate_uuid())
+        n2 = utils.get_test_node(id=2, uuid=ironic_utils.generate_uuid(),
+                                 instance_uuid=ironic_utils.generate_uuid())
+        for n in (n1, n2):
+            # let the DB fill in the timestamps
+            del n['created_at']
+            del n['updated_at']
+            self.dbapi.create_node(n)
+        self.assertEqual((2, create_time, 3, 0),
+                         self.dbapi.get_node_digest())
+
+        mock_utcnow.return_value = update_time
+        self.dbapi.update_node(n1['id'], {'extra': {'foo': 'bar'}})
+        self.assertEqual((2, update_time, 3, 1),
+                         self.dbapi.get_node_digest())
+        self.assertEqual((1, update_time, 1, 1),
+                         self.dbapi.get_node_digest({'uuid': n1['uuid']}))
+        self.assertEqual((1, create_time, 2, 0),
+                         self.dbapi.get_node_digest({'associated': True}))
+
+        # updates within the resolution of the timestamps are told apart
+        self.dbapi.update_node(n1['id'], {'extra': {'foo': 'baz'}})
+        self.assertEqual((2, update_time, 3, 2),
+                         self.dbapi.get_node_digest())
+        n = self.dbapi.reserve_node('fake-host', n2['id'])
+        self.dbapi.release_node('fake-host', n.id)
+        self.assertEqual((2, update_time, 3, 4),
+                         self.dbapi.get_node_digest())
+
     def test_get_node_list_chassis_not_found(self):
         self.assertRaises(exception.ChassisNotFound,
                           self.dbapi.get_node_list,
@@ -275,6 +441,16 @@ class DbNodeTestCase(base.DbTestCase):
 
         self.assertRaises(exception.PortNotFound, self.dbapi.get_port, p.id)
 
+    def test_operations_get_destroyed_after_destroying_a_node(self):
+        n = self._create_test_node()
+        op = self.dbapi.create_operation(
+                utils.get_test_operation(node_id=n['id']))
+
+        self.dbapi.destroy_node(n['uuid'])
+
+        self.assertRaises(exception.OperationNotFound,
+                          self.dbapi.get_operation, op.id)
+
     def test_update_node(self):
         n = self._create_test_node()
 
@@ -0,0 +1,128 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for manipulating Operations via the DB API"""
+
+import datetime
+
+import mock
+
+from ironic.common import exception
+from ironic.common import states
+from ironic.common import utils as ironic_utils
+from ironic.db import api as dbapi
+from ironic.openstack.common import timeutils
+
+from ironic.tests.db import base
+from ironic.tests.db import utils
+
+
+class DbOperationTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(DbOperationTestCase, self).setUp()
+        self.dbapi = dbapi.get_instance()
+        self.node = self.dbapi.create_node(utils.get_test_node())
+
+    def _create_test_operation(self, **kwargs):
+        op = utils.get_test_operation(node_id=self.node.id, **kwargs)
+        return self.dbapi.create_operation(op)
+
+    def test_create_operation_generates_uuid(self):
+        op = utils.get_test_operation(node_id=self.node.id)
+        del op['uuid']
+        res = self.dbapi.create_operation(op)
+        self.assertTrue(ironic_utils.is_uuid_like(res.uuid))
+
+    def test_get_operation_by_id(self):
+        op = self._create_test_operation()
+        res = self.dbapi.get_operation(op.id)
+        self.assertEqual(op.uuid, res.uuid)
+        self.assertEqual(states.QUEUED, res.state)
+
+    def test_get_operation_by_uuid(self):
+        op = self._create_test_operation()
+        res = self.dbapi.get_operation(op.uuid)
+        self.assertEqual(op.id, res.id)
+
+    def test_get_operation_that_does_not_exist(self):
+        self.assertRaises(exception.OperationNotFound,
+                          self.dbapi.get_operation, 666)
+
+    def test_get_operation_list(self):
+        uuids = []
+        for i in range(1, 6):
+            op = self._create_test_operation(
+                    id=i, uuid=ironic_utils.generate_uuid())
+            uuids.append(op.uuid)
+        res = self.dbapi.get_operation_list()
+        self.assertEqual(uuids, [r.uuid for r in res])
+
+    def test_get_operation_list_with_filters(self):
+        node2 = self.dbapi.create_node(utils.get_test_node(
+                id=124, uuid=ironic_utils.generate_uuid()))
+        op1 = self._create_test_operation(id=1,
+                                          uuid=ironic_utils.generate_uuid())
+        op2 = self.dbapi.create_operation(utils.get_test_operation(
+                id=2, uuid=ironic_utils.generate_uuid(), node_id=node2.id,
+                action='provision', target=states.ACTIVE,
+                state=states.DONE))
+
+        res = self.dbapi.get_operation_list(filters={'node_id': node2.id})
+        self.assertEqual([op2.id], [r.id for r in res])
+
+        res = self.dbapi.get_operation_list(
+                filters={'state': states.QUEUED})
+        self.assertEqual([op1.id], [r.id for r in res])
+
+        res = self.dbapi.get_operation_list(
+                filters={'action': 'provision'})
+        self.assertEqual([op2.id], [r.id for r in res])
+
+    def test_update_operation(self):
+        op = self._create_test_operation()
+        res = self.dbapi.update_operation(op.uuid, {'state': states.FAILED,
+                                                    'error': 'boom'})
+        self.assertEqual(states.FAILED, res.state)
+        self.assertEqual('boom', res.error)
+
+    def test_update_operation_that_does_not_exist(self):
+        self.assertRaises(exception.OperationNotFound,
+                          self.dbapi.update_operation, 666,
+                          {'state': states.DONE})
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_purge_operations(self, utcnow_mock):
+        past = datetime.datetime(2000, 1, 1, 0, 0)
+        utcnow_mock.return_value = past
+        old_done = self._create_test_operation(
+                id=1, uuid=ironic_utils.generate_uuid(),
+                state=states.DONE, finished_at=past)
+        old_failed = self._create_test_operation(
+                id=2, uuid=ironic_utils.generate_uuid(),
+                state=states.FAILED, finished_at=past)
+        running = self._create_test_operation(
+                id=3, uuid=ironic_utils.generate_uuid(),
+                state=states.RUNNING)
+        recent = self._create_test_operation(
+                id=4, uuid=ironic_utils.generate_uuid(),
+                state=states.DONE,
+                finished_at=past + datetime.timedelta(seconds=50))
+
+        utcnow_mock.return_value = past + datetime.timedelta(seconds=100)
+        self.assertEqual(2, self.dbapi.purge_operations(60))
+
+        res = self.dbapi.get_operation_list()
+        self.assertEqual([running.id, recent.id], [r.id for r in res])
+        for op in (old_done, old_failed):
+            self.assertRaises(exception.OperationNotFound,
+                              self.dbapi.get_operation, op.id)
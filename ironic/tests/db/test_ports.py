@@ -15,6 +15,7 @@
 
 """Tests for manipulating Ports via the DB API"""
 
+
 import six
 
 from ironic.common import exception
@@ -57,6 +58,20 @@ class DbPortTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertEqual(uuids.sort(), res_uuids.sort())
 
+    def test_get_portinfo_list(self):
+        self.dbapi.create_port(self.p)
+        res = self.dbapi.get_portinfo_list(columns=['uuid', 'node_id'])
+        self.assertEqual([(self.p['uuid'], self.n.id)],
+                         [tuple(r) for r in res])
+        res = self.dbapi.get_portinfo_list(filters={'node_id': 99})
+        self.assertEqual([], res)
+
+    def test_get_port_iter(self):
+        self.dbapi.create_port(self.p)
+        res = list(self.dbapi.get_port_iter({'node_id': self.n.id}))
+        self.assertEqual([self.p['uuid']], [r.uuid for r in res])
+        self.assertEqual([], list(self.dbapi.get_port_iter({'node_id': 99})))
+
     def test_get_port_by_address(self):
         self.dbapi.create_port(self.p)
 
@@ -80,6 +95,21 @@ class DbPortTestCase(base.DbTestCase):
         self.dbapi.create_port(self.p)
         self.assertEqual([], self.dbapi.get_ports_by_node_id(99))
 
+    def test_get_port_digest(self):
+        self.assertEqual(0, self.dbapi.get_port_digest()[0])
+        self.dbapi.create_port(self.p)
+        count, last_modified, ids, generations = self.dbapi.get_port_digest(
+                                            {'node_id': self.n.id})
+        self.assertEqual(1, count)
+        self.assertIsNotNone(last_modified)
+        self.assertEqual(0, generations)
+        self.dbapi.update_port(self.p['id'], {'extra': {'foo': 'bar'}})
+        self.assertEqual(1, self.dbapi.get_port_digest(
+                                            {'node_id': self.n.id})[3])
+        self.assertEqual(0, self.dbapi.get_port_digest({'node_id': 99})[0])
+        self.assertEqual(1, self.dbapi.get_port_digest(
+                                    {'address': self.p['address']})[0])
+
     def test_destroy_port(self):
         self.dbapi.create_port(self.p)
         self.dbapi.destroy_port(self.p['id'])
@@ -96,6 +126,37 @@ class DbPortTestCase(base.DbTestCase):
         res = self.dbapi.update_port(self.p['id'], {'address': new_address})
         self.assertEqual(new_address, res.address)
 
+    def test_update_ports(self):
+        self.dbapi.create_port(self.p)
+        p2 = self.dbapi.create_port(db_utils.get_test_port(
+                id=123, uuid=ironic_utils.generate_uuid(),
+                node_id=self.n.id, address='aa-bb-cc-11-22-33'))
+        res = self.dbapi.update_ports({self.p['uuid']: {'extra': {'a': 'b'}},
+                                       p2.uuid: {'extra': {'c': 'd'}}})
+        self.assertEqual(sorted([self.p['uuid'], p2.uuid]),
+                         sorted(p.uuid for p in res))
+        self.assertEqual({'a': 'b'},
+                         self.dbapi.get_port(self.p['uuid']).extra)
+        self.assertEqual({'c': 'd'}, self.dbapi.get_port(p2.uuid).extra)
+
+    def test_update_ports_not_found_rolls_back(self):
+        self.dbapi.create_port(self.p)
+        self.assertRaises(exception.PortNotFound,
+                          self.dbapi.update_ports,
+                          {self.p['uuid']: {'extra': {'a': 'b'}},
+                           ironic_utils.generate_uuid(): {'extra': {}}})
+        self.assertEqual(self.p['extra'],
+                         self.dbapi.get_port(self.p['uuid']).extra)
+
+    def test_update_ports_duplicated_address(self):
+        self.dbapi.create_port(self.p)
+        p2 = self.dbapi.create_port(db_utils.get_test_port(
+                id=123, uuid=ironic_utils.generate_uuid(),
+                node_id=self.n.id, address='aa-bb-cc-11-22-33'))
+        self.assertRaises(exception.MACAlreadyExists,
+                          self.dbapi.update_ports,
+                          {p2.uuid: {'address': self.p['address']}})
+
     def test_destroy_port_on_reserved_node(self):
         p = self.dbapi.create_port(db_utils.get_test_port(node_id=self.n.id))
         uuid = self.n.uuid
@@ -126,6 +126,22 @@ def get_test_chassis(**kw):
     }
 
 
+def get_test_operation(**kw):
+    return {
+        'id': kw.get('id', 17),
+        'uuid': kw.get('uuid', '0b2bf8b8-e6a3-4bd7-9c41-d1f1ab3d5e2f'),
+        'node_id': kw.get('node_id', 123),
+        'action': kw.get('action', 'power'),
+        'target': kw.get('target', states.POWER_ON),
+        'state': kw.get('state', states.QUEUED),
+        'error': kw.get('error'),
+        'started_at': kw.get('started_at'),
+        'finished_at': kw.get('finished_at'),
+        'created_at': kw.get('created_at'),
+        'updated_at': kw.get('updated_at'),
+    }
+
+
 def get_test_conductor(**kw):
     return {
         'id': kw.get('id', 6),
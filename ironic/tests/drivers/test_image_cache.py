@@ -19,6 +19,7 @@
 import mock
 import os
 import tempfile
+import threading
 import time
 
 from ironic.common import exception
@@ -52,7 +53,7 @@ class TestImageCacheFetch(base.TestCase):
         self.cache.fetch_image('uuid', self.dest_path)
         self.assertFalse(mock_download.called)
         mock_fetch_to_raw.assert_called_once_with(
-            None, 'uuid', self.dest_path, None)
+            None, 'uuid', self.dest_path, None, checksum=None)
         self.assertFalse(mock_clean_up.called)
 
     @mock.patch.object(image_cache.ImageCache, 'clean_up')
@@ -85,11 +86,12 @@ class TestImageCacheFetch(base.TestCase):
         self.cache.fetch_image(self.uuid, self.dest_path)
         self.assertFalse(mock_fetch_to_raw.called)
         mock_download.assert_called_once_with(
-            self.uuid, self.master_path, self.dest_path, ctx=None)
+            self.uuid, self.master_path, self.dest_path, ctx=None,
+            checksum=None)
         self.assertTrue(mock_clean_up.called)
 
     def test__download_image(self, mock_fetch_to_raw):
-        def _fake_fetch_to_raw(ctx, uuid, tmp_path, *args):
+        def _fake_fetch_to_raw(ctx, uuid, tmp_path, *args, **kwargs):
             self.assertEqual(self.uuid, uuid)
             self.assertNotEqual(self.dest_path, tmp_path)
             self.assertNotEqual(os.path.dirname(tmp_path), self.master_dir)
@@ -105,6 +107,163 @@ class TestImageCacheFetch(base.TestCase):
         with open(self.dest_path) as fp:
             self.assertEqual("TEST", fp.read())
 
+    def test__download_image_checksum(self, mock_fetch_to_raw):
+        def _fake_fetch_to_raw(ctx, uuid, tmp_path, *args, **kwargs):
+            self.assertEqual('checksum', kwargs['checksum'])
+            touch(tmp_path)
+            return 'checksum'
+
+        mock_fetch_to_raw.side_effect = _fake_fetch_to_raw
+        self.cache._download_image(self.uuid, self.master_path,
+                                   self.dest_path, checksum='checksum')
+        self.assertEqual('checksum',
+                         image_cache._read_checksum(self.master_path))
+
+    @mock.patch.object(image_cache.ImageCache, 'clean_up')
+    @mock.patch.object(image_cache.ImageCache, '_download_image')
+    def test_fetch_image_master_same_checksum(self, mock_download,
+                                              mock_clean_up,
+                                              mock_fetch_to_raw):
+        touch(self.master_path)
+        with open(self.master_path + '.md5', 'w') as fp:
+            fp.write('checksum')
+        self.cache.fetch_image(self.uuid, self.dest_path,
+                               checksum='checksum')
+        self.assertFalse(mock_download.called)
+        self.assertEqual(os.stat(self.dest_path).st_ino,
+                         os.stat(self.master_path).st_ino)
+
+    @mock.patch.object(image_cache.ImageCache, 'clean_up')
+    @mock.patch.object(image_cache.ImageCache, '_download_image')
+    def test_fetch_image_master_other_checksum(self, mock_download,
+                                               mock_clean_up,
+                                               mock_fetch_to_raw):
+        touch(self.master_path)
+        with open(self.master_path + '.md5', 'w') as fp:
+            fp.write('old')
+        self.cache.fetch_image(self.uuid, self.dest_path,
+                               checksum='checksum')
+        self.assertFalse(os.path.exists(self.master_path))
+        self.assertIsNone(image_cache._read_checksum(self.master_path))
+        mock_download.assert_called_once_with(
+            self.uuid, self.master_path, self.dest_path, ctx=None,
+            checksum='checksum')
+
+
+class TestImageCacheSingleFlight(base.TestCase):
+
+    def setUp(self):
+        super(TestImageCacheSingleFlight, self).setUp()
+        self.master_dir = tempfile.mkdtemp()
+        self.dest_dir = tempfile.mkdtemp()
+        self.cache = image_cache.ImageCache(self.master_dir, None, None)
+        self.uuid = 'uuid'
+        self.master_path = os.path.join(self.master_dir, self.uuid)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.downloads = []
+
+    def _fake_download(self, uuid, master_path, dest_path, ctx=None,
+                       checksum=None):
+        self.downloads.append(uuid)
+        self.started.set()
+        self.release.wait()
+        with open(master_path, 'w') as fp:
+            fp.write('TEST')
+        os.link(master_path, dest_path)
+
+    def _fetch_all(self, count):
+        errors = []
+
+        def _fetch(i):
+            try:
+                self.cache.fetch_image(
+                    self.uuid, os.path.join(self.dest_dir, str(i)))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=_fetch, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        self.started.wait()
+        time.sleep(0)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    @mock.patch.object(image_cache.ImageCache, 'clean_up')
+    def test_one_download_for_concurrent_requests(self, mock_clean_up):
+        with mock.patch.object(image_cache.ImageCache, '_download_image',
+                               autospec=True) as mock_download:
+            mock_download.side_effect = (
+                lambda cache, *args, **kwargs:
+                self._fake_download(*args, **kwargs))
+            errors = self._fetch_all(50)
+
+        self.assertEqual([], errors)
+        self.assertEqual(['uuid'], self.downloads)
+        self.assertEqual(51, os.stat(self.master_path).st_nlink)
+        self.assertEqual({}, image_cache._DOWNLOADS)
+        mock_clean_up.assert_called_once_with()
+
+    @mock.patch.object(image_cache.ImageCache, 'clean_up')
+    @mock.patch.object(image_cache.ImageCache, '_download_image')
+    def test_download_retried_after_failure(self, mock_download,
+                                            mock_clean_up):
+        def _fail(*args, **kwargs):
+            self.downloads.append('fail')
+            self.started.set()
+            self.release.wait()
+            raise exception.IronicException()
+
+        def _download(*args, **kwargs):
+            self.downloads.append('ok')
+            self._fake_download(*args, **kwargs)
+
+        calls = [_fail, _download]
+        mock_download.side_effect = (
+            lambda *args, **kwargs: calls.pop(0)(*args, **kwargs))
+        errors = self._fetch_all(3)
+
+        self.assertEqual(1, len(errors))
+        self.assertEqual(['fail', 'ok', 'uuid'], self.downloads)
+        self.assertEqual(3, os.stat(self.master_path).st_nlink)
+        self.assertEqual({}, image_cache._DOWNLOADS)
+
+    def _max_concurrent_slots(self, count):
+        active = []
+        peak = []
+
+        def _download():
+            with image_cache._download_slot():
+                active.append(None)
+                peak.append(len(active))
+                time.sleep(0.01)
+                active.pop()
+
+        threads = [threading.Thread(target=_download) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return max(peak)
+
+    def test_download_slot_serial(self):
+        self.config(parallel_image_downloads=False)
+        self.assertEqual(1, self._max_concurrent_slots(4))
+
+    def test_download_slot_parallel(self):
+        self.config(parallel_image_downloads=True,
+                    image_download_concurrency=2)
+        self.assertEqual(2, self._max_concurrent_slots(4))
+
+    def test_download_slot_unlimited(self):
+        self.config(parallel_image_downloads=True,
+                    image_download_concurrency=0)
+        self.assertEqual(4, self._max_concurrent_slots(4))
+
 
 class TestImageCacheCleanUp(base.TestCase):
 
@@ -134,8 +293,7 @@ class TestImageCacheCleanUp(base.TestCase):
         self.assertEqual(files[0], survived[0][0])
         # NOTE(dtantsur): do not compare milliseconds
         self.assertEqual(int(new_current_time - 100), int(survived[0][1]))
-        self.assertEqual(int(new_current_time - 100),
-                         int(survived[0][2].st_mtime))
+        self.assertEqual(0, survived[0][2])
 
     @mock.patch.object(image_cache.ImageCache, '_clean_up_ensure_cache_size')
     def test_clean_up_old_with_amount(self, mock_clean_size):
@@ -242,7 +400,7 @@ class TestImageCacheCleanUp(base.TestCase):
     @mock.patch.object(utils, 'rmtree_without_raise')
     @mock.patch.object(images, 'fetch_to_raw')
     def test_temp_images_not_cleaned(self, mock_fetch_to_raw, mock_rmtree):
-        def _fake_fetch_to_raw(ctx, uuid, tmp_path, *args):
+        def _fake_fetch_to_raw(ctx, uuid, tmp_path, *args, **kwargs):
             with open(tmp_path, 'w') as fp:
                 fp.write("TEST" * 10)
 
@@ -274,3 +432,145 @@ class TestImageCacheCleanUp(base.TestCase):
         mock_clean_size.side_effect = lambda listing, amount: amount
         self.cache.clean_up(amount=15)
         self.assertTrue(mock_log.called)
+
+
+class TestCacheIndex(base.TestCase):
+
+    def setUp(self):
+        super(TestCacheIndex, self).setUp()
+        self.master_dir = tempfile.mkdtemp()
+        self.cache = image_cache.ImageCache(self.master_dir,
+                                            cache_size=10,
+                                            cache_ttl=600)
+        self.index = self.cache._index
+
+    def _write(self, name, data):
+        file_name = os.path.join(self.master_dir, name)
+        with open(file_name, 'w') as fp:
+            fp.write(data)
+        return file_name
+
+    def _age_dir(self):
+        past = time.time() - 10
+        os.utime(self.master_dir, (past, past))
+
+    def test_shared_between_caches(self):
+        cache = image_cache.ImageCache(self.master_dir, None, None)
+        self.assertIs(self.index, cache._index)
+
+    def test_reconcile(self):
+        file_name = self._write('uuid', 'TEST')
+        self._write('uuid.md5', 'checksum')
+        os.mkdir(os.path.join(self.master_dir, 'tmp'))
+        self.index.refresh()
+        self.assertEqual([file_name], list(self.index.entries))
+        self.assertEqual([4, 1], self.index.entries[file_name][:2])
+        self.assertEqual(4, self.index.total_size)
+
+    def test_refresh_unchanged(self):
+        self._write('uuid', 'TEST')
+        self._age_dir()
+        self.index.refresh()
+        with mock.patch.object(self.index, 'reconcile') as mock_reconcile:
+            self.index.refresh()
+            self.assertFalse(mock_reconcile.called)
+
+    def test_refresh_recent_change(self):
+        self._write('uuid', 'TEST')
+        self.index.refresh()
+        # another change within the same tick would go unnoticed
+        with mock.patch.object(self.index, 'reconcile') as mock_reconcile:
+            self.index.refresh()
+            self.assertTrue(mock_reconcile.called)
+
+    def test_refresh_periodic(self):
+        file_name = self._write('uuid', 'TEST')
+        self._age_dir()
+        self.index.refresh()
+        # changing a file in place does not change the directory
+        with open(file_name, 'a') as fp:
+            fp.write('TEST')
+        self.index.refresh()
+        self.assertEqual(4, self.index.total_size)
+        later = time.time() + image_cache._REINDEX_INTERVAL
+        with mock.patch.object(time, 'time', return_value=later):
+            self.index.refresh()
+        self.assertEqual(8, self.index.total_size)
+
+    @mock.patch.object(images, 'fetch_to_raw')
+    def test_download_indexed(self, mock_fetch_to_raw):
+        def _fake_fetch_to_raw(ctx, uuid, tmp_path, *args, **kwargs):
+            with open(tmp_path, 'w') as fp:
+                fp.write("TEST")
+            return 'checksum'
+
+        mock_fetch_to_raw.side_effect = _fake_fetch_to_raw
+        master_path = os.path.join(self.master_dir, 'uuid')
+        dest_path = os.path.join(tempfile.mkdtemp(), 'dest')
+        self._age_dir()
+        self.index.refresh()
+        self.cache._download_image('uuid', master_path, dest_path)
+        self.assertEqual([4, 2], self.index.entries[master_path][:2])
+        self.assertEqual('checksum', image_cache._read_checksum(master_path))
+        self.assertEqual(4, self.index.total_size)
+        with mock.patch.object(self.index, 'reconcile') as mock_reconcile:
+            self.index.refresh()
+            self.assertFalse(mock_reconcile.called)
+
+    @mock.patch.object(images, 'fetch_to_raw')
+    def test_fetch_miss_not_reconciled(self, mock_fetch_to_raw):
+        mock_fetch_to_raw.side_effect = (
+            lambda ctx, uuid, tmp_path, *args, **kwargs: touch(tmp_path))
+        self._write('other', 'TEST')
+        self._age_dir()
+        self.index.refresh()
+        with mock.patch.object(self.index, 'reconcile') as mock_reconcile:
+            for i in range(3):
+                dest_path = os.path.join(tempfile.mkdtemp(), 'dest')
+                self.cache.fetch_image('uuid%d' % i, dest_path)
+            self.assertFalse(mock_reconcile.called)
+        self.assertEqual(4, len(self.index.entries))
+
+    def test_fetch_hit_updates_last_used(self):
+        master_path = self._write('uuid', 'TEST')
+        self.index.refresh()
+        self.index.entries[master_path][2] = 0
+        dest_path = os.path.join(tempfile.mkdtemp(), 'dest')
+        self.cache.fetch_image('uuid', dest_path)
+        self.assertEqual(2, self.index.entries[master_path][1])
+        self.assertNotEqual(0, self.index.entries[master_path][2])
+
+    def test_clean_up_nothing_to_evict(self):
+        self._write('uuid', 'TEST')
+        self.index.refresh()
+        with mock.patch.object(image_cache.ImageCache,
+                               '_delete_if_unused') as mock_delete:
+            self.cache.clean_up()
+            self.assertFalse(mock_delete.called)
+
+    def test_clean_up_updates_index(self):
+        files = [self._write(str(i), 'TEST') for i in range(3)]
+        checksum_files = [self._write('%d.md5' % i, 'checksum')
+                          for i in range(3)]
+        self.index.refresh()
+        self.assertEqual(12, self.index.total_size)
+        self.cache.clean_up()
+        self.assertEqual(2, len(self.index.entries))
+        self.assertEqual(8, self.index.total_size)
+        self.assertEqual(sorted(self.index.entries),
+                         sorted(f for f in files if os.path.exists(f)))
+        self.assertEqual(sorted(f + '.md5' for f in self.index.entries),
+                         sorted(f for f in checksum_files
+                                if os.path.exists(f)))
+
+    def test_clean_up_stale_link_count(self):
+        master_path = self._write('uuid', 'TEST')
+        dest_path = os.path.join(tempfile.mkdtemp(), 'dest')
+        os.link(master_path, dest_path)
+        self.index.refresh()
+        self.assertEqual(2, self.index.entries[master_path][1])
+        # the copy goes away without the cache knowing
+        os.unlink(dest_path)
+        self.cache.clean_up(amount=1)
+        self.assertFalse(os.path.exists(master_path))
+        self.assertEqual({}, self.index.entries)
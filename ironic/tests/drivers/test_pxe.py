@@ -387,10 +387,24 @@ class PXEPrivateFetchImagesTestCase(db_base.DbTestCase):
 
         mock_show.assert_called_once_with('uuid')
         mock_statvfs.assert_called_once_with('master_dir')
-        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None)
+        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None,
+                                                  checksum=None)
         self.assertFalse(mock_instance_cache.return_value.clean_up.called)
         self.assertFalse(mock_tftp_cache.return_value.clean_up.called)
 
+    def test_checksum_from_metadata(self, mock_image_service, mock_statvfs,
+                                    mock_instance_cache, mock_tftp_cache):
+        mock_show = mock_image_service.return_value.show
+        mock_show.return_value = dict(size=42, checksum='checksum')
+        mock_statvfs.return_value = mock.Mock(f_frsize=1, f_bavail=1024)
+
+        cache = mock.Mock(master_dir='master_dir')
+        pxe._fetch_images(None, cache, [('uuid', 'path')])
+
+        mock_show.assert_called_once_with('uuid')
+        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None,
+                                                  checksum='checksum')
+
     @mock.patch.object(os, 'stat')
     def test_one_clean_up(self, mock_stat, mock_image_service, mock_statvfs,
                           mock_instance_cache, mock_tftp_cache):
@@ -409,7 +423,8 @@ class PXEPrivateFetchImagesTestCase(db_base.DbTestCase):
         mock_show.assert_called_once_with('uuid')
         mock_statvfs.assert_called_with('master_dir')
         self.assertEqual(2, mock_statvfs.call_count)
-        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None)
+        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None,
+                                                  checksum=None)
         mock_instance_cache.return_value.clean_up.assert_called_once_with(
             amount=(42 * 2 - 1))
         self.assertFalse(mock_tftp_cache.return_value.clean_up.called)
@@ -436,7 +451,8 @@ class PXEPrivateFetchImagesTestCase(db_base.DbTestCase):
         mock_show.assert_called_once_with('uuid')
         mock_statvfs.assert_called_with('master_dir')
         self.assertEqual(2, mock_statvfs.call_count)
-        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None)
+        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None,
+                                                  checksum=None)
         mock_tftp_cache.return_value.clean_up.assert_called_once_with(
             amount=(42 * 2 - 1))
         self.assertFalse(mock_instance_cache.return_value.clean_up.called)
@@ -461,7 +477,8 @@ class PXEPrivateFetchImagesTestCase(db_base.DbTestCase):
         mock_show.assert_called_once_with('uuid')
         mock_statvfs.assert_called_with('master_dir')
         self.assertEqual(3, mock_statvfs.call_count)
-        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None)
+        cache.fetch_image.assert_called_once_with('uuid', 'path', ctx=None,
+                                                  checksum=None)
         mock_instance_cache.return_value.clean_up.assert_called_once_with(
             amount=(42 * 2 - 1))
         mock_tftp_cache.return_value.clean_up.assert_called_once_with(
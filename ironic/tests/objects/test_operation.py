@@ -0,0 +1,85 @@
+# coding=utf-8
+#
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from ironic.common import states
+from ironic.db import api as db_api
+from ironic import objects
+
+from ironic.tests.db import base
+from ironic.tests.db import utils
+
+
+class TestOperationObject(base.DbTestCase):
+
+    def setUp(self):
+        super(TestOperationObject, self).setUp()
+        self.fake_operation = utils.get_test_operation()
+        self.dbapi = db_api.get_instance()
+
+    def test_load(self):
+        uuid = self.fake_operation['uuid']
+        with mock.patch.object(self.dbapi, 'get_operation',
+                               autospec=True) as mock_get_operation:
+            mock_get_operation.return_value = self.fake_operation
+
+            objects.Operation.get_by_uuid(self.context, uuid)
+
+            mock_get_operation.assert_called_once_with(uuid)
+
+    def test_create(self):
+        with mock.patch.object(self.dbapi, 'create_operation',
+                               autospec=True) as mock_create_operation:
+            mock_create_operation.return_value = self.fake_operation
+
+            op = objects.Operation(context=self.context, node_id=123,
+                                   action='power', target=states.POWER_ON,
+                                   state=states.QUEUED)
+            op.create()
+
+            mock_create_operation.assert_called_once_with(
+                    {'node_id': 123, 'action': 'power',
+                     'target': states.POWER_ON, 'state': states.QUEUED})
+            self.assertEqual(self.fake_operation['uuid'], op.uuid)
+
+    def test_save(self):
+        uuid = self.fake_operation['uuid']
+        with mock.patch.object(self.dbapi, 'get_operation',
+                               autospec=True) as mock_get_operation:
+            mock_get_operation.return_value = self.fake_operation
+            with mock.patch.object(self.dbapi, 'update_operation',
+                                   autospec=True) as mock_update_operation:
+
+                op = objects.Operation.get_by_uuid(self.context, uuid)
+                op.state = states.RUNNING
+                op.save()
+
+                mock_update_operation.assert_called_once_with(
+                        uuid, {'state': states.RUNNING})
+
+    def test_refresh(self):
+        uuid = self.fake_operation['uuid']
+        returns = [dict(self.fake_operation, state=states.RUNNING),
+                   dict(self.fake_operation, state=states.DONE)]
+        expected = [mock.call(uuid), mock.call(uuid)]
+        with mock.patch.object(self.dbapi, 'get_operation',
+                               side_effect=returns,
+                               autospec=True) as mock_get_operation:
+            op = objects.Operation.get_by_uuid(self.context, uuid)
+            self.assertEqual(states.RUNNING, op.state)
+            op.refresh()
+            self.assertEqual(states.DONE, op.state)
+            self.assertEqual(expected, mock_get_operation.call_args_list)
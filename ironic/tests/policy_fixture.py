@@ -39,6 +39,6 @@ class PolicyFixture(fixtures.Fixture):
         self.addCleanup(ironic_policy.reset)
 
     def set_rules(self, rules):
-        common_policy.set_rules(common_policy.Rules(
+        ironic_policy.set_rules(common_policy.Rules(
                 dict((k, common_policy.parse_rule(v))
                      for k, v in rules.items())))
@@ -18,12 +18,15 @@ import datetime
 import filecmp
 import os
 import tempfile
+
+import mock
 import testtools
 
 from ironic.common import exception
 from ironic.common.glance_service import base_image_service
 from ironic.common.glance_service import service_utils
 from ironic.common import image_service as service
+from ironic.common import ranged_download
 from ironic.openstack.common import context
 from ironic.tests import base
 from ironic.tests import matchers
@@ -504,6 +507,81 @@ class TestGlanceImageService(base.TestCase):
         os.remove(stub_client.s_tmpfname)
         os.remove(tmpfname)
 
+    def _checksum_service(self, checksum):
+        class MyGlanceStubClient(stubs.StubGlanceClient):
+            """A client that returns an image with a checksum."""
+            gets = 0
+
+            def get(self, image_id):
+                self.gets += 1
+                return type('GlanceTestChecksumMeta', (object,),
+                            {'checksum': checksum})
+
+            def data(self, image_id):
+                return ['TE', 'ST']
+
+        stub_context = context.RequestContext(auth_token=True)
+        stub_context.user_id = 'fake'
+        stub_context.project_id = 'fake'
+        return service.Service(MyGlanceStubClient(), 1, stub_context)
+
+    def test_download_checksum(self):
+        # md5 of 'TEST'
+        checksum = '033bd94b1168d7e4f0d644c3c95e35bf'
+        stub_service = self._checksum_service(checksum)
+        (outfd, tmpfname) = tempfile.mkstemp(prefix='checksum')
+        self.addCleanup(os.remove, tmpfname)
+        with os.fdopen(outfd, 'w') as writer:
+            self.assertEqual(checksum, stub_service.download(1, writer))
+        with open(tmpfname) as reader:
+            self.assertEqual('TEST', reader.read())
+
+    def test_download_checksum_known(self):
+        checksum = '033bd94b1168d7e4f0d644c3c95e35bf'
+        stub_service = self._checksum_service('bad')
+        self.assertEqual(checksum, stub_service.download(1, NullWriter(),
+                                                         checksum=checksum))
+        self.assertEqual(0, stub_service.client.gets)
+
+    def test_download_checksum_mismatch(self):
+        stub_service = self._checksum_service('bad')
+        self.assertRaises(exception.ImageChecksumMismatch,
+                          stub_service.download, 1, NullWriter())
+
+    def test_download_no_checksum(self):
+        stub_service = self._checksum_service(None)
+        self.assertIsNone(stub_service.download(1, NullWriter()))
+
+    @mock.patch.object(ranged_download, 'download')
+    def test_download_http_url(self, mock_download):
+        class MyGlanceStubClient(stubs.StubGlanceClient):
+            """A client that returns a http url."""
+            gets = 0
+
+            def get(self, image_id):
+                self.gets += 1
+                return type('GlanceTestDirectUrlMeta', (object,),
+                            {'direct_url': 'http://store/image',
+                             'checksum': '033bd94b1168d7e4f0d644c3c95e35bf'})
+
+        def _download(url, image_file, digest=None):
+            digest.update('TEST')
+
+        mock_download.side_effect = _download
+        stub_context = context.RequestContext(auth_token=True)
+        stub_context.user_id = 'fake'
+        stub_context.project_id = 'fake'
+        stub_service = service.Service(MyGlanceStubClient(),
+                                       context=stub_context,
+                                       version=2)
+        writer = NullWriter()
+        self.config(allowed_direct_url_schemes=['http'], group='glance')
+        self.assertEqual('033bd94b1168d7e4f0d644c3c95e35bf',
+                         stub_service.download(1, writer))
+        mock_download.assert_called_once_with('http://store/image', writer,
+                                              digest=mock.ANY)
+        self.assertEqual(1, stub_service.client.gets)
+
     def test_client_forbidden_converts_to_imagenotauthed(self):
         class MyGlanceStubClient(stubs.StubGlanceClient):
             """A client that raises a Forbidden exception."""
@@ -13,12 +13,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+import mock
 from oslo.config import cfg
 
 from ironic.common import exception
 from ironic.common import hash_ring as hash
 from ironic.db import api as dbapi
 from ironic.openstack.common import context
+from ironic.openstack.common import timeutils
 from ironic.tests import base
 from ironic.tests.db import base as db_base
 
@@ -140,6 +144,10 @@ class HashRingManagerTestCase(db_base.DbTestCase):
             'drivers': ['driver1'],
         })
 
+    def touch_conductors(self):
+        self.dbapi.touch_conductor('host1')
+        self.dbapi.touch_conductor('host2')
+
     def test_hash_ring_manager_get_ring_success(self):
         self.register_conductors()
         ring = self.ring_manager.get_hash_ring('driver1')
@@ -162,3 +170,65 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         self.assertRaises(exception.DriverNotFound,
                           self.ring_manager.get_hash_ring,
                           'driver1')
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_hash_ring_manager_reset_interval(self, mock_utcnow):
+        start = datetime.datetime(2000, 1, 1, 0, 0)
+        mock_utcnow.return_value = start
+        ring_manager = hash.HashRingManager(reset_interval=60)
+        self.assertEqual((0, {}), ring_manager.get_driver_hosts())
+
+        self.register_conductors()
+        mock_utcnow.return_value = start + datetime.timedelta(seconds=30)
+        self.assertRaises(exception.DriverNotFound,
+                          ring_manager.get_hash_ring, 'driver1')
+
+        mock_utcnow.return_value = start + datetime.timedelta(seconds=61)
+        self.touch_conductors()
+        ring = ring_manager.get_hash_ring('driver1')
+        self.assertEqual(['host1', 'host2'], sorted(ring.hosts))
+        self.assertEqual((1, {'driver1': ['host1', 'host2'],
+                              'driver2': ['host1']}),
+                         ring_manager.get_driver_hosts())
+        # built once per generation
+        self.assertIs(ring_manager.get_driver_hosts()[1],
+                      ring_manager.get_driver_hosts()[1])
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_hash_ring_manager_reuses_unchanged_rings(self, mock_utcnow):
+        start = datetime.datetime(2000, 1, 1, 0, 0)
+        mock_utcnow.return_value = start
+        ring_manager = hash.HashRingManager(reset_interval=60)
+        self.register_conductors()
+        ring1 = ring_manager.get_hash_ring('driver1')
+        ring2 = ring_manager.get_hash_ring('driver2')
+        self.assertEqual(1, ring_manager.generation)
+
+        # nothing changed: the rings and the generation are kept
+        mock_utcnow.return_value = start + datetime.timedelta(seconds=61)
+        self.touch_conductors()
+        self.assertIs(ring1, ring_manager.get_hash_ring('driver1'))
+        self.assertEqual(1, ring_manager.generation)
+
+        mock_utcnow.return_value = start + datetime.timedelta(seconds=122)
+        self.touch_conductors()
+        self.dbapi.register_conductor({'hostname': 'host3',
+                                       'drivers': ['driver2']})
+        self.assertIs(ring1, ring_manager.get_hash_ring('driver1'))
+        self.assertIsNot(ring2, ring_manager.get_hash_ring('driver2'))
+        self.assertEqual(2, ring_manager.generation)
+
+    def test_hash_ring_manager_reset(self):
+        ring_manager = hash.HashRingManager(reset_interval=60)
+        self.assertEqual((0, {}), ring_manager.get_driver_hosts())
+        self.register_conductors()
+        self.assertEqual((0, {}), ring_manager.get_driver_hosts())
+        ring_manager.reset()
+        ring = ring_manager.get_hash_ring('driver1')
+        self.assertEqual(['host1', 'host2'], sorted(ring.hosts))
+
+    def test_get_shared_ring_manager(self):
+        self.config(hash_ring_reset_interval=42)
+        ring_manager = hash.get_shared_ring_manager()
+        self.assertIs(ring_manager, hash.get_shared_ring_manager())
+        self.assertEqual(42, ring_manager.reset_interval)
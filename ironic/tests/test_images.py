@@ -18,6 +18,11 @@
 
 import contextlib
 import fixtures
+import os
+import tempfile
+import time
+
+import mock
 
 from ironic.common import exception
 from ironic.common import images
@@ -73,7 +78,7 @@ class IronicImagesTestCase(base.TestCase):
         self.useFixture(fixtures.MonkeyPatch('os.rename', fake_rename))
         self.useFixture(fixtures.MonkeyPatch('os.unlink', fake_unlink))
         self.useFixture(fixtures.MonkeyPatch(
-                'ironic.common.images.fetch', lambda *_: None))
+                'ironic.common.images.fetch', lambda *_, **kw: (None, None)))
         self.useFixture(fixtures.MonkeyPatch(
                 'ironic.common.images.qemu_img_info', fake_qemu_img_info))
         self.useFixture(fixtures.MonkeyPatch(
@@ -110,3 +115,96 @@ class IronicImagesTestCase(base.TestCase):
         self.assertEqual(expected_commands, self.executes)
 
         del self.executes
+
+
+class FetchThrottleTestCase(base.TestCase):
+
+    def setUp(self):
+        super(FetchThrottleTestCase, self).setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'image')
+        self.image_service = mock.Mock()
+        self.image_service.download.side_effect = (
+            lambda image_href, image_file, **kwargs: [
+                image_file.write('x' * 524288) for i in range(2)])
+
+    @mock.patch.object(images, '_ThrottledFile')
+    def test_fetch_not_throttled(self, mock_throttled):
+        images.fetch(None, 'image_href', self.path, self.image_service)
+        self.assertFalse(mock_throttled.called)
+        self.assertEqual(1048576, os.path.getsize(self.path))
+
+    @mock.patch.object(time, 'sleep')
+    @mock.patch.object(time, 'time')
+    def test_fetch_throttled(self, mock_time, mock_sleep):
+        self.config(image_download_bandwidth=1)
+        mock_time.return_value = 100.0
+        with mock.patch.object(images, '_THROTTLE', images._Throttle()):
+            images.fetch(None, 'image_href', self.path, self.image_service)
+        mock_sleep.assert_called_once_with(0.5)
+        self.assertEqual(1048576, os.path.getsize(self.path))
+
+
+class FetchToRawTestCase(base.TestCase):
+
+    def setUp(self):
+        super(FetchToRawTestCase, self).setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'image')
+        self.image_service = mock.Mock()
+
+    def _set_image(self, *chunks):
+        self.image_service.download.side_effect = (
+            lambda image_href, image_file, **kwargs: [
+                image_file.write(chunk) for chunk in chunks])
+
+    def test_sniff_format(self):
+        self.assertEqual('qcow2', images.sniff_format(b'QFI\xfb\x00\x00'))
+        self.assertEqual('vdi', images.sniff_format(
+                                    b'x' * 64 + b'\x7f\x10\xda\xbe'))
+        self.assertEqual('raw', images.sniff_format(b'\x00' * 512))
+        self.assertEqual('raw', images.sniff_format(b''))
+
+    def test_fetch_sniffs_chunks(self):
+        self._set_image(b'QF', b'I', b'\xfb' + b'\x00' * 1024)
+        fmt, checksum = images.fetch(None, 'image_href', self.path,
+                                     self.image_service)
+        self.assertEqual('qcow2', fmt)
+        self.assertEqual(1028, os.path.getsize(self.path))
+
+    def test_fetch_sniffs_file(self):
+        def _copy(image_href, image_file, **kwargs):
+            os.write(image_file.fileno(), b'QFI\xfb')
+
+        self.image_service.download.side_effect = _copy
+        fmt, checksum = images.fetch(None, 'image_href', self.path,
+                                     self.image_service)
+        self.assertEqual('qcow2', fmt)
+
+    @mock.patch.object(images, 'image_to_raw')
+    @mock.patch.object(images, 'qemu_img_info')
+    def test_fetch_to_raw_raw(self, mock_info, mock_to_raw):
+        self._set_image(b'\x00' * 1024)
+        images.fetch_to_raw(None, 'image_href', self.path, self.image_service)
+        self.assertFalse(mock_info.called)
+        self.assertFalse(mock_to_raw.called)
+        self.assertEqual(1024, os.path.getsize(self.path))
+        self.assertFalse(os.path.exists(self.path + '.part'))
+
+    def test_fetch_to_raw_checksum(self):
+        def _download(image_href, image_file, **kwargs):
+            image_file.write(b'\x00' * 1024)
+            return 'checksum'
+
+        self.image_service.download.side_effect = _download
+        self.assertEqual('checksum',
+                         images.fetch_to_raw(None, 'image_href', self.path,
+                                             self.image_service,
+                                             checksum='checksum'))
+        self.image_service.download.assert_called_once_with(
+            'image_href', mock.ANY, checksum='checksum')
+
+    @mock.patch.object(images, 'image_to_raw')
+    def test_fetch_to_raw_converted(self, mock_to_raw):
+        self._set_image(b'QFI\xfb' + b'\x00' * 1024)
+        images.fetch_to_raw(None, 'image_href', self.path, self.image_service)
+        mock_to_raw.assert_called_once_with('image_href', self.path,
+                                            self.path + '.part')
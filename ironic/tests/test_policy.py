@@ -15,10 +15,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
+import fixtures
+import mock
 from oslo.config import cfg
 
 from ironic.common import exception
 from ironic.common import policy as ironic_policy
+from ironic.openstack.common import policy as common_policy
 from ironic.tests import base
 
 
@@ -31,3 +36,106 @@ class PolicyTestCase(base.TestCase):
         ironic_policy.reset()
         CONF.set_override('policy_file', '/non/existent/policy/file')
         self.assertRaises(exception.ConfigNotFound, ironic_policy.init)
+
+
+@mock.patch.object(common_policy, 'check', wraps=common_policy.check)
+class PolicyCheckTestCase(base.TestCase):
+
+    def setUp(self):
+        super(PolicyCheckTestCase, self).setUp()
+        self.policy.set_rules({'admin': 'role:admin or role:administrator',
+                               'admin_api': 'is_admin:True',
+                               'owner': 'tenant:%(tenant)s',
+                               'nested': 'rule:admin and not rule:admin_api',
+                               'default': 'rule:admin_api'})
+
+    def test_check_cached(self, mock_check):
+        creds = {'roles': ['Admin', 'member']}
+        self.assertTrue(ironic_policy.check('admin', {}, creds))
+        self.assertTrue(ironic_policy.check('admin', {'foo': 'bar'},
+                                            {'roles': ['member', 'admin']}))
+        self.assertEqual(1, mock_check.call_count)
+
+        self.assertFalse(ironic_policy.check('admin', {}, {'roles': []}))
+        self.assertFalse(ironic_policy.check('admin', {}, {'roles': []}))
+        self.assertEqual(2, mock_check.call_count)
+
+    def test_check_cached_generic(self, mock_check):
+        self.assertTrue(ironic_policy.check('admin_api', {},
+                                            {'is_admin': True}))
+        self.assertFalse(ironic_policy.check('admin_api', {},
+                                             {'is_admin': False}))
+        self.assertFalse(ironic_policy.check('admin_api', {}, {}))
+        self.assertTrue(ironic_policy.check('admin_api', {},
+                                            {'is_admin': True,
+                                             'user': 'other'}))
+        self.assertEqual(3, mock_check.call_count)
+
+    def test_check_nested_and_default_rules(self, mock_check):
+        creds = {'roles': ['admin'], 'is_admin': False}
+        self.assertTrue(ironic_policy.check('nested', {}, creds))
+        self.assertTrue(ironic_policy.check('nested', {}, creds))
+        self.assertFalse(ironic_policy.check('undefined', {}, creds))
+        self.assertFalse(ironic_policy.check('undefined', {}, creds))
+        self.assertEqual(2, mock_check.call_count)
+
+    def test_check_depends_on_target(self, mock_check):
+        creds = {'tenant': 'a'}
+        self.assertTrue(ironic_policy.check('owner', {'tenant': 'a'}, creds))
+        self.assertFalse(ironic_policy.check('owner', {'tenant': 'b'},
+                                             creds))
+        self.assertEqual(2, mock_check.call_count)
+
+    def test_check_rules_changed(self, mock_check):
+        creds = {'roles': ['admin']}
+        self.assertTrue(ironic_policy.check('admin', {}, creds))
+        self.policy.set_rules({'admin': '!'})
+        self.assertFalse(ironic_policy.check('admin', {}, creds))
+        self.assertEqual(2, mock_check.call_count)
+
+    def test_check_cache_bounded(self, mock_check):
+        self.useFixture(fixtures.MonkeyPatch(
+                'ironic.common.policy._CHECK_CACHE_SIZE', 2))
+        for role in ('a', 'b', 'b', 'c', 'a'):
+            ironic_policy.check('admin', {}, {'roles': [role]})
+        self.assertEqual(4, mock_check.call_count)
+        self.assertEqual(2, len(ironic_policy._CHECK_CACHE))
+
+    def test_check_cache_lru(self, mock_check):
+        self.useFixture(fixtures.MonkeyPatch(
+                'ironic.common.policy._CHECK_CACHE_SIZE', 2))
+        # "a" is used again before "c" is added, "b" is evicted instead
+        for role in ('a', 'b', 'a', 'c', 'a', 'b'):
+            ironic_policy.check('admin', {}, {'roles': [role]})
+        self.assertEqual(4, mock_check.call_count)
+        self.assertEqual([('roles', frozenset(['a'])),
+                          ('roles', frozenset(['b']))],
+                         [key[1] for key in ironic_policy._CHECK_CACHE])
+
+
+class PolicyReloadTestCase(base.TestCase):
+
+    def _write_policy(self, data):
+        with open(self.policy.policy_file_name, 'w') as policy_file:
+            policy_file.write(data)
+
+    @mock.patch.object(time, 'time')
+    def test_reload(self, mock_time):
+        self.config(policy_reload_interval=60)
+        mock_time.return_value = 1000
+        creds = {'roles': ['admin']}
+        self.assertTrue(ironic_policy.check('admin', {}, creds))
+
+        self._write_policy('{"admin": "!"}')
+        with mock.patch('os.path.getmtime', return_value=1):
+            mock_time.return_value = 1030
+            self.assertTrue(ironic_policy.check('admin', {}, creds))
+            mock_time.return_value = 1060
+            self.assertFalse(ironic_policy.check('admin', {}, creds))
+
+    @mock.patch.object(ironic_policy, 'init')
+    def test_no_reload(self, mock_init):
+        self.config(policy_reload_interval=0)
+        ironic_policy.check('admin', {}, {'roles': ['admin']})
+        ironic_policy.check('admin', {}, {'roles': ['admin']})
+        self.assertFalse(mock_init.called)
@@ -0,0 +1,198 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import os
+import re
+import socket
+import ssl
+import tempfile
+import threading
+
+import mock
+from six.moves import BaseHTTPServer
+import six.moves.urllib.parse as urlparse
+
+from ironic.common import exception
+from ironic.common import ranged_download
+from ironic.tests import base
+
+DATA = b''.join(chr(i % 251) for i in range(300000))
+
+
+class FakeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves DATA, with range requests if the server accepts them."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, head):
+        data = DATA
+        match = re.match(r'bytes=(\d+)-(\d+)$',
+                         self.headers.get('Range', ''))
+        if match and self.server.ranges:
+            start, end = int(match.group(1)), int(match.group(2))
+            data = DATA[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' %
+                             (start, end, len(DATA)))
+        else:
+            self.send_response(200)
+        if self.server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+        self.server.requests.append((self.command,
+                                     self.headers.get('Range')))
+
+    def do_HEAD(self):
+        self._send(True)
+
+    def do_GET(self):
+        self._send(False)
+
+
+class RangedDownloadTestCase(base.TestCase):
+
+    def setUp(self):
+        super(RangedDownloadTestCase, self).setUp()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                FakeHandler)
+        self.server.ranges = True
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={'poll_interval': 0.01})
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:%d/image' % self.server.server_port
+        self.path = os.path.join(tempfile.mkdtemp(), 'image')
+        self.config(image_download_ranges=4,
+                    image_download_range_threshold=0)
+
+    def _download(self, digest=None):
+        with open(self.path, 'wb') as image_file:
+            ranged_download.download(self.url, image_file, digest=digest)
+        with open(self.path, 'rb') as image_file:
+            return image_file.read()
+
+    def test_download_ranges(self):
+        digest = hashlib.md5()
+        self.assertEqual(DATA, self._download(digest))
+        self.assertEqual(hashlib.md5(DATA).hexdigest(), digest.hexdigest())
+        self.assertEqual([('HEAD', None)], self.server.requests[:1])
+        self.assertEqual(set(['bytes=0-74999', 'bytes=75000-149999',
+                              'bytes=150000-224999', 'bytes=225000-299999']),
+                         set(r for m, r in self.server.requests[1:]))
+
+    def test_download_ranges_not_supported(self):
+        self.server.ranges = False
+        digest = hashlib.md5()
+        self.assertEqual(DATA, self._download(digest))
+        self.assertEqual(hashlib.md5(DATA).hexdigest(), digest.hexdigest())
+        self.assertEqual([('HEAD', None), ('GET', None)],
+                         self.server.requests)
+
+    def test_download_small(self):
+        self.config(image_download_range_threshold=1)
+        self.assertEqual(DATA, self._download())
+        self.assertEqual([('HEAD', None), ('GET', None)],
+                         self.server.requests)
+
+    def test_download_ranges_disabled(self):
+        self.config(image_download_ranges=1)
+        self.assertEqual(DATA, self._download())
+        self.assertEqual([('GET', None)], self.server.requests)
+
+    @mock.patch.object(ranged_download, '_ranged_size')
+    def test_download_range_refused(self, mock_size):
+        # the server pretends to support ranges, but ignores them
+        self.server.ranges = False
+        mock_size.return_value = len(DATA)
+        self.assertRaises(exception.ImageDownloadFailed, self._download)
+
+    def test_download_unreachable(self):
+        self.url = 'http://127.0.0.1:1/image'
+        self.assertRaises(exception.ImageDownloadFailed, self._download)
+
+    @mock.patch.object(ranged_download.http_client, 'HTTPConnection')
+    def test_download_timeout(self, mock_conn):
+        self.config(image_download_timeout=10)
+        mock_conn.return_value.request.side_effect = socket.timeout()
+        self.assertRaises(exception.ImageDownloadFailed, self._download)
+        mock_conn.assert_called_with('127.0.0.1', self.server.server_port,
+                                     timeout=10)
+        self.assertTrue(mock_conn.return_value.close.called)
+
+    @mock.patch.object(FakeHandler, 'protocol_version', 'HTTP/1.1')
+    def test_download_closes_connections(self):
+        # NOTE: httplib only closes HTTP/1.1 connections when asked to.
+        close = ranged_download.http_client.HTTPConnection.close
+        with mock.patch.object(ranged_download.http_client.HTTPConnection,
+                               'close', autospec=True,
+                               side_effect=close) as mock_close:
+            self.assertEqual(DATA, self._download())
+        # the HEAD request and the 4 ranges
+        self.assertEqual(5, mock_close.call_count)
+
+    def test_preallocate(self):
+        with open(self.path, 'wb') as image_file:
+            ranged_download._preallocate(image_file.fileno(), 1024)
+        self.assertEqual(1024, os.path.getsize(self.path))
+
+    @mock.patch.object(os, 'ftruncate')
+    def test_preallocate_fallocate(self, mock_ftruncate):
+        with mock.patch.object(os, 'posix_fallocate',
+                               create=True) as mock_fallocate:
+            ranged_download._preallocate(42, 1024)
+        mock_fallocate.assert_called_once_with(42, 0, 1024)
+        self.assertFalse(mock_ftruncate.called)
+
+
+@mock.patch.object(ranged_download.http_client, 'HTTPSConnection')
+class HTTPSConnectionTestCase(base.TestCase):
+
+    def setUp(self):
+        super(HTTPSConnectionTestCase, self).setUp()
+        self.url = 'https://store/image'
+        self.parsed = urlparse.urlsplit(self.url)
+
+    def _context(self, mock_conn):
+        ranged_download._connect(self.url, self.parsed)
+        mock_conn.assert_called_once_with('store', None, timeout=60,
+                                          context=mock.ANY)
+        return mock_conn.call_args[1]['context']
+
+    def test_verified(self, mock_conn):
+        context = self._context(mock_conn)
+        self.assertEqual(ssl.CERT_REQUIRED, context.verify_mode)
+        self.assertTrue(context.check_hostname)
+
+    def test_insecure(self, mock_conn):
+        self.config(glance_api_insecure=True, group='glance')
+        context = self._context(mock_conn)
+        self.assertEqual(ssl.CERT_NONE, context.verify_mode)
+        self.assertFalse(context.check_hostname)
+
+    @mock.patch.object(ssl, 'create_default_context')
+    def test_cafile(self, mock_create, mock_conn):
+        self.config(glance_cafile='/path/to/ca', group='glance')
+        self.assertEqual(mock_create.return_value, self._context(mock_conn))
+        mock_create.assert_called_once_with(cafile='/path/to/ca')
+
+    def test_missing_cafile(self, mock_conn):
+        self.config(glance_cafile='/nonexistent/ca', group='glance')
+        self.assertRaises(exception.ImageDownloadFailed,
+                          ranged_download._request, self.url)
+        self.assertFalse(mock_conn.called)
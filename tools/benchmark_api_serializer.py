@@ -0,0 +1,92 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the throughput of the v1 collection endpoints.
+
+Runs GET /v1/nodes/detail and GET /v1/ports/detail against the in-memory
+test database, once with the per-item WSME conversion and once with the
+fast collection serializer, and prints the number of items per second.
+
+Usage: python tools/benchmark_api_serializer.py [NUM_NODES] [ROUNDS]
+"""
+
+import sys
+import time
+
+import mock
+from oslo.config import cfg
+
+from ironic.api.controllers.v1 import collection
+from ironic.common import utils
+from ironic.tests.api import base
+from ironic.tests.db import utils as dbutils
+
+
+class SerializerBenchmark(base.FunctionalTest):
+
+    def __init__(self, num_nodes, rounds):
+        super(SerializerBenchmark, self).__init__('run_benchmark')
+        self.num_nodes = num_nodes
+        self.rounds = rounds
+
+    def _populate(self):
+        chassis = [self.dbapi.create_chassis(dbutils.get_test_chassis(
+                       id=i, uuid=utils.generate_uuid()))
+                   for i in range(1, 11)]
+        for i in range(1, self.num_nodes + 1):
+            ch = chassis[i % len(chassis)]
+            self.dbapi.create_node(dbutils.get_test_node(
+                id=i, uuid=utils.generate_uuid(), chassis_id=ch.id,
+                instance_uuid=None))
+            self.dbapi.create_port(dbutils.get_test_port(
+                id=i, uuid=utils.generate_uuid(), node_id=i,
+                address='52:54:%02x:%02x:%02x:00' % (i >> 16 & 0xff,
+                                                     i >> 8 & 0xff,
+                                                     i & 0xff)))
+
+    def _items_per_sec(self, path, name):
+        start = time.time()
+        for i in range(self.rounds):
+            data = self.get_json(path)
+            assert len(data[name]) == self.num_nodes
+        return self.num_nodes * self.rounds / (time.time() - start)
+
+    def run_benchmark(self):
+        cfg.CONF.set_override('max_limit', self.num_nodes, 'api')
+        self._populate()
+        for path, name in (('/nodes/detail', 'nodes'),
+                           ('/ports/detail', 'ports')):
+            with mock.patch.object(collection.Collection, 'can_serialize',
+                                   return_value=False):
+                before = self._items_per_sec(path, name)
+            after = self._items_per_sec(path, name)
+            print('GET /v1%-14s WSME: %8.0f items/sec  '
+                  'serializer: %8.0f items/sec  (x%.1f)'
+                  % (path, before, after, after / before))
+
+
+def main(argv):
+    num_nodes = int(argv[1]) if len(argv) > 1 else 1000
+    rounds = int(argv[2]) if len(argv) > 2 else 3
+    test = SerializerBenchmark(num_nodes, rounds)
+    result = test.defaultTestResult()
+    test.run(result)
+    for failure in result.errors + result.failures:
+        print(failure[1])
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,122 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the latency of filtering baremetal nodes for a flavor.
+
+Tracks NUM_NODES baremetal nodes, of ten different hardware profiles, in an
+IronicHostManager, then schedules a burst of NUM_INSTANCES instances of one
+flavor, the way the filter scheduler does: filtering the remaining hosts
+with the exact filters, and consuming the first one for each instance. The
+burst is run once with the exact filters tested against every host, and
+once with the flavor index, and the mean latency per request is printed.
+
+Requires nova to be importable.
+
+Usage: python tools/benchmark_ironic_scheduler.py [NUM_NODES] [NUM_INSTANCES]
+"""
+
+import functools
+import sys
+import time
+
+from oslo.config import cfg
+
+from ironic.nova.scheduler import ironic_host_manager
+from nova.openstack.common import jsonutils
+from nova.scheduler import host_manager
+
+CONF = cfg.CONF
+
+EXACT_FILTERS = ['ironic.nova.scheduler.filters.exact_ram_filter.'
+                 'ExactRamFilter',
+                 'ironic.nova.scheduler.filters.exact_disk_filter.'
+                 'ExactDiskFilter',
+                 'ironic.nova.scheduler.filters.exact_core_filter.'
+                 'ExactCoreFilter']
+
+
+def _compute_node(i):
+    profile = i % 10
+    return dict(id=i, local_gb=100 + profile * 10,
+                memory_mb=4096 * (profile + 1), vcpus=8 + profile,
+                vcpus_used=0, local_gb_used=0, memory_mb_used=0,
+                updated_at=None, cpu_info='baremetal cpu',
+                stats=jsonutils.dumps({'cpu_arch': 'x86_64'}),
+                free_disk_gb=100 + profile * 10,
+                free_ram_mb=4096 * (profile + 1))
+
+
+def _populate(manager, num_nodes):
+    computes = [_compute_node(i) for i in range(num_nodes)]
+    hosts = [manager.host_state_cls('host', 'node%d' % c['id'], compute=c)
+             for c in computes]
+    return hosts, computes
+
+
+def _reset(hosts, computes):
+    for host, compute in zip(hosts, computes):
+        host.update_from_compute_node(compute)
+
+
+def _schedule(get_filtered_hosts, hosts, num_instances):
+    """Return the mean time, in seconds, to filter the hosts."""
+    # the flavor of the third hardware profile
+    instance_type = dict(memory_mb=4096 * 3, root_gb=120, ephemeral_gb=0,
+                         swap=0, vcpus=10)
+    filter_properties = {'instance_type': instance_type}
+    elapsed = 0.0
+    requests = 0
+    for num in range(num_instances):
+        start = time.time()
+        hosts = get_filtered_hosts(hosts, filter_properties, index=num)
+        elapsed += time.time() - start
+        requests += 1
+        if not hosts:
+            break
+        hosts[0].consume_from_instance(instance_type)
+    return elapsed / requests
+
+
+def main(argv):
+    num_nodes = int(argv[1]) if len(argv) > 1 else 10000
+    num_instances = int(argv[2]) if len(argv) > 2 else 200
+    CONF([], project='nova')
+    CONF.set_override('scheduler_available_filters',
+                      CONF.scheduler_available_filters + EXACT_FILTERS)
+    CONF.set_override('scheduler_default_filters',
+                      ['ExactRamFilter', 'ExactDiskFilter',
+                       'ExactCoreFilter'])
+
+    manager = ironic_host_manager.IronicHostManager()
+    hosts, computes = _populate(manager, num_nodes)
+
+    _reset(hosts, computes)
+    # bypass the flavor index of IronicHostManager
+    before = _schedule(functools.partial(
+                            host_manager.HostManager.get_filtered_hosts,
+                            manager),
+                       hosts, num_instances)
+    _reset(hosts, computes)
+    after = _schedule(manager.get_filtered_hosts, hosts, num_instances)
+
+    print('%d nodes, %d instances: filters: %.2f ms/request  '
+          'index: %.2f ms/request  (x%.1f)'
+          % (num_nodes, num_instances, before * 1000, after * 1000,
+             before / max(after, 1e-9)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,130 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the throughput of image downloads over HTTP.
+
+Serves an image of SIZE_MB MiB from a local HTTP server which supports
+range requests, and limits each of its connections to RATE_MB MiB/s, the
+way the throughput of a single TCP connection is limited on a real network.
+The image is downloaded once in a single stream, and once in RANGES
+concurrent ranges, and the throughput of both downloads is printed.
+
+Usage: python tools/benchmark_ranged_download.py [SIZE_MB] [RANGES] [RATE_MB]
+"""
+
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from oslo.config import cfg
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from ironic.common import ranged_download
+
+CONF = cfg.CONF
+
+CHUNK_SIZE = 65536
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves the image of the server, at a limited rate per connection."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, head):
+        data = self.server.data
+        start, end = 0, len(data) - 1
+        match = re.match(r'bytes=(\d+)-(\d+)$',
+                         self.headers.get('Range', ''))
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' %
+                             (start, end, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if head:
+            return
+        delay = float(CHUNK_SIZE) / self.server.rate
+        for offset in range(start, end + 1, CHUNK_SIZE):
+            self.wfile.write(data[offset:min(offset + CHUNK_SIZE, end + 1)])
+            time.sleep(delay)
+
+    def do_HEAD(self):
+        self._send(True)
+
+    def do_GET(self):
+        self._send(False)
+
+
+class StandInServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def _download(url, path, ranges):
+    """Return the throughput, in MiB/s, of downloading the image."""
+    CONF.set_override('image_download_ranges', ranges)
+    digest = hashlib.md5()
+    start = time.time()
+    with open(path, 'wb') as image_file:
+        ranged_download.download(url, image_file, digest=digest)
+    elapsed = time.time() - start
+    return os.path.getsize(path) / 1048576.0 / elapsed, digest.hexdigest()
+
+
+def main(argv):
+    size_mb = int(argv[1]) if len(argv) > 1 else 256
+    ranges = int(argv[2]) if len(argv) > 2 else 4
+    rate_mb = int(argv[3]) if len(argv) > 3 else 50
+    CONF([], project='ironic')
+    CONF.set_override('image_download_range_threshold', 0)
+
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    server.data = os.urandom(size_mb * 1048576)
+    server.rate = rate_mb * 1048576
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:%d/image' % server.server_port
+    path = os.path.join(tempfile.mkdtemp(), 'image')
+
+    try:
+        before, checksum = _download(url, path, 1)
+        after, ranged_checksum = _download(url, path, ranges)
+    finally:
+        server.shutdown()
+        os.unlink(path)
+        os.rmdir(os.path.dirname(path))
+    if checksum != ranged_checksum:
+        print('checksum mismatch: %s != %s' % (checksum, ranged_checksum))
+        return 1
+
+    print('%d MiB at %d MiB/s per connection: stream: %.1f MiB/s  '
+          '%d ranges: %.1f MiB/s  (x%.1f)'
+          % (size_mb, rate_mb, before, ranges, after, after / before))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))